@@ -3,10 +3,10 @@ from future.utils import iteritems, with_metaclass
 
 from agricola import AgricolaInvalidChoice, AgricolaImpossible, AgricolaPoorlyFormed
 from agricola.choice import (
-    DiscreteChoice, CountChoice, ListChoice,
-    VariableLengthListChoice, SpaceChoice)
+    DiscreteChoice, CountChoice, VariableLengthListChoice, SpaceChoice)
 from agricola.cards import MinorImprovement as MinorImprovementCard
 from agricola.cards import MajorImprovement as MajorImprovementCard
+from agricola.affordability import get_affordability_index
 
 
 class Action(with_metaclass(abc.ABCMeta, object)):
@@ -102,6 +102,8 @@ class Accumulating(ResourceAcquisition):
 
 class BasicWishForChildren(Action):
     def choices(self, player):
+        if not player.hand['minor_improvements']:
+            return []
         return [
             DiscreteChoice(
                player.hand['minor_improvements'],
@@ -110,7 +112,7 @@ class BasicWishForChildren(Action):
 
     def _effect(self, player, choices):
         player.add_people(1)
-        if choices[0] is not None:
+        if choices and choices[0] is not None:
             player.play_minor_improvement(choices[0], player.game)
 
 
@@ -195,7 +197,7 @@ class ResourceMarket3P(ResourceAcquisition):
         resources = self.resources.copy()
         resources[choices[0]] = 1
         resources["food"] = 1
-        player.add_resources(resources)
+        player.add_resources(**resources)
 
 
 class ResourceMarket4P(ResourceAcquisition):
@@ -243,8 +245,12 @@ class AnimalMarket(ResourceAcquisition):
 class FarmExpansion(Action):
     def choices(self, player):
         return [
-            VariableLengthListChoice(SpaceChoice("Room location."), "Number of rooms."),
-            VariableLengthListChoice(SpaceChoice("Stable location."), "Number of stables.")
+            VariableLengthListChoice(
+                SpaceChoice("Room location.", player.legal_spaces('room'), 'room'),
+                "Number of rooms."),
+            VariableLengthListChoice(
+                SpaceChoice("Stable location.", player.legal_spaces('stable'), 'stable'),
+                "Number of stables.")
         ]
 
     def _effect(self, player, choices):
@@ -275,21 +281,25 @@ class FarmExpansion(Action):
 class HouseRedevelopment(Action):
     def choices(self, player):
         house_upgrade_mats = player.valid_house_upgrades()
+        if not house_upgrade_mats:
+            raise AgricolaImpossible("House cannot be renovated any further.")
+        choices = [DiscreteChoice(house_upgrade_mats, "Choose new house material.")]
         imps = player.hand["minor_improvements"] + player.game.major_improvements
-        return [
-            DiscreteChoice(house_upgrade_mats, "Choose new house material."),
-            DiscreteChoice(imps, "Choose an optional improvement after renovation.")]
+        if imps:
+            choices.append(
+                DiscreteChoice(imps, "Choose an optional improvement after renovation."))
+        return choices
 
     def _effect(self, player, choices):
         player.upgrade_house(choices[0])
 
-        imp = choices[1]
+        imp = choices[1] if len(choices) > 1 else None
         if imp is not None:
             if isinstance(imp, MinorImprovementCard):
                 player.play_minor_improvement(imp, player.game)
             elif isinstance(imp, MajorImprovementCard):
                 player.play_major_improvement(imp, player.game)
-                player.game.major_improvements.remove(imp)
+                player.game.remove_major_improvement(imp)
             else:
                 raise AgricolaPoorlyFormed(
                     "Received {0}, but a major/minor improvement was expected.")
@@ -297,9 +307,14 @@ class HouseRedevelopment(Action):
 
 class FarmRedevelopment(Action):
     def choices(self, player):
+        house_upgrade_mats = player.valid_house_upgrades()
+        if not house_upgrade_mats:
+            raise AgricolaImpossible("House cannot be renovated any further.")
         return [
-            DiscreteChoice(player.house_progression[player.house_type], "Choose new house material."),
-            ListChoice(ListChoice(SpaceChoice("Space to pasteurize.")))
+            DiscreteChoice(house_upgrade_mats, "Choose new house material."),
+            VariableLengthListChoice(
+                VariableLengthListChoice(
+                    SpaceChoice("Space to pasteurize.", player.legal_spaces('pasture'), 'pasture')))
         ]
 
     def _effect(self, player, choices):
@@ -310,7 +325,10 @@ class FarmRedevelopment(Action):
 
 class MajorImprovement(Action):
     def choices(self, player):
-        imps = player.hand["minor_improvements"] + player.game.major_improvements
+        imps = get_affordability_index().playable_improvements(player)
+        if not imps:
+            raise AgricolaImpossible(
+                "Player cannot afford any major or minor improvement.")
         return [
             DiscreteChoice(imps, "Choose a major or minor improvement.")
         ]
@@ -321,7 +339,7 @@ class MajorImprovement(Action):
             player.play_minor_improvement(imp, player.game)
         elif isinstance(imp, MajorImprovementCard):
             player.play_major_improvement(imp, player.game)
-            player.game.major_improvements.remove(imp)
+            player.game.remove_major_improvement(imp)
         else:
             raise AgricolaPoorlyFormed(
                 "Received {0}, but a major/minor improvement was expected.")
@@ -331,7 +349,8 @@ class Fencing(Action):
     def choices(self, player):
         return [
             VariableLengthListChoice(
-                VariableLengthListChoice(SpaceChoice("Space to pasteurize.")))
+                VariableLengthListChoice(
+                    SpaceChoice("Space to pasteurize.", player.legal_spaces('pasture'), 'pasture')))
         ]
 
     def _effect(self, player, choices):
@@ -347,6 +366,8 @@ class Fencing(Action):
 
 class Lessons(Action):
     def choices(self, player):
+        if not player.hand['occupations']:
+            raise AgricolaImpossible("Player has no occupations left to play.")
         return [
             DiscreteChoice(player.hand['occupations'], 'Choose an occupation from your hand.')
         ]
@@ -360,6 +381,8 @@ class Lessons(Action):
 
 class Lessons3P(Action):
     def choices(self, player):
+        if not player.hand['occupations']:
+            raise AgricolaImpossible("Player has no occupations left to play.")
         return [
             DiscreteChoice(player.hand['occupations'], 'Choose an occupation from your hand.')
         ]
@@ -371,6 +394,8 @@ class Lessons3P(Action):
 
 class Lessons4P(Action):
     def choices(self, player):
+        if not player.hand['occupations']:
+            raise AgricolaImpossible("Player has no occupations left to play.")
         return [
             DiscreteChoice(player.hand['occupations'], 'Choose an occupation from your hand.')
         ]
@@ -386,6 +411,8 @@ class Lessons4P(Action):
 
 class MeetingPlace(Action):
     def choices(self, player):
+        if not player.hand['minor_improvements']:
+            return []
         return [
             DiscreteChoice(
                player.hand['minor_improvements'], "Choose an optional minor improvement.")
@@ -393,7 +420,7 @@ class MeetingPlace(Action):
 
     def _effect(self, player, choices):
         player.game.set_first_player(player)
-        if choices[0] is not None:
+        if choices and choices[0] is not None:
             player.play_minor_improvement(choices[0], player.game)
 
 
@@ -407,7 +434,7 @@ class MeetingPlaceFamily(Accumulating):
 
 class Farmland(Action):
     def choices(self, player):
-        return [SpaceChoice("Space to plow.")]
+        return [SpaceChoice("Space to plow.", player.legal_spaces('field'))]
 
     def _effect(self, player, choices):
         player.plow_fields(choices[0])
@@ -416,7 +443,7 @@ class Farmland(Action):
 class Cultivation(Action):
     def choices(self, player):
         return [
-            SpaceChoice("Space to plow."),
+            SpaceChoice("Space to plow.", player.legal_spaces('field')),
             CountChoice(player.grain, "Number of grain seeds to plant."),
             CountChoice(player.veg, "Number of vegatable seeds to plant.")]
 
@@ -465,7 +492,7 @@ class VegetableSeeds(ResourceAcquisition):
 class SideJob(Action):
     def choices(self, player):
         return [
-            SpaceChoice("Stable location."),
+            SpaceChoice("Stable location.", player.legal_spaces('stable'), 'stable'),
             CountChoice(player.grain, "Number of grain bushels to bake into bread.")]
 
     def _effect(self, player, choices):
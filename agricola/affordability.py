@@ -0,0 +1,133 @@
+""" Index of improvement costs and prerequisites for finding playable cards in bulk.
+
+Rather than attempting to play each improvement on a copy of a player and
+seeing which attempts raise, the costs and prerequisites of every improvement
+in the catalogue are stored as arrays once. A player is summarized by a
+resource vector and a prerequisite feature vector, and the playable subset of
+the catalogue is given by a single comparison of those vectors against the
+arrays. Batches of players can be handled at once by stacking their vectors.
+
+"""
+import numpy as np
+
+from agricola.cards import (
+    PREREQUISITE_FEATURES, prerequisite_value,
+    get_minor_improvements, get_major_improvements)
+
+
+COST_RESOURCES = [
+    'food', 'wood', 'clay', 'stone', 'reed', 'grain', 'veg',
+    'sheep', 'boar', 'cattle']
+
+
+class AffordabilityIndex(object):
+    """ Cost matrix and prerequisite bounds for a catalogue of improvements.
+
+    Cards are identified by name, so any instance of a catalogued card
+    (e.g. a copy in a player's hand) can be looked up in the index.
+
+    Parameters
+    ----------
+    cards: list of MinorImprovement/MajorImprovement instances
+        The catalogue.
+
+    """
+    def __init__(self, cards):
+        self.cards = list(cards)
+        self.names = [c.name for c in self.cards]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        if len(self.index) != len(self.cards):
+            raise ValueError("Card names in an AffordabilityIndex must be unique.")
+
+        n_cards = len(self.cards)
+        self.costs = np.zeros((n_cards, len(COST_RESOURCES)), dtype=np.int64)
+
+        # Unbounded prerequisites are given the widest possible bounds.
+        big = np.iinfo(np.int64).max
+        n_features = len(PREREQUISITE_FEATURES)
+        self.prereq_min = np.full((n_cards, n_features), -big, dtype=np.int64)
+        self.prereq_max = np.full((n_cards, n_features), big, dtype=np.int64)
+
+        for i, card in enumerate(self.cards):
+            for resource, amount in card.cost.items():
+                self.costs[i, COST_RESOURCES.index(resource)] = amount
+
+            for feature, (mn, mx) in card.prerequisites.items():
+                j = PREREQUISITE_FEATURES.index(feature)
+                if mn is not None:
+                    self.prereq_min[i, j] = mn
+                if mx is not None:
+                    self.prereq_max[i, j] = mx
+
+        self.has_prerequisites = (
+            (self.prereq_min != -big) | (self.prereq_max != big)).any(axis=1)
+
+    def __len__(self):
+        return len(self.cards)
+
+    @staticmethod
+    def resource_vector(player):
+        return np.array([getattr(player, r) for r in COST_RESOURCES], dtype=np.int64)
+
+    @staticmethod
+    def feature_vector(player):
+        return np.array(
+            [prerequisite_value(player, f) for f in PREREQUISITE_FEATURES], dtype=np.int64)
+
+    def affordable(self, resources, features=None):
+        """ Find the catalogued cards that can be played.
+
+        Parameters
+        ----------
+        resources: array-like, shape (..., len(COST_RESOURCES))
+            Resource vectors of one or more players.
+        features: array-like, shape (..., len(PREREQUISITE_FEATURES)) (optional)
+            Prerequisite feature vectors of the same players. If not supplied,
+            only costs are compared and prerequisites are ignored.
+
+        Returns
+        -------
+        Boolean array of shape (..., len(self)).
+
+        """
+        resources = np.asarray(resources)
+        result = (resources[..., None, :] >= self.costs).all(axis=-1)
+
+        if features is not None:
+            features = np.asarray(features)[..., None, :]
+            result &= ((features >= self.prereq_min) & (features <= self.prereq_max)).all(axis=-1)
+
+        return result
+
+    def player_mask(self, player):
+        """ Boolean array over the catalogue giving the cards that ``player`` could afford to play. """
+        return self.affordable(self.resource_vector(player), self.feature_vector(player))
+
+    def playable(self, player, cards):
+        """ Filter ``cards`` down to the ones that ``player`` can afford to play. """
+        mask = self.player_mask(player)
+        return [c for c in cards if mask[self.index[c.name]]]
+
+    def playable_improvements(self, player):
+        """ Playable minor improvements from the hand of ``player`` and major improvements from the pool.
+
+        These are the options offered by the "Major Improvement", "House Redevelopment"
+        and (minor improvements only) "Wish for Children" action spaces.
+
+        """
+        minor = self.playable(player, player.hand['minor_improvements'])
+        major = []
+        if player.game is not None:
+            major = self.playable(player, player.game.major_improvements)
+        return minor + major
+
+
+_default_index = None
+
+
+def get_affordability_index():
+    """ Return the (cached) AffordabilityIndex over all minor and major improvements. """
+    global _default_index
+    if _default_index is None:
+        _default_index = AffordabilityIndex(get_minor_improvements() + get_major_improvements())
+    return _default_index
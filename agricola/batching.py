@@ -0,0 +1,177 @@
+""" Batched evaluation of decisions from many concurrent games.
+
+A policy or value network is much faster on one batch of many states than on
+as many single states, but ``game.play`` asks its user interface for one
+decision at a time. An InferenceQueue lets many games share one batched
+function: each game submits the request for its decision and blocks (or, in
+asyncio code, awaits ``asyncio.wrap_future`` of the returned future), while a
+background thread collects the pending requests and passes them to the
+function together, either as soon as ``max_batch`` of them are waiting or
+once the oldest has waited ``max_latency`` seconds. Each answer is then
+routed back to the game that asked for it.
+
+A BatchedAgent is an agent that decides through a queue: its request is the
+position together with its legal moves, and the answer is a score for each
+of the moves. Running one ``game.play`` per thread, all with BatchedAgents
+sharing a queue, evaluates the decisions of all the games in batches.
+
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from agricola.search import SearchAgent, legal_moves
+
+
+class QueueStats(object):
+    """ Counters describing the batches flushed by an InferenceQueue. """
+    def __init__(self):
+        self.requests = 0
+        self.batches = 0
+        self.full_batches = 0
+
+    @property
+    def mean_batch_size(self):
+        return self.requests / float(self.batches) if self.batches else 0.0
+
+    def __str__(self):
+        return "<QueueStats requests={0} batches={1} full_batches={2} mean_batch_size={3:.1f}>".format(
+            self.requests, self.batches, self.full_batches, self.mean_batch_size)
+
+    def __repr__(self):
+        return str(self)
+
+
+class InferenceQueue(object):
+    """ Queue that answers requests from many threads with one batched function.
+
+    Parameters
+    ----------
+    fn: callable
+        Function from a list of requests to a sequence with one answer per
+        request, in the same order.
+    max_batch: int > 0
+        Largest number of requests passed to ``fn`` at once. A batch is
+        flushed as soon as it is full.
+    max_latency: float
+        Seconds that a request waits for others to join its batch before the
+        batch is flushed anyway.
+
+    """
+    def __init__(self, fn, max_batch=512, max_latency=0.005):
+        if max_batch <= 0:
+            raise ValueError("max_batch must be positive, got {0}.".format(max_batch))
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.stats = QueueStats()
+        # (request, future, time of submission), oldest first.
+        self._pending = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+
+    def submit(self, request):
+        """ Queue ``request``. Returns a ``concurrent.futures.Future`` of its answer. """
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Cannot submit to a closed InferenceQueue.")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._pending.append((request, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def evaluate(self, request):
+        """ Answer to ``request``, blocking until its batch has been evaluated. """
+        return self.submit(request).result()
+
+    def close(self):
+        """ Flush the requests that are still pending and stop the background thread. """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _next_batch(self):
+        """ Wait for a batch to be due and take it from the queue. Returns None once closed and empty. """
+        with self._cond:
+            while True:
+                if self._pending:
+                    if self._closed or len(self._pending) >= self.max_batch:
+                        break
+                    wait = self._pending[0][2] + self.max_latency - time.perf_counter()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                elif self._closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            self.stats.batches += 1
+            self.stats.requests += len(batch)
+            if len(batch) == self.max_batch:
+                self.stats.full_batches += 1
+
+            futures = [f for _, f, _ in batch]
+            try:
+                answers = list(self.fn([r for r, _, _ in batch]))
+                if len(answers) != len(batch):
+                    raise ValueError(
+                        "Batched function returned {0} answers for {1} requests.".format(
+                            len(answers), len(batch)))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, answer in zip(futures, answers):
+                    future.set_result(answer)
+
+
+class BatchedAgent(SearchAgent):
+    """ Agent that scores its legal moves through an InferenceQueue and plays the best one.
+
+    The requests sent to the queue are ``(game, moves)`` pairs of a search
+    copy of the position and its legal moves, and the answers must be
+    sequences with one score per move.
+
+    Parameters
+    ----------
+    queue: InferenceQueue
+    max_list_length: int
+        Passed on to ``search.legal_moves``.
+
+    """
+    def __init__(self, queue, max_list_length=1):
+        super(BatchedAgent, self).__init__(max_list_length)
+        self.queue = queue
+
+    def choose_move(self, game):
+        moves = legal_moves(game, self.max_list_length)
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+        scores = self.queue.evaluate((game, moves))
+        return moves[int(np.argmax(scores))]
@@ -0,0 +1,291 @@
+""" Opening book for the first rounds of a game.
+
+With a fixed schedule of actions the first rounds of a game reach the same
+few positions over and over again, and a search agent spends its full budget
+on each of them every time. An OpeningBook stores, for positions found by an
+offline search, the move that the search preferred together with how sure it
+was, so that agents can play those positions instantly.
+
+Positions are keyed by ``position_hash``, a 64 bit hash of ``search.state_key``
+and of the actions still to be revealed that, unlike ``hash``, is the same in
+every process. Books are built with ``build_book``, which walks the positions
+of the first rounds from a starting position and searches each of them with
+MCTS, and are saved as a ``.npy`` array of fixed size records sorted by hash.
+``OpeningBook.load`` memory-maps that file by default, so that a large book
+costs nothing to open, is shared between the processes that use it and only
+has the pages touched by lookups read into memory.
+
+A BookAgent wraps any agent: it plays the book move in positions up to a
+given round whose entry is confident enough, and leaves the other positions
+to the agent that it wraps.
+
+"""
+import ast
+import bisect
+import hashlib
+
+import numpy as np
+
+from agricola.search import Move, SearchAgent, state_key
+
+
+def position_hash(game):
+    """ Hash of the position in ``game``, as an int in [0, 2**64), stable across processes. """
+    schedule = tuple(a.name for _, a in game.round_schedule[game.round_idx:])
+    data = repr((state_key(game), schedule)).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def _plain(value):
+    """ Encoded answer with numpy scalars converted, so that its repr is a Python literal. """
+    if isinstance(value, (tuple, list)):
+        return tuple(_plain(v) for v in value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+class BookEntry(object):
+    """ What the search that built a book found in one position.
+
+    Parameters
+    ----------
+    move: Move
+        Move preferred by the search.
+    depth: int
+        Round of the position.
+    visits: int
+        Number of simulations spent on the position.
+    confidence: float
+        Fraction of the simulations that went to ``move``.
+    value: float
+        Mean reward of ``move`` for the player to move.
+
+    """
+    def __init__(self, move, depth, visits, confidence, value):
+        self.move = move
+        self.depth = depth
+        self.visits = visits
+        self.confidence = confidence
+        self.value = value
+
+    def __str__(self):
+        return "<BookEntry {0} depth={1} visits={2} confidence={3:.3f} value={4:.3f}>".format(
+            self.move, self.depth, self.visits, self.confidence, self.value)
+
+    def __repr__(self):
+        return str(self)
+
+
+class BookStats(object):
+    """ Counters describing the use of an OpeningBook. """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    @property
+    def probes(self):
+        return self.hits + self.misses + self.rejected
+
+    def __str__(self):
+        return "<BookStats hits={0} misses={1} rejected={2}>".format(
+            self.hits, self.misses, self.rejected)
+
+    def __repr__(self):
+        return str(self)
+
+
+class OpeningBook(object):
+    """ Map from positions to BookEntries.
+
+    Entries added with ``add`` are kept in a dict until the book is saved.
+    Loaded books are read-only.
+
+    """
+    def __init__(self):
+        self._entries = {}
+        self._records = None
+        self._hashes = None
+        self.stats = BookStats()
+
+    def add(self, game, entry):
+        """ Store ``entry`` for the position in ``game``. """
+        if self._records is not None:
+            raise ValueError("Cannot add entries to a loaded book.")
+        self._entries[position_hash(game)] = entry
+
+    def lookup(self, game):
+        """ BookEntry for the position in ``game``, or None. """
+        key = position_hash(game)
+        if self._records is None:
+            return self._entries.get(key)
+
+        i = bisect.bisect_left(self._hashes, np.uint64(key))
+        if i == len(self._hashes) or int(self._hashes[i]) != key:
+            return None
+        record = self._records[i]
+        action_idx, choices, name = ast.literal_eval(record['move'].decode('utf-8'))
+        return BookEntry(
+            Move(action_idx, choices, name), int(record['depth']), int(record['visits']),
+            float(record['confidence']), float(record['value']))
+
+    def probe(self, game, max_depth=None, min_confidence=0.0):
+        """ Book move for ``game``, or None.
+
+        Parameters
+        ----------
+        game: AgricolaGame
+        max_depth: int (optional)
+            Last round in which the book is used.
+        min_confidence: float
+            Smallest confidence of an entry whose move is played.
+
+        """
+        if max_depth is not None and game.round_idx > max_depth:
+            return None
+        entry = self.lookup(game)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        move = entry.move
+        actions = game.actions_remaining
+        if (entry.confidence < min_confidence or
+                not 0 <= move.action_idx < len(actions) or
+                actions[move.action_idx].name != move.name):
+            self.stats.rejected += 1
+            return None
+        self.stats.hits += 1
+        return move
+
+    def save(self, path):
+        """ Write the book to a ``.npy`` file. """
+        if self._records is not None:
+            np.save(path, np.asarray(self._records))
+            return
+
+        moves = {}
+        for key, entry in self._entries.items():
+            move = entry.move
+            moves[key] = repr(
+                (move.action_idx, _plain(move.choices), move.name)).encode('utf-8')
+        width = max([len(m) for m in moves.values()] + [1])
+        dtype = np.dtype([
+            ('hash', '<u8'), ('depth', '<u2'), ('visits', '<u4'),
+            ('confidence', '<f4'), ('value', '<f4'), ('move', 'S{0}'.format(width))])
+
+        records = np.zeros(len(self._entries), dtype=dtype)
+        for i, key in enumerate(sorted(self._entries)):
+            entry = self._entries[key]
+            records[i] = (
+                key, entry.depth, entry.visits, entry.confidence, entry.value, moves[key])
+        np.save(path, records)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ Book saved by ``save``, memory-mapped unless ``mmap`` is False. """
+        book = cls()
+        book._records = np.load(path, mmap_mode='r' if mmap else None)
+        book._hashes = book._records['hash']
+        return book
+
+    def __len__(self):
+        if self._records is None:
+            return len(self._entries)
+        return len(self._records)
+
+    def __str__(self):
+        return "<OpeningBook entries={0} {1}>".format(len(self), self.stats)
+
+    def __repr__(self):
+        return str(self)
+
+
+def build_book(game, mcts, max_depth=2, breadth=1, book=None):
+    """ Search the positions of the first rounds from ``game`` and store the results in a book.
+
+    Every position is searched with ``mcts`` and its most visited move is
+    stored. The walk then continues from the ``breadth`` most visited moves,
+    for every player, until the end of round ``max_depth``. Positions reached
+    by several paths are searched once.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+        Starting position, as a search copy.
+    mcts: MCTS
+    max_depth: int
+        Last round whose positions are stored.
+    breadth: int
+        Number of moves followed from each position.
+    book: OpeningBook (optional)
+        Book to add to. A new book is created if not supplied.
+
+    Returns
+    -------
+    The book.
+
+    """
+    if book is None:
+        book = OpeningBook()
+    seen = set()
+    stack = [game]
+    while stack:
+        game = stack.pop()
+        if game.game_over or game.round_idx > max_depth:
+            continue
+        key = position_hash(game)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        root = mcts.search(game)
+        if not root.children:
+            continue
+        children = sorted(root.children, key=lambda child: -child.visits)
+        best = children[0]
+        book.add(game, BookEntry(
+            best.move, game.round_idx, root.visits,
+            best.visits / float(root.visits),
+            best.total[root.player_idx] / best.visits))
+
+        for child in children[:breadth]:
+            stack.append(child.game)
+    return book
+
+
+class BookAgent(SearchAgent):
+    """ Agent that plays from an opening book, and otherwise as another agent.
+
+    Parameters
+    ----------
+    agent: SearchAgent
+        Agent for positions that are not in the book.
+    book: OpeningBook
+    max_depth: int (optional)
+        Last round in which the book is used.
+    min_confidence: float
+        Smallest confidence of an entry whose move is played.
+
+    """
+    def __init__(self, agent, book, max_depth=None, min_confidence=0.0):
+        super(BookAgent, self).__init__(agent.max_list_length)
+        self.agent = agent
+        self.book = book
+        self.max_depth = max_depth
+        self.min_confidence = min_confidence
+
+    def set_deadline(self, deadline, token=None):
+        super(BookAgent, self).set_deadline(deadline, token)
+        self.agent.set_deadline(deadline, token)
+
+    def action_timed_out(self, name):
+        super(BookAgent, self).action_timed_out(name)
+        self.agent.action_timed_out(name)
+
+    def choose_move(self, game):
+        move = self.book.probe(game, self.max_depth, self.min_confidence)
+        if move is not None:
+            return move
+        return self.agent.choose_move(game)
@@ -1,13 +1,40 @@
 import abc
+import itertools
+from collections import Counter
+import numpy as np
 from future.utils import with_metaclass
 
 
-from agricola.utils import score_mapping, cumsum
+from agricola import AgricolaImpossible, AgricolaInvalidChoice
+from agricola.utils import score_mapping, cumsum, multiset_satisfy
 from agricola.choice import (
     YesNoChoice, DiscreteChoice, CountChoice, ListChoice, SpaceChoice)
 
 
+HOUSE_TYPES = ['wood', 'clay', 'stone']
+
+# Quantities that card prerequisites can place bounds on.
+PREREQUISITE_FEATURES = [
+    'occupations', 'house_level', 'grain_fields', 'veg_fields',
+    'sheep', 'clay', 'empty_spaces']
+
+
+def prerequisite_value(player, feature):
+    """ Value of one of the PREREQUISITE_FEATURES for ``player``. """
+    if feature == 'occupations':
+        return len(player.occupations)
+    elif feature == 'house_level':
+        return HOUSE_TYPES.index(player.house_type)
+    elif feature == 'empty_spaces':
+        return len(player.empty_spaces)
+    else:
+        return getattr(player, feature)
+
+
 class Card(with_metaclass(abc.ABCMeta, object)):
+    # feature name -> (min, max), either of which may be None.
+    prerequisites = {}
+
     @abc.abstractproperty
     def card_type(self):
         raise NotImplementedError()
@@ -20,12 +47,55 @@ class Card(with_metaclass(abc.ABCMeta, object)):
     def short_name(self):
         return self.__class__.__name__
 
+    @property
+    def id(self):
+        """ Stable integer id of the card (see ``card_id``). """
+        return card_id(self.name)
+
+    # Cards are identified by name, so that the copies of a card made by
+    # deep-copying a game are equal to it.
+    def __eq__(self, other):
+        return isinstance(other, Card) and self.name == other.name
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.name)
+
     def __repr__(self):
         return str(self)
 
     def __str__(self):
         return "<{0}({1})>".format(self.name, self.card_type)
 
+    def prerequisites_met(self, player):
+        for feature, (mn, mx) in self.prerequisites.items():
+            value = prerequisite_value(player, feature)
+            if mn is not None and value < mn:
+                return False
+            if mx is not None and value > mx:
+                return False
+        return True
+
+    def _check(self, player):
+        if not self.prerequisites_met(player):
+            raise AgricolaImpossible(
+                "Prerequisites {0} for playing {1} are not met.".format(
+                    self.prerequisites, self))
+
+    def install(self, player):
+        """ Put the lasting effects of the card into play for ``player``, without playing it.
+
+        Used to set up positions in which the card was played earlier (see
+        ``scenario.build_scenario``): the card listens for events and changes
+        rates and capacities as when it is played, but what it gives once
+        (goods, fields, pastures and goods placed on round spaces) is not
+        given again.
+
+        """
+        raise NotImplementedError()
+
 
 def all_subclasses(cls):
     recurse = [
@@ -50,15 +120,192 @@ def get_major_improvements():
             CookingHearth(5),
             Well(),
             ClayOven(),
-            StoneOven,
+            StoneOven(),
             Joinery(),
             Pottery(),
             BasketmakersWorkshop()]
 
 
+# Names of the cards indexed by card id, and the inverse mapping. Built on
+# first use from the cards defined in this module; cards defined elsewhere
+# (e.g. in tests) are added by ``register_cards``.
+_catalogue = []
+_card_ids = {}
+
+
+def catalogue():
+    """ Names of the cards, indexed by card id.
+
+    The ids of the cards of this module are stable: the occupations for any
+    number of players in alphabetical order, then the minor improvements in
+    alphabetical order, then the major improvements in the order of
+    ``get_major_improvements``. They are followed by the cards given to
+    ``register_cards``.
+
+    """
+    if not _catalogue:
+        names = []
+        for cls in (Occupation, MinorImprovement):
+            names += sorted(
+                c().name for c in all_subclasses(cls) if c.__module__ == __name__)
+        names += [m.name for m in get_major_improvements()]
+        for name in names:
+            _register(name)
+    return _catalogue
+
+
+def _register(name):
+    if name not in _card_ids:
+        _card_ids[name] = len(_catalogue)
+        _catalogue.append(name)
+    return _card_ids[name]
+
+
+def register_cards(cards):
+    """ Give ids to cards defined outside this module.
+
+    The cards that are not in the catalogue yet are added to it in
+    alphabetical order. Ids depend on the order of the calls, so cards
+    should be registered when the module defining them is imported, to get
+    the same ids in every process.
+
+    Parameters
+    ----------
+    cards: iterable of Card or card names
+
+    """
+    catalogue()
+    for name in sorted(set(c if isinstance(c, str) else c.name for c in cards)):
+        _register(name)
+
+
+def card_id(card):
+    """ Integer id of ``card``, a Card or the name of one. """
+    name = card if isinstance(card, str) else card.name
+    if name not in _card_ids:
+        catalogue()
+    try:
+        return _card_ids[name]
+    except KeyError:
+        raise ValueError(
+            "Unknown card {0}. Cards defined outside of agricola.cards "
+            "must be registered with register_cards.".format(name))
+
+
+def _as_id(card):
+    if isinstance(card, (Card, str)):
+        return card_id(card)
+    return int(card)
+
+
+def card_name(idx):
+    """ Name of the card with id ``idx``. """
+    return catalogue()[idx]
+
+
+class CardSet(object):
+    """ Set of cards, stored as a bitset of card ids.
+
+    CardSets are immutable, so they can be shared between copies of a game
+    and used as dictionary keys; membership is a single bit test and
+    the set operators work on whole masks at once.
+
+    Parameters
+    ----------
+    cards: iterable of Card, card names or card ids
+    mask: int
+        Bits of further cards in the set.
+
+    """
+    __slots__ = ('mask',)
+
+    def __init__(self, cards=(), mask=0):
+        for card in cards:
+            mask |= 1 << _as_id(card)
+        self.mask = mask
+
+    def __contains__(self, card):
+        return bool(self.mask >> _as_id(card) & 1)
+
+    def __iter__(self):
+        """ Ids of the cards, in increasing order. """
+        mask, idx = self.mask, 0
+        while mask:
+            if mask & 1:
+                yield idx
+            mask >>= 1
+            idx += 1
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
+    def __bool__(self):
+        return self.mask != 0
+
+    __nonzero__ = __bool__
+
+    def __or__(self, other):
+        return CardSet(mask=self.mask | other.mask)
+
+    def __and__(self, other):
+        return CardSet(mask=self.mask & other.mask)
+
+    def __sub__(self, other):
+        return CardSet(mask=self.mask & ~other.mask)
+
+    def __eq__(self, other):
+        return isinstance(other, CardSet) and self.mask == other.mask
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.mask)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def names(self):
+        return [card_name(idx) for idx in self]
+
+    def to_array(self, out=None):
+        """ Membership of every card of the catalogue, as an array indexed by card id.
+
+        Parameters
+        ----------
+        out: ndarray (optional)
+            One-dimensional array to write the membership into (cards with
+            ids beyond its end are left out). Defaults to a new bool array
+            the size of the catalogue.
+
+        """
+        if out is None:
+            out = np.zeros(len(catalogue()), dtype=bool)
+        else:
+            out[:] = 0
+        for idx in self:
+            if idx >= len(out):
+                break
+            out[idx] = 1
+        return out
+
+    def __str__(self):
+        return "<CardSet {0}>".format(self.names)
+
+    def __repr__(self):
+        return str(self)
+
+
 class Occupation(with_metaclass(abc.ABCMeta, Card)):
     def check_and_apply(self, player):
-        print("Applying occupation {0}.".format(self.name))
+        pass
+
+    def install(self, player):
+        self.check_and_apply(player)
 
     @property
     def card_type(self):
@@ -126,8 +373,7 @@ class StorehouseKeeper(Occupation):
 
     def trigger(self, player, **kwargs):
         choice = player.game.get_choice(
-            player, DiscreteChoice(('clay', 'grain')),
-            "StorehouseKeeper: Get 1 clay or 1 grain?")
+            player, DiscreteChoice(('clay', 'grain'), "StorehouseKeeper: Get 1 clay or 1 grain?"))
         player.add_resources(**{choice: 1})
 
 
@@ -220,7 +466,8 @@ class Lutenist(Occupation):
                 desc = "Lutenist: Buy 1 vegetable for 2 food?"
                 use = self.player.game.get_choice(self.player, YesNoChoice(desc))
                 if use:
-                    self.player.change_state(cost=dict(food=2), change=dict(veg=1))
+                    self.player.change_state(
+                        "Lutenist effect.", cost=dict(food=2), change=dict(veg=1))
 
 
 class Braggart(Occupation):
@@ -241,6 +488,9 @@ class PigBreeder(Occupation):
     def check_and_apply(self, player):
         player.add_resources(boar=1)
 
+    def install(self, player):
+        pass
+
     def trigger(self, player, **kwargs):
         pass
 
@@ -252,7 +502,7 @@ class BrushwoodCollector(Occupation):
 
     def check_and_apply(self, player):
         player.listen_for_event(self, 'build_room')
-        player.listen_for_event(self, 'renovate')
+        player.listen_for_event(self, 'renovation')
 
     def trigger(self, player, **kwargs):
         desc = "BrushwoodCollector: 1 wood in place of all reed?"
@@ -276,6 +526,9 @@ class Consultant(Occupation):
         else:
             player.add_resources(sheep=2)
 
+    def install(self, player):
+        pass
+
 
 class WoodCutter(Occupation):
     deck = 'A'
@@ -300,6 +553,9 @@ class HouseSteward(Occupation):
         wood = score_mapping(player.game.rounds_remaining, [1, 3, 6, 9], [0, 1, 2, 3, 4])
         player.add_resources(wood=wood)
 
+    def install(self, player):
+        pass
+
 
 class SheepWhisperer(Occupation):
     deck = 'B'
@@ -309,6 +565,9 @@ class SheepWhisperer(Occupation):
     def check_and_apply(self, player):
         player.add_future([2, 5, 8, 10], 'sheep', 1)
 
+    def install(self, player):
+        pass
+
 
 class HedgeKeeper(Occupation):
     deck = 'A'
@@ -338,7 +597,9 @@ class ScytheWorker(Occupation):
 
     def check_and_apply(self, player):
         player.add_resources(grain=1)
-        player.listen_for_event(self, 'Action: TravelingPlayers')
+
+    def install(self, player):
+        pass
 
 
 class SeasonalWorker(Occupation):
@@ -365,6 +626,10 @@ class ClayHutBuilder(Occupation):
         else:
             player.listen_for_event(self, 'renovation')
 
+    def install(self, player):
+        if player.house_type == 'wood':
+            player.listen_for_event(self, 'renovation')
+
     def trigger(self, player, **kwargs):
         player.add_future(range(1, 6), 'clay', 2)
         player.stop_listening(self, 'renovation')
@@ -384,10 +649,12 @@ class Pastor(Occupation):
     player = None
 
     def check_and_apply(self, player):
-        self.player = player
+        self.install(player)
+        self.trigger()
 
+    def install(self, player):
+        self.player = player
         player.game.listen_for_event(self, 'build_room')
-        self.trigger()
 
     def trigger(self, **kwargs):
         player = self.player
@@ -416,7 +683,7 @@ class AssistantTiller(Occupation):
         desc = "AssistantTiller: Plow a field?"
         plow_field = player.game.get_choice(player, YesNoChoice(desc))
         if plow_field:
-            space_to_plow = player.game.get_choices(player, SpaceChoice("Space to plow."))
+            space_to_plow = player.game.get_choices(player, SpaceChoice("Space to plow.", player.legal_spaces('field')))
             player.plow_fields(space_to_plow)
 
 
@@ -427,6 +694,9 @@ class Groom(Occupation):
 
     def check_and_apply(self, player):
         player.add_resources(wood=1)
+        self.install(player)
+
+    def install(self, player):
         player.listen_for_event(self, 'start_round')
 
     def trigger(self, player, **kwargs):
@@ -434,7 +704,7 @@ class Groom(Occupation):
             desc = "Groom: Build a stable for 1 wood?"
             build_stable = player.game.get_choice(player, YesNoChoice(desc))
             if build_stable:
-                stable_loc = player.game.get_choices(player, SpaceChoice("Stable location."))
+                stable_loc = player.game.get_choices(player, SpaceChoice("Stable location.", player.legal_spaces('stable')))
                 player.build_stables(stable_loc, 1)
 
 
@@ -460,7 +730,7 @@ class StableArchitect(Occupation):
     text = 'During scoring, you get 1 bonus point for each unfenced stable in your farmyard.'
 
     def victory_points(self, player):
-        pass
+        return player.free_stables
 
 
 class SmallScaleFarmer(Occupation):
@@ -503,12 +773,12 @@ class Cottager(Occupation):
         action = player.game.get_choice(player, choice)
 
         if action == choice.options[0]:
-            choice = SpaceChoice("Room location.")
+            choice = SpaceChoice("Room location.", player.legal_spaces('room'))
             room_loc = player.game.get_choice(player, choice)
             player.build_rooms(room_loc)
-        elif action == choice.options[0]:
+        elif action == choice.options[1]:
             choice = DiscreteChoice(
-                player.valid_house_upgrades, "Choose new house material."),
+                player.valid_house_upgrades(), "Choose new house material.")
             material = player.game.get_choice(player, choice)
             player.upgrade_house(material)
         else:
@@ -522,7 +792,7 @@ class RoughCaster(Occupation):
 
     def check_and_apply(self, player):
         player.listen_for_event(self, 'build_room')
-        player.listen_for_event(self, 'renovate')
+        player.listen_for_event(self, 'renovation')
 
     def trigger(self, player, event_name):
         success = event_name == 'build room' and player.house_type == 'clay'
@@ -546,9 +816,13 @@ class RoofBallaster(Occupation):
 
         if use:
             player.change_state(
+                "RoofBallaster effect.",
                 cost=dict(food=1),
                 change=dict(stone=player.rooms))
 
+    def install(self, player):
+        pass
+
 
 class Tutor(Occupation):
     deck = 'B'
@@ -571,9 +845,9 @@ class OvenFiringBoy(Occupation):
         player.listen_for_event(self, 'Action: Copse')
 
     def trigger(self, player, **kwargs):
-        grain = CountChoice(
+        grain = player.game.get_choice(player, CountChoice(
             player.grain,
-            "OvenFiringBoy: Number of grain bushels to bake into bread?")
+            "OvenFiringBoy: Number of grain bushels to bake into bread?"))
         player.bake_bread(grain)
 
 
@@ -583,7 +857,41 @@ class OrganicFarmer(Occupation):
     text = 'During the scoring, you get 1 bonus point for each pasture containing at least 1 animal while having unused capacity for at least 3 more animals.'
 
     def victory_points(self, player):
-        pass
+        # Animals are not assigned to particular pastures, so the player is
+        # scored on the best arrangement of their animals: the most pastures
+        # holding animals with room for 3 more, with the remaining animals
+        # fitting into the rest of their farmyard.
+        capacities = [
+            p.capacity() + player.pasture_capacity_modifier for p in player._pastures]
+        counts = [player.sheep, player.boar, player.cattle]
+        kinds = [k for k, n in enumerate(counts) if n]
+        candidates = [i for i, c in enumerate(capacities) if c >= 4]
+        for n_bonus in range(min(len(candidates), sum(counts)), 0, -1):
+            for bonus in itertools.combinations(candidates, n_bonus):
+                others = [c for i, c in enumerate(capacities) if i not in bonus]
+                others += [1] * (player.free_stables + 1)
+                for bonus_kinds in itertools.product(kinds, repeat=n_bonus):
+                    if _animals_fit(
+                            counts, [capacities[i] for i in bonus], bonus_kinds, others):
+                        return n_bonus
+        return 0
+
+
+def _animals_fit(counts, capacities, kinds, others):
+    """ Whether animals fit with pasture i holding between 1 and capacities[i] - 3 of kinds[i].
+
+    ``counts`` are the numbers of sheep, boar and cattle, and ``others`` the
+    capacities of the remaining animal containers, which may hold any kind.
+
+    """
+    counts = list(counts)
+    for kind in kinds:
+        counts[kind] -= 1
+    if min(counts) < 0:
+        return False
+    for capacity, kind in zip(capacities, kinds):
+        counts[kind] -= min(capacity - 4, counts[kind])
+    return multiset_satisfy(sorted(n for n in counts if n), Counter(others))
 
 
 class Manservant(Occupation):
@@ -597,6 +905,10 @@ class Manservant(Occupation):
         else:
             player.listen_for_event(self, 'renovation')
 
+    def install(self, player):
+        if player.house_type != 'stone':
+            player.listen_for_event(self, 'renovation')
+
     def trigger(self, player, **kwargs):
         if player.house_type == 'stone':
             player.add_future(range(1, 4), 'food', 1)
@@ -629,13 +941,13 @@ class Childless(Occupation):
             choice = DiscreteChoice(
                 ["Grain", "Vegetable"],
                 "Childless: Select type of seeds to receive.")
-            seed_type = player.game.get_choices(player, [choice])
+            seed_type = player.game.get_choice(player, choice)
             if seed_type == choice.options[0]:
                 player.add_resources(food=1, grain=1)
             elif seed_type == choice.options[1]:
                 player.add_resources(food=1, veg=1)
             else:
-                raise Exception()
+                raise AgricolaInvalidChoice("Childless: a type of seed must be selected.")
 
 
 class Geologist(Occupation):
@@ -696,7 +1008,7 @@ class Scholar(Occupation):
                     'Choose an occupation from your hand.')
                 occ = player.game.get_choice(player, choice)
                 player.play_occupation(occ, player.game)
-            elif action == choice.options[0]:
+            elif action == choice.options[1]:
                 choice = DiscreteChoice(
                     player.hand["minor_improvements"],
                     "Choose a minor improvement to play.")
@@ -721,7 +1033,7 @@ class PlowDriver(Occupation):
             if use:
                 player.change_state("Plowdriver effect.", cost=dict(food=1))
                 space_to_plow = player.game.get_choices(
-                    player, SpaceChoice("Space to plow."))
+                    player, SpaceChoice("Space to plow.", player.legal_spaces('field')))
                 player.plow_fields(space_to_plow)
 
 
@@ -767,6 +1079,9 @@ class Priest(Occupation):
         if player.house_type == 'clay' and player.rooms == 2:
             player.add_resources(clay=3, reed=2, stone=2)
 
+    def install(self, player):
+        pass
+
 
 class MinorImprovement(with_metaclass(abc.ABCMeta, Card)):
     _victory_points = 0
@@ -776,19 +1091,18 @@ class MinorImprovement(with_metaclass(abc.ABCMeta, Card)):
         pass
 
     def check_and_apply(self, player):
-        print("Applying minor improvement {0}.".format(self.name))
         description = "Playing minor improvement {0}".format(self)
 
-        player.change_state(description, cost=self.cost.copy())
         self._check(player)
+        player.change_state(description, cost=self.cost.copy())
         self._apply(player)
 
-    def _check(self, player):
-        pass
-
     def _apply(self, player):
         pass
 
+    def install(self, player):
+        self._apply(player)
+
     @property
     def card_type(self):
         return "Minor Improvement"
@@ -823,7 +1137,7 @@ class Basket(MinorImprovement):
         player.listen_for_event(self, 'Action: Grove')
         player.listen_for_event(self, 'Action: Copse')
 
-    def trigger(self, player, pasture):
+    def trigger(self, player, **kwargs):
         use = player.game.get_choices(player, YesNoChoice("Basket: exchange 2 wood for 3 food?"))
         if use:
             player.change_state("Basket effect.", cost=dict(wood=2), change=dict(food=3))
@@ -838,18 +1152,22 @@ class ClayEmbankment(MinorImprovement):
     def _apply(self, player):
         player.add_resources(clay=int(player.clay / 2))
 
+    def install(self, player):
+        pass
+
 
 class LargeGreenhouse(MinorImprovement):
     _cost = dict(wood=2)
     deck = 'A'
     text = "Add 4, 7, and 9 to the current round and place 1 vegetable on each corresponding space. At the start of these rounds, you get that vegetable."
-
-    def _check(self, player):
-        return len(player.occupations) >= 2
+    prerequisites = dict(occupations=(2, None))
 
     def _apply(self, player):
         player.add_future([4, 7, 9], 'veg', 1)
 
+    def install(self, player):
+        pass
+
 
 class SheperdsCrook(MinorImprovement):
     _cost = dict(wood=1)
@@ -870,7 +1188,7 @@ class Manger(MinorImprovement):
     text = "During scoring, if your pastures cover at least 6/7/8/10 farmyard spaces, you get 1/2/3/4 bonus points."
 
     def victory_points(self, player):
-        n_pasture_spaces = len(set(self.pasture_spaces))
+        n_pasture_spaces = len(set(player.pasture_spaces))
         return score_mapping(n_pasture_spaces, [6, 7, 8, 10], [0, 1, 2, 3, 4])
 
 
@@ -878,9 +1196,7 @@ class Mantelpiece(MinorImprovement):
     _cost = dict(stone=1)
     deck = 'B'
     text = "When you play this card, you immediately get 1 bonus point for each complete round left to play. You may no longer renovate your house."
-
-    def _check(self, player):
-        return player.house_type in ['clay', 'stone']
+    prerequisites = dict(house_level=(1, None))
 
     def _apply(self, player):
         self._rounds_remaining = player.game.rounds_remaining
@@ -906,9 +1222,7 @@ class SleepingCorner(MinorImprovement):
     deck = 'A'
     text = 'You can use any "Wish for Children" action space even if it is occupied by one other player\'s person.'
     _victory_points = 1
-
-    def _check(self, player):
-        return player.grain_fields >= 2
+    prerequisites = dict(grain_fields=(2, None))
 
 
 class ClearingSpade(MinorImprovement):
@@ -921,9 +1235,7 @@ class WoolBlankets(MinorImprovement):
     _cost = dict(wood=1)
     deck = 'A'
     text = 'During scoring, if you live in a wooden/clay/stone house by then, you get 3/2/0 bonus points.'
-
-    def _check(self, player):
-        return player.sheep >= 5
+    prerequisites = dict(sheep=(5, None))
 
     def victory_points(self, player):
         return {'wood': 3, 'clay': 2, 'stone': 0}[player.house_type]
@@ -947,9 +1259,7 @@ class Canoe(MinorImprovement):
     deck = 'A'
     text = 'Each time you use the "Fishing" accumulation space, you get an additional 1 food and 1 reed.'
     _victory_points = 1
-
-    def _check(self, player):
-        return len(player.occupations) >= 1
+    prerequisites = dict(occupations=(1, None))
 
     def _apply(self, player):
         player.listen_for_event(self, 'Action: Fishing')
@@ -965,12 +1275,16 @@ class MiningHammer(MinorImprovement):
 
     def _apply(self, player):
         player.add_resources(food=1)
+        self.install(player)
+
+    def install(self, player):
         player.listen_for_event(self, 'renovation')
 
     def trigger(self, player, **kwargs):
-        use = player.game.get_choices("MiningHammer: build 1 stable for free?")
+        use = player.game.get_choice(
+            player, YesNoChoice("MiningHammer: build 1 stable for free?"))
         if use:
-            stable_loc = player.game.get_choices(player, SpaceChoice("Stable location."))
+            stable_loc = player.game.get_choices(player, SpaceChoice("Stable location.", player.legal_spaces('stable')))
             player.build_stables(stable_loc, 0)
 
 
@@ -978,14 +1292,22 @@ class BigCountry(MinorImprovement):
     _cost = dict()
     deck = 'A'
     text = 'For each complete round left to play, you immediately get 1 bonus point and 2 food.'
+    prerequisites = dict(empty_spaces=(None, 0))
 
-    def _check(self, player):
-        return not player.empty_spaces
+    def __init__(self, rounds_remaining=None):
+        # Complete rounds left when the card was played. May be given for
+        # cards that are installed rather than played (see ``install``).
+        self._rounds_remaining = rounds_remaining
 
     def _apply(self, player):
         self._rounds_remaining = player.game.rounds_remaining
         player.add_resources(food=2*self._rounds_remaining)
 
+    def install(self, player):
+        # Unless it is known, the card is taken to have been played just now.
+        if self._rounds_remaining is None:
+            self._rounds_remaining = player.game.rounds_remaining
+
     def victory_points(self, player):
         return self._rounds_remaining
 
@@ -1002,8 +1324,8 @@ class JunkRoom(MinorImprovement):
     text = 'Each time after you build an improvement, including this one, you get 1 food.'
 
     def _apply(self, player):
-        player.listen_for_event(self, 'minor improvement')
-        player.listen_for_event(self, 'major improvement')
+        player.listen_for_event(self, 'minor_improvement')
+        player.listen_for_event(self, 'major_improvement')
 
     def trigger(self, player, **kwargs):
         player.add_resources(food=1)
@@ -1027,6 +1349,9 @@ class YoungAnimalMarket(MinorImprovement):
     def _apply(self, player):
         player.add_animals(cattle=1)
 
+    def install(self, player):
+        pass
+
 
 class Caravan(MinorImprovement):
     _cost = dict(wood=3, food=3)
@@ -1043,7 +1368,7 @@ class Claypipe(MinorImprovement):
     text = 'In the returning home phase of each round, if you gained at least 7 building resources in the preceding work phase, you get 2 food.'
 
     def _apply(self, player):
-        player.listen_for_event(self, 'return home')
+        player.listen_for_event(self, 'end_round')
 
 
 class LumberMill(MinorImprovement):
@@ -1051,9 +1376,7 @@ class LumberMill(MinorImprovement):
     deck = 'A'
     text = 'Every improvement costs you 1 wood less.'
     _victory_points = 2
-
-    def _check(self, player):
-        return len(player.occupations) <= 3
+    prerequisites = dict(occupations=(None, 3))
 
 
 class LoamPit(MinorImprovement):
@@ -1061,9 +1384,7 @@ class LoamPit(MinorImprovement):
     deck = 'B'
     text = 'Each time you use the "Day Laborer" action space, you also get 3 clay.'
     _victory_points = 1
-
-    def _check(self, player):
-        return len(player.occupations) >= 3
+    prerequisites = dict(occupations=(3, None))
 
     def _apply(self, player):
         player.listen_for_event(self, 'Action: DayLaborer')
@@ -1079,34 +1400,36 @@ class ShiftingCultivation(MinorImprovement):
     traveling = True
 
     def _apply(self, player):
-        space_to_plow = player.game.get_choices(player, SpaceChoice("Space to plow."))
+        space_to_plow = player.game.get_choices(player, SpaceChoice("Space to plow.", player.legal_spaces('field')))
         player.plow_fields(space_to_plow)
 
+    def install(self, player):
+        pass
+
 
 class PondHut(MinorImprovement):
     _cost = dict(wood=1)
     deck = 'A'
     text = 'Place 1 food on each of the next 3 round spaces. At the start of these rounds, you get the food.'
     _victory_points = 1
-
-    def _check(self, player):
-        return len(player.occupations) == 2
+    prerequisites = dict(occupations=(2, 2))
 
     def _apply(self, player):
         player.add_future(range(1, 4), 'food', 1)
 
+    def install(self, player):
+        pass
+
 
 class Loom(MinorImprovement):
     _cost = dict(wood=2)
     deck = 'B'
     text = 'In the field phase of each harvest, if you have at least 1/4/7 sheep, you get 1/2/3 food. During scoring, you get 1 bonus point for every 3 sheep.'
     _victory_points = 1
-
-    def _check(self, player):
-        return len(player.occupations) >= 2
+    prerequisites = dict(occupations=(2, None))
 
     def _apply(self, player):
-        player.listen_for_event(self, 'field phase')
+        player.listen_for_event(self, 'field_phase')
 
     def trigger(self, player, **kwargs):
         food = score_mapping(player.sheep, [1, 4, 7], [0, 1, 2, 3])
@@ -1120,9 +1443,7 @@ class MoldboardPlow(MinorImprovement):
     _cost = dict(wood=2)
     deck = 'B'
     text = 'Place 2 field tiles on this card. Twice this game, when you use the "Farmland" action space, you can also plow 1 field from this card.'
-
-    def _check(self, player):
-        return len(player.occupations) >= 1
+    prerequisites = dict(occupations=(1, None))
 
     def _apply(self, player):
         self._fields_remaining = 2
@@ -1133,7 +1454,7 @@ class MoldboardPlow(MinorImprovement):
             use = player.game.get_choices(player, YesNoChoice("MoldboardPlow: plow an extra field?"))
             if use:
                 self._fields_remaining -= 1
-                space_to_plow = player.game.get_choices(player, SpaceChoice("Space to plow."))
+                space_to_plow = player.game.get_choices(player, SpaceChoice("Space to plow.", player.legal_spaces('field')))
                 player.plow_fields(space_to_plow)
 
 
@@ -1143,11 +1464,23 @@ class MiniPasture(MinorImprovement):
     text = 'Immediately fence a farmyard space, without paying wood for the fences. (If you already have pastures, the new one must be adjacent to an existing one.)'
     traveling = True
 
+    def _check(self, player):
+        super(MiniPasture, self)._check(player)
+        if not player.legal_spaces('pasture'):
+            raise AgricolaImpossible(
+                "No space can be fenced for {0}.".format(self))
+
     def _apply(self, player):
 
         space_to_pasteurize = player.game.get_choices(
-            player, SpaceChoice("Space to pasteurize."))
-        player.build_pasture([space_to_pasteurize])
+            player, SpaceChoice("Space to pasteurize.", player.legal_spaces('pasture')))
+        if space_to_pasteurize is None:
+            raise AgricolaImpossible(
+                "No space was chosen to fence for {0}.".format(self))
+        player.build_pastures([[space_to_pasteurize]])
+
+    def install(self, player):
+        pass
 
 
 class Pitchfork(MinorImprovement):
@@ -1159,7 +1492,7 @@ class Pitchfork(MinorImprovement):
         player.listen_for_event(self, 'Action: GrainSeeds')
 
     def trigger(self, player, **kwargs):
-        for action in self.player.game.actions_taken:
+        for action in player.game.actions_taken:
             if action.name == "Farmland":
                 player.add_resources(food=3)
                 return
@@ -1191,12 +1524,10 @@ class ThreeFieldRotation(MinorImprovement):
     _cost = dict(wood=2)
     deck = 'B'
     text = 'At the start of the field phase of each harvest, if you have at least 1 grain field, 1 vegetable field, and 1 empty field, you get 3 food.'
-
-    def _check(self, player):
-        return len(player.occupations) >= 3
+    prerequisites = dict(occupations=(3, None))
 
     def _apply(self, player):
-        player.listen_for_event(self, 'field phase')
+        player.listen_for_event(self, 'field_phase')
 
     def trigger(self, player, **kwargs):
         if player.grain_fields >= 1 and player.veg_fields >= 1 and player.empty_fields >= 1:
@@ -1212,15 +1543,16 @@ class MarketStall(MinorImprovement):
     def _apply(self, player):
         player.add_resources(veg=1)
 
+    def install(self, player):
+        pass
+
 
 class Beanfield(MinorImprovement):
     _cost = dict(food=1)
     deck = 'B'
     text = 'This card is a field that can only grow vegetables.'
     _victory_points = 1
-
-    def _check(self, player):
-        return len(player.occupations) >= 2
+    prerequisites = dict(occupations=(2, None))
 
 
 class ButterChurn(MinorImprovement):
@@ -1228,12 +1560,10 @@ class ButterChurn(MinorImprovement):
     deck = 'B'
     text = 'In the field phase of each harvest, you get 1 food for every 3 sheep and 1 food for every 2 cattle you have.'
     _victory_points = 1
-
-    def _check(self, player):
-        return len(player.occupations) <= 3
+    prerequisites = dict(occupations=(None, 3))
 
     def _apply(self, player):
-        player.listen_for_event(self, 'field phase')
+        player.listen_for_event(self, 'field_phase')
 
     def trigger(self, player, **kwargs):
         food = int(player.sheep/3) + int(player.cattle/3)
@@ -1247,33 +1577,35 @@ class CarpentersParlor(MinorImprovement):
 
     def _apply(self, player):
         # TODO
-        player.listen_for_event(self, 'field phase')
+        player.listen_for_event(self, 'field_phase')
 
 
 class AcornBasket(MinorImprovement):
     _cost = dict(reed=1)
     deck = 'B'
     text = 'Place 1 wild boar on each of the next 2 round spaces. At the start of these rounds you get the wild boar.'
-
-    def _check(self, player):
-        return len(player.occupations) >= 3
+    prerequisites = dict(occupations=(3, None))
 
     def _apply(self, player):
         player.add_future(range(1, 3), 'boar', 1)
 
+    def install(self, player):
+        pass
+
 
 class StrawberryPatch(MinorImprovement):
     _cost = dict(wood=1)
     deck = 'B'
     text = 'Place 1 food on each of the next 3 round spaces. At the start of these rounds, you get the food.'
     _victory_points = 2
-
-    def _check(self, player):
-        return player.veg_fields >= 2
+    prerequisites = dict(veg_fields=(2, None))
 
     def _apply(self, player):
         player.add_future(range(1, 4), 'food', 1)
 
+    def install(self, player):
+        pass
+
 
 class CornScoop(MinorImprovement):
     _cost = dict(wood=1)
@@ -1295,24 +1627,25 @@ class RammedClay(MinorImprovement):
     def _apply(self, player):
         player.add_resources(clay=1)
 
+    def install(self, player):
+        pass
+
 
 class ThreshingBoard(MinorImprovement):
     _cost = dict(wood=1)
     deck = 'A'
     text = 'Each time you use the "Farmland", or "Cultivation" action space, you get an additional "Bake Bread" action.'
     _victory_points = 1
-
-    def _check(self, player):
-        return len(player.occupations) >= 2
+    prerequisites = dict(occupations=(2, None))
 
     def _apply(self, player):
         player.listen_for_event(self, 'Action: Farmland')
         player.listen_for_event(self, 'Action: Cultivation')
 
     def trigger(self, player, **kwargs):
-        grain = CountChoice(
+        grain = player.game.get_choice(player, CountChoice(
             player.grain,
-            "ThreshingBoard: Number of grain bushels to bake into bread?")
+            "ThreshingBoard: Number of grain bushels to bake into bread?"))
         player.bake_bread(grain)
 
 
@@ -1323,7 +1656,7 @@ class DutchWindmill(MinorImprovement):
     _victory_points = 2
 
     def _apply(self, player):
-        player.listen_for_event(self, 'bake bread')
+        player.listen_for_event(self, 'bake_bread')
 
     def trigger(self, player, **kwargs):
         sums = cumsum([len(s) for s in player.game.action_order[:1]])
@@ -1339,7 +1672,8 @@ class StoneTongs(MinorImprovement):
     text = 'Each time you use a stone accumulation space, you get 1 additional stone.'
 
     def _apply(self, player):
-        player.listen_for_event(self, 'stone accumulation')
+        player.listen_for_event(self, 'Action: EasternQuarry')
+        player.listen_for_event(self, 'Action: WesternQuarry')
 
     def trigger(self, player, **kwargs):
         player.add_resources(stone=1)
@@ -1349,15 +1683,16 @@ class ThickForest(MinorImprovement):
     _cost = dict(wood=2)
     deck = 'B'
     text = 'Place 1 wood on each remaining even-numbered round space. At the start of these rounds, you get the wood.'
-
-    def _check(self, player):
-        return player.clay >= 5
+    prerequisites = dict(clay=(5, None))
 
     def _apply(self, player):
         n_rounds = len(player.game.action_order) - 1
         rounds = [r for r in range(player.game.round_idx+1, n_rounds+1) if r % 2 == 0]
         player.add_future(rounds, 'wood', 1, absolute=True)
 
+    def install(self, player):
+        pass
+
 
 class BreadPaddle(MinorImprovement):
     _cost = dict(wood=1)
@@ -1366,12 +1701,15 @@ class BreadPaddle(MinorImprovement):
 
     def _apply(self, player):
         player.add_resources(food=1)
+        self.install(player)
+
+    def install(self, player):
         player.listen_for_event(self, 'occupation')
 
     def trigger(self, player, **kwargs):
-        grain = CountChoice(
+        grain = player.game.get_choice(player, CountChoice(
             player.grain,
-            "BreadPaddle: Number of grain bushels to bake into bread?")
+            "BreadPaddle: Number of grain bushels to bake into bread?"))
         player.bake_bread(grain)
 
 
@@ -1383,6 +1721,9 @@ class Handplow(MinorImprovement):
     def _apply(self, player):
         player.add_future([5], 'field', 1)
 
+    def install(self, player):
+        pass
+
 
 class MilkJug(MinorImprovement):
     _cost = dict(clay=1)
@@ -1423,13 +1764,14 @@ class SackCart(MinorImprovement):
     _cost = dict(wood=2)
     deck = 'B'
     text = 'Place 1 grain each on the remaining spaces for rounds 5, 8, 11, and 14. At the start of these rounds, you get the grain.'
-
-    def _check(self, player):
-        return len(player.occupations) >= 2
+    prerequisites = dict(occupations=(2, None))
 
     def _apply(self, player):
         player.add_future([5, 8, 11, 14], 'grain', 1, absolute=True)
 
+    def install(self, player):
+        pass
+
 
 class MajorImprovement(with_metaclass(abc.ABCMeta, Card)):
     _victory_points = 0
@@ -1438,8 +1780,8 @@ class MajorImprovement(with_metaclass(abc.ABCMeta, Card)):
         pass
 
     def check_and_apply(self, player):
-        print("Applying major improvement {0}.".format(self.name))
         description = "Playing major improvement {0}".format(self)
+        self._check(player)
         player.change_state(description, cost=self.cost.copy())
         self._apply(player)
 
@@ -1447,6 +1789,9 @@ class MajorImprovement(with_metaclass(abc.ABCMeta, Card)):
     def _apply(self, player):
         raise NotImplementedError()
 
+    def install(self, player):
+        self._apply(player)
+
     @property
     def card_type(self):
         return "Major Improvement"
@@ -1514,15 +1859,18 @@ class CookingHearth(MajorImprovement):
 
 
 class Well(MajorImprovement):
-    victory_points = 4
+    _victory_points = 4
     _cost = dict(wood=1, stone=3)
 
     def _apply(self, player):
         player.add_future(range(1, 6), 'food', 1)
 
+    def install(self, player):
+        pass
+
 
 class ClayOven(MajorImprovement):
-    victory_points = 2
+    _victory_points = 2
     _cost = dict(clay=3, stone=1)
 
     def _apply(self, player):
@@ -1533,7 +1881,7 @@ class ClayOven(MajorImprovement):
 
 
 class StoneOven(MajorImprovement):
-    victory_points = 3
+    _victory_points = 3
     _cost = dict(clay=1, stone=3)
 
     def _apply(self, player):
@@ -6,11 +6,6 @@ class Choice(object):
         pass
 
 
-class YesNoChoice(Choice):
-    def __init__(self, desc=None):
-        super(DiscreteChoice, self).__init__(desc)
-
-
 class DiscreteChoice(Choice):
     def __init__(self, options, desc=None):
         if not options:
@@ -22,6 +17,11 @@ class DiscreteChoice(Choice):
         self.options = list(options)
 
 
+class YesNoChoice(DiscreteChoice):
+    def __init__(self, desc=None):
+        super(YesNoChoice, self).__init__([True, False], desc)
+
+
 class CountChoice(Choice):
     def __init__(self, n=None, desc=None):
         self.n = n
@@ -42,5 +42,11 @@ class VariableLengthListChoice(Choice):
 
 
 class SpaceChoice(Choice):
-    def __init__(self, desc=None):
+    def __init__(self, desc=None, spaces=None, kind=None):
         super(SpaceChoice, self).__init__(desc)
+        # Legal spaces for a single new object, or None if unknown. In a list
+        # of spaces this only holds for the first one: later objects may also
+        # be placed next to the ones before them.
+        self.spaces = spaces
+        # Kind of object placed ('room', 'stable', ...), or None.
+        self.kind = kind
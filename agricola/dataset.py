@@ -0,0 +1,463 @@
+""" Supervised datasets from recorded games.
+
+A GameRecord holds what is needed to replay a game through the engine: the
+configuration of the game (the class that creates it and its arguments),
+the seed of the numpy random state in which it was set up (which fixes the
+deal of the cards), the first player, and every decision as the name of the
+action taken and the answers to its choices, encoded as in ``search.Move``,
+together with the answers to the prompts raised by cards while the move was
+taken and until the next decision. Games played with ``game.play`` are
+recorded by passing a GameRecord as its ``recorder`` (see ``record_game``),
+whoever makes the decisions. Records are
+stored one JSON object per line, in files that may be gzipped, and an archive
+is any number of such files.
+
+``replay`` steps through the positions of a record, and ``game_examples``
+turns them into training examples: for every decision the observation of the
+position (see ``observation.ObservationEncoder``), its legal mask and the
+index of the action chosen (see ``indexing.ActionIndex``). Decisions whose
+move has no index are left out.
+
+``export_examples`` converts whole archives. The files are read in the
+calling process and their games sent in small tasks to a pool of worker
+processes, which replay and encode them; at most ``max_pending`` tasks are in
+flight at once, so memory stays bounded however large the archive, and the
+examples are generated in the order of the archive, one ExampleBatch per
+task.
+
+"""
+import gzip
+import importlib
+import json
+import multiprocessing
+from collections import deque
+
+import numpy as np
+
+from agricola import AgricolaException
+from agricola.choice import DiscreteChoice
+from agricola.game import setup_game, advance, play
+from agricola.indexing import ActionIndex
+from agricola.observation import ObservationEncoder
+from agricola.search import Move, apply_move, decode_choice, encode_choice, search_copy
+from agricola.ui import SilentInterface
+
+
+def make_game(config):
+    """ New game from a configuration.
+
+    Parameters
+    ----------
+    config: dict
+        ``game``: "module:Class" of the game, with optional ``args`` and
+        ``kwargs`` for its constructor. For example
+        ``{"game": "agricola.game:StandardAgricolaGame", "args": [2]}``.
+
+    """
+    module, name = config['game'].split(':')
+    cls = getattr(importlib.import_module(module), name)
+    return cls(*config.get('args', []), **config.get('kwargs', {}))
+
+
+def _tuples(value):
+    """ Answers read from JSON, with lists turned back into tuples. """
+    if isinstance(value, list):
+        return tuple(_tuples(v) for v in value)
+    return value
+
+
+def _encode(spec, answer):
+    try:
+        return encode_choice(spec, answer)
+    except ValueError:
+        # The answer is an equivalent copy of one of the options.
+        if isinstance(spec, DiscreteChoice):
+            names = [getattr(o, 'name', o) for o in spec.options]
+            return names.index(getattr(answer, 'name', answer))
+        raise
+
+
+class GameRecord(object):
+    """ Everything needed to replay a game.
+
+    Parameters
+    ----------
+    config: dict
+        Configuration of the game (see ``make_game``).
+    seed: int
+        Seed of the numpy random state in which the game is set up.
+    first_player: int
+    moves: list of (str, list) pairs (optional)
+        Name of the action of each decision and its encoded answers.
+    scores: list of int (optional)
+        Final scores of the players.
+    prompts: list of lists (optional)
+        For each move, the encoded answers to each prompt raised while it was
+        taken (see ``interface``). Moves without an entry have their prompts
+        answered by the defaults of SilentInterface when replayed.
+
+    """
+    def __init__(self, config, seed, first_player, moves=None, scores=None, prompts=None):
+        self.config = config
+        self.seed = seed
+        self.first_player = first_player
+        self.moves = moves or []
+        self.scores = scores
+        self.prompts = prompts or [[] for _ in self.moves]
+        self._log = None
+        self._interface = None
+
+    def interface(self, ui):
+        """ Interface that passes choices on to ``ui``, logging its answers between ``begin_move`` and ``end_move``.
+
+        Only the answers given through the latest such interface are logged.
+
+        """
+        self._interface = _RecordingInterface(ui, self)
+        return self._interface
+
+    def begin_move(self):
+        """ Log the answers to prompts from now on for the next move recorded. """
+        self._log = []
+
+    def end_move(self):
+        """ Stop logging the answers to prompts. """
+        self._log = None
+
+    def _log_answers(self, interface, choices, answers):
+        if self._log is not None and interface is self._interface:
+            self._log.append([_encode(c, a) for c, a in zip(choices, answers)])
+
+    def record(self, game, player_idx, action, choices):
+        """ Add the decision of a player to take ``action`` with ``choices`` in ``game``.
+
+        The answers logged since ``begin_move``, and until ``end_move``, are
+        the prompts of the move.
+
+        """
+        player = game.players[player_idx]
+        specs = action.choices(player) or []
+        encoded = [_encode(s, c) for s, c in zip(specs, choices or [])]
+        self.moves.append((action.name, encoded))
+        if self._log is None:
+            self._log = []
+        self.prompts.append(self._log)
+
+    def start(self):
+        """ Search copy of the game at its first decision. The global random state is left as it was. """
+        state = np.random.get_state()
+        try:
+            np.random.seed(self.seed)
+            game = make_game(self.config)
+            game.ui = None
+            setup_game(game, self.first_player)
+        finally:
+            np.random.set_state(state)
+        advance(game)
+        return search_copy(game)
+
+    def to_json(self):
+        return json.dumps(dict(
+            config=self.config, seed=self.seed, first_player=self.first_player,
+            moves=self.moves, scores=self.scores, prompts=self.prompts))
+
+    @classmethod
+    def from_json(cls, line):
+        d = json.loads(line)
+        return cls(
+            d['config'], d['seed'], d['first_player'], d['moves'], d.get('scores'),
+            d.get('prompts'))
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __str__(self):
+        return "<GameRecord {0} seed={1} moves={2} scores={3}>".format(
+            self.config.get('game'), self.seed, len(self.moves), self.scores)
+
+    def __repr__(self):
+        return str(self)
+
+
+class _RecordingInterface(object):
+    """ Interface that passes choices on to ``ui`` and logs its answers in ``record``. """
+    def __init__(self, ui, record):
+        self._ui = ui
+        self._record = record
+
+    def get_choices(self, name, choices):
+        answers = self._ui.get_choices(name, choices)
+        self._record._log_answers(self, choices, answers)
+        return answers
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('_ui', '_record'):
+            raise AttributeError(name)
+        return getattr(self._ui, name)
+
+    def __str__(self):
+        return "<RecordingInterface of {0}>".format(self._ui)
+
+    def __repr__(self):
+        return str(self)
+
+
+class _ReplayInterface(SilentInterface):
+    """ Interface that answers prompts with recorded answers, then with the defaults of SilentInterface. """
+    def __init__(self, answers):
+        self.answers = list(answers)
+
+    def get_choices(self, name, choices):
+        if not self.answers:
+            return super(_ReplayInterface, self).get_choices(name, choices)
+        answers = self.answers.pop(0)
+        if len(answers) != len(choices):
+            raise AgricolaException(
+                "Recorded {0} answers to a prompt of {1} choices.".format(
+                    len(answers), len(choices)))
+        return [decode_choice(c, _tuples(a)) for c, a in zip(choices, answers)]
+
+
+def _apply_answering(game, move, prompts):
+    """ ``search.apply_move``, with the prompts raised by the move answered from ``prompts``. """
+    if not prompts:
+        return apply_move(game, move)
+    ui = game.ui
+    game.ui = replay_ui = _ReplayInterface(prompts)
+    try:
+        child = apply_move(game, move)
+    finally:
+        game.ui = ui
+    child.ui = ui
+    if replay_ui.answers:
+        raise AgricolaException(
+            "{0} recorded prompts of move {1} were not raised.".format(
+                len(replay_ui.answers), move))
+    return child
+
+
+def record_game(config, ui, seed, first_player=0, **play_kwargs):
+    """ Play a game through ``ui`` with ``game.play`` and return its GameRecord. """
+    record = GameRecord(config, seed, first_player)
+    state = np.random.get_state()
+    try:
+        np.random.seed(seed)
+        game = make_game(config)
+        game = play(game, ui, first_player=first_player, recorder=record, **play_kwargs)
+    finally:
+        np.random.set_state(state)
+    record.scores = [int(game.score[i]) for i in range(game.n_players)]
+    return record
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't')
+    return open(path, mode)
+
+
+def write_records(path, records):
+    """ Write GameRecords to ``path``, one per line (gzipped if ``path`` ends with .gz). """
+    with _open(path, 'w') as f:
+        for record in records:
+            f.write(record.to_json())
+            f.write('\n')
+
+
+def read_records(path):
+    """ Generate the GameRecords stored in ``path``. """
+    with _open(path, 'r') as f:
+        for line in f:
+            if line.strip():
+                yield GameRecord.from_json(line)
+
+
+def replay(record):
+    """ Generate (position, move) pairs for the decisions of ``record``.
+
+    Raises an AgricolaException if a move is illegal or the final scores do
+    not match those of the record.
+
+    """
+    game = record.start()
+    for k, (name, choices) in enumerate(record.moves):
+        if game.game_over:
+            raise AgricolaException("Record has moves after the end of the game.")
+        names = [a.name for a in game.actions_remaining]
+        if name not in names:
+            raise AgricolaException("Action {0} is not available.".format(name))
+        move = Move(names.index(name), _tuples(choices), name)
+        yield game, move
+        game = _apply_answering(game, move, record.prompts[k] if k < len(record.prompts) else [])
+
+    if not game.game_over:
+        raise AgricolaException("Record ends before the end of the game.")
+    scores = [game.score[i] for i in range(game.n_players)]
+    if record.scores is not None and list(record.scores) != scores:
+        raise AgricolaException(
+            "Replay ended with scores {0}, but the record has {1}.".format(
+                scores, record.scores))
+
+
+class ExampleBatch(object):
+    """ Training examples from consecutive games.
+
+    Attributes
+    ----------
+    obs: array of shape (n, obs_size)
+    masks: array of shape (n, ceil(n_actions / 8))
+        Legal masks, packed as by ``np.packbits`` (see
+        ``trajectory.unpack_masks``).
+    actions: array of shape (n,)
+    players: array of shape (n,)
+    game_lengths: array
+        Number of examples of each game, in order.
+    skipped: int
+        Number of games that could not be replayed.
+
+    """
+    def __init__(self, obs, masks, actions, players, game_lengths, skipped=0):
+        self.obs = obs
+        self.masks = masks
+        self.actions = actions
+        self.players = players
+        self.game_lengths = game_lengths
+        self.skipped = skipped
+
+    @classmethod
+    def concatenate(cls, batches, obs_size, mask_size):
+        batches = list(batches)
+        if not batches:
+            return cls(
+                np.zeros((0, obs_size), dtype=np.float32),
+                np.zeros((0, mask_size), dtype=np.uint8),
+                np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int16),
+                np.zeros(0, dtype=np.int64))
+        return cls(
+            np.concatenate([b.obs for b in batches]),
+            np.concatenate([b.masks for b in batches]),
+            np.concatenate([b.actions for b in batches]),
+            np.concatenate([b.players for b in batches]),
+            np.concatenate([b.game_lengths for b in batches]),
+            sum(b.skipped for b in batches))
+
+    def __len__(self):
+        return len(self.actions)
+
+
+def game_examples(record, encoder, index):
+    """ ExampleBatch of the decisions of ``record`` that have an index. """
+    moves = list(replay(record))
+    obs = encoder.empty(len(moves))
+    masks = np.zeros((len(moves), (index.size + 7) // 8), dtype=np.uint8)
+    actions = np.zeros(len(moves), dtype=np.int64)
+    players = np.zeros(len(moves), dtype=np.int16)
+    mask = np.zeros(index.size, dtype=bool)
+
+    n = 0
+    for game, move in moves:
+        try:
+            actions[n] = index.encode(game, move)
+        except AgricolaException:
+            continue
+        encoder.encode(game, obs, n)
+        masks[n] = np.packbits(index.legal_mask(game, mask))
+        players[n] = game.current_player_idx
+        n += 1
+    return ExampleBatch(obs[:n], masks[:n], actions[:n], players[:n], np.array([n]))
+
+
+# Encoders and indices of the worker, by configuration.
+_codecs = {}
+
+
+def codecs(config):
+    """ ObservationEncoder and ActionIndex for games with configuration ``config``. """
+    key = json.dumps(config, sort_keys=True)
+    if key not in _codecs:
+        game = GameRecord(config, 0, 0).start()
+        _codecs[key] = ObservationEncoder(game), ActionIndex(game)
+    return _codecs[key]
+
+
+def _convert(lines, errors):
+    batches, skipped = [], 0
+    for line in lines:
+        record = GameRecord.from_json(line)
+        encoder, index = codecs(record.config)
+        try:
+            batches.append(game_examples(record, encoder, index))
+        except AgricolaException:
+            if errors == 'raise':
+                raise
+            skipped += 1
+    if batches:
+        obs_size, mask_size = batches[0].obs.shape[1], batches[0].masks.shape[1]
+    else:
+        encoder, index = codecs(GameRecord.from_json(lines[0]).config)
+        obs_size, mask_size = encoder.size, (index.size + 7) // 8
+    batch = ExampleBatch.concatenate(batches, obs_size, mask_size)
+    batch.skipped = skipped
+    return batch
+
+
+def _tasks(paths, games_per_task):
+    task = []
+    for path in paths:
+        with _open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    task.append(line)
+                    if len(task) == games_per_task:
+                        yield task
+                        task = []
+    if task:
+        yield task
+
+
+def export_examples(paths, n_workers=None, games_per_task=16, max_pending=None, errors='skip'):
+    """ Generate ExampleBatches from the games recorded in the files ``paths``.
+
+    Parameters
+    ----------
+    paths: list of str
+        Files of records (see ``write_records``).
+    n_workers: int >= 0 (optional)
+        Number of worker processes. Defaults to the number of CPUs. If 0, the
+        games are converted in this process.
+    games_per_task: int
+        Number of games converted by a worker at a time; each task gives one
+        ExampleBatch.
+    max_pending: int (optional)
+        Largest number of tasks in flight. Defaults to twice the number of
+        workers.
+    errors: str
+        'skip' to leave out games that cannot be replayed (they are counted
+        in ``ExampleBatch.skipped``), or 'raise'.
+
+    """
+    if errors not in ('skip', 'raise'):
+        raise ValueError("Unknown error handling: {0}.".format(errors))
+    tasks = _tasks(paths, games_per_task)
+    if n_workers == 0:
+        for task in tasks:
+            yield _convert(task, errors)
+        return
+
+    n_workers = n_workers or multiprocessing.cpu_count()
+    max_pending = max_pending or 2 * n_workers
+    pool = multiprocessing.Pool(n_workers)
+    try:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.apply_async(_convert, (task, errors)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,160 @@
+""" Determinisation of the hidden information in a game.
+
+The occupations and minor improvements in a player's hand are private, but a
+search copy of a game contains every player's hand. To search on behalf of an
+``observer`` without cheating, the search can instead be run on
+determinisations: copies of the game in which the hands of the other players
+are replaced by hands drawn at random from the cards that the observer has
+not seen, i.e. the cards of the game's decks minus the observer's hand and
+the cards that any player has already played. Every opponent keeps the
+number of cards that they currently hold.
+
+Optionally the order in which the remaining actions of each stage will be
+revealed is also resampled, since it is unknown to every player when actions
+are shuffled within their stages.
+
+A Determinizer does the bookkeeping (finding the unseen cards) once per
+position and then draws any number of determinisations from it. The copies
+are made with ``AgricolaGame.clone``, so they share the decks, the actions and
+all unplayed cards with each other and with the original game, and only the
+hands and the schedule are rebuilt for each copy.
+
+"""
+import numpy as np
+
+from agricola.search import search_copy
+
+
+_KINDS = ['occupations', 'minor_improvements']
+
+
+class Determinizer(object):
+    """ Sampler of determinisations of a game for one observer.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+        Position to determinise. Not modified.
+    observer_idx: int (optional)
+        Player whose information is respected. Defaults to the player whose
+        turn it is.
+    shuffle_schedule: bool
+        If True and the game randomizes the order of actions within stages,
+        also resample the order in which the unrevealed actions are revealed.
+    seed: int or RandomState (optional)
+
+    """
+    def __init__(self, game, observer_idx=None, shuffle_schedule=False, seed=None):
+        self.game = search_copy(game)
+        if observer_idx is None:
+            observer_idx = self.game.current_player_idx
+        self.observer_idx = observer_idx
+        self.shuffle_schedule = shuffle_schedule and self.game.randomize
+        if isinstance(seed, np.random.RandomState):
+            self.rng = seed
+        else:
+            self.rng = np.random.RandomState(seed)
+
+        self.opponents = [
+            i for i in range(self.game.n_players) if i != observer_idx]
+
+        # For each kind of card with hidden hands: the unseen cards, and the
+        # number of cards held by each opponent.
+        self._pools = []
+        for kind in _KINDS:
+            deck = getattr(self.game, kind)
+            sizes = [len(self.game.players[i].hand[kind]) for i in self.opponents]
+            if not deck or not deck.shuffle or not sum(sizes):
+                continue
+
+            pool = unseen_cards(self.game, kind, observer_idx)
+            if len(pool) < sum(sizes):
+                raise ValueError(
+                    "Only {0} unseen {1} for hands totalling {2} cards.".format(
+                        len(pool), kind, sum(sizes)))
+            self._pools.append((kind, pool, np.cumsum([0] + sizes)))
+
+        if self.shuffle_schedule:
+            # Unrevealed rounds of each stage, as (positions, actions).
+            schedule = self.game.round_schedule
+            hidden = {}
+            for i in range(self.game.round_idx, len(schedule)):
+                stage_idx, action = schedule[i]
+                positions, actions = hidden.setdefault(stage_idx, ([], []))
+                positions.append(i)
+                actions.append(action)
+            self._hidden_rounds = [h for h in hidden.values() if len(h[0]) > 1]
+
+    def sample_hands(self, n):
+        """ Draw the opponents' hands for ``n`` determinisations.
+
+        Returns
+        -------
+        List of length ``n`` of dicts mapping (player index, kind of card) to
+        a list of cards.
+
+        """
+        samples = [{} for _ in range(n)]
+        for kind, pool, bounds in self._pools:
+            # Each row holds the first ``bounds[-1]`` cards of an independent
+            # random permutation of the pool.
+            order = np.argsort(self.rng.rand(n, len(pool)), axis=1)[:, :bounds[-1]]
+            for sample, row in zip(samples, order.tolist()):
+                for j, player_idx in enumerate(self.opponents):
+                    sample[player_idx, kind] = [
+                        pool[k] for k in row[bounds[j]:bounds[j+1]]]
+        return samples
+
+    def sample(self, n=1):
+        """ Draw ``n`` determinised search copies of the game. """
+        return [self.apply(hands) for hands in self.sample_hands(n)]
+
+    def apply(self, hands):
+        """ Search copy of the game with the hands given in ``hands`` (as returned by ``sample_hands``). """
+        game = self.game.clone()
+        for (player_idx, kind), cards in hands.items():
+            game.players[player_idx].set_hand(kind, cards)
+
+        if self.shuffle_schedule and self._hidden_rounds:
+            schedule = list(game.round_schedule)
+            for positions, actions in self._hidden_rounds:
+                order = self.rng.permutation(len(actions))
+                for position, k in zip(positions, order):
+                    schedule[position] = (schedule[position][0], actions[k])
+            game.round_schedule = schedule
+            game.action_order = [game.action_order[0]] + [
+                [a for s, a in schedule if s == stage_idx]
+                for stage_idx in range(1, len(game.action_order))]
+        return game
+
+
+def unseen_cards(game, kind, observer_idx):
+    """ Cards of the deck for ``kind`` that ``observer_idx`` cannot have seen.
+
+    These are the cards of the deck minus those in the observer's hand and
+    those played by any player. Cards are matched by name.
+
+    """
+    deck = getattr(game, kind)
+    if not deck:
+        return []
+
+    seen = {}
+    known = list(game.players[observer_idx].hand[kind])
+    for player in game.players:
+        known.extend(getattr(player, kind))
+    for card in known:
+        seen[card.name] = seen.get(card.name, 0) + 1
+
+    pool = []
+    for card in deck.cards:
+        if seen.get(card.name, 0):
+            seen[card.name] -= 1
+        else:
+            pool.append(card)
+    return pool
+
+
+def determinize(game, n, observer_idx=None, shuffle_schedule=False, seed=None):
+    """ Draw ``n`` determinisations of ``game`` for ``observer_idx``. See Determinizer. """
+    return Determinizer(game, observer_idx, shuffle_schedule, seed).sample(n)
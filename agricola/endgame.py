@@ -0,0 +1,293 @@
+""" Exact solver for the final rounds of a game.
+
+Once the last action has been revealed the game contains no further chance
+events, so the remainder of the game is a deterministic game tree whose leaves
+are the final scores. Near the end of the game this tree is small enough to
+search exhaustively with minimax and alpha-beta pruning. Positions reached by
+different move orders (e.g. taking "Forest" then "Clay Pit" rather than the
+reverse) are only searched once thanks to a transposition table keyed by
+``search.state_key``.
+
+With more than one player, the solver is "paranoid": the player to be
+optimized for (by default, the player to move at the root) maximizes their
+score minus the best score among the other players, and every other player
+is assumed to minimize that quantity. For two players this is exactly
+minimax on the score difference; in a solo game it is plain maximization of
+the player's score.
+
+"""
+import time
+
+from agricola import AgricolaException
+from agricola.search import (
+    AnytimeAgent, RandomAgent, SearchStats, SearchTimeout,
+    apply_move, successors, state_key, rounds_left, search_copy)
+from agricola.transposition import TranspositionTable
+
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class EndgameResult(object):
+    """ Outcome of solving a position.
+
+    Parameters
+    ----------
+    value: int
+        Game-theoretic value of the position for ``player_idx``.
+    move: Move
+        A move achieving ``value``, or None if the game is over.
+    scores: dict
+        Final score of each player under optimal play.
+    principal_variation: list of Move
+        Sequence of moves, starting with ``move``, under optimal play. It
+        stops early at positions whose exact value was not kept.
+    player_idx: int
+        Player that the value is given for.
+    stats: SearchStats
+
+    """
+    def __init__(self, value, move, scores, principal_variation, player_idx, stats):
+        self.value = value
+        self.move = move
+        self.scores = scores
+        self.principal_variation = principal_variation
+        self.player_idx = player_idx
+        self.stats = stats
+
+    def __str__(self):
+        return "<EndgameResult value={0} move={1} scores={2} {3}>".format(
+            self.value, self.move, self.scores, self.stats)
+
+    def __repr__(self):
+        return str(self)
+
+
+class EndgameSolver(object):
+    """ Alpha-beta search to the end of the game.
+
+    Parameters
+    ----------
+    max_rounds: int > 0
+        Refuse to solve positions with more than this many rounds left to
+        play (including the current round).
+    max_list_length: int
+        Passed on to ``search.candidate_moves``.
+    table: TranspositionTable or dict (optional)
+        Transposition table. Can be shared between solvers and persists
+        between calls to ``solve``. Entries are stored with the number of
+        positions searched to produce them as their depth. Defaults to an
+        unbounded TranspositionTable.
+
+    """
+    def __init__(self, max_rounds=1, max_list_length=1, table=None):
+        self.max_rounds = max_rounds
+        self.max_list_length = max_list_length
+        self.table = TranspositionTable() if table is None else table
+        self.stats = SearchStats()
+        self._deadline = None
+
+    def in_range(self, game):
+        """ Whether ``game`` is close enough to the end to be solved. """
+        return game.game_over or rounds_left(game) <= self.max_rounds
+
+    @staticmethod
+    def utility(scores, player_idx):
+        others = [s for i, s in scores.items() if i != player_idx]
+        if not others:
+            return scores[player_idx]
+        return scores[player_idx] - max(others)
+
+    def solve(self, game, player_idx=None, deadline=None):
+        """ Solve ``game`` exactly.
+
+        Parameters
+        ----------
+        game: AgricolaGame
+            Position to solve. Not modified.
+        player_idx: int (optional)
+            Player to optimize for. Defaults to the player whose turn it is.
+        deadline: float (optional)
+            ``time.perf_counter()`` time by which to finish. Positions solved
+            before the deadline stay in the table, so a later call resumes
+            where this one stopped.
+
+        Returns
+        -------
+        EndgameResult
+
+        Raises
+        ------
+        SearchTimeout if the deadline is reached first.
+
+        """
+        if not self.in_range(game):
+            raise ValueError(
+                "Position has {0} rounds left to play, but solver is limited "
+                "to {1} rounds.".format(rounds_left(game), self.max_rounds))
+
+        game = search_copy(game)
+        if player_idx is None:
+            player_idx = game.current_player_idx
+
+        self.stats = SearchStats()
+        start = time.perf_counter()
+        self._deadline = deadline
+        try:
+            value, scores = self._search(game, player_idx, -float('inf'), float('inf'))
+        finally:
+            self._deadline = None
+            self.stats.elapsed = time.perf_counter() - start
+
+        pv = self._principal_variation(game, player_idx)
+        move = pv[0] if pv else None
+        return EndgameResult(value, move, scores, pv, player_idx, self.stats)
+
+    def move_values(self, game, player_idx=None):
+        """ Exact value of every legal move in ``game``, as a list of (move, value) pairs.
+
+        Useful as an oracle for judging the moves of other agents.
+
+        """
+        game = search_copy(game)
+        if player_idx is None:
+            player_idx = game.current_player_idx
+
+        self.stats = SearchStats()
+        start = time.perf_counter()
+        values = []
+        for move, child in successors(game, max_list_length=self.max_list_length):
+            value, _ = self._search(child, player_idx, -float('inf'), float('inf'))
+            values.append((move, value))
+        self.stats.elapsed = time.perf_counter() - start
+        return values
+
+    def _search(self, game, player_idx, alpha, beta):
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchTimeout(
+                "Endgame search stopped after {0} positions.".format(self.stats.nodes))
+        self.stats.nodes += 1
+        start_nodes = self.stats.nodes
+
+        if game.game_over:
+            return self.utility(game.score, player_idx), dict(game.score)
+
+        key = (player_idx, state_key(game))
+        entry = self.table.get(key)
+        best_move = None
+        if entry is not None:
+            value, flag, best_move, scores = entry
+            self.stats.tt_hits += 1
+            if flag == EXACT:
+                return value, scores
+            elif flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value, scores
+
+        original_alpha, original_beta = alpha, beta
+        maximizing = game.current_player_idx == player_idx
+        best_value = -float('inf') if maximizing else float('inf')
+        best_scores = None
+        seen = set()
+
+        for move, child in self._ordered_successors(game, best_move):
+            child_key = state_key(child) if not child.game_over else None
+            if child_key is not None:
+                if child_key in seen:
+                    continue
+                seen.add(child_key)
+
+            value, scores = self._search(child, player_idx, alpha, beta)
+
+            if (value > best_value) if maximizing else (value < best_value):
+                best_value, best_move, best_scores = value, move, scores
+
+            if maximizing:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+
+        if best_scores is None:
+            raise ValueError(
+                "No legal moves for player {0} in round {1}.".format(
+                    game.current_player_idx, game.round_idx))
+
+        if best_value <= original_alpha:
+            flag = UPPER
+        elif best_value >= original_beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        entry = (best_value, flag, best_move, best_scores)
+        if isinstance(self.table, TranspositionTable):
+            self.table.store(key, entry, depth=self.stats.nodes - start_nodes)
+        else:
+            self.table[key] = entry
+
+        return best_value, best_scores
+
+    def _ordered_successors(self, game, first=None):
+        """ Successors of ``game``, trying the move ``first`` (e.g. from the table) before all others. """
+        if first is not None:
+            try:
+                yield first, apply_move(game, first)
+            except AgricolaException:
+                first = None
+
+        for move, child in successors(game, max_list_length=self.max_list_length):
+            if move != first:
+                yield move, child
+
+    def _principal_variation(self, game, player_idx):
+        # Only exact entries hold best play: the move of a bound is the one
+        # that caused a cutoff, which may be a refutation of a worse line.
+        pv = []
+        while not game.game_over:
+            entry = self.table.get((player_idx, state_key(game)))
+            if entry is None or entry[1] != EXACT or entry[2] is None:
+                break
+            move = entry[2]
+            pv.append(move)
+            game = apply_move(game, move)
+        return pv
+
+
+class EndgameAgent(AnytimeAgent):
+    """ Agent that plays perfectly in the final rounds of the game.
+
+    Before the final ``max_rounds`` rounds, moves are chosen by ``fallback``.
+    When decisions are timed, the fallback's move is also played if the
+    solver does not finish before the deadline.
+
+    Parameters
+    ----------
+    max_rounds: int > 0
+        Number of rounds at the end of the game to play perfectly.
+    fallback: SearchAgent (optional)
+        Agent used earlier in the game. Defaults to a RandomAgent.
+    max_list_length: int
+        Passed on to ``search.candidate_moves``.
+    table: TranspositionTable or dict (optional)
+        Transposition table for the solver.
+
+    """
+    def __init__(self, max_rounds=1, fallback=None, max_list_length=1, table=None):
+        super(EndgameAgent, self).__init__(max_list_length)
+        self.solver = EndgameSolver(max_rounds, max_list_length, table)
+        self.fallback = fallback or RandomAgent(max_list_length=max_list_length)
+        self.last_result = None
+
+    def improve(self, game):
+        if not self.solver.in_range(game) or self.deadline is not None:
+            yield self.fallback.choose_move(game)
+        if self.solver.in_range(game):
+            try:
+                self.last_result = self.solver.solve(game, deadline=self.stop_time())
+            except SearchTimeout:
+                return
+            yield self.last_result.move
@@ -0,0 +1,328 @@
+""" Batched heuristic evaluation of positions.
+
+Search agents that stop short of the end of the game need an estimate of the
+value of the positions at which they stop. ``Player.score`` gives the score
+that a player would have if the game ended now, but it is computed one player
+at a time with Python loops over the farmyard and the cards, and it ignores
+everything that only pays off later: crops in the fields, room to grow the
+family, food for the coming harvests and the number of rounds left to use
+them.
+
+Evaluation is split in two steps. ``encode_game`` reduces each player of a
+position to a row of raw counts (resources, people, rooms, fields, animals,
+points from cards, ...) together with the progress of the game, and
+``encode_games`` stacks many positions into one array. ``derive_features``
+then turns raw rows into the features of the evaluation with array
+operations only, so that a whole batch of positions is featurized in one
+pass, and a HeuristicEvaluator returns the weighted sum of the features for
+every player of every position.
+
+Among the features are the terms of ``Player.score``; giving each of them a
+weight of 1 and every other feature a weight of 0 (``SCORE_WEIGHTS``)
+reproduces the score exactly. The default weights add hand-set values for
+progress towards future points. Weights are plain dicts from feature name to
+weight: they can be fitted offline with ``fit_weights`` on encoded positions
+and their final scores, saved to and loaded from JSON files, and swapped into
+an agent without changing it.
+
+"""
+import json
+
+import numpy as np
+
+
+RESOURCES = [
+    'food', 'wood', 'clay', 'stone', 'reed', 'grain', 'veg', 'sheep', 'boar', 'cattle']
+
+# Columns of an encoded player, in order.
+RAW_FEATURES = RESOURCES + [
+    'people', 'rooms', 'house', 'fields', 'sown_grain', 'sown_veg',
+    'pastures', 'fenced_stables', 'empty_spaces', 'card_points',
+    'cook_veg', 'cook_sheep', 'cook_boar', 'cook_cattle',
+    'rounds_left', 'harvests_left', 'progress']
+
+_RAW = {name: i for i, name in enumerate(RAW_FEATURES)}
+
+_HOUSE_TYPES = {'wood': 0, 'clay': 1, 'stone': 2}
+
+# (raw feature, thresholds, points) for the terms of Player.score that are
+# computed with ``score_mapping``.
+_SCORE_TABLES = [
+    ('pastures', [1, 2, 3, 4], [-1, 1, 2, 3, 4]),
+    ('fields', [1, 3, 4, 5], [-1, 1, 2, 3, 4]),
+    ('grain', [1, 4, 6, 8], [-1, 1, 2, 3, 4]),
+    ('veg', [1, 2, 3, 4], [-1, 1, 2, 3, 4]),
+    ('sheep', [1, 4, 6, 8], [-1, 1, 2, 3, 4]),
+    ('boar', [1, 3, 5, 7], [-1, 1, 2, 3, 4]),
+    ('cattle', [1, 2, 4, 6], [-1, 1, 2, 3, 4]),
+]
+
+_SCORE_FEATURES = (
+    [name + '_points' for name, _, _ in _SCORE_TABLES] +
+    ['stable_points', 'space_points', 'people_points', 'room_points', 'card_points'])
+
+# Columns of the derived features, in order.
+FEATURES = _SCORE_FEATURES + [
+    'sown', 'building_materials', 'food_shortfall', 'growth_room',
+    'growth_room_rounds', 'rounds_left']
+
+SCORE_WEIGHTS = dict((name, 1.0) for name in _SCORE_FEATURES)
+
+DEFAULT_WEIGHTS = dict(SCORE_WEIGHTS)
+DEFAULT_WEIGHTS.update(
+    # Sown crops end up in the supply, where they score.
+    sown=0.3,
+    building_materials=0.1,
+    # Each missing food costs a begging card (-3) at a harvest.
+    food_shortfall=-1.5,
+    # A person born now is worth 3 points plus the actions they take.
+    growth_room=1.0,
+    growth_room_rounds=0.2,
+    rounds_left=0.0)
+
+
+def _harvests_left(game):
+    if game.game_over:
+        return 0
+    return len(set(s for s, _ in game.round_schedule[game.round_idx - 1:]))
+
+
+def encode_player(player, out=None):
+    """ Raw features of ``player`` (see RAW_FEATURES), excluding the progress of the game.
+
+    Parameters
+    ----------
+    player: Player
+    out: array (optional)
+        Array with at least ``len(RAW_FEATURES)`` entries to fill in. A new
+        array is returned if not supplied.
+
+    """
+    if out is None:
+        out = np.zeros(len(RAW_FEATURES))
+
+    resources, animals = player.resources, player.animals
+    for i, r in enumerate(RESOURCES):
+        out[i] = resources[r] if r in resources else animals.get(r, 0)
+
+    sown_grain = sown_veg = 0
+    for f in player._fields:
+        if f.kind == 'grain':
+            sown_grain += f.n_items
+        elif f.kind == 'veg':
+            sown_veg += f.n_items
+
+    pasture_spaces = set(s for p in player._pastures for s in p.spaces)
+    stable_spaces = set(s.space for s in player._stables)
+    n_used = len(
+        set(player.room_spaces) | pasture_spaces | stable_spaces | set(player.field_spaces))
+
+    card_points = 0
+    for cards in (player.occupations, player.minor_improvements, player.major_improvements):
+        for card in cards:
+            card_points += card.victory_points(player)
+
+    rates = player.cooking_rates
+    out[_RAW['people']:_RAW['rounds_left']] = [
+        player.people, len(player._rooms), _HOUSE_TYPES[player.house_type],
+        len(player._fields), sown_grain, sown_veg,
+        len(player._pastures), len(stable_spaces & pasture_spaces),
+        player.shape[0] * player.shape[1] - n_used, card_points,
+        rates['veg'], rates['sheep'], rates['boar'], rates['cattle']]
+    return out
+
+
+def encode_game(game, out=None):
+    """ Raw features of every player of ``game``, as an array of shape (n_players, len(RAW_FEATURES)).
+
+    If ``out`` is supplied it is filled in and returned instead.
+
+    """
+    if out is None:
+        out = np.zeros((game.n_players, len(RAW_FEATURES)))
+    n_rounds = len(game.round_schedule)
+    rounds_left = max(n_rounds - game.round_idx + 1, 0)
+    context = [rounds_left, _harvests_left(game), 1.0 - rounds_left / float(n_rounds)]
+
+    for i, player in enumerate(game.players):
+        encode_player(player, out[i])
+        out[i, _RAW['rounds_left']:] = context
+    return out
+
+
+def encode_games(games):
+    """ Raw features of a batch of games with the same number of players.
+
+    Returns
+    -------
+    Array of shape (n_games, n_players, len(RAW_FEATURES)).
+
+    """
+    games = list(games)
+    if not games:
+        return np.zeros((0, 0, len(RAW_FEATURES)))
+    n_players = games[0].n_players
+    out = np.zeros((len(games), n_players, len(RAW_FEATURES)))
+    for game, rows in zip(games, out):
+        if game.n_players != n_players:
+            raise ValueError(
+                "Games in a batch must have the same number of players, "
+                "got {0} and {1}.".format(n_players, game.n_players))
+        encode_game(game, rows)
+    return out
+
+
+def _lookup(values, thresholds, points):
+    """ Vectorised ``score_mapping``. """
+    idx = np.searchsorted(np.asarray(thresholds), values, side='right')
+    return np.asarray(points, dtype=float)[idx]
+
+
+def derive_features(raw):
+    """ Features (see FEATURES) of raw feature rows.
+
+    Parameters
+    ----------
+    raw: array of shape (..., len(RAW_FEATURES))
+
+    Returns
+    -------
+    Array of shape (..., len(FEATURES)).
+
+    """
+    raw = np.asarray(raw, dtype=float)
+
+    def col(name):
+        return raw[..., _RAW[name]]
+
+    features = np.empty(raw.shape[:-1] + (len(FEATURES),))
+
+    for i, (name, thresholds, points) in enumerate(_SCORE_TABLES):
+        features[..., i] = _lookup(col(name), thresholds, points)
+
+    people, rooms = col('people'), col('rooms')
+    rounds_left = col('rounds_left')
+    k = len(_SCORE_TABLES)
+    features[..., k] = np.minimum(col('fenced_stables'), 4)
+    features[..., k + 1] = -col('empty_spaces')
+    features[..., k + 2] = 3 * people
+    features[..., k + 3] = col('house') * rooms
+    features[..., k + 4] = col('card_points')
+
+    # Food that could be had at the next harvest, against what is needed.
+    food = (
+        col('food') + col('grain') + col('veg') * col('cook_veg') +
+        col('sheep') * col('cook_sheep') + col('boar') * col('cook_boar') +
+        col('cattle') * col('cook_cattle'))
+    needed = np.where(col('harvests_left') > 0, 2 * people, 0)
+    growth_room = np.clip(np.minimum(rooms, 5) - people, 0, None)
+
+    k += 5
+    features[..., k] = col('sown_grain') + col('sown_veg')
+    features[..., k + 1] = col('wood') + col('clay') + col('stone') + col('reed')
+    features[..., k + 2] = np.clip(needed - food, 0, None)
+    features[..., k + 3] = growth_room
+    features[..., k + 4] = growth_room * rounds_left
+    features[..., k + 5] = rounds_left
+    return features
+
+
+def weight_vector(weights):
+    """ Array of the weights of FEATURES from a dict (missing features have weight 0). """
+    unknown = set(weights) - set(FEATURES)
+    if unknown:
+        raise ValueError("Unknown features: {0}.".format(sorted(unknown)))
+    return np.array([float(weights.get(name, 0.0)) for name in FEATURES])
+
+
+def fit_weights(raw, targets, ridge=1e-3, features=None):
+    """ Fit weights by ridge regression of ``targets`` on the features of ``raw``.
+
+    Parameters
+    ----------
+    raw: array of shape (..., len(RAW_FEATURES))
+        Encoded players, e.g. from ``encode_games``.
+    targets: array with the shape of ``raw`` without its last axis
+        Value to predict for each player, e.g. their final score.
+    ridge: float >= 0
+        Strength of the L2 penalty on the weights.
+    features: list of str (optional)
+        Features to fit. The others get weight 0. Defaults to all FEATURES.
+
+    Returns
+    -------
+    Dict from feature name to weight.
+
+    """
+    features = list(features or FEATURES)
+    idx = [FEATURES.index(f) for f in features]
+    X = derive_features(raw)[..., idx].reshape(-1, len(idx))
+    y = np.asarray(targets, dtype=float).reshape(-1)
+    if X.shape[0] != y.shape[0]:
+        raise ValueError(
+            "Got {0} encoded players but {1} targets.".format(X.shape[0], y.shape[0]))
+
+    # Least squares on the system augmented with the penalty, which also
+    # copes with features that are constant in the data.
+    X = np.vstack([X, np.sqrt(ridge) * np.eye(len(idx))])
+    y = np.concatenate([y, np.zeros(len(idx))])
+    w = np.linalg.lstsq(X, y, rcond=None)[0]
+    return dict(zip(features, w.tolist()))
+
+
+class HeuristicEvaluator(object):
+    """ Linear evaluation of positions for every player.
+
+    Parameters
+    ----------
+    weights: dict (optional)
+        Maps names of FEATURES to weights; missing features get weight 0.
+        Defaults to DEFAULT_WEIGHTS.
+
+    """
+    def __init__(self, weights=None):
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self._w = weight_vector(self.weights)
+
+    def evaluate(self, states):
+        """ Values of a batch of positions.
+
+        Parameters
+        ----------
+        states: list of AgricolaGame, or array
+            Games with the same number of players, or their raw features as
+            returned by ``encode_games`` (or ``encode_game``).
+
+        Returns
+        -------
+        Array with the value of every player in every position, of shape
+        (n_games, n_players) (or (n_players,) for a single encoded game).
+
+        """
+        if not isinstance(states, np.ndarray):
+            states = encode_games(states)
+        return derive_features(states).dot(self._w)
+
+    def __call__(self, game):
+        """ Values of every player in ``game``, as an array. """
+        if game.game_over:
+            return np.array([game.score[i] for i in range(game.n_players)], dtype=float)
+        return self.evaluate(encode_game(game))
+
+    def save(self, path):
+        """ Write the weights to a JSON file. """
+        with open(path, 'w') as f:
+            json.dump(self.weights, f, indent=2, sort_keys=True)
+
+    @classmethod
+    def load(cls, path):
+        """ Evaluator with the weights stored in a JSON file by ``save``. """
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def __str__(self):
+        return "<HeuristicEvaluator {0}>".format(
+            ", ".join("{0}={1:g}".format(k, v) for k, v in sorted(self.weights.items()) if v))
+
+    def __repr__(self):
+        return str(self)
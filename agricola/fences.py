@@ -0,0 +1,307 @@
+""" Planning of pasture layouts for the "Fencing" and "Farm Redevelopment" actions.
+
+All sets of pastures that can be built on a farmyard with a bounded number of
+fences are enumerated once per farmyard shape and stored as bitmasks over the
+spaces and fence segments of the farmyard. Finding the pasture additions
+available to a player then reduces to a handful of vectorised array operations
+on that table instead of trying out candidate pastures one by one.
+
+"""
+import itertools
+
+import numpy as np
+
+
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+def popcount(masks):
+    """ Number of set bits in each element of an array of non-negative int64 masks. """
+    masks = np.ascontiguousarray(masks, dtype=np.int64)
+    as_bytes = masks.view(np.uint8).reshape(masks.shape + (8,))
+    return _POPCOUNT8[as_bytes].sum(axis=-1)
+
+
+def space_fences(space):
+    """ The four fence segments surrounding ``space``, in the format used by Pasture.fences. """
+    i, j = space
+    return [
+        ((i, j), (i, j+1)),  # Top
+        ((i, j+1), (i+1, j+1)),  # Right
+        ((i+1, j), (i+1, j+1)),  # Bottom
+        ((i, j), (i+1, j))]  # Left
+
+
+class PastureLayout(object):
+    """ A set of pastures that a player can add to their farmyard.
+
+    Parameters
+    ----------
+    pastures: list of list of spaces
+        The new pastures, in the format expected by the ``Fencing`` action.
+    cost: int
+        Number of new fences required, which is also the wood spent.
+    capacity: int
+        Total animal capacity of the new pastures.
+
+    """
+    def __init__(self, pastures, cost, capacity):
+        self.pastures = pastures
+        self.cost = cost
+        self.capacity = capacity
+
+    @property
+    def n_pastures(self):
+        return len(self.pastures)
+
+    @property
+    def n_spaces(self):
+        return sum(len(p) for p in self.pastures)
+
+    def __str__(self):
+        return "<PastureLayout pastures={0} cost={1} capacity={2}>".format(
+            self.pastures, self.cost, self.capacity)
+
+    def __repr__(self):
+        return str(self)
+
+
+class FencePlanner(object):
+    """ Table of every pasture layout buildable on a farmyard of a given shape.
+
+    Parameters
+    ----------
+    shape: tuple of int, length=2
+        Shape of the farmyard.
+    max_fences: int
+        Layouts requiring more than this many fences in total are omitted.
+
+    """
+    def __init__(self, shape=(3, 5), max_fences=15):
+        self.shape = tuple(shape)
+        self.max_fences = max_fences
+
+        self.spaces = list(itertools.product(range(self.shape[0]), range(self.shape[1])))
+        self.space_bit = {s: i for i, s in enumerate(self.spaces)}
+        n_spaces = len(self.spaces)
+
+        self.fence_list = sorted(set(f for s in self.spaces for f in space_fences(s)))
+        self.fence_bit = {f: i for i, f in enumerate(self.fence_list)}
+        if len(self.fence_list) > 63:
+            raise ValueError(
+                "Farmyard of shape {0} has too many fence "
+                "segments for a FencePlanner.".format(self.shape))
+
+        neighbours = []
+        perimeters = []
+        for s in self.spaces:
+            n = 0
+            for d in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+                other = (s[0] + d[0], s[1] + d[1])
+                if other in self.space_bit:
+                    n |= 1 << self.space_bit[other]
+            neighbours.append(n)
+            perimeters.append(self.fence_mask_for([s]))
+
+        self.connected = np.zeros(1 << n_spaces, dtype=bool)
+        for mask in range(1, 1 << n_spaces):
+            self.connected[mask] = self._is_connected(mask, neighbours)
+
+        # Fences surrounding each connected region, i.e. the fences of a pasture.
+        pasture_fences = {}
+        for mask in np.flatnonzero(self.connected):
+            mask = int(mask)
+            fences = 0
+            for b in self._bits(mask):
+                fences ^= perimeters[b]
+            if bin(fences).count('1') <= max_fences:
+                pasture_fences[mask] = fences
+
+        by_lowest = {}
+        for mask in sorted(pasture_fences):
+            by_lowest.setdefault(self._bits(mask)[0], []).append(mask)
+
+        # Enumerate sets of disjoint pastures, adding pastures in order of
+        # their lowest space so that each set is produced exactly once.
+        layouts = []
+
+        def extend(used, fences, pastures, lowest):
+            layouts.append((used, fences, pastures))
+            for low in range(lowest, n_spaces):
+                if used & (1 << low):
+                    continue
+                for mask in by_lowest.get(low, []):
+                    if mask & used:
+                        continue
+                    new_fences = fences | pasture_fences[mask]
+                    if bin(new_fences).count('1') <= max_fences:
+                        extend(used | mask, new_fences, pastures + (mask,), low + 1)
+
+        extend(0, 0, (), 0)
+        layouts = layouts[1:]
+
+        self.max_pastures = max(len(layout[2]) for layout in layouts)
+        self.cells = np.array([layout[0] for layout in layouts], dtype=np.int64)
+        self.fences = np.array([layout[1] for layout in layouts], dtype=np.int64)
+        self.pastures = np.zeros((len(layouts), self.max_pastures), dtype=np.int64)
+        for i, layout in enumerate(layouts):
+            self.pastures[i, :len(layout[2])] = layout[2]
+        self.n_pastures = (self.pastures != 0).sum(axis=1)
+        self.n_spaces = popcount(self.cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    @staticmethod
+    def _bits(mask):
+        bits = []
+        while mask:
+            low = mask & -mask
+            bits.append(low.bit_length() - 1)
+            mask ^= low
+        return bits
+
+    @staticmethod
+    def _is_connected(mask, neighbours):
+        seen = frontier = mask & -mask
+        while frontier:
+            low = frontier & -frontier
+            frontier ^= low
+            new = neighbours[low.bit_length() - 1] & mask & ~seen
+            seen |= new
+            frontier |= new
+        return seen == mask
+
+    def space_mask_for(self, spaces):
+        mask = 0
+        for s in spaces:
+            mask |= 1 << self.space_bit[tuple(s)]
+        return mask
+
+    def fence_mask_for(self, spaces):
+        """ Mask of the fences surrounding a connected group of ``spaces``. """
+        mask = 0
+        for s in spaces:
+            for f in space_fences(s):
+                mask ^= 1 << self.fence_bit[f]
+        return mask
+
+    def spaces_for(self, mask):
+        return [self.spaces[b] for b in self._bits(int(mask))]
+
+    def candidates(self, player):
+        """ Indices, costs and capacities of all pasture additions affordable by ``player``.
+
+        A pasture addition is affordable if its new pastures lie on spaces that
+        are free for pastures (empty or holding an unfenced stable), if the
+        player's pastures remain a connected group after adding it, and if the
+        player has enough wood and fences for the fences it requires.
+
+        """
+        if tuple(player.shape) != self.shape:
+            raise ValueError(
+                "FencePlanner for shape {0} cannot plan for a farmyard "
+                "of shape {1}.".format(self.shape, player.shape))
+
+        existing_fences = 0
+        for f in player.fences:
+            existing_fences |= 1 << self.fence_bit[f]
+
+        return self.candidates_for_masks(
+            self.space_mask_for(player.pasture_spaces), existing_fences,
+            self.space_mask_for(
+                set(player.room_spaces) | set(player.field_spaces) | set(player.pasture_spaces)),
+            self.space_mask_for(player.stable_spaces),
+            min(player.wood, player.fences_avail), player.pasture_capacity_modifier)
+
+    def candidates_for_masks(
+            self, existing_cells, existing_fences, blocked, stables, budget, modifier=0):
+        """ As ``candidates``, for a farmyard given by bitmasks.
+
+        Parameters
+        ----------
+        existing_cells: int
+            Mask of the spaces in existing pastures.
+        existing_fences: int
+            Mask of the existing fences.
+        blocked: int
+            Mask of the spaces that new pastures cannot be placed on.
+        stables: int
+            Mask of the spaces holding stables.
+        budget: int
+            Maximum number of new fences.
+        modifier: int
+            Added to the capacity of each pasture.
+
+        """
+        valid = (self.cells & blocked) == 0
+        valid &= self.connected[self.cells | existing_cells]
+
+        cost = popcount(self.fences & ~existing_fences)
+        valid &= cost <= budget
+
+        idx = np.flatnonzero(valid)
+        pastures = self.pastures[idx]
+        sizes = popcount(pastures)
+        n_stables = popcount(pastures & stables)
+        capacity = np.where(
+            pastures != 0,
+            sizes * 2**(n_stables + 1) + modifier,
+            0).sum(axis=1)
+
+        return idx, cost[idx], capacity
+
+    def layout(self, idx, cost, capacity):
+        pastures = [self.spaces_for(p) for p in self.pastures[idx] if p]
+        return PastureLayout(pastures, int(cost), int(capacity))
+
+    def pareto_layouts(self, player):
+        """ The Pareto-optimal pasture additions available to ``player``.
+
+        A pasture addition is Pareto-optimal if no other affordable addition
+        costs at most as much wood while fencing at least as many spaces,
+        creating at least as many pastures and providing at least as much
+        capacity (and is strictly better in at least one of these). Of several
+        additions with identical objectives, only one is returned.
+
+        Returns
+        -------
+        List of PastureLayout instances, sorted by cost.
+
+        """
+        return self.pareto_candidates(*self.candidates(player))
+
+    def pareto_candidates(self, idx, cost, capacity):
+        """ The Pareto-optimal layouts among candidates returned by ``candidates``. """
+        if not len(idx):
+            return []
+
+        objectives = np.stack(
+            [-cost, self.n_spaces[idx], self.n_pastures[idx], capacity], axis=1)
+        objectives, first = np.unique(objectives, axis=0, return_index=True)
+
+        at_least = (objectives[:, None, :] >= objectives[None, :, :]).all(axis=2)
+        np.fill_diagonal(at_least, False)
+        dominated = at_least.any(axis=0)
+
+        keep = sorted(first[~dominated], key=lambda i: (cost[i], idx[i]))
+        return [self.layout(idx[i], cost[i], capacity[i]) for i in keep]
+
+
+_planners = {}
+
+
+def get_fence_planner(shape=(3, 5), max_fences=15):
+    """ Return a cached FencePlanner for ``shape`` allowing at least ``max_fences`` fences. """
+    shape = tuple(shape)
+    for (s, m), planner in _planners.items():
+        if s == shape and m >= max_fences:
+            return planner
+    planner = _planners[(shape, max_fences)] = FencePlanner(shape, max_fences)
+    return planner
+
+
+def pareto_pasture_layouts(player):
+    """ Pareto-optimal pasture additions available to ``player``. See FencePlanner.pareto_layouts. """
+    max_fences = max(15, player.fences_avail + len(player.fences))
+    return get_fence_planner(player.shape, max_fences).pareto_layouts(player)
@@ -1,14 +1,16 @@
-import itertools
 import numpy as np
 import copy
+import threading
+import time
 
 from agricola import (
     Player, TextInterface, AgricolaException)
-from agricola.action import get_actions, get_simple_actions
+from agricola.action import Accumulating, get_actions, get_simple_actions
 from agricola.cards import (
-    get_occupations, get_minor_improvements, get_major_improvements)
+    get_occupations, get_minor_improvements, get_major_improvements, CardSet)
 from agricola.utils import EventGenerator, EventScope
 from agricola.choice import Choice
+from agricola.ui import DecisionToken
 
 # TODO: make sure that certain actions which allow two things to be done have
 # the order of the two things respected (and make sure player can't take the
@@ -106,7 +108,9 @@ class AgricolaGame(EventGenerator):
             pass
         self.minor_improvements = minor_improvements
 
-        self.major_improvements = major_improvements or []
+        # A tuple, changed only through ``remove_major_improvement``.
+        self.major_improvements = tuple(major_improvements or ())
+        self._major_improvement_set = CardSet(self.major_improvements)
 
         self.randomize = randomize
 
@@ -135,8 +139,9 @@ class AgricolaGame(EventGenerator):
             'renovation',
             'build_room',
             'build_pasture',
-            'build_stable'
+            'build_stable',
             'plow_field',
+            'bake_bread',
             'birth',
             'occupation',
             'minor_improvement',
@@ -144,13 +149,66 @@ class AgricolaGame(EventGenerator):
         ] or event_name.startswith('Action: ')
 
     def set_first_player(self, idx):
+        if isinstance(idx, Player):
+            idx = self.players.index(idx)
         self.first_player_idx = idx
 
+    def clone(self):
+        """ Create a copy of the game for exploring what-if scenarios.
+
+        Equivalent to ``copy.deepcopy``, except that the user interface, the
+        card decks, the initial players and the action schedule are shared
+        with the copy, as are cards that have not been played yet and all
+        actions that carry no state from round to round. None of these are
+        modified while the game is being played (cards are copied when they
+        are played, and accumulating actions when they are revealed), and
+        skipping them makes cloning considerably cheaper.
+
+        """
+        memo = {}
+        shared = [
+            getattr(self, 'ui', None), self.occupations,
+            self.minor_improvements, self.initial_players, self.actions,
+            getattr(self, 'action_order', None), getattr(self, 'round_schedule', None)]
+        if isinstance(self.initial_players, list):
+            shared.extend(self.initial_players)
+        shared.extend(
+            a for stage in self.actions for a in stage
+            if not isinstance(a, Accumulating))
+        shared.extend(self.major_improvements)
+        for p in getattr(self, 'players', []):
+            for cards in p.hand.values():
+                shared.extend(cards)
+
+        for obj in shared:
+            if obj is not None:
+                memo[id(obj)] = obj
+        return copy.deepcopy(self, memo)
+
+    @property
+    def game_over(self):
+        return self.round_idx > len(self.round_schedule)
+
+    @property
+    def major_improvement_set(self):
+        """ CardSet of the major improvements still available, kept up to date by ``remove_major_improvement``. """
+        return self._major_improvement_set
+
+    def remove_major_improvement(self, card):
+        """ Take ``card`` out of the major improvements still available. """
+        improvements = list(self.major_improvements)
+        improvements.remove(card)
+        self.major_improvements = tuple(improvements)
+        self._major_improvement_set = self._major_improvement_set - CardSet([card])
+
     @property
     def rounds_remaining(self):
         """ Complete rounds remaining (i.e. doesn't include current round). """
         return sum([len(s) for s in self.actions[1:]]) - self.round_idx
 
+    def get_choice(self, player, choice):
+        return self.get_choices(player, [choice])[0]
+
     def get_choices(self, player, _choices):
         return_as_list = True
         if isinstance(_choices, Choice):
@@ -165,8 +223,8 @@ class AgricolaGame(EventGenerator):
         return choices
 
 
-def play(game, ui, first_player=None):
-    game.ui = ui
+def setup_game(game, first_player=None):
+    """ Create the players, deal their hands and prepare ``game`` for its first round. """
     if game.randomize:
         game.action_order = (
             [game.actions[0]] +
@@ -174,6 +232,12 @@ def play(game, ui, first_player=None):
     else:
         game.action_order = game.actions
 
+    # (stage_idx, action revealed) for each round.
+    game.round_schedule = [
+        (stage_idx, action)
+        for stage_idx, stage_actions in enumerate(game.action_order[1:], 1)
+        for action in stage_actions]
+
     game.players = [copy.deepcopy(ip) for ip in game.initial_players]
     for i, p in enumerate(game.players):
         p.name = str(i)
@@ -195,98 +259,330 @@ def play(game, ui, first_player=None):
         first_player = np.random.randint(game.n_players)
     game.set_first_player(first_player)
 
-    ui.start_game(game)
-
     game.round_idx = 1
     game.stage_idx = 1
     game.actions_taken = {}
+    game.actions_remaining = []
+    game.current_player_idx = None
+    game.round_in_progress = False
+    game.active_actions = [_reveal(a) for a in game.action_order[0]]
 
-    for p in game.players:
-        print(p)
 
-    # Main loop
-    game.active_actions = [a for a in game.action_order[0]]
-    for stage_actions in game.action_order[1:]:
-        ui.begin_stage(game.stage_idx)
-        for round_action in stage_actions:
-            game.active_actions.append(round_action)
-            for action in game.active_actions:
-                action.turn()
+def _reveal(action):
+    """ The instance of a scheduled action that is put into play.
+
+    Accumulating actions are copied so that the schedule itself is never
+    modified and can be shared between copies of the game.
 
-            game.actions_remaining = game.active_actions + []
+    """
+    return copy.deepcopy(action) if isinstance(action, Accumulating) else action
 
-            ui.begin_round(game.round_idx, round_action)
 
-            player_turns = [p.people for p in game.players]
-            remaining_players = set(range(len(game.players)))
+def begin_round(game):
+    """ Reveal the action for the current round and replenish the accumulation spaces.
 
-            order = list(range(game.n_players))
-            order = order[game.first_player_idx:] + order[:game.first_player_idx]
-            game.actions_taken = {}
+    Returns the newly revealed action.
+
+    """
+    round_action = _reveal(game.round_schedule[game.round_idx - 1][1])
+    game.active_actions.append(round_action)
+    for action in game.active_actions:
+        action.turn()
+
+    game.actions_remaining = game.active_actions + []
+    game.actions_taken = {}
+
+    game.player_turns = [p.people for p in game.players]
+    order = list(range(game.n_players))
+    game.turn_order = order[game.first_player_idx:] + order[:game.first_player_idx]
+    game.current_player_idx = game.turn_order[0]
+    game.round_in_progress = True
+
+    return round_action
+
+
+def check_action_available(game, action):
+    if action is None:
+        raise AgricolaException("No action chosen")
+    elif action not in game.actions_remaining:
+        raise AgricolaException("That action is not available this round")
+    elif action in game.actions_taken:
+        raise AgricolaException(
+            "That action has already been taken by "
+            "player {0}".format(game.actions_taken[action]))
 
-            for i in itertools.cycle(order):
-                if i in remaining_players:
-                    action = None
-                    while action is None:
-                        game_copy = copy.deepcopy(game)
-                        player = game_copy.players[i]
-
-                        try:
-                            action = ui.get_action(player.name, game_copy.actions_remaining)
-
-                            if action is None:
-                                raise AgricolaException("No action chosen")
-                            elif action not in game_copy.actions_remaining:
-                                raise AgricolaException("That action is not available this round")
-                            elif action in game_copy.actions_taken:
-                                raise AgricolaException(
-                                    "That action has already been taken by "
-                                    "player {0}".format(game_copy.actions_taken[action]))
-
-                            choices = action.choices(player)
-                            if choices:
-                                choices = game_copy.get_choices(player, choices)
-
-                            event_name = "Action: {}".format(action.__class__.__name__)
-                            with EventScope([game_copy, player], event_name, player=player, action=action):
-                                action.effect(player, choices)
-
-                            del game
-                            game = game_copy
-
-                        except AgricolaException as e:
-                            ui.action_failed(str(e))
-                            action = None
-                            del game_copy
-
-                    game.actions_taken[action] = i
-                    game.actions_remaining.remove(action)
-                    ui.update_game(game)
-                    ui.action_successful()
-
-                    for p in game.players:
-                        print(p)
-
-                    player_turns[i] -= 1
-                    if player_turns[i] <= 0:
-                        remaining_players.remove(i)
-                        if not remaining_players:
-                            break
-
-            ui.end_round()
-            game.round_idx += 1
-
-        ui.harvest()
-        for p in game.players:
-            p.harvest()
-        ui.end_stage()
-
-        game.stage_idx += 1
 
+def take_action(game, player_idx, action, choices):
+    """ Have a player take an action, modifying ``game`` in place.
+
+    Raises an AgricolaException if the action cannot be taken with the given
+    choices, in which case ``game`` may be left in an inconsistent state; callers
+    that need to recover should apply the action to a copy of the game.
+
+    """
+    check_action_available(game, action)
+    player = game.players[player_idx]
+
+    event_name = "Action: {}".format(action.__class__.__name__)
+    with EventScope([game, player], event_name, player=player, action=action):
+        action.effect(player, choices)
+
+    game.actions_taken[action] = player_idx
+    game.actions_remaining.remove(action)
+
+    game.player_turns[player_idx] -= 1
+    game.current_player_idx = None
+    n = len(game.turn_order)
+    start = game.turn_order.index(player_idx)
+    for k in range(1, n + 1):
+        i = game.turn_order[(start + k) % n]
+        if game.player_turns[i] > 0:
+            game.current_player_idx = i
+            break
+
+
+def end_round(game):
+    """ Finish the current round. Returns True if the round ends a stage (so a harvest is due). """
+    game.current_player_idx = None
+    game.round_in_progress = False
+    stage_idx = game.round_schedule[game.round_idx - 1][0]
+    game.round_idx += 1
+    return game.game_over or game.round_schedule[game.round_idx - 1][0] != stage_idx
+
+
+def harvest(game):
+    """ Run the harvest for every player and move on to the next stage. """
+    for p in game.players:
+        p.harvest()
+    game.stage_idx += 1
+
+
+def finish_game(game):
     game.score = {}
     for i, p in enumerate(game.players):
         game.score[i] = p.score()
+
+
+def advance(game):
+    """ Run the game forward until a player has to make a decision or the game ends. """
+    while game.current_player_idx is None and not game.game_over:
+        if game.round_in_progress:
+            if end_round(game):
+                harvest(game)
+        else:
+            begin_round(game)
+
+    if game.game_over:
+        finish_game(game)
+
+
+def _decide(game, ui, player_idx):
+    """ Ask ``ui`` for the action, and the answers to its choices, of a player in ``game``. """
+    player = game.players[player_idx]
+    action = ui.get_action(player.name, game.actions_remaining)
+    check_action_available(game, action)
+
+    if ui.cancelled():
+        return None
+
+    choices = action.choices(player)
+    if choices:
+        choices = game.get_choices(player, choices)
+    return action, choices
+
+
+def _decide_by(deadline, token, game, ui, player_idx):
+    """ As ``_decide``, but give up if ``ui`` has not decided by ``deadline``.
+
+    The decision is made in a background thread. Returns the decision and
+    None, or None and the thread if ``ui`` ran out of time, in which case
+    ``token`` is cancelled. The interface is not interrupted, so the thread
+    may still be running: ``ui`` must not be used again until it has
+    finished.
+
+    """
+    result = []
+
+    def decide():
+        try:
+            result.append((True, _decide(game, ui, player_idx)))
+        except BaseException as e:
+            result.append((False, e))
+
+    thread = threading.Thread(target=decide)
+    thread.daemon = True
+    thread.start()
+    thread.join(max(deadline - time.perf_counter(), 0.0))
+
+    if thread.is_alive():
+        token.cancel()
+        return None, thread
+    decided, value = result[0]
+    if not decided:
+        raise value
+    return value, None
+
+
+def _fallback_decision(fallback, game, player_idx):
+    """ The action, and the answers to its choices, that ``fallback`` chooses for a player in ``game``. """
+    from agricola.search import search_copy
+    move = fallback.choose_move(search_copy(game))
+    if move is None:
+        raise ValueError(
+            "Fallback found no legal move for player {0}.".format(player_idx))
+    return move.resolve(game)
+
+
+def play(
+        game, ui, first_player=None, speculator=None, time_budget=None, fallback=None,
+        recorder=None, grace=None):
+    """ Play ``game`` to the end, with all decisions made through ``ui``.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+    ui: UserInterface
+    first_player: int (optional)
+        Index of the player who starts. Random if not supplied.
+    speculator: speculate.Speculator (optional)
+        If supplied, the successors of each position are computed in the
+        background while ``ui`` decides, and moves that have already been
+        computed are committed without taking the action again.
+    time_budget: float (optional)
+        Seconds allowed for each decision (choosing an action and answering
+        its choices, including any retries after illegal choices). The
+        deadline is passed to ``ui.set_deadline`` beforehand, so that anytime
+        agents (see ``search.AnytimeAgent``) can return their best move in
+        time. If ``ui`` has not decided by the deadline, the move chosen by
+        ``fallback`` is taken instead, and the decision's DecisionToken is
+        cancelled. Interfaces should stop soon after their decision is
+        cancelled (see ``UserInterface.cancelled``): ``ui`` is waited for, for
+        at most another ``grace`` seconds, so that it is never working on two
+        decisions at once. If it is still working after that, it is dropped,
+        and ``fallback`` makes all remaining decisions and answers all
+        remaining prompts.
+    fallback: SearchAgent (optional)
+        Agent deciding for players who run out of time, other than ``ui``.
+        Defaults to a ``search.RandomAgent``, i.e. a random legal move.
+    recorder: dataset.GameRecord (optional)
+        If supplied, every decision is passed to ``recorder.record`` once it
+        has been taken, together with the position in which it was taken, and
+        the answers ``ui`` gives to the prompts of cards are logged with it.
+    grace: float (optional)
+        Seconds that ``ui`` is given to stop after a timed out decision is
+        cancelled. Defaults to ``time_budget``.
+
+    """
+    if time_budget is not None:
+        from agricola.search import RandomAgent
+        fallback = fallback or RandomAgent()
+        grace = time_budget if grace is None else grace
+
+    game.ui = ui if recorder is None else recorder.interface(ui)
+    setup_game(game, first_player)
+
+    ui.start_game(game)
+
+    for p in game.players:
+        print(p)
+
+    # Main loop
+    dropped = False
+    new_stage = True
+    while not game.game_over:
+        if new_stage:
+            ui.begin_stage(game.stage_idx)
+
+        round_action = begin_round(game)
+        ui.begin_round(game.round_idx, round_action)
+
+        while game.current_player_idx is not None:
+            i = game.current_player_idx
+            if speculator is not None:
+                speculator.start(game)
+
+            deadline = None
+            if time_budget is not None and not dropped:
+                token = DecisionToken()
+                deadline = time.perf_counter() + time_budget
+                ui.set_deadline(deadline, token)
+
+            action = None
+            while action is None:
+                if recorder is not None:
+                    recorder.end_move()
+                game_copy = game.clone()
+                player = game_copy.players[i]
+
+                try:
+                    if dropped:
+                        action, choices = _fallback_decision(fallback, game_copy, i)
+                    elif deadline is None:
+                        action, choices = _decide(game_copy, ui, i)
+                    else:
+                        decision, thread = None, None
+                        if time.perf_counter() < deadline:
+                            decision, thread = _decide_by(deadline, token, game_copy, ui, i)
+
+                        if decision is None:
+                            # The fallback decides on a copy of its own while
+                            # the interface winds down its cancelled decision.
+                            game_copy = game.clone()
+                            decision = _fallback_decision(fallback, game_copy, i)
+                            if thread is not None:
+                                thread.join(grace)
+                            if thread is not None and thread.is_alive():
+                                # The interface is not told anything more, as
+                                # it is still busy with the cancelled decision.
+                                dropped = True
+                                ui = fallback
+                                game.ui = game_copy.ui = (
+                                    ui if recorder is None else recorder.interface(ui))
+                            else:
+                                ui.action_timed_out(player.name)
+                        action, choices = decision
+
+                    if recorder is not None:
+                        recorder.begin_move()
+                    child = None
+                    if speculator is not None:
+                        child = speculator.lookup(game_copy, action, choices)
+                    if child is None:
+                        take_action(game_copy, i, action, choices)
+                    else:
+                        game_copy = child
+
+                    if recorder is not None:
+                        recorder.record(game, i, action, choices)
+                    del game
+                    game = game_copy
+
+                except AgricolaException as e:
+                    ui.action_failed(str(e))
+                    action = None
+                    del game_copy
+
+            if speculator is not None:
+                speculator.stop()
+
+            ui.update_game(game)
+            ui.action_successful()
+
+            for p in game.players:
+                print(p)
+
+        ui.end_round()
+        new_stage = end_round(game)
+        if new_stage:
+            ui.harvest()
+            harvest(game)
+            ui.end_stage()
+
+    if time_budget is not None:
+        ui.set_deadline(None)
+    finish_game(game)
     game.ui = None
+    return game
 
 
 class SimpleAgricolaGame(AgricolaGame):
@@ -0,0 +1,312 @@
+""" A fixed, flat index of the moves of a game configuration.
+
+Policies need a fixed discrete set of actions, while the moves of this engine
+are an action together with answers to choices whose options are live
+objects (cards, materials, spaces) that differ from position to position. An
+ActionIndex numbers the moves of every game with the same actions, cards and
+farm size once and for all, so that the same integer always denotes the same
+move.
+
+Each action of the configuration gets a contiguous block of indices. Within
+it, each of the choices that the action asks for has a fixed domain of
+canonical answers, and the index of a move is the mixed-radix number of its
+answers in those domains, offset by the start of the block:
+
+* a choice between options has the unanswered choice followed by the options
+  that can appear there, identified by name for cards (every card of the
+  configuration) and by value otherwise (e.g. 'clay' or True);
+* a count has the unanswered choice followed by 1 to ``max_count``;
+* a space has the unanswered choice followed by every space of the farm;
+* a list of spaces has the empty list followed by every set of at most
+  ``max_list_length`` spaces;
+* a list of pastures has the empty list followed by every single pasture
+  (connected set of spaces) of the farm.
+
+The choices that an action asks for, and the kind of their options, are
+found when the index is built by asking the action for its choices on behalf
+of a player with plenty of goods and every card of the configuration in hand.
+Choices that are only sometimes asked for are left unanswered in the moves
+where they are not.
+
+Moves outside of the domains (e.g. several pastures at once, or more spaces
+than ``max_list_length``) have no index. ``legal_mask`` marks the indices of
+the legal moves of a position among those generated by
+``search.candidate_moves``.
+
+"""
+import itertools
+
+import numpy as np
+
+from agricola import AgricolaException, AgricolaInvalidChoice
+from agricola.choice import (
+    CountChoice, DiscreteChoice, ListChoice, SpaceChoice, VariableLengthListChoice)
+from agricola.macro import connected_extensions
+from agricola.player import Player
+from agricola.search import Move, candidate_moves, successors
+
+
+def _option_key(option):
+    """ Canonical form of an option of a DiscreteChoice. """
+    name = getattr(option, 'name', None)
+    return option if name is None else name
+
+
+class _Domain(object):
+    """ Canonical answers to one choice, the first of which is the unanswered choice. """
+    def __init__(self, values):
+        self.values = list(values)
+        self.index = {v: i for i, v in enumerate(self.values)}
+
+    def __len__(self):
+        return len(self.values)
+
+
+def _plain(value):
+    if isinstance(value, (tuple, list)):
+        return tuple(_plain(v) for v in value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+class ActionIndex(object):
+    """ Numbering of the moves of games with the configuration of ``game``.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+        A game that has been set up (see ``game.setup_game``).
+    max_list_length: int
+        Largest number of rooms, stables or fields (etc.) built at once that
+        has an index. Also passed on to ``search.candidate_moves``.
+    max_count: int
+        Largest count (e.g. of fields sown) that has an index.
+
+    """
+    def __init__(self, game, max_list_length=1, max_count=15):
+        self.max_list_length = max_list_length
+        self.max_count = max_count
+        shape = tuple(game.players[0].shape)
+        self._spaces = [(i, j) for i in range(shape[0]) for j in range(shape[1])]
+        self._pastures = [()] + [
+            (p,) for p in connected_extensions([], set(self._spaces), shape, len(self._spaces))]
+
+        cards = []
+        for deck in (game.occupations, game.minor_improvements):
+            if deck is not None:
+                cards.extend(deck.cards)
+        cards.extend(game.major_improvements)
+        self._card_names = list(dict.fromkeys(c.name for c in cards))
+
+        actions = []
+        for stage in game.actions:
+            for action in stage:
+                if action.name not in [a.name for a in actions]:
+                    actions.append(action)
+
+        self.action_names = []
+        self._domains = []
+        self._offsets = []
+        self._action_idx = {}
+        size = 0
+        for action in actions:
+            domains = [self._domain(s) for s in self._probe(game, action)]
+            self._action_idx[action.name] = len(self.action_names)
+            self.action_names.append(action.name)
+            self._domains.append(domains)
+            self._offsets.append(size)
+            size += int(np.prod([len(d) for d in domains])) if domains else 1
+        self.size = size
+
+        # Block of each index, for constant time decoding.
+        self._owner = np.zeros(size, dtype=np.int32)
+        for a, offset in enumerate(self._offsets):
+            self._owner[offset:] = a
+
+    def _probe(self, game, action):
+        """ Choices asked for by ``action``, answered with representative options. """
+        hand = dict(
+            occupations=list(game.occupations.cards) if game.occupations else [],
+            minor_improvements=(
+                list(game.minor_improvements.cards) if game.minor_improvements else []))
+        goods = dict(
+            food=99, wood=99, clay=99, stone=99, reed=99, grain=15, veg=15,
+            sheep=5, boar=5, cattle=5)
+
+        specs = []
+        for house_type in ('wood', 'clay'):
+            player = Player('probe', shape=game.players[0].shape, house_type=house_type, **goods)
+            for kind, cards in hand.items():
+                player.set_hand(kind, cards)
+            player.set_game(game)
+            try:
+                found = action.choices(player)
+            except AgricolaException:
+                continue
+            for k, spec in enumerate(found):
+                if k == len(specs):
+                    specs.append(spec)
+                elif isinstance(spec, DiscreteChoice) and isinstance(specs[k], DiscreteChoice):
+                    options = specs[k].options + [
+                        o for o in spec.options
+                        if _option_key(o) not in [_option_key(p) for p in specs[k].options]]
+                    specs[k] = DiscreteChoice(options, spec.desc)
+        return specs
+
+    def _domain(self, spec):
+        if isinstance(spec, DiscreteChoice):
+            if any(getattr(o, 'name', None) is not None for o in spec.options):
+                return _Domain([None] + self._card_names)
+            return _Domain([None] + [_option_key(o) for o in spec.options])
+
+        elif isinstance(spec, CountChoice):
+            return _Domain([None] + list(range(1, self.max_count + 1)))
+
+        elif isinstance(spec, SpaceChoice):
+            return _Domain([None] + self._spaces)
+
+        elif isinstance(spec, ListChoice):
+            subdomains = [self._domain(s) for s in spec.subchoices]
+            return _Domain(itertools.product(*[d.values for d in subdomains]))
+
+        elif isinstance(spec, VariableLengthListChoice):
+            if isinstance(spec.subchoice, VariableLengthListChoice):
+                return _Domain(self._pastures)
+            mx = self.max_list_length if spec.mx is None else min(spec.mx, self.max_list_length)
+            values = [()]
+            for n in range(1, mx + 1):
+                values.extend(itertools.combinations(self._spaces, n))
+            return _Domain(values)
+
+        return _Domain([None])
+
+    def _canonical(self, spec, value):
+        """ Canonical answer to ``spec`` of an encoded answer (see ``search.Move``). """
+        if isinstance(spec, DiscreteChoice):
+            return None if value is None else _option_key(spec.options[value])
+        elif isinstance(spec, ListChoice):
+            return tuple(self._canonical(s, v) for s, v in zip(spec.subchoices, value))
+        elif isinstance(spec, VariableLengthListChoice):
+            if not value:
+                return ()
+            if isinstance(spec.subchoice, VariableLengthListChoice):
+                return tuple(sorted(tuple(sorted(p)) for p in _plain(value)))
+            return tuple(sorted(_plain(value)))
+        return _plain(value)
+
+    def _encoded(self, spec, value):
+        """ Inverse of ``_canonical`` for the options of ``spec``. """
+        if isinstance(spec, DiscreteChoice):
+            if value is None:
+                return None
+            for i, option in enumerate(spec.options):
+                if _option_key(option) == value:
+                    return i
+            raise AgricolaInvalidChoice(
+                "Option {0} is not available for choice: {1}".format(value, spec.desc))
+        elif isinstance(spec, ListChoice):
+            return tuple(self._encoded(s, v) for s, v in zip(spec.subchoices, value))
+        elif isinstance(spec, VariableLengthListChoice):
+            return value if value else None
+        return value
+
+    def encode(self, game, move):
+        """ Index of ``move`` in the position ``game``.
+
+        Raises AgricolaInvalidChoice if the move has no index.
+
+        """
+        action, _ = move.resolve(game)
+        a = self._action_idx.get(action.name)
+        if a is None:
+            raise AgricolaInvalidChoice(
+                "Action {0} is not part of the index.".format(action.name))
+        domains = self._domains[a]
+        specs = action.choices(game.players[game.current_player_idx])
+        if len(specs) > len(domains):
+            raise AgricolaInvalidChoice(
+                "Action {0} asks for more choices than the index has.".format(action.name))
+
+        index = 0
+        for k, domain in enumerate(domains):
+            value = domain.values[0]
+            if k < len(specs):
+                value = self._canonical(specs[k], move.choices[k])
+            i = domain.index.get(value)
+            if i is None:
+                raise AgricolaInvalidChoice(
+                    "Answer {0} to choice {1} of {2} is not part of the index.".format(
+                        value, k, action.name))
+            index = index * len(domain) + i
+        return self._offsets[a] + index
+
+    def decode(self, game, index):
+        """ Move with index ``index`` in the position ``game``.
+
+        Raises AgricolaInvalidChoice if the action is not available or an
+        answer is not one of the options of the position.
+
+        """
+        if not 0 <= index < self.size:
+            raise AgricolaInvalidChoice(
+                "Index {0} is out of range for {1} moves.".format(index, self.size))
+        a = int(self._owner[index])
+        name, domains = self.action_names[a], self._domains[a]
+
+        idx = None
+        for i, action in enumerate(game.actions_remaining):
+            if action.name == name:
+                idx = i
+                break
+        if idx is None:
+            raise AgricolaInvalidChoice("Action {0} is not available.".format(name))
+
+        values = []
+        rest = index - self._offsets[a]
+        for domain in reversed(domains):
+            rest, i = divmod(rest, len(domain))
+            values.append(domain.values[i])
+        values.reverse()
+
+        specs = game.actions_remaining[idx].choices(game.players[game.current_player_idx])
+        for domain, value in zip(domains[len(specs):], values[len(specs):]):
+            if value != domain.values[0]:
+                raise AgricolaInvalidChoice(
+                    "Action {0} does not ask for choice {1} here.".format(name, len(specs)))
+        choices = [self._encoded(s, v) for s, v in zip(specs, values)]
+        return Move(idx, choices, name)
+
+    def legal_indices(self, game):
+        """ Sorted indices of the legal moves of ``game`` (see ``legal_mask``). """
+        indices = {}
+        for move in candidate_moves(game, self.max_list_length):
+            try:
+                indices[move] = self.encode(game, move)
+            except AgricolaException:
+                continue
+        return sorted(set(indices[move] for move, _ in successors(game, list(indices))))
+
+    def legal_mask(self, game, out=None):
+        """ Boolean array over the indices, true for the legal moves of ``game``.
+
+        Candidate moves are those of ``search.candidate_moves``; moves with no
+        index are left out. If ``out`` is supplied it is filled in and
+        returned instead.
+
+        """
+        if out is None:
+            out = np.zeros(self.size, dtype=bool)
+        else:
+            out[:] = False
+        out[self.legal_indices(game)] = True
+        return out
+
+    def __len__(self):
+        return self.size
+
+    def __str__(self):
+        return "<ActionIndex actions={0} size={1}>".format(len(self.action_names), self.size)
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,278 @@
+""" Compound decisions presented as single, pre-validated macro-actions.
+
+"Farm Expansion" asks for a list of room spaces and a list of stable spaces,
+and "Fencing" and "Farm Redevelopment" for a list of pastures, each a list of
+spaces. ``search.candidate_moves`` fills such lists with every connected group
+of up to ``max_list_length`` free spaces, and with every combination of these
+with the other answers, including many that the player cannot pay for.
+
+Here each compound answer is instead built up from the rules: sets of new
+rooms or stables that form a connected group with the existing ones and that
+the player can pay for, pastures from the fence planner, and combinations of
+rooms and stables that do not overlap and are affordable together. Every
+option is a complete Move, labelled with what it builds (e.g. "rooms at
+(2, 0); stables at (0, 3), (0, 4)"), so an agent takes a whole build in one
+step. Options that build nothing are not offered. Options are ordered by a
+cheap static value of what they build, and combinations of rooms and stables
+are generated lazily, best first.
+
+Other actions are passed through with their usual candidate moves.
+
+"""
+import heapq
+import itertools
+
+from agricola import AgricolaException
+from agricola.action import FarmExpansion, FarmRedevelopment, Fencing
+from agricola.fences import pareto_pasture_layouts
+from agricola.search import Move, choice_candidates
+
+# Rough value of what an option builds, used to order the options.
+ROOM_VALUE = 2.0
+STABLE_VALUE = 1.0
+PASTURE_VALUE = 1.0
+CAPACITY_VALUE = 0.25
+
+_MAX_ROOMS = 15
+
+
+class MacroOption(object):
+    """ A complete answer to the choices of one action.
+
+    Parameters
+    ----------
+    choices: tuple
+        Encoded answers, as in ``search.Move``.
+    value: float
+        Static value used for ordering options.
+    label: str
+        Description of what the option builds.
+
+    """
+    def __init__(self, choices, value, label):
+        self.choices = tuple(choices)
+        self.value = value
+        self.label = label
+
+    def __str__(self):
+        return "<MacroOption {0} value={1:g}>".format(self.label, self.value)
+
+    def __repr__(self):
+        return str(self)
+
+
+def _neighbours(space, shape):
+    i, j = space
+    for ii, jj in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1)):
+        if 0 <= ii < shape[0] and 0 <= jj < shape[1]:
+            yield ii, jj
+
+
+def _connected(spaces, shape):
+    spaces = set(spaces)
+    if not spaces:
+        return True
+    start = next(iter(spaces))
+    seen, stack = {start}, [start]
+    while stack:
+        for n in _neighbours(stack.pop(), shape):
+            if n in spaces and n not in seen:
+                seen.add(n)
+                stack.append(n)
+    return len(seen) == len(spaces)
+
+
+def connected_extensions(existing, free, shape, max_size):
+    """ Sets of spaces from ``free`` that form one connected group together with ``existing``.
+
+    Generated lazily by increasing size (up to ``max_size``), each as a
+    sorted tuple.
+
+    """
+    existing = set(existing)
+    if max_size <= 0:
+        return
+
+    if existing:
+        level = set()
+        for s in existing:
+            for n in _neighbours(s, shape):
+                if n in free:
+                    level.add((n,))
+    else:
+        level = set((s,) for s in free)
+
+    size = 1
+    while level:
+        next_level = set()
+        for spaces in sorted(level):
+            group = existing | set(spaces)
+            if _connected(group, shape):
+                yield spaces
+            if size < max_size:
+                for s in group:
+                    for n in _neighbours(s, shape):
+                        if n in free and n not in spaces:
+                            next_level.add(tuple(sorted(spaces + (n,))))
+        level = next_level
+        size += 1
+
+
+def _blocked(player, omit=()):
+    blocked = set()
+    for kind, objects in player.occupied.items():
+        if kind not in omit:
+            for o in objects:
+                blocked.update(o.spaces)
+    return blocked
+
+
+def _all_spaces(player):
+    return set(itertools.product(range(player.shape[0]), range(player.shape[1])))
+
+
+def room_layouts(player, wood=None, reed=None):
+    """ Affordable sets of new rooms for ``player``, as sorted tuples of spaces.
+
+    ``wood`` and ``reed`` override the player's supply of the house material
+    and of reed.
+
+    """
+    material = player.resources[player.house_type] if wood is None else wood
+    reed = player.reed if reed is None else reed
+    max_rooms = min(material // player.room_cost, reed // 2, _MAX_ROOMS)
+    free = _all_spaces(player) - _blocked(player)
+    return connected_extensions(player.room_spaces, free, player.shape, max_rooms)
+
+
+def stable_layouts(player, unit_cost=2, wood=None):
+    """ Affordable sets of new stables for ``player``, as sorted tuples of spaces. """
+    wood = player.wood if wood is None else wood
+    max_stables = player.stables_avail
+    if unit_cost:
+        max_stables = min(max_stables, wood // unit_cost)
+    free = _all_spaces(player) - _blocked(player, omit=['pasture'])
+    return connected_extensions(player.stable_spaces, free, player.shape, max_stables)
+
+
+def _spaces_label(spaces):
+    return ", ".join(str(s) for s in spaces)
+
+
+def _pasture_options(player):
+    options = []
+    for layout in pareto_pasture_layouts(player):
+        pastures = tuple(tuple(sorted(p)) for p in layout.pastures)
+        value = PASTURE_VALUE * layout.n_pastures + CAPACITY_VALUE * layout.capacity
+        label = "pastures " + "; ".join(
+            "[" + _spaces_label(p) + "]" for p in pastures)
+        options.append((value, pastures, label))
+    options.sort(key=lambda o: -o[0])
+    return options
+
+
+def farm_expansion_options(player):
+    """ MacroOptions for "Farm Expansion", best first. Combinations are generated lazily. """
+    wood_house = player.house_type == 'wood'
+    rooms = [(0.0, None)] + [
+        (ROOM_VALUE * len(r), r) for r in room_layouts(player)]
+    stables = [(0.0, None)] + [
+        (STABLE_VALUE * len(s), s) for s in stable_layouts(player)]
+    rooms.sort(key=lambda o: -o[0])
+    stables.sort(key=lambda o: -o[0])
+
+    # Best-first enumeration of pairs of indices into the sorted lists.
+    heap = [(-(rooms[0][0] + stables[0][0]), 0, 0)]
+    pushed = {(0, 0)}
+    while heap:
+        neg_value, i, j = heapq.heappop(heap)
+        for ii, jj in ((i + 1, j), (i, j + 1)):
+            if ii < len(rooms) and jj < len(stables) and (ii, jj) not in pushed:
+                pushed.add((ii, jj))
+                heapq.heappush(heap, (-(rooms[ii][0] + stables[jj][0]), ii, jj))
+
+        room_spaces, stable_spaces = rooms[i][1], stables[j][1]
+        if room_spaces is None and stable_spaces is None:
+            continue
+        if room_spaces and stable_spaces and set(room_spaces) & set(stable_spaces):
+            continue
+        if wood_house and room_spaces and stable_spaces:
+            wood = player.room_cost * len(room_spaces) + 2 * len(stable_spaces)
+            if wood > player.wood:
+                continue
+
+        labels = []
+        if room_spaces:
+            labels.append("rooms at " + _spaces_label(room_spaces))
+        if stable_spaces:
+            labels.append("stables at " + _spaces_label(stable_spaces))
+        yield MacroOption((room_spaces, stable_spaces), -neg_value, "; ".join(labels))
+
+
+def fencing_options(player):
+    """ MacroOptions for "Fencing", best first. """
+    for value, pastures, label in _pasture_options(player):
+        yield MacroOption((pastures,), value, label)
+
+
+def farm_redevelopment_options(player):
+    """ MacroOptions for "Farm Redevelopment", best first. """
+    materials = player.valid_house_upgrades()
+    pastures = [(0.0, None, None)] + _pasture_options(player)
+    options = []
+    for idx, material in enumerate(materials):
+        if player.resources[material] < player.rooms or player.reed < 1:
+            continue
+        for value, layout, label in pastures:
+            full_label = "house to " + material
+            if label:
+                full_label += "; " + label
+            options.append(MacroOption((idx, layout), value, full_label))
+    options.sort(key=lambda o: -o.value)
+    return options
+
+
+_OPTIONS = [
+    (FarmExpansion, farm_expansion_options),
+    (Fencing, fencing_options),
+    (FarmRedevelopment, farm_redevelopment_options),
+]
+
+
+def macro_options(action, player):
+    """ MacroOptions for ``action`` taken by ``player``, or None if it is not a compound action. """
+    for cls, options in _OPTIONS:
+        if isinstance(action, cls):
+            return options(player)
+    return None
+
+
+def macro_moves(game, max_list_length=1, max_options=None):
+    """ Candidate moves for the player to move, with compound actions as macro-actions.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+    max_list_length: int
+        Passed on to ``search.choice_candidates`` for the other actions.
+    max_options: int (optional)
+        Maximum number of options generated per compound action.
+
+    """
+    player = game.players[game.current_player_idx]
+    for idx, action in enumerate(game.actions_remaining):
+        options = macro_options(action, player)
+        if options is None:
+            try:
+                specs = action.choices(player)
+            except AgricolaException:
+                continue
+            candidates = [choice_candidates(s, player, max_list_length) for s in specs]
+            for values in itertools.product(*candidates):
+                yield Move(idx, values, action.name)
+            continue
+
+        if max_options is not None:
+            options = itertools.islice(options, max_options)
+        for option in options:
+            yield Move(idx, option.choices, "{0}: {1}".format(action.name, option.label))
@@ -0,0 +1,337 @@
+""" Monte Carlo Tree Search.
+
+The tree is searched with UCT: starting from the root, children are selected
+by their upper confidence bound until a node that still has untried moves is
+reached, one new child is added for the next untried move, the game is played
+out from that child by a rollout policy, and the final result is propagated
+back up the tree.
+
+Each node stores the rewards of all players, and selection at a node is done
+on behalf of the player to move there, so the same tree works for any number
+of players. By default a player's reward is 1 for a win (shared between tied
+players) and 0 otherwise; in a solo game it is the final score divided by
+``solo_scale``.
+
+Legal moves of a node are discovered lazily: a node keeps a generator over
+its candidate moves (in random order) and each expansion pulls the next legal
+move from it, so no work is spent on moves that are never expanded and each
+candidate is only ever tried once per node.
+
+If a transposition table is supplied, the visit count and total reward of
+every position are also accumulated in the table under its ``state_key``, and
+selection estimates the value of a child from these shared statistics, which
+include the simulations through all the nodes (in this tree, or in the trees
+of other searches sharing the table) that reach the same position by a
+different move order. The exploration term still uses the visit count of the
+child itself.
+
+The search sees the whole game, including the hands of other players.
+
+"""
+import math
+import time
+
+import numpy as np
+
+from agricola.search import (
+    AnytimeAgent, RandomAgent, SearchStats,
+    apply_move, candidate_moves, successors, search_copy, state_key)
+from agricola.transposition import TranspositionTable
+
+
+def win_reward(scores, solo_scale=100.0):
+    """ Reward of each player given the final ``scores`` (dict from player index to score). """
+    n_players = len(scores)
+    reward = np.zeros(n_players)
+    if n_players == 1:
+        reward[0] = scores[0] / solo_scale
+        return reward
+
+    best = max(scores.values())
+    winners = [i for i, s in scores.items() if s == best]
+    reward[winners] = 1.0 / len(winners)
+    return reward
+
+
+class MCTSStats(SearchStats):
+    """ SearchStats where ``nodes`` counts simulations. """
+    @property
+    def simulations(self):
+        return self.nodes
+
+    @property
+    def simulations_per_sec(self):
+        return self.nodes_per_sec
+
+    def __str__(self):
+        return "<MCTSStats simulations={0} elapsed={1:.3f}s simulations/sec={2:.1f}>".format(
+            self.nodes, self.elapsed, self.nodes_per_sec)
+
+
+class MCTSNode(object):
+    """ A position in the search tree.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+        The position, as a search copy.
+    parent: MCTSNode (optional)
+    move: Move (optional)
+        Move leading from ``parent`` to this node.
+
+    """
+    def __init__(self, game, parent=None, move=None):
+        self.game = game
+        self.parent = parent
+        self.move = move
+        self.player_idx = game.current_player_idx
+        self.key = None
+        self.children = []
+        self.visits = 0
+        self.total = np.zeros(game.n_players)
+        self._untried = None
+        self.exhausted = game.game_over
+
+    @property
+    def terminal(self):
+        return self.game.game_over
+
+    @property
+    def moves(self):
+        """ Legal moves discovered so far, in the order that they were expanded. """
+        return [c.move for c in self.children]
+
+    def expand(self, rng, max_list_length=1, move_generator=None):
+        """ Add a child for the next untried legal move. Returns None once all moves have been tried.
+
+        Candidate moves are generated by ``move_generator(game)``, or by
+        ``search.candidate_moves`` if it is not supplied.
+
+        """
+        if self.exhausted:
+            return None
+
+        if self._untried is None:
+            if move_generator is None:
+                moves = list(candidate_moves(self.game, max_list_length))
+            else:
+                moves = list(move_generator(self.game))
+            order = rng.permutation(len(moves))
+            self._untried = successors(self.game, (moves[i] for i in order))
+
+        for move, child_game in self._untried:
+            child = MCTSNode(child_game, self, move)
+            self.children.append(child)
+            return child
+
+        self.exhausted = True
+        self._untried = None
+        return None
+
+    def select(self, c, table=None):
+        """ Child with the highest upper confidence bound for the player to move.
+
+        If ``table`` is supplied, the mean reward of a child is taken from the
+        statistics stored in the table for its position when available.
+
+        """
+        log_n = math.log(self.visits)
+        best, best_value = None, -float('inf')
+        for child in self.children:
+            mean = child.total[self.player_idx] / child.visits
+            if table is not None and child.key is not None:
+                entry = table.get(child.key)
+                if entry is not None and entry[0] > 0:
+                    mean = entry[1][self.player_idx] / entry[0]
+            value = mean + c * math.sqrt(log_n / child.visits)
+            if value > best_value:
+                best, best_value = child, value
+        return best
+
+    def best_child(self):
+        """ Most visited child. """
+        return max(self.children, key=lambda child: child.visits)
+
+    def __str__(self):
+        return "<MCTSNode move={0} visits={1} value={2}>".format(
+            self.move, self.visits,
+            self.total / self.visits if self.visits else self.total)
+
+    def __repr__(self):
+        return str(self)
+
+
+class MCTS(object):
+    """ UCT search.
+
+    Parameters
+    ----------
+    n_simulations: int (optional)
+        Number of simulations per search.
+    time_budget: float (optional)
+        Wall-clock budget per search in seconds. If both ``n_simulations`` and
+        ``time_budget`` are given, the search stops at whichever is hit first.
+        If neither is given, 1000 simulations are run.
+    c: float
+        Exploration constant of the upper confidence bound.
+    rollout_policy: SearchAgent (optional)
+        Agent choosing the moves of the rollouts. Defaults to a RandomAgent.
+        A policy with a ``playout`` method (such as ``rollout.RolloutPolicy``)
+        is instead handed the whole rollout, and must return the final scores.
+    reward: callable (optional)
+        Function from final scores to an array of rewards, one per player.
+        Defaults to ``win_reward``.
+    seed: int (optional)
+        Seed for the order in which moves are expanded (and for the default
+        rollout policy).
+    max_list_length: int
+        Passed on to ``search.candidate_moves``.
+    table: TranspositionTable or dict (optional)
+        Table in which to share statistics between transpositions. Entries are
+        ``[visits, total]`` lists keyed by ``('mcts', state_key)`` and, in a
+        TranspositionTable, stored with their visit count as their depth.
+    move_generator: callable (optional)
+        Function from a game to the candidate moves to expand, such as
+        ``macro.macro_moves``. Defaults to ``search.candidate_moves``.
+
+    """
+    def __init__(
+            self, n_simulations=None, time_budget=None, c=math.sqrt(2),
+            rollout_policy=None, reward=None, seed=None, max_list_length=1,
+            table=None, move_generator=None):
+        if n_simulations is None and time_budget is None:
+            n_simulations = 1000
+        self.n_simulations = n_simulations
+        self.time_budget = time_budget
+        self.c = c
+        self.rng = np.random.RandomState(seed)
+        self.rollout_policy = rollout_policy or RandomAgent(
+            self.rng, max_list_length=max_list_length)
+        self.reward = reward or win_reward
+        self.max_list_length = max_list_length
+        self.table = table
+        self.move_generator = move_generator
+        self.stats = MCTSStats()
+
+    def search(self, game, root=None, deadline=None):
+        """ Run the search from ``game``, or continue it from an existing ``root``. Returns the root node.
+
+        If a ``deadline`` (a ``time.perf_counter()`` time) is given, the
+        search also stops when it is reached.
+
+        """
+        if root is None:
+            root = MCTSNode(search_copy(game))
+            if self.table is not None:
+                root.key = ('mcts', state_key(root.game))
+
+        self.stats = stats = MCTSStats()
+        start = time.perf_counter()
+        if self.time_budget is not None:
+            budget_end = start + self.time_budget
+            deadline = budget_end if deadline is None else min(deadline, budget_end)
+
+        while True:
+            if self.n_simulations is not None and stats.nodes >= self.n_simulations:
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            self.simulate(root)
+            stats.nodes += 1
+
+        stats.elapsed = time.perf_counter() - start
+        return root
+
+    def simulate(self, root):
+        """ Run one simulation: selection, expansion, rollout and backpropagation. """
+        leaf = self.select_leaf(root)
+        self.backpropagate(leaf, self.reward(self.rollout(leaf.game)))
+
+    def select_leaf(self, root, virtual_loss=0):
+        """ Descend from ``root`` to a newly expanded (or terminal) node.
+
+        If ``virtual_loss`` is positive, that many visits without reward are
+        added to every node on the path, discouraging concurrent simulations
+        from following the same path until ``backpropagate`` is called with
+        the same ``virtual_loss``.
+
+        """
+        node = root
+        node.visits += virtual_loss
+        while not node.terminal:
+            child = node.expand(self.rng, self.max_list_length, self.move_generator)
+            if child is not None:
+                node = child
+                node.visits += virtual_loss
+                if self.table is not None:
+                    node.key = ('mcts', state_key(node.game))
+                break
+            if not node.children:
+                break
+            node = node.select(self.c, self.table)
+            node.visits += virtual_loss
+        return node
+
+    def backpropagate(self, leaf, reward, virtual_loss=0):
+        """ Add ``reward`` to the nodes from ``leaf`` up to the root, removing ``virtual_loss``. """
+        table = self.table
+        node = leaf
+        while node is not None:
+            node.visits += 1 - virtual_loss
+            node.total += reward
+            if table is not None and node.key is not None:
+                entry = table.get(node.key)
+                if entry is None:
+                    entry = [0, np.zeros(len(reward))]
+                entry[0] += 1
+                entry[1] = entry[1] + reward
+                if isinstance(table, TranspositionTable):
+                    table.store(node.key, entry, depth=entry[0])
+                else:
+                    table[node.key] = entry
+            node = node.parent
+
+    def rollout(self, game):
+        """ Play ``game`` to the end with the rollout policy and return the final scores. """
+        playout = getattr(self.rollout_policy, 'playout', None)
+        if playout is not None:
+            return playout(game)
+
+        while not game.game_over:
+            move = self.rollout_policy.choose_move(game)
+            if move is None:
+                raise ValueError(
+                    "Rollout policy found no legal move for player {0} in round {1}.".format(
+                        game.current_player_idx, game.round_idx))
+            game = apply_move(game, move)
+        return game.score
+
+
+class MCTSAgent(AnytimeAgent):
+    """ Agent choosing the most visited move of an MCTS search.
+
+    Parameters are as for MCTS. When decisions are timed, the search also
+    stops at the agent's deadline (see AnytimeAgent).
+
+    """
+    def __init__(
+            self, n_simulations=None, time_budget=None, c=math.sqrt(2),
+            rollout_policy=None, reward=None, seed=None, max_list_length=1,
+            table=None, move_generator=None):
+        super(MCTSAgent, self).__init__(max_list_length)
+        self.mcts = MCTS(
+            n_simulations, time_budget, c, rollout_policy, reward, seed, max_list_length,
+            table, move_generator)
+        self.last_root = None
+
+    @property
+    def stats(self):
+        return self.mcts.stats
+
+    def improve(self, game):
+        if self.deadline is not None:
+            yield self.quick_move(game)
+        root = self.mcts.search(game, deadline=self.stop_time())
+        self.last_root = root
+        if root.children:
+            yield root.best_child().move
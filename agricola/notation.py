@@ -0,0 +1,268 @@
+""" Compact text notation of positions.
+
+Like the FEN notation of chess positions, a position of a game is written as
+a short line of text, which can be stored in logs and test fixtures, compared
+and used as a dictionary key, and turned back into a game. The notation of
+a position at a decision of a player is made of space-separated fields:
+
+``round:first:current``
+    the round, the starting player of the round and the player to move,
+``turns``
+    the number of people each player still has to place this round,
+    separated by commas,
+``schedule``
+    for each stage, the order in which its actions are revealed, as indices
+    into the alphabetical list of the actions of the stage (one base 36
+    digit each), with stages separated by dots,
+``actions``
+    for each action in play, in order, the player who took it this round
+    (one base 36 digit, or ``-``) followed by the goods on it if it is an
+    accumulation space (separated by colons, in alphabetical order of goods),
+    separated by commas,
+
+followed by one field per player, made of slash-separated parts:
+
+``house``
+    the material of the house: ``w``, ``c`` or ``s``,
+``rooms``, ``stables``
+    hexadecimal masks of the spaces of the farmyard they cover, with space
+    ``(i, j)`` at bit ``i * columns + j``,
+``fields``
+    the fields in the order in which they were plowed (which decides the
+    fields that are sown first), each as the number ``i * columns + j`` of
+    its space (one base 36 digit) followed by ``-`` if it is empty or by
+    ``g`` or ``v`` and the number of grain or vegetables on it (one digit),
+``pastures``
+    the masks of the pastures, separated by commas,
+``goods``
+    the amounts of ``evaluate.RESOURCES``, separated by commas,
+``family``
+    people, people still to be born, fences and stables left,
+``hand``, ``played``
+    the ids of the cards in hand and of the cards played, separated by commas,
+``futures``
+    goods promised for future rounds, as ``round.good.amount``, separated
+    by commas.
+
+Cards are identified by their ids in ``cards.catalogue``, which are the
+same for every game. The game itself (its actions, decks and number of
+players) is not part of the notation, and is supplied to ``parse`` as a new
+game of the same kind.
+
+``parse`` builds the position with ``scenario.build_scenario``, so played
+cards are put back into play with their lasting effects only, and then
+restores the state of the round.
+The internal state of played cards (e.g. uses remaining) is not part of
+the notation, so positions that differ only in it have the same notation.
+
+"""
+import re
+
+from agricola.action import Accumulating
+from agricola.cards import card_name
+from agricola.evaluate import RESOURCES
+from agricola.scenario import build_scenario
+
+_HOUSES = {'wood': 'w', 'clay': 'c', 'stone': 's'}
+_HOUSE_TYPES = {v: k for k, v in _HOUSES.items()}
+_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+_FIELD = re.compile(r'([0-9a-z])(-|[gv][0-9])')
+_KIND_OF_CROP = {'g': 'grain', 'v': 'veg'}
+
+
+def _mask(spaces, columns):
+    mask = 0
+    for i, j in spaces:
+        mask |= 1 << (i * columns + j)
+    return '{0:x}'.format(mask)
+
+
+def _spaces(mask, columns):
+    mask, spaces, bit = int(mask, 16), [], 0
+    while mask:
+        if mask & 1:
+            spaces.append(divmod(bit, columns))
+        mask >>= 1
+        bit += 1
+    return spaces
+
+
+def _ints(text):
+    return [int(v) for v in text.split(',')] if text else []
+
+
+def _player_field(player, columns):
+    fields = ''.join(
+        _DIGITS[f.space[0] * columns + f.space[1]] +
+        ('-' if not f.n_items else f.kind[0] + str(f.n_items))
+        for f in player._fields)
+    goods = [
+        player.resources[r] if r in player.resources else player.animals[r]
+        for r in RESOURCES]
+    hand = [c.id for kind in sorted(player.hand) for c in player.hand[kind]]
+    played = [
+        c.id for kind in ('occupations', 'minor_improvements', 'major_improvements')
+        for c in getattr(player, kind)]
+    futures = [
+        '{0}.{1}.{2}'.format(r, good, amount)
+        for r, d in sorted(player.futures.items())
+        for good, amount in sorted(d.items()) if amount]
+    return '/'.join([
+        _HOUSES[player.house_type],
+        _mask([r.space for r in player._rooms], columns),
+        fields,
+        ','.join(_mask(p.spaces, columns) for p in player._pastures),
+        _mask([s.space for s in player._stables], columns),
+        ','.join(str(g) for g in goods),
+        '{0},{1},{2},{3}'.format(
+            player.people, player.people_avail, player.fences_avail, player.stables_avail),
+        ','.join(str(i) for i in hand),
+        ','.join(str(i) for i in played),
+        ','.join(futures)])
+
+
+def serialize(game):
+    """ Notation of ``game``, which must be at a decision of a player. """
+    if game.game_over or game.current_player_idx is None:
+        raise ValueError("Only positions at a decision have a notation.")
+    columns = game.players[0].shape[1]
+
+    schedule = []
+    for stage_idx, stage in enumerate(game.actions[1:], 1):
+        names = sorted(a.name for a in stage)
+        digits = []
+        for s, action in game.round_schedule:
+            if s == stage_idx:
+                k = names.index(action.name)
+                while k in digits:
+                    k += 1
+                digits.append(k)
+        schedule.append(''.join(_DIGITS[k] for k in digits))
+
+    actions = []
+    for action in game.active_actions:
+        taker = game.actions_taken.get(action)
+        token = '-' if taker is None else _DIGITS[taker]
+        if isinstance(action, Accumulating):
+            token += ':'.join(str(action.resources[r]) for r in sorted(action.acc_amount))
+        actions.append(token)
+
+    fields = [
+        '{0}:{1}:{2}'.format(game.round_idx, game.first_player_idx, game.current_player_idx),
+        ','.join(str(t) for t in game.player_turns),
+        '.'.join(schedule),
+        ','.join(actions)]
+    fields.extend(_player_field(p, columns) for p in game.players)
+    return ' '.join(fields)
+
+
+def _player_spec(text, cards, columns):
+    """ Keyword arguments of ``scenario.build_scenario`` for a player, and the goods, family and futures. """
+    parts = text.split('/')
+    if len(parts) != 10:
+        raise ValueError("Player {0!r} does not have 10 parts.".format(text))
+    (house, rooms, fields, pastures, stables, goods, family, hand, played,
+     futures) = parts
+
+    tokens = _FIELD.findall(fields)
+    if ''.join(c + t for c, t in tokens) != fields:
+        raise ValueError("Invalid fields {0!r}.".format(fields))
+    fields = [divmod(_DIGITS.index(c), columns) for c, _ in tokens]
+    goods = dict(zip(RESOURCES, _ints(goods)))
+    people, people_avail, fences_avail, stables_avail = _ints(family)
+
+    hand_cards = dict(occupations=[], minor_improvements=[])
+    for card in _cards(hand, cards):
+        hand_cards[_kind(card)].append(card)
+    played_cards = dict(occupations=[], minor_improvements=[], major_improvements=[])
+    for card in _cards(played, cards):
+        played_cards[_kind(card)].append(card)
+
+    spec = dict(
+        house_type=_HOUSE_TYPES[house], rooms=_spaces(rooms, columns), fields=fields,
+        sown={
+            f: (_KIND_OF_CROP[t[0]], int(t[1:]))
+            for f, (_, t) in zip(fields, tokens) if t != '-'},
+        pastures=[_spaces(p, columns) for p in pastures.split(',') if p],
+        stables=_spaces(stables, columns), people=people, people_avail=people_avail,
+        fences_avail=fences_avail, stables_avail=stables_avail, hand=hand_cards,
+        **played_cards)
+
+    promised = {}
+    for token in futures.split(',') if futures else []:
+        r, good, amount = token.split('.')
+        promised[int(r), good] = int(amount)
+    return spec, goods, promised
+
+
+def _cards(ids, cards):
+    """ Cards of the game with the comma-separated ``ids``, from ``cards``, a dict keyed by name. """
+    try:
+        return [cards[card_name(i)] for i in _ints(ids)]
+    except (IndexError, KeyError):
+        raise ValueError("Cards {0!r} are not all in the game.".format(ids))
+
+
+def _kind(card):
+    return {
+        'Occupation': 'occupations', 'Minor Improvement': 'minor_improvements',
+        'Major Improvement': 'major_improvements'}[card.card_type]
+
+
+def parse(text, game):
+    """ Set up ``game``, a new game of the kind of the notation ``text``, in the position of ``text``.
+
+    Returns the game. Raises ValueError if ``text`` is not a valid notation
+    for the game.
+
+    """
+    fields = text.split()
+    if len(fields) != 4 + game.n_players:
+        raise ValueError("Expected {0} fields for a {1} player game, got {2}.".format(
+            4 + game.n_players, game.n_players, len(fields)))
+    clock, turns, schedule, actions = fields[:4]
+    round_idx, first_player, current_player = _ints(clock.replace(':', ','))
+
+    stages = schedule.split('.')
+    if len(stages) != len(game.actions) - 1:
+        raise ValueError("Expected {0} stages, got {1}.".format(
+            len(game.actions) - 1, len(stages)))
+    order = []
+    for stage, digits in zip(game.actions[1:], stages):
+        names = sorted(a.name for a in stage)
+        order.extend(names[_DIGITS.index(d)] for d in digits)
+
+    pools = {c.name: c for c in game.major_improvements}
+    for deck in (game.occupations, game.minor_improvements):
+        if deck is not None:
+            pools.update((c.name, c) for c in deck.cards)
+    initial = game.initial_players
+    columns = (initial[0] if isinstance(initial, list) else initial).shape[1]
+    players = [_player_spec(f, pools, columns) for f in fields[4:]]
+
+    game = build_scenario(
+        game, round_idx, [spec for spec, _, _ in players], first_player, order)
+
+    actions = actions.split(',')
+    if len(actions) != len(game.active_actions):
+        raise ValueError("Expected {0} actions, got {1}.".format(
+            len(game.active_actions), len(actions)))
+    game.actions_taken = {}
+    for action, token in zip(game.active_actions, actions):
+        if token[0] != '-':
+            game.actions_taken[action] = _DIGITS.index(token[0])
+        if isinstance(action, Accumulating):
+            amounts = _ints(token[1:].replace(':', ','))
+            action.resources.update(zip(sorted(action.acc_amount), amounts))
+    game.actions_remaining = [a for a in game.active_actions if a not in game.actions_taken]
+    game.player_turns = _ints(turns)
+    game.current_player_idx = current_player
+
+    # The goods are set last, as animals may be waiting to be accommodated.
+    for player, (_, goods, futures) in zip(game.players, players):
+        for good, amount in goods.items():
+            setattr(player, good, amount)
+        player.futures.clear()
+        for (r, good), amount in futures.items():
+            player.futures[r][good] = amount
+    return game
@@ -0,0 +1,236 @@
+""" Fixed-layout numeric observations of positions, for training agents.
+
+An ObservationEncoder is built once from a game that has been set up, and
+fixes the layout of the observations of every position of games with the
+same players, farm size, actions and cards. Each observation is a flat row of
+numbers made of the following blocks, whose offsets and shapes are given by
+``ObservationEncoder.layout`` (and views of which are returned by ``view``):
+
+``farm``
+    (n_players, len(FARM_PLANES), rows, columns) planes of each player's
+    farmyard: rooms, fields, grain and vegetables sown in each field,
+    pastures and stables.
+``player``
+    (n_players, len(PLAYER_FEATURES)) resources, animals, people, fences and
+    stables left, house material, people still to place this round and the
+    number of cards of each kind in hand.
+``hand``, ``played``
+    (n_players, n_cards) bits of the cards in each player's hand and of the
+    cards they have played, over all the cards that the game can deal. Hands
+    hidden by a ``view.GameView`` are left blank.
+``supply``
+    (n_cards,) bits of the major improvements still available.
+``actions``
+    (n_actions, 2 + n_players + len(RESOURCES)) for each action of the game:
+    whether it has been revealed, whether it can still be taken this round,
+    which player took it, and the goods accumulated on it.
+``round``
+    One-hot round (with a last entry for a finished game) followed by a
+    one-hot stage.
+
+Players are ordered starting from the player whose point of view is
+encoded, which defaults to the observer of a ``view.GameView`` and to the
+player to move otherwise. Encoding the GameView of a player, rather than the
+game itself, leaves out what that player cannot see.
+
+``encode`` writes an observation into row ``i`` of a caller-supplied buffer
+and ``encode_batch`` fills the first rows of a buffer from a batch of games;
+neither allocates arrays, so a buffer can be reused for every step of
+training.
+
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from agricola.evaluate import RESOURCES
+
+FARM_PLANES = ['room', 'field', 'sown_grain', 'sown_veg', 'pasture', 'stable']
+
+PLAYER_FEATURES = RESOURCES + [
+    'people', 'people_avail', 'fences_avail', 'stables_avail',
+    'house_wood', 'house_clay', 'house_stone', 'turns_left',
+    'hand_occupations', 'hand_minor_improvements']
+
+_PLANE = {name: i for i, name in enumerate(FARM_PLANES)}
+_PLAYER = {name: i for i, name in enumerate(PLAYER_FEATURES)}
+_RESOURCE = {name: i for i, name in enumerate(RESOURCES)}
+
+
+def _unique(names):
+    return list(OrderedDict.fromkeys(names))
+
+
+class ObservationEncoder(object):
+    """ Encoder of the positions of games like ``game``.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+        A game that has been set up (see ``game.setup_game``). Its players,
+        farm size, actions and card pools determine the layout.
+
+    """
+    def __init__(self, game):
+        self.n_players = game.n_players
+        self.shape = tuple(game.players[0].shape)
+        self.action_names = _unique(a.name for stage in game.actions for a in stage)
+        self.n_stages = len(game.actions) - 1
+        self.n_rounds = len(game.round_schedule)
+
+        cards = []
+        for deck in (game.occupations, game.minor_improvements):
+            if deck is not None:
+                cards.extend(deck.cards)
+        cards.extend(game.major_improvements)
+        for player in game.players:
+            for kind in ('occupations', 'minor_improvements', 'major_improvements'):
+                cards.extend(getattr(player, kind))
+        self.card_names = _unique(c.name for c in cards)
+
+        self._actions = {name: i for i, name in enumerate(self.action_names)}
+        self._cards = {name: i for i, name in enumerate(self.card_names)}
+
+        n_cards, n = len(self.card_names), self.n_players
+        blocks = [
+            ('farm', (n, len(FARM_PLANES)) + self.shape),
+            ('player', (n, len(PLAYER_FEATURES))),
+            ('hand', (n, n_cards)),
+            ('played', (n, n_cards)),
+            ('supply', (n_cards,)),
+            ('actions', (len(self.action_names), 2 + n + len(RESOURCES))),
+            ('round', (self.n_rounds + 1 + self.n_stages,)),
+        ]
+        self.layout = OrderedDict()
+        offset = 0
+        for name, shape in blocks:
+            self.layout[name] = (offset, shape)
+            offset += int(np.prod(shape))
+        self.size = offset
+
+    def empty(self, n_rows, dtype=np.float32):
+        """ Zeroed buffer for ``n_rows`` observations. """
+        return np.zeros((n_rows, self.size), dtype=dtype)
+
+    def view(self, row, name):
+        """ View of block ``name`` of the observation ``row``, with the shape of the block. """
+        offset, shape = self.layout[name]
+        return row[offset:offset + int(np.prod(shape))].reshape(shape)
+
+    def _card(self, card):
+        try:
+            return self._cards[card.name]
+        except KeyError:
+            raise ValueError("Card {0} is not one of the cards of the encoder.".format(card.name))
+
+    def encode(self, game, out, i=0, player_idx=None):
+        """ Write the observation of ``game`` into row ``i`` of ``out``.
+
+        Parameters
+        ----------
+        game: AgricolaGame
+        out: array of shape (n_rows, size)
+        i: int
+            Row to write.
+        player_idx: int (optional)
+            Player from whose point of view the position is encoded, who comes
+            first in the per-player blocks. Defaults to the observer of a
+            GameView and to the player to move otherwise.
+
+        Returns
+        -------
+        The row.
+
+        """
+        if game.n_players != self.n_players:
+            raise ValueError(
+                "Encoder is for games with {0} players, got {1}.".format(
+                    self.n_players, game.n_players))
+        if player_idx is None:
+            player_idx = getattr(game, 'observer_idx', None)
+        if player_idx is None:
+            player_idx = game.current_player_idx
+        n = self.n_players
+        row = out[i]
+        row[:] = 0
+
+        farm, features = self.view(row, 'farm'), self.view(row, 'player')
+        hand, played = self.view(row, 'hand'), self.view(row, 'played')
+        turns = getattr(game, 'player_turns', None)
+        for k in range(n):
+            p = (player_idx + k) % n
+            player = game.players[p]
+
+            planes = farm[k]
+            for room in player._rooms:
+                planes[(_PLANE['room'],) + room.space] = 1
+            for field in player._fields:
+                planes[(_PLANE['field'],) + field.space] = 1
+                if field.kind == 'grain':
+                    planes[(_PLANE['sown_grain'],) + field.space] = field.n_items
+                elif field.kind == 'veg':
+                    planes[(_PLANE['sown_veg'],) + field.space] = field.n_items
+            for pasture in player._pastures:
+                for space in pasture.spaces:
+                    planes[(_PLANE['pasture'],) + space] = 1
+            for stable in player._stables:
+                planes[(_PLANE['stable'],) + stable.space] = 1
+
+            f = features[k]
+            for r, j in _RESOURCE.items():
+                f[j] = player.resources[r] if r in player.resources else player.animals[r]
+            f[_PLAYER['people']] = player.people
+            f[_PLAYER['people_avail']] = player.people_avail
+            f[_PLAYER['fences_avail']] = player.fences_avail
+            f[_PLAYER['stables_avail']] = player.stables_avail
+            f[_PLAYER['house_' + player.house_type]] = 1
+            if turns is not None:
+                f[_PLAYER['turns_left']] = turns[p]
+
+            for kind, cards in player.hand.items():
+                f[_PLAYER['hand_' + kind]] = len(cards)
+                for card in cards:
+                    hand[k, self._card(card)] = 1
+            for kind in ('occupations', 'minor_improvements', 'major_improvements'):
+                for card in getattr(player, kind):
+                    played[k, self._card(card)] = 1
+
+        supply = self.view(row, 'supply')
+        for card in game.major_improvements:
+            supply[self._card(card)] = 1
+
+        actions = self.view(row, 'actions')
+        remaining = getattr(game, 'actions_remaining', ())
+        taken = getattr(game, 'actions_taken', {})
+        for action in getattr(game, 'active_actions', ()):
+            a = actions[self._actions[action.name]]
+            a[0] = 1
+            if action in remaining:
+                a[1] = 1
+            taker = taken.get(action)
+            if taker is not None:
+                a[2 + (taker - player_idx) % n] = 1
+            for r, amount in getattr(action, 'resources', {}).items():
+                a[2 + n + _RESOURCE[r]] += amount
+
+        timing = self.view(row, 'round')
+        timing[min(game.round_idx, self.n_rounds + 1) - 1] = 1
+        if not game.game_over:
+            stage_idx = game.round_schedule[game.round_idx - 1][0]
+            timing[self.n_rounds + stage_idx] = 1
+        return row
+
+    def encode_batch(self, games, out, player_idxs=None):
+        """ Write the observations of ``games`` into the first rows of ``out``.
+
+        ``player_idxs`` optionally gives the point of view of each game (see
+        ``encode``). Returns the rows written.
+
+        """
+        n_games = 0
+        for i, game in enumerate(games):
+            if i == out.shape[0]:
+                raise ValueError("Buffer has only {0} rows.".format(out.shape[0]))
+            self.encode(game, out, i, None if player_idxs is None else player_idxs[i])
+            n_games = i + 1
+        return out[:n_games]
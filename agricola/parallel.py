@@ -0,0 +1,306 @@
+""" Monte Carlo Tree Search using several processes.
+
+Two schemes are provided.
+
+Root parallelism: every worker process builds its own tree from the same
+position with its own random seed, and the visit counts and rewards of the
+moves at the roots of the trees are summed. Workers never communicate during
+the search, so this scales almost perfectly, at the cost of each tree being
+as shallow as a single-process tree.
+
+Tree parallelism: a single tree is kept in the main process, which performs
+selection and expansion and hands the newly expanded positions to the worker
+processes to be played out. Several rollouts are kept in flight at once, and
+virtual loss (visits without reward, added to a path when it is selected and
+removed when its rollout returns) steers concurrent selections down
+different paths. This builds one deeper tree, but the main process can
+become the bottleneck when rollouts are cheap compared to expansion.
+
+Positions are sent to the workers pickled, so the games being searched must
+be picklable (search copies made by ``search.search_copy`` are).
+
+"""
+import math
+import multiprocessing
+import time
+
+import numpy as np
+
+from agricola.mcts import MCTS, MCTSNode, MCTSStats
+from agricola.search import AnytimeAgent, search_copy
+
+
+_worker_mcts = None
+
+
+def _init_worker(mcts, base_seed):
+    global _worker_mcts
+    _worker_mcts = mcts
+    # Each worker needs its own random stream.
+    identity = multiprocessing.current_process()._identity
+    seed = (base_seed + (identity[0] if identity else 0)) % (2**32)
+    mcts.rng.seed(seed)
+    policy_rng = getattr(mcts.rollout_policy, 'rng', None)
+    if policy_rng is not None and policy_rng is not mcts.rng:
+        policy_rng.seed(seed + 1)
+
+
+def _worker_search(args):
+    game, n_simulations, time_budget = args
+    mcts = _worker_mcts
+    mcts.n_simulations = n_simulations
+    mcts.time_budget = time_budget
+    root = mcts.search(game)
+    summary = [(c.move, c.visits, c.total) for c in root.children]
+    return summary, mcts.stats.nodes
+
+
+def _worker_rollout(game):
+    return _worker_mcts.rollout(game)
+
+
+class RootStatistics(object):
+    """ Visit counts and total rewards of the moves available at the root of a search.
+
+    Attributes
+    ----------
+    visits: dict
+        Maps each Move to its number of visits.
+    total: dict
+        Maps each Move to the array of total rewards of each player.
+
+    """
+    def __init__(self):
+        self.visits = {}
+        self.total = {}
+
+    def add(self, move, visits, total):
+        self.visits[move] = self.visits.get(move, 0) + visits
+        self.total[move] = self.total.get(move, 0) + np.asarray(total)
+
+    def best_move(self):
+        """ Most visited move, or None if no moves were visited. """
+        if not self.visits:
+            return None
+        return max(self.visits, key=lambda m: self.visits[m])
+
+    @classmethod
+    def from_node(cls, node):
+        statistics = cls()
+        for child in node.children:
+            statistics.add(child.move, child.visits, child.total)
+        return statistics
+
+
+class ParallelMCTS(object):
+    """ MCTS spread over a pool of worker processes.
+
+    Parameters
+    ----------
+    n_workers: int > 0
+        Number of worker processes.
+    mode: str
+        Either 'root' or 'tree'.
+    n_simulations: int (optional)
+        Total number of simulations per search, over all workers.
+    time_budget: float (optional)
+        Wall-clock budget per search in seconds.
+    virtual_loss: int
+        Virtual loss applied per in-flight rollout in tree mode.
+    in_flight: int (optional)
+        Maximum number of rollouts in flight at once in tree mode. Defaults to
+        twice the number of workers.
+    seed: int (optional)
+        Base seed; each worker derives its own seed from it.
+    **mcts_kwargs
+        Other arguments for the MCTS instances (``c``, ``rollout_policy``,
+        ``reward``, ``max_list_length``, ``table``, ``move_generator``). In
+        root mode each worker gets its own copy of ``table``.
+
+    """
+    def __init__(
+            self, n_workers=None, mode='root', n_simulations=None, time_budget=None,
+            virtual_loss=1, in_flight=None, seed=None, **mcts_kwargs):
+        if mode not in ('root', 'tree'):
+            raise ValueError("Unknown parallel MCTS mode: {0}.".format(mode))
+        if n_simulations is None and time_budget is None:
+            n_simulations = 1000
+
+        self.n_workers = n_workers or multiprocessing.cpu_count()
+        self.mode = mode
+        self.n_simulations = n_simulations
+        self.time_budget = time_budget
+        self.virtual_loss = virtual_loss
+        self.in_flight = in_flight or 2 * self.n_workers
+        self.seed = np.random.randint(2**31) if seed is None else seed
+        self.mcts = MCTS(seed=self.seed, **mcts_kwargs)
+        self.stats = MCTSStats()
+        self.last_root = None
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(
+                self.n_workers, initializer=_init_worker, initargs=(self.mcts, self.seed))
+        return self._pool
+
+    def close(self):
+        """ Shut down the worker processes. """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def search(self, game, deadline=None):
+        """ Search from ``game``, returning RootStatistics.
+
+        If a ``deadline`` (a ``time.perf_counter()`` time) is given, the
+        search also stops when it is reached.
+
+        """
+        game = search_copy(game)
+        self.stats = MCTSStats()
+        start = time.perf_counter()
+
+        time_budget = self.time_budget
+        if deadline is not None:
+            time_left = max(deadline - start, 0.0)
+            time_budget = time_left if time_budget is None else min(time_budget, time_left)
+
+        if self.mode == 'root':
+            statistics = self._root_search(game, time_budget)
+        else:
+            statistics = self._tree_search(game, time_budget)
+
+        self.stats.elapsed = time.perf_counter() - start
+        return statistics
+
+    def _root_search(self, game, time_budget):
+        n_simulations = None
+        if self.n_simulations is not None:
+            n_simulations = int(math.ceil(self.n_simulations / float(self.n_workers)))
+
+        jobs = [(game, n_simulations, time_budget)] * self.n_workers
+        statistics = RootStatistics()
+        for summary, n in self.pool.map(_worker_search, jobs):
+            for move, visits, total in summary:
+                statistics.add(move, visits, total)
+            self.stats.nodes += n
+        return statistics
+
+    def _tree_search(self, game, time_budget):
+        mcts = self.mcts
+        root = self.last_root = MCTSNode(game)
+        deadline = None if time_budget is None else time.perf_counter() + time_budget
+        pending = []
+        started = 0
+
+        def budget_left():
+            if self.n_simulations is not None and started >= self.n_simulations:
+                return False
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            return True
+
+        while True:
+            while len(pending) < self.in_flight and budget_left():
+                leaf = mcts.select_leaf(root, self.virtual_loss)
+                pending.append((leaf, self.pool.apply_async(_worker_rollout, (leaf.game,))))
+                started += 1
+
+            if not pending:
+                break
+
+            # Wait for the oldest rollout, then collect any others that have finished.
+            pending[0][1].wait()
+            still_pending = []
+            for leaf, result in pending:
+                if result.ready():
+                    scores = result.get()
+                    mcts.backpropagate(leaf, mcts.reward(scores), self.virtual_loss)
+                    self.stats.nodes += 1
+                else:
+                    still_pending.append((leaf, result))
+            pending = still_pending
+
+        return RootStatistics.from_node(root)
+
+
+class ParallelMCTSAgent(AnytimeAgent):
+    """ Agent choosing the most visited move of a ParallelMCTS search.
+
+    Parameters are as for ParallelMCTS. When decisions are timed, the search
+    also stops at the agent's deadline (see AnytimeAgent). Call ``close``
+    when done with the agent to shut down its worker processes.
+
+    """
+    def __init__(self, n_workers=None, mode='root', max_list_length=1, **kwargs):
+        super(ParallelMCTSAgent, self).__init__(max_list_length)
+        self.mcts = ParallelMCTS(
+            n_workers, mode, max_list_length=max_list_length, **kwargs)
+
+    @property
+    def stats(self):
+        return self.mcts.stats
+
+    def improve(self, game):
+        if self.deadline is not None:
+            yield self.quick_move(game)
+        move = self.mcts.search(game, deadline=self.stop_time()).best_move()
+        if move is not None:
+            yield move
+
+    def close(self):
+        self.mcts.close()
+
+
+def scaling_benchmark(game, worker_counts=(1, 2, 4, 8), mode='root', time_budget=10.0, **kwargs):
+    """ Measure simulations per second of ParallelMCTS for different numbers of workers.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+        Position to search from.
+    worker_counts: list of int
+        Numbers of workers to try.
+    mode: str
+        Either 'root' or 'tree'.
+    time_budget: float
+        Length of each search in seconds.
+    **kwargs
+        Other arguments for ParallelMCTS.
+
+    Returns
+    -------
+    List of (n_workers, simulations per second) pairs.
+
+    """
+    results = []
+    for n_workers in worker_counts:
+        with ParallelMCTS(n_workers, mode, time_budget=time_budget, **kwargs) as search:
+            # Start the workers before timing.
+            search.pool
+            search.search(game)
+            results.append((n_workers, search.stats.simulations_per_sec))
+    return results
+
+
+if __name__ == "__main__":
+    from agricola.game import StandardAgricolaGame, setup_game, advance
+
+    game = StandardAgricolaGame(2)
+    game.ui = None
+    setup_game(game)
+    advance(game)
+
+    for mode in ['root', 'tree']:
+        print("Mode: {0}".format(mode))
+        for n_workers, rate in scaling_benchmark(game, mode=mode):
+            print("    {0} workers: {1:.1f} simulations/sec".format(n_workers, rate))
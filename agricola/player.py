@@ -3,6 +3,7 @@ import itertools
 from collections import OrderedDict, Counter, defaultdict
 from future.utils import with_metaclass
 from copy import deepcopy
+from functools import partial
 from pprint import pformat
 
 import numpy as np
@@ -11,9 +12,10 @@ import networkx as nx
 from agricola.utils import (
     EventGenerator, EventScope, multiset_satisfy, draw_grid,
     index_check, orthog_adjacent, score_mapping)
+from agricola.cards import CardSet
 from agricola import (
     AgricolaException, AgricolaNotEnoughResources, AgricolaLogicError,
-    AgricolaPoorlyFormed, AgricolaImpossible)
+    AgricolaPoorlyFormed, AgricolaImpossible, AgricolaInvalidChoice)
 
 
 class SpatialObject(with_metaclass(abc.ABCMeta, object)):
@@ -126,7 +128,9 @@ class Field(SingleSpaceObject):
 
 
 class Room(SingleSpaceObject):
-    pass
+    def __deepcopy__(self, memo):
+        # Rooms never change once built, so copies of a farmyard can share them.
+        return self
 
 
 class AnimalContainer(object):
@@ -136,12 +140,18 @@ class AnimalContainer(object):
 
 
 class Stable(SingleSpaceObject, AnimalContainer):
+    def __deepcopy__(self, memo):
+        # Stables never change once built, so copies of a farmyard can share them.
+        return self
+
     def capacity(self):
         return 1
 
 
 class Pasture(SpatialObject, AnimalContainer):
     def __init__(self, spaces):
+        if not len(spaces):
+            raise AgricolaPoorlyFormed("A pasture must contain at least one space.")
         if isinstance(spaces[0], int):
             spaces = [spaces]
         self._spaces = spaces = list(set(spaces))
@@ -187,8 +197,12 @@ class Pasture(SpatialObject, AnimalContainer):
         self.n_stables += n
 
     def capacity(self):
-        return self.n_spaces * 2**(self.n_stables+1)
+        return self.size * 2**(self.n_stables+1)
+
 
+# For each kind of spatial object, the kinds of object it is
+# allowed to share a space with.
+PLACEMENT_OMIT = dict(room=[], field=[], stable=['pasture'], pasture=['stable'])
 
 RESOURCE_TYPES = ('food wood clay stone reed sheep boar cattle grain veg '
                   'pastures fences fences_avail stables fenced_stables free_stables stables_avail '
@@ -348,17 +362,22 @@ class Player(EventGenerator):
         fields = fields or []
         self._fields = fields = [Field(f) for f in fields]
 
-        # Played cards
-        self.occupations = occupations or []
-        self.minor_improvements = minor_improvements or []
-        self.major_improvements = major_improvements or []
-        self.played_cards = {
-            attr: getattr(self, attr)
-            for attr in ['occupations', 'minor_improvements', 'major_improvements']}
+        # Played cards. Tuples, so that they are only changed by the methods
+        # that keep ``played_set`` up to date.
+        self.occupations = tuple(occupations or ())
+        self.minor_improvements = tuple(minor_improvements or ())
+        self.major_improvements = tuple(major_improvements or ())
 
-        # Hand cards
+        # Hand cards, likewise tuples (see ``hand_set``).
         hand = hand or {'minor_improvements': [], 'occupations': []}
-        self.hand = deepcopy(hand)
+        self.hand = {kind: tuple(cards) for kind, cards in deepcopy(hand).items()}
+
+        # Kept up to date as cards are dealt and played (see ``hand_set``).
+        # Played cards given as None only count towards the number played.
+        self._hand_set = CardSet(c for cards in self.hand.values() for c in cards)
+        self._played_set = CardSet(c for c in itertools.chain(
+            self.occupations, self.minor_improvements, self.major_improvements)
+            if c is not None)
 
         self.house_progression = dict(wood=['clay'], clay=['stone'], stone=[])
         self.room_cost = 5
@@ -371,6 +390,7 @@ class Player(EventGenerator):
         self.harvest_rates = dict(wood=[], clay=[], reed=[])
 
         self.occupied = OrderedDict()
+        self._placement_masks = {}
 
         self._check_spatial_objects(self._rooms, 'room')
         Room.check_connected_group(self._rooms)
@@ -388,12 +408,25 @@ class Player(EventGenerator):
         self.occupied['field'] = self._fields
 
         # round_idx -> dictionary of resources
-        self.futures = defaultdict(lambda: defaultdict(int))
+        self.futures = defaultdict(partial(defaultdict, int))
 
         self.pasture_capacity_modifier = 0
+        self.room_for_people = 0
 
         self.game = None
 
+    def __deepcopy__(self, memo):
+        # Cached placement masks are never modified in place, so they can be shared.
+        result = self.__class__.__new__(self.__class__)
+        memo[id(self)] = result
+        for key, value in self.__dict__.items():
+            if key == '_placement_masks':
+                value = dict(value)
+            else:
+                value = deepcopy(value, memo)
+            result.__dict__[key] = value
+        return result
+
     def _validate_event_name(self, event_name):
         return event_name in [
             'start_round',
@@ -406,8 +439,9 @@ class Player(EventGenerator):
             'renovation',
             'build_room',
             'build_pasture',
-            'build_stable'
+            'build_stable',
             'plow_field',
+            'bake_bread',
             'birth',
             'occupation',
             'minor_improvement',
@@ -428,8 +462,59 @@ class Player(EventGenerator):
 
         return self.__getattribute__(key)
 
+    def __setattr__(self, key, value):
+        # Keep resources and animals in their dictionaries rather than
+        # shadowing them with instance attributes.
+        for d in ["resources", "animals"]:
+            if key in self.__dict__.get(d, ()):
+                self.__dict__[d][key] = value
+                return
+
+        super(Player, self).__setattr__(key, value)
+
     def give_cards(self, attr, cards):
-        self.hand[attr].extend(cards)
+        cards = tuple(cards)
+        self.hand[attr] += cards
+        self._hand_set = self._hand_set | CardSet(cards)
+
+    def set_hand(self, attr, cards):
+        """ Replace the cards of kind ``attr`` in the player's hand by ``cards``. """
+        self.hand[attr] = tuple(cards)
+        self._hand_set = CardSet(c for cards in self.hand.values() for c in cards)
+
+    def _remove_from_hand(self, attr, card):
+        cards = list(self.hand[attr])
+        cards.remove(card)
+        self.hand[attr] = tuple(cards)
+        self._hand_set = self._hand_set - CardSet([card])
+
+    def add_played_card(self, attr, card):
+        """ Add ``card`` to the played cards of kind ``attr``, without playing it. """
+        setattr(self, attr, getattr(self, attr) + (card,))
+        self._played_set = self._played_set | CardSet([card])
+
+    @property
+    def played_cards(self):
+        return {
+            attr: getattr(self, attr)
+            for attr in ['occupations', 'minor_improvements', 'major_improvements']}
+
+    @property
+    def hand_set(self):
+        """ CardSet of the cards in the player's hand.
+
+        Maintained by the methods that deal and play cards (``give_cards``,
+        ``set_hand`` and the ``play_*`` methods), rather than rebuilt from
+        ``hand``, whose cards are held in tuples so that they can only be
+        changed through these methods.
+
+        """
+        return self._hand_set
+
+    @property
+    def played_set(self):
+        """ CardSet of the occupations and improvements the player has played (see ``hand_set``). """
+        return self._played_set
 
     @property
     def rooms(self):
@@ -450,12 +535,12 @@ class Player(EventGenerator):
     @property
     def fenced_stables(self):
         return len([s for s in self._stables
-                    if any(s in p for p in self.pastures)])
+                    if any(s.space in p for p in self._pastures)])
 
     @property
     def free_stables(self):
         return len([s for s in self._stables
-                    if not any(s in p for p in self.pastures)])
+                    if not any(s.space in p for p in self._pastures)])
 
     @property
     def fields(self):
@@ -504,6 +589,68 @@ class Player(EventGenerator):
                     empty_spaces.add((i, j))
         return empty_spaces
 
+    def placement_mask(self, kind):
+        """ Get the spaces where a single new object of a given kind can legally be placed.
+
+        Only the spatial rules are taken into account: the space must not hold an
+        object that the new object is not allowed to share a space with, and the
+        new object must be orthogonally adjacent to an existing object of the same
+        kind (if there are any, and adjacent to every connected group of them if
+        they are split into several). Whether the player can pay for the object is not
+        checked. Masks are cached until the farmyard changes.
+
+        Parameters
+        ----------
+        kind: str
+            One of 'room', 'field', 'stable', 'pasture'.
+
+        Returns
+        -------
+        Boolean numpy array with the same shape as the farmyard.
+
+        """
+        if kind not in PLACEMENT_OMIT:
+            raise AgricolaPoorlyFormed(
+                "{0} is not a kind of spatial object.".format(kind))
+
+        if kind not in self._placement_masks:
+            blocked = np.zeros(self.shape, dtype=bool)
+            for object_type, objects in self.occupied.items():
+                if object_type not in PLACEMENT_OMIT[kind]:
+                    for o in objects:
+                        for space in o.spaces:
+                            blocked[space] = True
+
+            # The new object has to connect every existing group of objects of the same kind.
+            mask = ~blocked
+            G = SpatialObject.orthog_graph(self.occupied[kind], require_connected=False)
+            for component in nx.connected_components(G):
+                group = np.zeros(self.shape, dtype=bool)
+                for space in component:
+                    group[space] = True
+
+                adjacent = np.zeros(self.shape, dtype=bool)
+                adjacent[1:, :] |= group[:-1, :]
+                adjacent[:-1, :] |= group[1:, :]
+                adjacent[:, 1:] |= group[:, :-1]
+                adjacent[:, :-1] |= group[:, 1:]
+                mask &= adjacent
+
+            self._placement_masks[kind] = mask
+
+        return self._placement_masks[kind].copy()
+
+    def legal_spaces(self, kind):
+        """ Get a sorted list of the spaces where a single new object of a given kind can be placed.
+
+        See ``placement_mask``.
+
+        """
+        return [tuple(int(i) for i in s) for s in np.argwhere(self.placement_mask(kind))]
+
+    def _farmyard_changed(self):
+        self._placement_masks = {}
+
     def __str__(self):
         s = ["<Player {} \n".format(self.name)]
         grid = np.tile('.', self.shape)
@@ -550,7 +697,7 @@ class Player(EventGenerator):
         score += score_mapping(self.boar, [1, 3, 5, 7], [-1, 1, 2, 3, 4])
         score += score_mapping(self.cattle, [1, 2, 4, 6], [-1, 1, 2, 3, 4])
 
-        score += max(self.fenced_stables, 4)
+        score += min(self.fenced_stables, 4)
         score -= len(self.empty_spaces)
 
         score += 3 * self.people
@@ -646,6 +793,10 @@ class Player(EventGenerator):
         state_change.check_and_apply(self)
 
     def build_rooms(self, spaces):
+        if spaces is None:
+            raise AgricolaInvalidChoice("No room location was chosen.")
+        if spaces and isinstance(spaces[0], int):
+            spaces = [spaces]
         rooms = [Room(s) for s in spaces]
 
         self._check_spatial_objects(rooms, 'room')
@@ -659,15 +810,17 @@ class Player(EventGenerator):
         state_change.check_and_apply(self)
 
         self._rooms.extend(rooms)
+        self._farmyard_changed()
 
     def valid_house_upgrades(self):
         return self.house_progression[self.house_type]
 
     def upgrade_house(self, material):
-        assert material in self.valid_house_upgrades(), (
-            "Cannot upgrade from {} to {}.".format(self.house_type, material))
+        if material not in self.valid_house_upgrades():
+            raise AgricolaInvalidChoice(
+                "Cannot upgrade from {} to {}.".format(self.house_type, material))
         description = "Upgrading house from {0} to {1}".format(self.house_type, material)
-        cost = {self.material_required: self.n_rooms, 'reed': 1}
+        cost = {material: self.rooms, 'reed': 1}
         state_change = PlayerStateChange(description, cost=cost)
         state_change.check_and_apply(self)
         self.house_type = material
@@ -686,6 +839,7 @@ class Player(EventGenerator):
         """
         if isinstance(pastures, Pasture):
             pastures = [pastures]
+        pastures = [p if isinstance(p, Pasture) else Pasture(p) for p in pastures]
         self._check_spatial_objects(pastures, 'pasture', omit=['stable'])
         Pasture.check_connected_group(self._pastures + pastures)
 
@@ -700,11 +854,14 @@ class Player(EventGenerator):
         state_change.check_and_apply(self)
 
         self._pastures.extend(pastures)
+        self._farmyard_changed()
         for p in pastures:
-            self.trigger_event('build_pasture', pasture=p)
+            self.trigger_event('build_pasture', player=self, pasture=p)
 
     def build_stables(self, spaces, unit_cost):
-        if isinstance(spaces, int):
+        if spaces is None:
+            raise AgricolaInvalidChoice("No stable location was chosen.")
+        if spaces and isinstance(spaces[0], int):
             spaces = [spaces]
         stables = [Stable(s) for s in spaces]
 
@@ -718,10 +875,11 @@ class Player(EventGenerator):
         state_change.check_and_apply(self)
 
         self._stables.extend(stables)
+        self._farmyard_changed()
 
     def _check_animal_capacity(self, animal_counts, n_added, name):
         animal_counts = sorted(animal_counts)
-        capacities = [1] * (self.n_free_stables + 1)
+        capacities = [1] * (self.free_stables + 1)
 
         pasture_capacities = [
             p.capacity() + self.pasture_capacity_modifier for p in self._pastures]
@@ -735,7 +893,9 @@ class Player(EventGenerator):
                 "has insufficient animal capacity.".format(n_added, name))
 
     def plow_fields(self, spaces):
-        if isinstance(spaces[0], int):
+        if spaces is None:
+            raise AgricolaInvalidChoice("No field location was chosen.")
+        if spaces and isinstance(spaces[0], int):
             spaces = [spaces]
         fields = [Field(s) for s in spaces]
 
@@ -743,6 +903,7 @@ class Player(EventGenerator):
         Field.check_connected_group(self._fields + fields)
 
         self._fields.extend(fields)
+        self._farmyard_changed()
 
     def sow(self, n_grain, n_veg):
         description = "Sowing {0} grain and {1} veg".format(n_grain, n_veg)
@@ -760,7 +921,7 @@ class Player(EventGenerator):
             next(empty_fields).plant_veg()
 
     def bake_bread(self, n):
-        if n > len(self.bread_rates-1) and self.bread_rates[-1] == 0:
+        if n > len(self.bread_rates) - 1 and self.bread_rates[-1] == 0:
             raise AgricolaPoorlyFormed()
         bread_rates = self.bread_rates[:-1][:n]
         n_left = max(n - len(bread_rates), 0)
@@ -793,18 +954,27 @@ class Player(EventGenerator):
         state_change.check_and_apply(self)
 
     def play_occupation(self, occupation, game):
-        occupation.check_and_apply(self)
+        if occupation not in self.hand['occupations']:
+            raise AgricolaInvalidChoice(
+                "{0} is not an occupation in the hand of player {1}.".format(occupation, self.name))
+        card = deepcopy(occupation)
+        card.check_and_apply(self)
 
-        self.hand['occupations'].remove(occupation)
-        self.occupations.append(occupation)
+        self._remove_from_hand('occupations', occupation)
+        self.add_played_card('occupations', card)
 
     def play_minor_improvement(self, improvement, game):
-        improvement.check_and_apply(self)
+        if improvement not in self.hand['minor_improvements']:
+            raise AgricolaInvalidChoice(
+                "{0} is not a minor improvement in the hand of player {1}.".format(improvement, self.name))
+        card = deepcopy(improvement)
+        card.check_and_apply(self)
 
-        self.hand['minor_improvements'].remove(improvement)
-        self.minor_improvements.append(improvement)
+        self._remove_from_hand('minor_improvements', improvement)
+        self.add_played_card('minor_improvements', card)
 
     def play_major_improvement(self, improvement, game):
-        improvement.check_and_apply(self)
+        card = deepcopy(improvement)
+        card.check_and_apply(self)
 
-        self.major_improvements.append(improvement)
+        self.add_played_card('major_improvements', card)
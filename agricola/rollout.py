@@ -0,0 +1,1110 @@
+""" Lightweight engine for random playouts of the family game.
+
+The full rules engine represents a game as a graph of Player, Action, Room,
+Pasture and Card objects, fires events through EventScopes and signals
+illegal moves with exceptions raised half-way through modifying the game,
+which is why every move is tried on a clone. That generality is wasted on
+random playouts, which only need to get from a position to final scores as
+quickly as possible.
+
+A RolloutGame holds the same position in a compact form: per player, a flat
+list of resource counts and bitmasks over the spaces (rooms, fields, stables,
+pastures) and fence segments of the farmyard, using the numbering of
+``fences.FencePlanner``; per game, the accumulated resources of each action
+space, a bitmask of the action spaces taken this round and the owner of each
+major improvement. Moves are checked in full before anything is modified, so
+a RolloutGame can be played on in place.
+
+The engine covers the actions of the family game (``get_actions(True, n)``
+and ``get_simple_actions``), the major improvements and ``Player.score``,
+reproducing the full engine exactly, including its quirks. Moves are the
+``search.Move`` objects used by the other search tools: the same move has the
+same meaning in a game and in the RolloutGame compiled from it, and
+``RolloutGame.candidate_moves`` generates the same candidates, in the same
+order, as ``search.candidate_moves``. ``fuzz`` checks this equivalence by
+playing random games through both engines.
+
+"""
+import itertools
+from collections import Counter
+
+import numpy as np
+
+from agricola import (
+    AgricolaException, AgricolaNotEnoughResources, AgricolaInvalidChoice,
+    AgricolaImpossible, AgricolaPoorlyFormed)
+from agricola.action import Accumulating, ResourceAcquisition, get_simple_actions
+from agricola.affordability import COST_RESOURCES
+from agricola.fences import get_fence_planner
+from agricola.game import AgricolaGame, StandardAgricolaGame, setup_game, advance
+from agricola.macro import connected_extensions
+from agricola.utils import multiset_satisfy, score_mapping
+from agricola.search import (
+    Move, RandomAgent, search_copy, apply_move, candidate_moves, successors)
+
+
+FOOD, WOOD, CLAY, STONE, REED, GRAIN, VEG, SHEEP, BOAR, CATTLE = range(10)
+N_RESOURCES = len(COST_RESOURCES)
+HOUSE_TYPES = ['wood', 'clay', 'stone']
+HOUSE_RESOURCES = [WOOD, CLAY, STONE]
+ANIMALS = [SHEEP, BOAR, CATTLE]
+
+# Kinds of action.
+(GAIN, ACCUMULATE, MEETING_PLACE, RESOURCE_MARKET, ANIMAL_MARKET,
+ WISH, MODEST_WISH, FARM_EXPANSION, HOUSE_REDEVELOPMENT, FARM_REDEVELOPMENT,
+ MAJOR_IMPROVEMENT, FENCING, LESSONS, FARMLAND, CULTIVATION,
+ GRAIN_UTILIZATION, SIDE_JOB) = range(17)
+
+_ACTION_KINDS = {
+    'MeetingPlaceFamily': MEETING_PLACE,
+    'ResourceMarket3P': RESOURCE_MARKET,
+    'AnimalMarket': ANIMAL_MARKET,
+    'BasicWishForChildren': WISH,
+    'UrgentWishForChildren': WISH,
+    'ModestWishForChildren': MODEST_WISH,
+    'FarmExpansion': FARM_EXPANSION,
+    'HouseRedevelopment': HOUSE_REDEVELOPMENT,
+    'FarmRedevelopment': FARM_REDEVELOPMENT,
+    'MajorImprovement': MAJOR_IMPROVEMENT,
+    'Fencing': FENCING,
+    'Lessons': LESSONS,
+    'Lessons3P': LESSONS,
+    'Lessons4P': LESSONS,
+    'Farmland': FARMLAND,
+    'Cultivation': CULTIVATION,
+    'GrainUtilization': GRAIN_UTILIZATION,
+    'SideJob': SIDE_JOB,
+}
+
+# Effects of the major improvements, by class name: (bread rate of unlimited
+# baking, oven bread rates, fixed victory points, resource for bonus points).
+_MAJOR_KINDS = {
+    'Fireplace': (2, [], 1, None),
+    'CookingHearth': (3, [], 1, None),
+    'Well': (0, [], 4, None),
+    'ClayOven': (0, [5], 2, None),
+    'StoneOven': (0, [4, 4], 3, None),
+    'Joinery': (0, [], 0, (WOOD, [3, 5, 7])),
+    'Pottery': (0, [], 0, (CLAY, [3, 5, 7])),
+    'BasketmakersWorkshop': (0, [], 0, (REED, [1, 3, 5])),
+}
+
+_LIST_TYPES = (list, tuple)
+
+
+def _action_spec(action):
+    """ (kind, resources) describing ``action``, where resources are (index, amount) pairs. """
+    name = action.__class__.__name__
+    if isinstance(action, Accumulating):
+        resources = [(COST_RESOURCES.index(r), a) for r, a in action.acc_amount.items()]
+        if name == 'MeetingPlaceFamily':
+            return MEETING_PLACE, resources
+        if type(action)._effect is not Accumulating._effect:
+            raise ValueError("RolloutGame does not support action {0}.".format(name))
+        return ACCUMULATE, resources
+
+    if name in _ACTION_KINDS:
+        return _ACTION_KINDS[name], []
+
+    if isinstance(action, ResourceAcquisition):
+        if type(action)._effect is not ResourceAcquisition._effect:
+            raise ValueError("RolloutGame does not support action {0}.".format(name))
+        return GAIN, [(COST_RESOURCES.index(r), a) for r, a in action.resources.items()]
+
+    raise ValueError("RolloutGame does not support action {0}.".format(name))
+
+
+class _Geometry(object):
+    """ Bit numbering of the spaces and fences of a farmyard shape. """
+    def __init__(self, shape):
+        self.shape = shape
+        self.planner = get_fence_planner(shape)
+        self.spaces = self.planner.spaces
+        self.space_bit = self.planner.space_bit
+        self.n_spaces = len(self.spaces)
+        self.full = (1 << self.n_spaces) - 1
+        self.connected = self.planner.connected.tolist()
+        self.connected[0] = True
+        self.perimeter = [self.planner.fence_mask_for([s]) for s in self.spaces]
+
+        self.neighbours = []
+        for s in self.spaces:
+            n = 0
+            for d in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+                other = (s[0] + d[0], s[1] + d[1])
+                if other in self.space_bit:
+                    n |= 1 << self.space_bit[other]
+            self.neighbours.append(n)
+
+
+_geometries = {}
+
+
+def _get_geometry(shape):
+    shape = tuple(shape)
+    if shape not in _geometries:
+        _geometries[shape] = _Geometry(shape)
+    return _geometries[shape]
+
+
+class _Board(object):
+    """ Data shared by every RolloutGame derived from the same game. """
+    def __init__(self, shape, names, kinds, resources, stages, n_base, majors):
+        geometry = _get_geometry(shape)
+        self.shape = geometry.shape
+        self.spaces = geometry.spaces
+        self.space_bit = geometry.space_bit
+        self.n_spaces = geometry.n_spaces
+        self.full = geometry.full
+        self.connected = geometry.connected
+        self.perimeter = geometry.perimeter
+        self.neighbours = geometry.neighbours
+
+        # Per action space: name, kind and (resource, amount) pairs.
+        self.names = names
+        self.kinds = kinds
+        self.resources = resources
+        # Stage of each round, and number of action spaces available from the start.
+        self.stages = stages
+        self.n_base = n_base
+
+        # Major improvements, as (name, cost vector, kind).
+        self.majors = majors
+
+    @staticmethod
+    def count(mask):
+        return bin(mask).count('1')
+
+    def bits(self, mask):
+        bits = []
+        while mask:
+            low = mask & -mask
+            bits.append(low.bit_length() - 1)
+            mask ^= low
+        return bits
+
+    def components(self, mask):
+        """ Masks of the connected groups of spaces in ``mask``. """
+        components = []
+        while mask:
+            seen = frontier = mask & -mask
+            while frontier:
+                low = frontier & -frontier
+                frontier ^= low
+                new = self.neighbours[low.bit_length() - 1] & mask & ~seen
+                seen |= new
+                frontier |= new
+            components.append(seen)
+            mask &= ~seen
+        return components
+
+    def adjacent(self, mask):
+        adjacent = 0
+        for b in self.bits(mask):
+            adjacent |= self.neighbours[b]
+        return adjacent
+
+    def space_mask(self, spaces):
+        """ Mask of ``spaces``, or None if a space is off the farmyard or repeated. """
+        mask = 0
+        for s in spaces:
+            bit = self.space_bit.get(tuple(s)) if isinstance(s, _LIST_TYPES) else None
+            if bit is None or mask & (1 << bit):
+                return None
+            mask |= 1 << bit
+        return mask
+
+    def fence_mask(self, mask):
+        fences = 0
+        for b in self.bits(mask):
+            fences ^= self.perimeter[b]
+        return fences
+
+
+class RolloutPlayer(object):
+    """ Compact state of one player. See RolloutGame. """
+    __slots__ = [
+        'res', 'people', 'people_avail', 'fences_avail', 'stables_avail',
+        'house', 'rooms', 'fields', 'field_order', 'crops', 'stables',
+        'pastures', 'pasture_cells', 'fences', 'bread']
+
+    def copy(self):
+        other = RolloutPlayer.__new__(RolloutPlayer)
+        other.res = self.res[:]
+        other.people = self.people
+        other.people_avail = self.people_avail
+        other.fences_avail = self.fences_avail
+        other.stables_avail = self.stables_avail
+        other.house = self.house
+        other.rooms = self.rooms
+        other.fields = self.fields
+        other.field_order = self.field_order[:]
+        other.crops = self.crops[:]
+        other.stables = self.stables
+        other.pastures = self.pastures[:]
+        other.pasture_cells = self.pasture_cells
+        other.fences = self.fences
+        other.bread = self.bread[:]
+        return other
+
+    def key(self):
+        return (
+            tuple(self.res), self.people, self.people_avail, self.fences_avail,
+            self.stables_avail, self.house, self.rooms,
+            tuple((b, self.crops[b]) for b in self.field_order),
+            self.stables, tuple(self.pastures), self.fences, tuple(self.bread))
+
+
+class RolloutGame(object):
+    """ Compact copy of a family game for fast playouts.
+
+    Created from a game with ``from_game``. Only games without occupations
+    and minor improvements, using the family actions and the standard major
+    improvements, are supported.
+
+    """
+    def copy(self):
+        other = RolloutGame.__new__(RolloutGame)
+        other.board = self.board
+        other.n_players = self.n_players
+        other.round_idx = self.round_idx
+        other.first_player_idx = self.first_player_idx
+        other.current_player_idx = self.current_player_idx
+        other.player_turns = self.player_turns[:]
+        other.turn_order = self.turn_order[:]
+        other.taken = self.taken
+        other.acc = self.acc[:]
+        other.owners = self.owners[:]
+        other.players = [p.copy() for p in self.players]
+        other.score = self.score
+        return other
+
+    @classmethod
+    def from_game(cls, game):
+        """ Compile ``game``, which must be waiting for a move or over. """
+        if not game.game_over and game.current_player_idx is None:
+            raise ValueError("RolloutGame requires a game waiting for a move.")
+
+        shapes = set(tuple(p.shape) for p in game.players)
+        if len(shapes) != 1:
+            raise ValueError("RolloutGame requires all farmyards to have the same shape.")
+
+        n_rounds = len(game.round_schedule)
+        n_revealed = min(game.round_idx, n_rounds)
+        n_base = len(game.active_actions) - n_revealed
+        actions = (
+            list(game.active_actions) +
+            [a for _, a in game.round_schedule[n_revealed:]])
+        specs = [_action_spec(a) for a in actions]
+
+        pool = list(game.major_improvements)
+        played = [(i, m) for i, p in enumerate(game.players) for m in p.major_improvements]
+        majors = []
+        for card in pool + [m for _, m in played]:
+            name = card.__class__.__name__
+            if name not in _MAJOR_KINDS or card.prerequisites:
+                raise ValueError("RolloutGame does not support major improvement {0}.".format(name))
+            cost = [0] * N_RESOURCES
+            for r, amount in card.cost.items():
+                cost[COST_RESOURCES.index(r)] = amount
+            majors.append((card.name, cost, _MAJOR_KINDS[name]))
+
+        board = _Board(
+            shapes.pop(), [a.name for a in actions], [k for k, _ in specs],
+            [r for _, r in specs], [s for s, _ in game.round_schedule],
+            n_base, majors)
+
+        self = cls.__new__(cls)
+        self.board = board
+        self.n_players = game.n_players
+        self.round_idx = game.round_idx
+        self.first_player_idx = game.first_player_idx
+        self.current_player_idx = game.current_player_idx
+        self.player_turns = list(getattr(game, 'player_turns', [0] * game.n_players))
+        self.turn_order = list(getattr(game, 'turn_order', range(game.n_players)))
+
+        self.acc = [0] * len(actions)
+        for slot, action in enumerate(game.active_actions):
+            if isinstance(action, Accumulating):
+                self.acc[slot] = sum(action.resources.values())
+        self.taken = 0
+        for slot, action in enumerate(game.active_actions):
+            if action in game.actions_taken:
+                self.taken |= 1 << slot
+
+        self.owners = [-1] * len(pool) + [i for i, _ in played]
+        self.players = [_compile_player(board, p) for p in game.players]
+        self.score = dict(game.score) if game.game_over else None
+        return self
+
+    @property
+    def game_over(self):
+        return self.round_idx > len(self.board.stages)
+
+    @property
+    def n_active(self):
+        return self.board.n_base + min(self.round_idx, len(self.board.stages))
+
+    def actions_remaining(self):
+        """ Action spaces that can still be taken this round, in the order of ``game.actions_remaining``. """
+        taken = self.taken
+        return [s for s in range(self.n_active) if not taken >> s & 1]
+
+    def pool(self):
+        """ Indices of the major improvements that have not been taken, in the order of ``game.major_improvements``. """
+        return [i for i, owner in enumerate(self.owners) if owner < 0]
+
+    def key(self):
+        """ Hashable summary of the position, equal for equivalent positions. """
+        return (
+            self.round_idx, self.first_player_idx, self.current_player_idx,
+            tuple(self.player_turns), tuple(self.turn_order), self.taken,
+            tuple(self.acc[:self.n_active]),
+            tuple(self.board.majors[i][0] for i in self.pool()),
+            tuple(sorted(
+                (self.board.majors[i][0], o) for i, o in enumerate(self.owners) if o >= 0)),
+            tuple(p.key() for p in self.players))
+
+    # ---------------------------------------------------------------- moves
+
+    def apply(self, move):
+        """ Play ``move`` for the player to move and advance to the next decision.
+
+        Raises an AgricolaException, leaving the game unchanged, if the move
+        is illegal.
+
+        """
+        remaining = self.actions_remaining()
+        if not 0 <= move.action_idx < len(remaining):
+            raise AgricolaInvalidChoice("Move refers to an action that does not remain.")
+        slot = remaining[move.action_idx]
+        self._take(self.current_player_idx, slot, move.choices, True)
+        self._end_turn(slot)
+
+    def is_legal(self, move):
+        remaining = self.actions_remaining()
+        if not 0 <= move.action_idx < len(remaining):
+            return False
+        try:
+            self._take(self.current_player_idx, remaining[move.action_idx], move.choices, False)
+        except AgricolaException:
+            return False
+        return True
+
+    def candidate_moves(self, max_list_length=1):
+        """ The moves generated by ``search.candidate_moves`` for the compiled game. """
+        board = self.board
+        player = self.players[self.current_player_idx]
+        for idx, slot in enumerate(self.actions_remaining()):
+            options = self._choice_candidates(board.kinds[slot], player, max_list_length)
+            if options is None:
+                continue
+            for values in _product(options):
+                yield Move(idx, values, board.names[slot])
+
+    def legal_moves(self, max_list_length=1):
+        return [m for m in self.candidate_moves(max_list_length) if self.is_legal(m)]
+
+    def playout(self, rng, max_list_length=1):
+        """ Play to the end of the game in place, choosing uniformly among the
+        remaining actions and then among the legal answers to its choices.
+
+        Returns the final scores.
+
+        """
+        board = self.board
+        while not self.game_over:
+            player_idx = self.current_player_idx
+            player = self.players[player_idx]
+            slots = self.actions_remaining()
+            while slots:
+                k = rng.randint(len(slots))
+                slot = slots[k]
+                options = self._choice_candidates(board.kinds[slot], player, max_list_length)
+                done = False
+                if options is not None:
+                    candidates = list(_product(options))
+                    for i in rng.permutation(len(candidates)):
+                        try:
+                            self._take(player_idx, slot, candidates[i], True)
+                        except AgricolaException:
+                            continue
+                        done = True
+                        break
+                if done:
+                    break
+                del slots[k]
+            else:
+                raise AgricolaImpossible(
+                    "No legal move for player {0} in round {1}.".format(
+                        player_idx, self.round_idx))
+            self._end_turn(slot)
+        return self.score
+
+    def _end_turn(self, slot):
+        player_idx = self.current_player_idx
+        self.taken |= 1 << slot
+        self.player_turns[player_idx] -= 1
+        self.current_player_idx = None
+        n = len(self.turn_order)
+        start = self.turn_order.index(player_idx)
+        for k in range(1, n + 1):
+            i = self.turn_order[(start + k) % n]
+            if self.player_turns[i] > 0:
+                self.current_player_idx = i
+                break
+
+        # As game.advance; the harvest does nothing.
+        board = self.board
+        n_rounds = len(board.stages)
+        while self.current_player_idx is None:
+            self.round_idx += 1
+            if self.round_idx > n_rounds:
+                self.score = {i: self.player_score(i) for i in range(self.n_players)}
+                return
+
+            n_active = board.n_base + self.round_idx
+            for s in range(n_active):
+                for r, amount in board.resources[s]:
+                    if board.kinds[s] in (ACCUMULATE, MEETING_PLACE):
+                        self.acc[s] += amount
+            self.taken = 0
+            self.player_turns = [p.people for p in self.players]
+            order = list(range(self.n_players))
+            first = self.first_player_idx
+            self.turn_order = order[first:] + order[:first]
+            self.current_player_idx = self.turn_order[0]
+
+    # -------------------------------------------------------------- choices
+
+    def _choice_candidates(self, kind, player, max_list_length):
+        """ Candidate answers for each choice of an action, or None if the action cannot be chosen. """
+        if kind in (GAIN, ACCUMULATE, MEETING_PLACE, WISH, MODEST_WISH):
+            return []
+        elif kind == RESOURCE_MARKET:
+            return [[None, 0, 1]]
+        elif kind == ANIMAL_MARKET:
+            return [[None, 0, 1, 2]]
+        elif kind == FARM_EXPANSION:
+            return [
+                self._space_lists(player, 'room', max_list_length),
+                self._space_lists(player, 'stable', max_list_length)]
+        elif kind == HOUSE_REDEVELOPMENT:
+            if player.house == 2:
+                return None
+            options = [[None, 0]]
+            n_pool = len(self.pool())
+            if n_pool:
+                options.append([None] + list(range(n_pool)))
+            return options
+        elif kind == FARM_REDEVELOPMENT:
+            if player.house == 2:
+                return None
+            return [[None, 0], self._pasture_candidates(player)]
+        elif kind == MAJOR_IMPROVEMENT:
+            n = len(self._affordable_majors(player))
+            if not n:
+                return None
+            return [[None] + list(range(n))]
+        elif kind == FENCING:
+            return [self._pasture_candidates(player)]
+        elif kind == LESSONS:
+            return None
+        elif kind == FARMLAND:
+            return [[None] + self._legal_spaces(player, 'field')]
+        elif kind == CULTIVATION:
+            return [
+                [None] + self._legal_spaces(player, 'field'),
+                _counts(player.res[GRAIN]), _counts(player.res[VEG])]
+        elif kind == GRAIN_UTILIZATION:
+            return [
+                _counts(player.res[GRAIN]), _counts(player.res[VEG]),
+                _counts(player.res[GRAIN])]
+        elif kind == SIDE_JOB:
+            return [[None] + self._legal_spaces(player, 'stable'), _counts(player.res[GRAIN])]
+
+    def _placement(self, player, kind):
+        """ Masks of the existing objects of ``kind`` and of the spaces that new ones cannot share. """
+        if kind == 'stable':
+            return player.stables, player.rooms | player.fields | player.stables
+        group = player.rooms if kind == 'room' else player.fields
+        return group, player.rooms | player.fields | player.stables | player.pasture_cells
+
+    def _legal_spaces(self, player, kind):
+        """ As ``Player.legal_spaces``. """
+        board = self.board
+        group, blocked = self._placement(player, kind)
+        mask = board.full & ~blocked
+        for component in board.components(group):
+            mask &= board.adjacent(component)
+        return [board.spaces[b] for b in board.bits(mask)]
+
+    def _space_lists(self, player, kind, max_list_length):
+        """ As ``search.choice_candidates`` for a list of spaces (see ``search.space_lists``). """
+        board = self.board
+        group, blocked = self._placement(player, kind)
+        existing = [board.spaces[b] for b in board.bits(group)]
+        free = set(board.spaces[b] for b in board.bits(board.full & ~blocked))
+        return [None] + list(
+            connected_extensions(existing, free, board.shape, max_list_length))
+
+    def _pasture_candidates(self, player):
+        """ As ``search.choice_candidates`` for a list of pastures. """
+        board = self.board
+        n_fences = board.count(player.fences)
+        planner = get_fence_planner(board.shape, max(15, player.fences_avail + n_fences))
+        layouts = planner.pareto_candidates(*planner.candidates_for_masks(
+            player.pasture_cells, player.fences,
+            player.rooms | player.fields | player.pasture_cells, player.stables,
+            min(player.res[WOOD], player.fences_avail)))
+        return [None] + [tuple(tuple(sorted(p)) for p in layout.pastures) for layout in layouts]
+
+    def _affordable_majors(self, player):
+        res = player.res
+        return [
+            i for i in self.pool()
+            if all(r >= c for r, c in zip(res, self.board.majors[i][1]))]
+
+    # -------------------------------------------------------------- effects
+
+    def _take(self, player_idx, slot, choices, commit):
+        """ Check the effect of taking action ``slot`` with encoded ``choices``, applying it if ``commit``.
+
+        Raises an AgricolaException before changing anything if the action is illegal.
+
+        """
+        board = self.board
+        kind = board.kinds[slot]
+        player = self.players[player_idx]
+        choices = tuple(choices)
+
+        if kind in (GAIN, ACCUMULATE, MEETING_PLACE):
+            _expect(choices, 0)
+            if commit:
+                for r, amount in board.resources[slot]:
+                    if kind == GAIN:
+                        player.res[r] += amount
+                    else:
+                        player.res[r] += self.acc[slot]
+                        self.acc[slot] = 0
+                if kind == MEETING_PLACE:
+                    self.first_player_idx = player_idx
+
+        elif kind == RESOURCE_MARKET:
+            _expect(choices, 1)
+            choice = _option(choices[0], 2)
+            if choice is None:
+                raise AgricolaInvalidChoice()
+            if commit:
+                player.res[FOOD] += 1
+                player.res[(REED, STONE)[choice]] += 1
+
+        elif kind == ANIMAL_MARKET:
+            _expect(choices, 1)
+            choice = _option(choices[0], 3)
+            if choice is None:
+                raise AgricolaInvalidChoice()
+            animal = ANIMALS[choice]
+            counts = [player.res[a] for a in ANIMALS]
+            counts[choice] += 1
+            self._check_capacity(player, counts)
+            if commit:
+                player.res[FOOD] += (1, 0, -1)[choice]
+                player.res[animal] += 1
+
+        elif kind in (WISH, MODEST_WISH):
+            _expect(choices, 0)
+            if kind == MODEST_WISH and self.round_idx < 5:
+                raise AgricolaImpossible()
+            if player.people_avail < 1:
+                raise AgricolaImpossible()
+            if commit:
+                player.people += 1
+                player.people_avail -= 1
+
+        elif kind == FARM_EXPANSION:
+            _expect(choices, 2)
+            rooms, stables = choices
+            if rooms is None and stables is None:
+                raise AgricolaInvalidChoice()
+            res = player.res[:]
+            new_rooms = self._check_rooms(player, rooms, res)
+            new_stables = self._check_stables(
+                player, stables, 2, res, player.rooms | new_rooms)
+            if commit:
+                player.res = res
+                player.rooms |= new_rooms
+                if stables is not None:
+                    player.stables |= new_stables
+                    player.stables_avail -= board.count(new_stables)
+
+        elif kind in (HOUSE_REDEVELOPMENT, FARM_REDEVELOPMENT):
+            if player.house == 2:
+                raise AgricolaImpossible()
+            if kind == HOUSE_REDEVELOPMENT:
+                pool = self.pool()
+                _expect(choices, 2 if pool else 1)
+            else:
+                _expect(choices, 2)
+            if _option(choices[0], 1) is None:
+                raise AgricolaInvalidChoice()
+
+            res = player.res[:]
+            material = HOUSE_RESOURCES[player.house + 1]
+            _pay(res, [(material, board.count(player.rooms)), (REED, 1)])
+
+            major = pastures = None
+            if kind == HOUSE_REDEVELOPMENT:
+                if len(choices) > 1 and choices[1] is not None:
+                    major = pool[_option(choices[1], len(pool), required=True)]
+                    _pay(res, enumerate(board.majors[major][1]))
+            elif choices[1] is not None:
+                pastures = self._check_pastures(player, choices[1], res)
+
+            if commit:
+                player.res = res
+                player.house += 1
+                if major is not None:
+                    self._play_major(player_idx, major)
+                if pastures is not None:
+                    self._build_pastures(player, pastures)
+
+        elif kind == MAJOR_IMPROVEMENT:
+            affordable = self._affordable_majors(player)
+            if not affordable:
+                raise AgricolaImpossible()
+            _expect(choices, 1)
+            if choices[0] is None:
+                raise AgricolaPoorlyFormed()
+            major = affordable[_option(choices[0], len(affordable), required=True)]
+            res = player.res[:]
+            _pay(res, enumerate(board.majors[major][1]))
+            if commit:
+                player.res = res
+                self._play_major(player_idx, major)
+
+        elif kind == FENCING:
+            _expect(choices, 1)
+            if choices[0] is not None:
+                res = player.res[:]
+                pastures = self._check_pastures(player, choices[0], res)
+                if commit:
+                    player.res = res
+                    self._build_pastures(player, pastures)
+
+        elif kind == LESSONS:
+            raise AgricolaImpossible("Player has no occupations left to play.")
+
+        elif kind == FARMLAND:
+            _expect(choices, 1)
+            new_field = self._check_field(player, choices[0])
+            if commit:
+                player.fields |= new_field
+                player.field_order.append(new_field.bit_length() - 1)
+
+        elif kind in (CULTIVATION, GRAIN_UTILIZATION):
+            _expect(choices, 3)
+            if all(c is None for c in choices):
+                raise AgricolaInvalidChoice()
+            if kind == CULTIVATION:
+                space, grain, veg = choices
+                bake = None
+            else:
+                grain, veg, bake = choices
+                space = None
+
+            new_field = 0
+            if space is not None:
+                new_field = self._check_field(player, space)
+            res = player.res[:]
+            sow = grain is not None or veg is not None
+            if sow:
+                grain, veg = grain or 0, veg or 0
+                empty = [b for b in player.field_order if not player.crops[b]]
+                if new_field:
+                    empty.append(new_field.bit_length() - 1)
+                if len(empty) < grain + veg:
+                    raise AgricolaNotEnoughResources()
+                _pay(res, [(GRAIN, grain), (VEG, veg)])
+            if bake is not None:
+                self._check_bake(player, bake, res)
+
+            if commit:
+                player.res = res
+                if new_field:
+                    player.fields |= new_field
+                    player.field_order.append(new_field.bit_length() - 1)
+                if sow:
+                    for b in empty[:grain]:
+                        player.crops[b] = 3
+                    for b in empty[grain:grain + veg]:
+                        player.crops[b] = -2
+
+        elif kind == SIDE_JOB:
+            _expect(choices, 2)
+            space, bake = choices
+            if space is None and bake is None:
+                raise AgricolaInvalidChoice()
+            res = player.res[:]
+            new_stable = 0
+            if space is not None:
+                new_stable = self._check_stables(player, [space], 1, res, player.rooms)
+            if bake is not None:
+                self._check_bake(player, bake, res)
+            if commit:
+                player.res = res
+                if new_stable:
+                    player.stables |= new_stable
+                    player.stables_avail -= 1
+
+    def _check_rooms(self, player, spaces, res):
+        """ Mask of the rooms built at ``spaces``, after paying for them from ``res``. """
+        if spaces is None:
+            return 0
+        board = self.board
+        mask = _space_list_mask(board, spaces)
+        occupied = player.rooms | player.fields | player.stables | player.pasture_cells
+        if mask & occupied or not board.connected[player.rooms | mask]:
+            raise AgricolaImpossible()
+        n = board.count(mask)
+        _pay(res, [(HOUSE_RESOURCES[player.house], 5 * n), (REED, 2 * n)])
+        return mask
+
+    def _check_stables(self, player, spaces, unit_cost, res, rooms):
+        if spaces is None:
+            return 0
+        board = self.board
+        mask = _space_list_mask(board, spaces)
+        if mask & (rooms | player.fields | player.stables):
+            raise AgricolaImpossible()
+        if not board.connected[player.stables | mask]:
+            raise AgricolaImpossible()
+        n = board.count(mask)
+        if player.stables_avail < n:
+            raise AgricolaNotEnoughResources()
+        _pay(res, [(WOOD, unit_cost * n)])
+        return mask
+
+    def _check_field(self, player, space):
+        if space is None:
+            raise AgricolaInvalidChoice("No field location was chosen.")
+        board = self.board
+        mask = _space_list_mask(board, [space])
+        if mask & (player.rooms | player.fields | player.stables | player.pasture_cells):
+            raise AgricolaImpossible()
+        if not board.connected[player.fields | mask]:
+            raise AgricolaImpossible()
+        return mask
+
+    def _check_pastures(self, player, pastures, res):
+        """ Masks of the new pastures, after paying for their fences from ``res``. """
+        board = self.board
+        if not isinstance(pastures, _LIST_TYPES):
+            raise AgricolaInvalidChoice()
+        masks = []
+        cells = 0
+        for spaces in pastures:
+            if not isinstance(spaces, _LIST_TYPES) or not spaces:
+                raise AgricolaPoorlyFormed()
+            mask = 0
+            for s in spaces:
+                bit = board.space_bit.get(tuple(s)) if isinstance(s, _LIST_TYPES) else None
+                if bit is None:
+                    raise AgricolaImpossible()
+                mask |= 1 << bit
+            if not board.connected[mask] or mask & cells:
+                raise AgricolaImpossible()
+            cells |= mask
+            masks.append(mask)
+
+        if cells & (player.rooms | player.fields | player.pasture_cells):
+            raise AgricolaImpossible()
+        if not board.connected[player.pasture_cells | cells]:
+            raise AgricolaImpossible()
+
+        fences = 0
+        for mask in masks:
+            fences |= board.fence_mask(mask)
+        n = board.count(fences & ~player.fences)
+        if player.fences_avail < n:
+            raise AgricolaNotEnoughResources()
+        _pay(res, [(WOOD, n)])
+        return masks
+
+    def _build_pastures(self, player, masks):
+        board = self.board
+        fences = player.fences
+        for mask in masks:
+            fences |= board.fence_mask(mask)
+        player.fences_avail -= board.count(fences & ~player.fences)
+        player.fences = fences
+        player.pastures.extend(masks)
+        for mask in masks:
+            player.pasture_cells |= mask
+
+    def _check_capacity(self, player, counts):
+        board = self.board
+        free_stables = board.count(player.stables & ~player.pasture_cells)
+        capacities = [1] * (free_stables + 1)
+        capacities.extend(2 * board.count(m) for m in player.pastures)
+        if not multiset_satisfy(sorted(counts), Counter(capacities)):
+            raise AgricolaNotEnoughResources()
+
+    @staticmethod
+    def _check_bake(player, n, res):
+        bread = player.bread
+        if n > len(bread) - 1 and bread[-1] == 0:
+            raise AgricolaPoorlyFormed()
+        rates = bread[:-1][:n]
+        rates.extend([bread[-1]] * max(n - len(rates), 0))
+        _pay(res, [(GRAIN, n)])
+        res[FOOD] += sum(rates)
+
+    def _play_major(self, player_idx, major):
+        player = self.players[player_idx]
+        baking, ovens, _, _ = self.board.majors[major][2]
+        bread = player.bread
+        bread[-1] = max(bread[-1], baking)
+        if ovens:
+            bread[:] = sorted(bread[:-1] + ovens, reverse=True) + bread[-1:]
+        self.owners[major] = player_idx
+
+    # -------------------------------------------------------------- scoring
+
+    def player_score(self, player_idx):
+        """ As ``Player.score``. """
+        board = self.board
+        p = self.players[player_idx]
+        res = p.res
+        n_bits = board.count
+
+        score = 0
+        score += score_mapping(len(p.pastures), [1, 2, 3, 4], [-1, 1, 2, 3, 4])
+        score += score_mapping(n_bits(p.fields), [1, 3, 4, 5], [-1, 1, 2, 3, 4])
+
+        score += score_mapping(res[GRAIN], [1, 4, 6, 8], [-1, 1, 2, 3, 4])
+        score += score_mapping(res[VEG], [1, 2, 3, 4], [-1, 1, 2, 3, 4])
+
+        score += score_mapping(res[SHEEP], [1, 4, 6, 8], [-1, 1, 2, 3, 4])
+        score += score_mapping(res[BOAR], [1, 3, 5, 7], [-1, 1, 2, 3, 4])
+        score += score_mapping(res[CATTLE], [1, 2, 4, 6], [-1, 1, 2, 3, 4])
+
+        score += min(n_bits(p.stables & p.pasture_cells), 4)
+        score -= board.n_spaces - n_bits(p.rooms | p.fields | p.stables | p.pasture_cells)
+
+        score += 3 * p.people
+        score += p.house * n_bits(p.rooms)
+
+        for major, owner in enumerate(self.owners):
+            if owner == player_idx:
+                _, _, points, bonus = board.majors[major][2]
+                score += points
+                if bonus is not None:
+                    resource, thresholds = bonus
+                    score += score_mapping(res[resource], thresholds, [2, 3, 4, 5])
+        return score
+
+
+def _compile_player(board, player):
+    for attr in ['occupations', 'minor_improvements']:
+        if getattr(player, attr) or player.hand[attr]:
+            raise ValueError("RolloutGame does not support occupations or minor improvements.")
+    if (player.room_cost != 5 or player.pasture_capacity_modifier or
+            any(p.n_stables for p in player._pastures)):
+        raise ValueError("RolloutGame does not support modified players.")
+
+    p = RolloutPlayer()
+    p.res = [getattr(player, r) for r in COST_RESOURCES]
+    p.people = player.people
+    p.people_avail = player.people_avail
+    p.fences_avail = player.fences_avail
+    p.stables_avail = player.stables_avail
+    p.house = HOUSE_TYPES.index(player.house_type)
+    p.rooms = board.space_mask(player.room_spaces)
+    p.field_order = [board.space_bit[tuple(f.space)] for f in player._fields]
+    p.fields = board.space_mask(player.field_spaces)
+    p.crops = [0] * board.n_spaces
+    for f, b in zip(player._fields, p.field_order):
+        p.crops[b] = f.n_items if f.kind == 'grain' else -f.n_items
+    p.stables = board.space_mask(player.stable_spaces)
+    p.pastures = [board.space_mask(pasture.spaces) for pasture in player._pastures]
+    p.pasture_cells = 0
+    p.fences = 0
+    for mask in p.pastures:
+        p.pasture_cells |= mask
+        p.fences |= board.fence_mask(mask)
+    p.bread = list(player.bread_rates)
+    return p
+
+
+def _expect(choices, n):
+    if len(choices) != n:
+        raise AgricolaInvalidChoice(
+            "Expected {0} choices, but move has {1} choices.".format(n, len(choices)))
+
+
+def _option(value, n, required=False):
+    """ Check that ``value`` indexes one of ``n`` options. """
+    if value is None and not required:
+        return None
+    if value is None or not 0 <= value < n:
+        raise AgricolaInvalidChoice()
+    return value
+
+
+def _pay(res, costs):
+    costs = list(costs)
+    for r, amount in costs:
+        if res[r] < amount:
+            raise AgricolaNotEnoughResources()
+    for r, amount in costs:
+        res[r] -= amount
+
+
+def _space_list_mask(board, spaces):
+    if not isinstance(spaces, _LIST_TYPES):
+        raise AgricolaInvalidChoice()
+    mask = board.space_mask(spaces)
+    if mask is None:
+        raise AgricolaImpossible()
+    return mask
+
+
+def _counts(n):
+    return [None] + list(range(1, n + 1))
+
+
+def _product(options):
+    return itertools.product(*options)
+
+
+class RolloutPolicy(object):
+    """ Rollout policy for ``mcts.MCTS`` that plays games out with a RolloutGame.
+
+    Only family games are supported (see RolloutGame).
+
+    Parameters
+    ----------
+    seed: int or RandomState (optional)
+    max_list_length: int
+        Passed on to ``RolloutGame.playout``.
+
+    """
+    def __init__(self, seed=None, max_list_length=1):
+        if isinstance(seed, np.random.RandomState):
+            self.rng = seed
+        else:
+            self.rng = np.random.RandomState(seed)
+        self.max_list_length = max_list_length
+
+    def playout(self, game):
+        """ Play ``game`` (not modified) to the end and return the final scores. """
+        return RolloutGame.from_game(game).playout(self.rng, self.max_list_length)
+
+
+def _full_playout(game, rng):
+    agent = RandomAgent(rng)
+    while not game.game_over:
+        game = apply_move(game, agent.choose_move(game))
+    return game.score
+
+
+def _fuzz_game(n_players, simple):
+    if simple:
+        game = AgricolaGame(get_simple_actions(), n_players)
+    else:
+        game = StandardAgricolaGame(n_players, family=True)
+    game.ui = None
+    setup_game(game)
+    advance(game)
+    return search_copy(game)
+
+
+def fuzz(n_games=10, n_players=2, seed=0, simple=False, max_list_length=1):
+    """ Check that RolloutGame agrees with the full engine on random games.
+
+    Each game is played by picking uniformly among the legal moves found by
+    the full engine. Before every move, the candidate moves of the two engines
+    and the legality of every candidate are compared, and after every move the
+    RolloutGame that has been played on is compared to one compiled afresh
+    from the full game. Final scores are compared at the end.
+
+    Parameters
+    ----------
+    n_games: int
+        Number of games to play.
+    n_players: int
+        Number of players per game.
+    seed: int
+        Seed for the setup of the games and the choice of moves.
+    simple: bool
+        If True, use the actions of ``get_simple_actions`` rather than the
+        family game.
+    max_list_length: int
+        Passed on to the move generators.
+
+    Returns
+    -------
+    Number of moves played.
+
+    Raises
+    ------
+    AssertionError if the engines disagree.
+
+    """
+    rng = np.random.RandomState(seed)
+    n_moves = 0
+    for i in range(n_games):
+        np.random.seed(rng.randint(2**31))
+        game = _fuzz_game(n_players, simple)
+        fast = RolloutGame.from_game(game)
+
+        while not game.game_over:
+            where = "game {0}, round {1}, move {2}".format(i, game.round_idx, n_moves)
+            if fast.key() != RolloutGame.from_game(game).key():
+                raise AssertionError("States differ in {0}.".format(where))
+
+            moves = list(candidate_moves(game, max_list_length))
+            fast_moves = list(fast.candidate_moves(max_list_length))
+            if moves != fast_moves:
+                raise AssertionError("Candidate moves differ in {0}.".format(where))
+
+            legal = dict(successors(game, moves))
+            for move in moves:
+                if (move in legal) != fast.is_legal(move):
+                    raise AssertionError(
+                        "Engines disagree on legality of {0} in {1}.".format(move, where))
+
+            move = list(legal)[rng.randint(len(legal))]
+            game = legal[move]
+            fast.apply(move)
+            n_moves += 1
+
+        if fast.key() != RolloutGame.from_game(game).key():
+            raise AssertionError("Final states differ in game {0}.".format(i))
+        if fast.score != game.score:
+            raise AssertionError(
+                "Scores differ in game {0}: {1} != {2}.".format(i, fast.score, game.score))
+    return n_moves
+
+
+if __name__ == "__main__":
+    import time
+
+    for n_players in [1, 2, 3, 4]:
+        start = time.perf_counter()
+        n_moves = fuzz(n_games=5, n_players=n_players, seed=n_players)
+        print("{0} players: {1} moves agree ({2:.1f}s)".format(
+            n_players, n_moves, time.perf_counter() - start))
+
+    game = _fuzz_game(2, False)
+    policy = RolloutPolicy(0)
+    for engine, playout in [
+            ('full', lambda g: _full_playout(g, policy.rng)),
+            ('rollout', policy.playout)]:
+        start = time.perf_counter()
+        n = 0
+        while time.perf_counter() - start < 5.0:
+            playout(game)
+            n += 1
+        print("{0}: {1:.1f} playouts/sec".format(engine, n / (time.perf_counter() - start)))
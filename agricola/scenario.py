@@ -0,0 +1,345 @@
+""" Construction of positions in the middle of a game.
+
+Training on the decisions of late rounds should not require playing the
+early rounds first. ``build_scenario`` sets up a game directly at the start
+of any round, with the farmyards, goods, family, played cards and hands of
+the players and the stocks of the accumulation spaces given by the caller;
+``random_scenario`` samples all of these, in amounts that grow with the
+round, and ``curriculum`` generates random scenarios for a sequence of
+rounds (for instance starting near the end of the game and moving earlier,
+as the agent improves).
+
+Each player is described by the keyword arguments of ``Player``, which
+validates the farmyard once when the player is created. In addition, played
+cards and cards in hand may be given by name, and ``sown`` maps field spaces
+to the (kind, number of items) sown on them. Played cards are put into play
+with ``Card.install``: their lasting effects apply, but they are not paid
+for and what they give once (goods, fields, pastures and goods placed on
+round spaces) is not given again, so the farmyards and goods of the players
+are those of their descriptions. Cards whose effects depend on when they
+were played can be given as cards instead of names, such as
+``BigCountry(rounds_remaining=3)``; given by name, BigCountry counts the
+rounds left from ``round_idx``, as if it had just been played.
+
+"""
+import copy
+
+import numpy as np
+
+from agricola import Player, AgricolaException
+from agricola.action import Accumulating
+from agricola.game import setup_game, advance, _reveal
+from agricola.player import Pasture
+
+_KINDS = ['occupations', 'minor_improvements']
+
+
+def set_schedule(game, schedule):
+    """ Fix the order in which the stage actions of a game that has not been set up are revealed.
+
+    ``schedule`` gives the names of the stage actions in the order in which
+    they are revealed. Actions must stay within their own stage.
+
+    """
+    position = {name: i for i, name in enumerate(schedule)}
+    stages = []
+    for stage in game.actions[1:]:
+        missing = [a.name for a in stage if a.name not in position]
+        if missing:
+            raise ValueError(
+                "Schedule does not include actions {0}.".format(missing))
+        stages.append(sorted(stage, key=lambda a: position[a.name]))
+    game.actions = [game.actions[0]] + stages
+    game.randomize = False
+
+
+def _card_pools(game):
+    pools = {}
+    for kind in _KINDS:
+        deck = getattr(game, kind)
+        pools[kind] = list(deck.cards) if deck else []
+    pools['major_improvements'] = list(game.major_improvements)
+    return pools
+
+
+def _find(pool, card, kind):
+    if not isinstance(card, str):
+        return card
+    for c in pool:
+        if c.name == card:
+            return c
+    raise ValueError("{0} is not one of the {1} of the game.".format(card, kind))
+
+
+def _install(player, card, kind):
+    """ Put ``card`` into play for ``player``, as if it had been played earlier. """
+    card = copy.deepcopy(card)
+    card.install(player)
+    player.add_played_card(kind, card)
+
+
+def _deal(pool, n_cards, rng):
+    """ ``n_cards`` cards drawn from ``pool``, which loses them. """
+    order = rng.permutation(len(pool))[:n_cards]
+    dealt = [pool[k] for k in order]
+    for k in sorted(order, reverse=True):
+        del pool[k]
+    return dealt
+
+
+def build_scenario(
+        game, round_idx=1, players=None, first_player=0, schedule=None,
+        stocks=None, seed=None, errors='raise'):
+    """ Set up ``game`` at the start of round ``round_idx``.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+        A game that has not been set up yet.
+    round_idx: int
+        Round in which the game starts. The actions of the earlier rounds
+        are revealed.
+    players: list of dict (optional)
+        Keyword arguments of ``Player`` for each player (see the module
+        docstring). The cards of hands that are not given are dealt from
+        the cards that nobody holds, less the cards already played.
+    first_player: int
+        Starting player of the round.
+    schedule: list of str (optional)
+        Order in which the stage actions are revealed (see
+        ``set_schedule``). If not supplied, the order is as for
+        ``setup_game``.
+    stocks: dict (optional)
+        Maps the names of accumulation spaces revealed before round
+        ``round_idx`` to the goods lying on them before they are replenished
+        at the start of the round. Defaults to nothing.
+    seed: int or RandomState (optional)
+        Seed for dealing the hands.
+    errors: str
+        'raise' to raise the AgricolaException of a played card that cannot
+        be put into play, or 'skip' to leave it out.
+
+    Returns
+    -------
+    The game, advanced to the first decision of round ``round_idx``.
+
+    """
+    if errors not in ('raise', 'skip'):
+        raise ValueError("Unknown error handling: {0}.".format(errors))
+    if players is not None and len(players) != game.n_players:
+        raise ValueError(
+            "Got {0} players for a game with {1} players.".format(
+                len(players), game.n_players))
+    rng = seed if isinstance(seed, np.random.RandomState) else np.random.RandomState(seed)
+    if schedule is not None:
+        set_schedule(game, schedule)
+
+    setup_game(game, first_player)
+    if not 1 <= round_idx <= len(game.round_schedule):
+        raise ValueError(
+            "Round {0} is not one of the {1} rounds of the game.".format(
+                round_idx, len(game.round_schedule)))
+    game.round_idx = round_idx
+    game.stage_idx = game.round_schedule[round_idx - 1][0]
+    game.active_actions.extend(
+        _reveal(action) for _, action in game.round_schedule[:round_idx - 1])
+
+    stocks = dict(stocks or {})
+    for action in game.active_actions:
+        if isinstance(action, Accumulating) and action.name in stocks:
+            action.resources.update(stocks.pop(action.name))
+    if stocks:
+        raise ValueError(
+            "Accumulation spaces {0} have not been revealed.".format(sorted(stocks)))
+
+    pools = _card_pools(game)
+    specs = [dict(spec) for spec in (players or [{}] * game.n_players)]
+    played = [{} for _ in specs]
+    hands = [{} for _ in specs]
+    for i, spec in enumerate(specs):
+        for kind in _KINDS + ['major_improvements']:
+            played[i][kind] = [
+                _find(pools[kind], c, kind) for c in spec.pop(kind, None) or []]
+        hand = spec.pop('hand', None)
+        if hand is not None:
+            for kind in _KINDS:
+                hands[i][kind] = [_find(pools[kind], c, kind) for c in hand.get(kind, [])]
+
+    # Cards that are played or held are out of the pools.
+    for i in range(len(specs)):
+        for kind, cards in list(played[i].items()) + list(hands[i].items()):
+            names = [c.name for c in cards]
+            pools[kind] = [c for c in pools[kind] if c.name not in names]
+    for p in played:
+        for card in p['major_improvements']:
+            game.remove_major_improvement(card)
+
+    game.players = []
+    for i, spec in enumerate(specs):
+        sown = spec.pop('sown', {})
+        player = Player(str(i), **spec)
+        for field in player._fields:
+            if tuple(field.space) in sown:
+                field._kind, field._n_items = sown[tuple(field.space)]
+        player._check_animal_capacity(player.animals.values(), 0, 'animals')
+        player.set_game(game)
+        game.players.append(player)
+
+        for kind in _KINDS:
+            if kind in hands[i]:
+                player.set_hand(kind, hands[i][kind])
+            else:
+                deck = getattr(game, kind)
+                if deck:
+                    n = max(deck.cards_per_player - len(played[i][kind]), 0)
+                    player.set_hand(kind, _deal(pools[kind], n, rng))
+        for kind, cards in played[i].items():
+            for card in cards:
+                try:
+                    _install(player, card, kind)
+                except AgricolaException:
+                    if errors == 'raise':
+                        raise
+
+    advance(game)
+    return game
+
+
+def _grow(rng, group, free, shape, n):
+    """ Up to ``n`` spaces from ``free`` added at random to keep ``group`` connected. """
+    group, added = set(group), []
+    for _ in range(n):
+        if group:
+            candidates = sorted(set(
+                (r + dr, c + dc) for r, c in group
+                for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))) & free)
+        else:
+            candidates = sorted(free)
+        if not candidates:
+            break
+        space = candidates[rng.randint(len(candidates))]
+        group.add(space)
+        free.discard(space)
+        added.append(space)
+    return added
+
+
+def random_player(game, round_idx, rng):
+    """ Random keyword arguments of a player at the start of round ``round_idx`` (see ``build_scenario``). """
+    n_rounds = sum(len(stage) for stage in game.actions[1:])
+    progress = (round_idx - 1) / float(max(n_rounds - 1, 1))
+    initial = game.initial_players
+    shape = tuple((initial[0] if isinstance(initial, list) else initial).shape)
+    free = set((r, c) for r in range(shape[0]) for c in range(shape[1]))
+
+    rooms = [(0, 0), (1, 0)]
+    free -= set(rooms)
+    rooms += _grow(rng, rooms, free, shape, rng.binomial(3, progress))
+    fields = _grow(rng, [], free, shape, rng.binomial(5, progress))
+
+    sown = {}
+    for space in fields:
+        kind = ['grain', 'veg', None][rng.choice(3, p=[0.4, 0.2, 0.4])]
+        if kind is not None:
+            sown[space] = (kind, int(rng.randint(1, 4 if kind == 'grain' else 3)))
+
+    pastures, fenced = [], []
+    for _ in range(rng.binomial(3, progress)):
+        start = _grow(rng, fenced, free, shape, 1)
+        if not start:
+            break
+        pasture = start + _grow(rng, start, free, shape, rng.randint(3))
+        n_fences = len(Pasture.fences_for_pasture_group(
+            [Pasture(p) for p in pastures + [pasture]]))
+        if n_fences > 15:
+            break
+        pastures.append(pasture)
+        fenced.extend(pasture)
+    n_fences = len(Pasture.fences_for_pasture_group([Pasture(p) for p in pastures]))
+
+    stable_spaces = sorted(free | set(fenced))
+    n_stables = min(rng.binomial(4, progress / 2), len(stable_spaces))
+    stables = [stable_spaces[k] for k in rng.permutation(len(stable_spaces))[:n_stables]]
+
+    people = 2 + min(rng.binomial(3, progress), len(rooms) - 2)
+    house_type = ['wood', 'clay', 'stone'][min(rng.binomial(2, progress), 2)]
+    spec = dict(
+        shape=shape, house_type=house_type, rooms=rooms, fields=fields,
+        pastures=pastures, stables=stables, sown=sown, people=people,
+        people_avail=5 - people, fences_avail=15 - n_fences,
+        stables_avail=4 - n_stables)
+
+    for good, rate in dict(
+            food=1.0, wood=1.5, clay=1.0, stone=0.5, reed=0.5,
+            grain=0.3, veg=0.15).items():
+        spec[good] = int(rng.poisson(rate * round_idx))
+
+    # At most as many animals of each kind as one of the places for animals
+    # holds, the pet in the house and unfenced stables holding one each.
+    capacities = sorted(
+        [Pasture(p).capacity() for p in pastures] +
+        [1] * (1 + sum(s not in fenced for s in stables)), reverse=True)
+    animals = ['sheep', 'boar', 'cattle']
+    for k, capacity in zip(rng.permutation(3), capacities):
+        spec[animals[k]] = int(rng.randint(capacity + 1))
+
+    pools = _card_pools(game)
+    for kind, mean in [('occupations', 0.3), ('minor_improvements', 0.2)]:
+        if pools[kind]:
+            n = min(rng.binomial(n_rounds, mean * progress), 7)
+            spec[kind] = [c.name for c in _deal(pools[kind], n, rng)]
+    return spec
+
+
+def random_scenario(game, round_idx, seed=None, first_player=None):
+    """ Set up ``game`` at the start of round ``round_idx`` in a random position.
+
+    The order of the stage actions, the players (see ``random_player``),
+    the stocks of the accumulation spaces and the hands are drawn from
+    ``seed``, as is the first player unless it is given. Played cards that
+    cannot be put into play are left out.
+
+    """
+    rng = seed if isinstance(seed, np.random.RandomState) else np.random.RandomState(seed)
+    schedule = [
+        stage[k].name for stage in game.actions[1:]
+        for k in (rng.permutation(len(stage)) if game.randomize else range(len(stage)))]
+    if first_player is None:
+        first_player = rng.randint(game.n_players)
+
+    revealed = list(game.actions[0])
+    stages = [a for stage in game.actions[1:] for a in stage]
+    order = {name: i for i, name in enumerate(schedule)}
+    revealed += sorted(stages, key=lambda a: order[a.name])[:round_idx - 1]
+    stocks = {}
+    for action in revealed:
+        if isinstance(action, Accumulating):
+            rounds = rng.randint(round_idx)
+            stocks[action.name] = {r: a * rounds for r, a in action.acc_amount.items()}
+
+    players = [random_player(game, round_idx, rng) for _ in range(game.n_players)]
+    taken = set()
+    for spec in players:
+        for kind in _KINDS:
+            spec[kind] = [c for c in spec.get(kind, []) if (kind, c) not in taken]
+            taken.update((kind, c) for c in spec[kind])
+    return build_scenario(
+        game, round_idx, players, first_player, schedule, stocks, seed=rng, errors='skip')
+
+
+def curriculum(game_factory, rounds, seed=None):
+    """ Generate random scenarios of the games made by ``game_factory``.
+
+    Parameters
+    ----------
+    game_factory: callable
+        Function with no arguments returning a new game.
+    rounds: iterable of int
+        Starting round of each scenario, e.g. ``[14] * 1000 + [12] * 1000``
+        to train on the last round first.
+    seed: int (optional)
+
+    """
+    rng = np.random.RandomState(seed)
+    for round_idx in rounds:
+        yield random_scenario(game_factory(), round_idx, seed=rng)
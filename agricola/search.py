@@ -0,0 +1,461 @@
+""" Tools shared by the agents that play Agricola by searching over copies of a game.
+
+A decision in Agricola consists of picking one of the remaining actions and
+then answering the choices that the action asks for. Here such a decision is
+represented by a Move, which refers to the action by its position in
+``actions_remaining`` and stores the answers in a canonical, hashable form
+(options of a DiscreteChoice are stored by index rather than as the card or
+material objects themselves). A Move is therefore independent of any
+particular copy of a game, and can be found on one copy and then applied to
+another copy, or to the live game being played.
+
+Moves are generated by enumerating a finite set of candidate answers for each
+choice, and the legal moves are the candidates that can actually be applied to
+a copy of the game without raising an AgricolaException.
+
+"""
+import itertools
+import time
+
+import numpy as np
+
+from agricola import AgricolaException, AgricolaInvalidChoice
+from agricola.choice import (
+    DiscreteChoice, CountChoice, ListChoice,
+    VariableLengthListChoice, SpaceChoice)
+from agricola.action import Accumulating
+from agricola.fences import pareto_pasture_layouts
+from agricola.game import take_action, advance
+from agricola.player import PLACEMENT_OMIT
+from agricola.ui import SilentInterface
+
+
+class SearchTimeout(Exception):
+    """ Raised by a search that runs out of time before reaching a result.
+
+    Deliberately not an AgricolaException, which signals an illegal move and
+    is caught while generating successors.
+
+    """
+    pass
+
+
+class Move(object):
+    """ An action together with answers to the choices that it asks for.
+
+    Parameters
+    ----------
+    action_idx: int
+        Index of the action in ``game.actions_remaining``.
+    choices: tuple
+        One encoded answer per choice asked for by the action. Answers to a
+        DiscreteChoice are encoded as the index of the chosen option, answers
+        to ListChoices and VariableLengthListChoices as tuples of encoded
+        answers, and all other answers as themselves. None means that the
+        choice was left unanswered.
+    name: str (optional)
+        Name of the action, for display only.
+
+    """
+    def __init__(self, action_idx, choices=(), name=None):
+        self.action_idx = action_idx
+        self.choices = tuple(choices)
+        self.name = name
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Move) and
+            self.action_idx == other.action_idx and
+            self.choices == other.choices)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.action_idx, self.choices))
+
+    def __str__(self):
+        name = self.name or "action {0}".format(self.action_idx)
+        return "<Move {0} choices={1}>".format(name, self.choices)
+
+    def __repr__(self):
+        return str(self)
+
+    def decode(self, specs):
+        """ Convert the stored answers into answers for the choices ``specs``. """
+        if len(specs) != len(self.choices):
+            raise AgricolaInvalidChoice(
+                "Expected {0} choices, but move has {1} choices.".format(
+                    len(specs), len(self.choices)))
+        return [decode_choice(s, v) for s, v in zip(specs, self.choices)]
+
+    def resolve(self, game):
+        """ The action and decoded choices that this move corresponds to in ``game``. """
+        if not 0 <= self.action_idx < len(game.actions_remaining):
+            raise AgricolaInvalidChoice(
+                "Move refers to action {0}, but only {1} actions remain.".format(
+                    self.action_idx, len(game.actions_remaining)))
+        action = game.actions_remaining[self.action_idx]
+        player = game.players[game.current_player_idx]
+        return action, self.decode(action.choices(player))
+
+
+def decode_choice(spec, value):
+    """ Convert an encoded answer (see Move) into an answer to the choice ``spec``. """
+    if value is None:
+        return None
+    elif isinstance(spec, DiscreteChoice):
+        if not 0 <= value < len(spec.options):
+            raise AgricolaInvalidChoice(
+                "Option {0} does not exist for choice: {1}".format(value, spec.desc))
+        return spec.options[value]
+    elif isinstance(spec, ListChoice):
+        return [decode_choice(s, v) for s, v in zip(spec.subchoices, value)]
+    elif isinstance(spec, VariableLengthListChoice):
+        return [decode_choice(spec.subchoice, v) for v in value]
+    else:
+        return value
+
+
+def encode_choice(spec, answer):
+    """ Inverse of ``decode_choice``. """
+    if answer is None:
+        return None
+    elif isinstance(spec, DiscreteChoice):
+        return spec.options.index(answer)
+    elif isinstance(spec, ListChoice):
+        return tuple(encode_choice(s, a) for s, a in zip(spec.subchoices, answer))
+    elif isinstance(spec, VariableLengthListChoice):
+        return tuple(encode_choice(spec.subchoice, a) for a in answer)
+    elif isinstance(spec, SpaceChoice):
+        return tuple(answer)
+    else:
+        return answer
+
+
+def space_lists(player, kind, max_size):
+    """ Sets of up to ``max_size`` free spaces where ``player`` could place new objects of ``kind`` at once.
+
+    The new objects have to form one connected group with the existing ones,
+    so only the first object of a list must be at one of the spaces of
+    ``Player.legal_spaces``. Each set is a sorted tuple, and the sets are
+    generated by increasing size (see ``macro.connected_extensions``).
+
+    """
+    from agricola.macro import connected_extensions
+    blocked = set(
+        space for other, objects in player.occupied.items()
+        if other not in PLACEMENT_OMIT[kind] for o in objects for space in o.spaces)
+    free = set(itertools.product(range(player.shape[0]), range(player.shape[1]))) - blocked
+    existing = [space for o in player.occupied[kind] for space in o.spaces]
+    return connected_extensions(existing, free, player.shape, max_size)
+
+
+def choice_candidates(spec, player, max_list_length=1):
+    """ Candidate encoded answers to the choice ``spec`` made by ``player``.
+
+    Not every candidate is necessarily legal. Lists of spaces are limited to
+    at most ``max_list_length`` spaces, except for lists of pastures, for which
+    the Pareto-optimal pasture additions found by the fence planner are used.
+    Lists of rooms and stables are the groups of free spaces that connect to
+    the existing ones (see ``space_lists``).
+
+    """
+    if isinstance(spec, DiscreteChoice):
+        return [None] + list(range(len(spec.options)))
+
+    elif isinstance(spec, CountChoice):
+        if spec.n is None:
+            return [None]
+        return [None] + list(range(1, spec.n + 1))
+
+    elif isinstance(spec, SpaceChoice):
+        return [None] + [tuple(s) for s in (spec.spaces or [])]
+
+    elif isinstance(spec, ListChoice):
+        subcandidates = [
+            choice_candidates(s, player, max_list_length) for s in spec.subchoices]
+        return list(itertools.product(*subcandidates))
+
+    elif isinstance(spec, VariableLengthListChoice):
+        candidates = [None]
+        if isinstance(spec.subchoice, VariableLengthListChoice):
+            for layout in pareto_pasture_layouts(player):
+                candidates.append(
+                    tuple(tuple(sorted(p)) for p in layout.pastures))
+        elif isinstance(spec.subchoice, SpaceChoice):
+            mx = max_list_length if spec.mx is None else min(spec.mx, max_list_length)
+            if spec.subchoice.kind is not None:
+                candidates.extend(space_lists(player, spec.subchoice.kind, mx))
+            else:
+                spaces = [tuple(s) for s in (spec.subchoice.spaces or [])]
+                for n in range(1, mx + 1):
+                    candidates.extend(itertools.combinations(spaces, n))
+        return candidates
+
+    return [None]
+
+
+def candidate_moves(game, max_list_length=1):
+    """ Generate candidate moves for the player whose turn it is in ``game``.
+
+    Every legal move (up to the restrictions of ``choice_candidates``) is
+    generated, as well as some illegal ones.
+
+    """
+    player = game.players[game.current_player_idx]
+    for idx, action in enumerate(game.actions_remaining):
+        try:
+            specs = action.choices(player)
+        except AgricolaException:
+            continue
+
+        options = [choice_candidates(s, player, max_list_length) for s in specs]
+        for values in itertools.product(*options):
+            yield Move(idx, values, action.name)
+
+
+def search_copy(game):
+    """ Copy of ``game`` suitable for searching.
+
+    Choices that arise while simulating moves on the copy (for instance from
+    cards that trigger when an action is taken) are answered by a
+    SilentInterface rather than by the user interface of ``game``.
+
+    """
+    ui = getattr(game, 'ui', None)
+    game.ui = _simulation_ui
+    try:
+        game_copy = game.clone()
+    finally:
+        game.ui = ui
+    return game_copy
+
+
+_simulation_ui = SilentInterface()
+
+
+def apply_move(game, move):
+    """ Return a copy of ``game`` with ``move`` applied and the game advanced to the next decision.
+
+    Raises an AgricolaException if ``move`` is not legal in ``game``.
+
+    """
+    child = game.clone()
+    player_idx = child.current_player_idx
+    action, choices = move.resolve(child)
+    take_action(child, player_idx, action, choices)
+    advance(child)
+    return child
+
+
+def successors(game, moves=None, max_list_length=1):
+    """ Generate (move, child) pairs for the legal moves in ``game``.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+        A game copied with ``search_copy``.
+    moves: iterable of Move (optional)
+        Moves to try, in order. Defaults to ``candidate_moves(game)``.
+    max_list_length: int
+        Passed on to ``candidate_moves``.
+
+    """
+    if moves is None:
+        moves = candidate_moves(game, max_list_length)
+
+    for move in moves:
+        try:
+            child = apply_move(game, move)
+        except AgricolaException:
+            continue
+        yield move, child
+
+
+def legal_moves(game, max_list_length=1):
+    """ All legal moves for the player whose turn it is in ``game``. """
+    return [m for m, _ in successors(game, max_list_length=max_list_length)]
+
+
+def rounds_left(game):
+    """ Number of rounds left to play, including the current round. """
+    return len(game.round_schedule) - game.round_idx + 1
+
+
+def _player_key(player):
+    return (
+        player.house_type, player.people, player.people_avail,
+        tuple(sorted(player.resources.items())),
+        tuple(sorted(player.animals.items())),
+        player.fences_avail, player.stables_avail,
+        tuple(sorted(player.room_spaces)),
+        tuple(sorted(tuple(sorted(p.spaces)) for p in player._pastures)),
+        tuple(sorted(player.stable_spaces)),
+        tuple(sorted((f.space, f.kind, f.n_items) for f in player._fields)),
+        player.hand_set.mask, player.played_set.mask,
+        tuple(sorted(
+            (r, tuple(sorted((k, v) for k, v in d.items() if v)))
+            for r, d in player.futures.items() if any(d.values()))))
+
+
+def state_key(game):
+    """ Hashable summary of the parts of ``game`` that affect its outcome.
+
+    Two positions with equal keys are treated as the same position by the
+    transposition tables of the search agents, regardless of the order in
+    which the moves leading to them were made. Internal state of cards that
+    have been played (e.g. uses remaining) is not included.
+
+    """
+    actions = tuple(
+        (a.name,
+         tuple(sorted(a.resources.items())) if isinstance(a, Accumulating) else (),
+         game.actions_taken.get(a))
+        for a in game.active_actions)
+    return (
+        game.round_idx, game.current_player_idx, game.first_player_idx,
+        tuple(getattr(game, 'player_turns', ())),
+        actions,
+        game.major_improvement_set.mask,
+        tuple(_player_key(p) for p in game.players))
+
+
+class SearchStats(object):
+    """ Counters describing the work done by a search. """
+    def __init__(self):
+        self.nodes = 0
+        self.tt_hits = 0
+        self.elapsed = 0.0
+
+    @property
+    def nodes_per_sec(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return "<SearchStats nodes={0} tt_hits={1} elapsed={2:.3f}s nodes/sec={3:.1f}>".format(
+            self.nodes, self.tt_hits, self.elapsed, self.nodes_per_sec)
+
+    def __repr__(self):
+        return str(self)
+
+
+class SearchAgent(SilentInterface):
+    """ Base class for agents that play by choosing complete moves.
+
+    Subclasses implement ``choose_move``, which is given a search copy of the
+    game (see ``search_copy``) and returns a legal Move. Choices that arise
+    outside of the agent's own moves (e.g. from cards) receive the defaults of
+    SilentInterface.
+
+    Parameters
+    ----------
+    max_list_length: int
+        Passed on to ``candidate_moves``.
+
+    """
+    def __init__(self, max_list_length=1):
+        self.max_list_length = max_list_length
+        self._pending = None
+
+    def choose_move(self, game):
+        raise NotImplementedError()
+
+    def get_action(self, name, actions_remaining):
+        move = self.choose_move(search_copy(self.game))
+        if move is None:
+            return None
+        self._pending = move if move.choices else None
+        return actions_remaining[move.action_idx]
+
+    def get_choices(self, name, choices):
+        move, self._pending = self._pending, None
+        if move is not None:
+            return move.decode(choices)
+        return super(SearchAgent, self).get_choices(name, choices)
+
+    def action_timed_out(self, name):
+        # The choices of the abandoned move must not answer later prompts.
+        self._pending = None
+
+
+class AnytimeAgent(SearchAgent):
+    """ Base class for agents that always have a best move so far.
+
+    Subclasses implement ``improve``, a generator that is given a search copy
+    of the game and yields successively better legal moves. ``choose_move``
+    returns the last move yielded before the agent's deadline (set by
+    ``game.play`` through ``set_deadline`` when decisions are timed) or before
+    the decision is cancelled, or the last move of all if there is no
+    deadline. Between expensive steps
+    ``improve`` should check ``stop_time`` (or ``out_of_time``) and pass it
+    on to the searches it runs, and should yield a cheap move early on so
+    that there is always something to return.
+
+    Parameters
+    ----------
+    max_list_length: int
+        Passed on to ``candidate_moves``.
+    margin: float
+        Seconds before the deadline at which to stop improving, leaving time
+        for the move to be returned and committed.
+
+    """
+    def __init__(self, max_list_length=1, margin=0.05):
+        super(AnytimeAgent, self).__init__(max_list_length)
+        self.margin = margin
+
+    def improve(self, game):
+        raise NotImplementedError()
+
+    def stop_time(self):
+        """ ``time.perf_counter()`` time at which to stop improving, or None. """
+        if self.deadline is None:
+            return None
+        return self.deadline - self.margin
+
+    def out_of_time(self):
+        if self.cancelled():
+            return True
+        stop = self.stop_time()
+        return stop is not None and time.perf_counter() >= stop
+
+    def quick_move(self, game):
+        """ The first legal move of ``game``, or None. """
+        for move, _ in successors(game, max_list_length=self.max_list_length):
+            return move
+        return None
+
+    def choose_move(self, game):
+        best = None
+        for move in self.improve(game):
+            best = move
+            if self.out_of_time():
+                break
+        return best
+
+
+class RandomAgent(SearchAgent):
+    """ Agent that plays a uniformly random candidate move among those that are legal.
+
+    Parameters
+    ----------
+    seed: int or RandomState (optional)
+        Seed for the agent's random number generator.
+    max_list_length: int
+        Passed on to ``candidate_moves``.
+
+    """
+    def __init__(self, seed=None, max_list_length=1):
+        super(RandomAgent, self).__init__(max_list_length)
+        if isinstance(seed, np.random.RandomState):
+            self.rng = seed
+        else:
+            self.rng = np.random.RandomState(seed)
+
+    def choose_move(self, game):
+        moves = list(candidate_moves(game, self.max_list_length))
+        order = self.rng.permutation(len(moves))
+        for move, _ in successors(game, (moves[i] for i in order)):
+            return move
+        return None
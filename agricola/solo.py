@@ -0,0 +1,207 @@
+""" Optimisation of solo games.
+
+In a solo game there are no opponents, and after the setup the only source of
+uncertainty is the order in which the actions of each stage are revealed.
+Once that order and the player's hand are fixed, finding a good game is a
+deterministic planning problem, which is tackled here with a beam search over
+moves: at every step all successors of the positions in the beam are
+generated, positions that have been reached before are dropped, and the
+``beam_width`` best positions according to an evaluation function are kept.
+
+"""
+import time
+
+from agricola.evaluate import HeuristicEvaluator
+from agricola.game import StandardAgricolaGame, setup_game, advance
+from agricola.scenario import set_schedule
+from agricola.search import (
+    SearchStats, successors, search_copy, state_key)
+from agricola.transposition import TranspositionTable
+
+
+def setup_solo_game(
+        game=None, occupations=None, minor_improvements=None, schedule=None):
+    """ Set up a solo game with a given hand and action schedule.
+
+    Parameters
+    ----------
+    game: AgricolaGame (optional)
+        A one player game that has not been set up yet. Defaults to
+        ``StandardAgricolaGame(1)``.
+    occupations: list of Occupation or str (optional)
+        Occupations (or names of occupations from the game's deck) to use as
+        the player's hand. If not supplied, the hand is dealt as usual.
+    minor_improvements: list of MinorImprovement or str (optional)
+        As for ``occupations``.
+    schedule: list of str (optional)
+        Names of the stage actions in the order in which they are revealed.
+        Actions must stay within their own stage. If not supplied, the order
+        is random.
+
+    Returns
+    -------
+    The game, ready for its first move.
+
+    """
+    if game is None:
+        game = StandardAgricolaGame(1)
+    if game.n_players != 1:
+        raise ValueError(
+            "A solo game must have 1 player, got {0}.".format(game.n_players))
+
+    if schedule is not None:
+        set_schedule(game, schedule)
+
+    setup_game(game, first_player=0)
+    player = game.players[0]
+
+    for kind, cards in [('occupations', occupations),
+                        ('minor_improvements', minor_improvements)]:
+        if cards is None:
+            continue
+        deck = getattr(game, kind)
+        pool = {c.name: c for c in (deck.cards if deck else [])}
+        player.set_hand(kind, [pool[c] if isinstance(c, str) else c for c in cards])
+
+    advance(game)
+    return game
+
+
+def final_score(game):
+    """ Evaluation function scoring a solo position by its current score. """
+    if game.game_over:
+        return game.score[0]
+    return game.players[0].score()
+
+
+class SoloResult(object):
+    """ Outcome of optimising a solo game.
+
+    Parameters
+    ----------
+    moves: list of Move
+        The best sequence of moves found, from the starting position.
+    score: int
+        Final score achieved by ``moves``.
+    complete: bool
+        False if the search ran out of time, in which case the moves after
+        the point at which it stopped were chosen greedily.
+    stats: SearchStats
+        ``nodes`` counts generated positions and ``tt_hits`` counts
+        positions dropped because they had been reached before.
+
+    """
+    def __init__(self, moves, score, complete, stats):
+        self.moves = moves
+        self.score = score
+        self.complete = complete
+        self.stats = stats
+
+    def __str__(self):
+        return "<SoloResult score={0} moves={1} complete={2} {3}>".format(
+            self.score, len(self.moves), self.complete, self.stats)
+
+    def __repr__(self):
+        return str(self)
+
+
+class SoloOptimizer(object):
+    """ Beam search for a high-scoring solo game.
+
+    Parameters
+    ----------
+    beam_width: int > 0
+        Number of positions kept after each step.
+    max_states: int > 0
+        Maximum number of positions remembered for detecting positions that
+        have already been reached. When the limit is hit, the least recently
+        reached positions are forgotten.
+    time_budget: float (optional)
+        Wall-clock budget in seconds. When exhausted, the best position in
+        the beam is played out by always taking the first legal move.
+    evaluate: callable or HeuristicEvaluator (optional)
+        Function from a game to a number, used to rank positions. Defaults to
+        ``final_score``. A HeuristicEvaluator ranks the positions generated at
+        each step in a single batch.
+    max_list_length: int
+        Passed on to ``search.candidate_moves``.
+
+    """
+    def __init__(
+            self, beam_width=16, max_states=100000, time_budget=None,
+            evaluate=None, max_list_length=1):
+        self.beam_width = beam_width
+        self.max_states = max_states
+        self.time_budget = time_budget
+        self.evaluate = evaluate or final_score
+        self.max_list_length = max_list_length
+        self.stats = SearchStats()
+
+    def _evaluate(self, games):
+        if isinstance(self.evaluate, HeuristicEvaluator):
+            if not games:
+                return []
+            return self.evaluate.evaluate(games)[:, 0].tolist()
+        return [self.evaluate(g) for g in games]
+
+    def optimize(self, game):
+        """ Find a high-scoring sequence of moves from ``game``, which is not modified. """
+        if game.n_players != 1:
+            raise ValueError(
+                "SoloOptimizer requires a 1 player game, got {0}.".format(game.n_players))
+
+        self.stats = stats = SearchStats()
+        start = time.perf_counter()
+        deadline = None if self.time_budget is None else start + self.time_budget
+
+        game = search_copy(game)
+        if game.game_over:
+            return SoloResult([], game.score[0], True, stats)
+
+        beam = [(None, game, [])]
+        best = None
+        seen = TranspositionTable(self.max_states)
+        complete = True
+
+        while beam:
+            if deadline is not None and time.perf_counter() > deadline:
+                complete = False
+                break
+
+            candidates = []
+            for _, position, moves in beam:
+                for move, child in successors(position, max_list_length=self.max_list_length):
+                    stats.nodes += 1
+                    if child.game_over:
+                        if best is None or child.score[0] > best[0]:
+                            best = (child.score[0], child, moves + [move])
+                        continue
+
+                    key = state_key(child)
+                    if key in seen:
+                        stats.tt_hits += 1
+                        continue
+                    seen[key] = True
+
+                    candidates.append((None, child, moves + [move]))
+
+            values = self._evaluate([c[1] for c in candidates])
+            candidates = [(v, c, m) for v, (_, c, m) in zip(values, candidates)]
+            candidates.sort(key=lambda c: c[0], reverse=True)
+            beam = candidates[:self.beam_width]
+
+        if not complete and beam:
+            _, position, moves = beam[0]
+            moves = list(moves)
+            while not position.game_over:
+                move, position = next(
+                    successors(position, max_list_length=self.max_list_length))
+                moves.append(move)
+            if best is None or position.score[0] > best[0]:
+                best = (position.score[0], position, moves)
+
+        stats.elapsed = time.perf_counter() - start
+
+        if best is None:
+            return SoloResult([], None, complete, stats)
+        return SoloResult(best[2], best[0], complete, stats)
@@ -0,0 +1,201 @@
+""" Speculative computation of successor states while a player is deciding.
+
+While ``game.play`` waits for ``ui.get_action`` (a human at a prompt, or an
+agent in another process or on another machine) the engine has nothing to do.
+A Speculator uses that time: when a player's turn starts it copies the game
+and, in a background thread, takes the player's candidate moves one by one on
+copies of it, remembering the resulting state of each legal move and the
+exception raised by each illegal one. Once the player has chosen an action
+and answered its choices, the game loop looks the move up, and if it has
+already been computed commits the stored state (or reports the stored
+failure) instead of taking the action itself.
+
+A move whose effects asked the user interface for a choice (for instance a
+card that triggers when an action is taken) is not stored, because the
+answer that the speculative copy received might not be the one the player
+would give; such moves are always taken by the game loop in the usual way.
+
+Speculation runs in a thread, so it only helps when the interface spends its
+time waiting rather than computing in the same process: an agent that
+searches in-process shares the interpreter with the speculation.
+
+"""
+import itertools
+import threading
+
+from agricola import AgricolaException
+from agricola.game import take_action
+from agricola.search import Move, candidate_moves, encode_choice
+from agricola.ui import SilentInterface
+
+
+class SpeculationStats(object):
+    """ Counters describing the use of a Speculator. """
+    def __init__(self):
+        self.computed = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / float(lookups) if lookups else 0.0
+
+    def __str__(self):
+        return "<SpeculationStats computed={0} hits={1} misses={2} hit_rate={3:.3f}>".format(
+            self.computed, self.hits, self.misses, self.hit_rate)
+
+    def __repr__(self):
+        return str(self)
+
+
+class _SpeculativeInterface(SilentInterface):
+    """ SilentInterface that records whether it was asked for a choice. """
+    def __init__(self):
+        self.asked = False
+
+    def get_choices(self, name, choices):
+        self.asked = True
+        return super(_SpeculativeInterface, self).get_choices(name, choices)
+
+
+def interleaved_moves(game, max_list_length=1):
+    """ Candidate moves of ``game``, taking one candidate of each action in turn.
+
+    Every action gets its first candidates computed early, which suits a
+    Speculator that may be interrupted at any time.
+
+    """
+    by_action = itertools.groupby(
+        candidate_moves(game, max_list_length), key=lambda m: m.action_idx)
+    iterators = [iter(list(moves)) for _, moves in by_action]
+    while iterators:
+        remaining = []
+        for moves in iterators:
+            move = next(moves, None)
+            if move is not None:
+                yield move
+                remaining.append(moves)
+        iterators = remaining
+
+
+class Speculator(object):
+    """ Background computation of the successors of the position a player is deciding on.
+
+    Parameters
+    ----------
+    max_moves: int (optional)
+        Maximum number of moves computed per position. Unlimited if None.
+    max_list_length: int
+        Passed on to ``search.candidate_moves``.
+    order: callable (optional)
+        Function from a game to the moves to compute, most likely first.
+        Defaults to ``interleaved_moves``.
+
+    """
+    def __init__(self, max_moves=256, max_list_length=1, order=None):
+        self.max_moves = max_moves
+        self.max_list_length = max_list_length
+        self.order = order
+        self.stats = SpeculationStats()
+        self._results = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, game):
+        """ Begin computing the successors of ``game``, dropping those of any previous position. """
+        self.stop()
+        if self._thread is not None:
+            self._thread.join()
+
+        # The copy is made here rather than in the thread so that the live
+        # game is never touched from the background.
+        ui = getattr(game, 'ui', None)
+        game.ui = _SpeculativeInterface()
+        try:
+            base = game.clone()
+        finally:
+            game.ui = ui
+
+        self._results = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(base, self._results, self._stop))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stop computing as soon as the move being computed is finished. """
+        self._stop.set()
+
+    def _run(self, base, results, stop):
+        order = self.order or (lambda g: interleaved_moves(g, self.max_list_length))
+        moves = order(base)
+        if self.max_moves is not None:
+            moves = itertools.islice(moves, self.max_moves)
+
+        player_idx = base.current_player_idx
+        for move in moves:
+            if stop.is_set():
+                return
+            child = base.clone()
+            child.ui.asked = False
+            try:
+                action, choices = move.resolve(child)
+                take_action(child, player_idx, action, choices)
+            except AgricolaException as e:
+                result = e
+            else:
+                if child.ui.asked:
+                    continue
+                result = child
+            results[move] = result
+            self.stats.computed += 1
+
+    def lookup(self, game, action, choices):
+        """ State reached by ``action`` with decoded ``choices`` in ``game``, if already computed.
+
+        Parameters
+        ----------
+        game: AgricolaGame
+            The position that was passed to ``start`` (or a copy of it).
+        action: Action
+            Action from ``game.actions_remaining``.
+        choices: list
+            Answers to the choices asked for by ``action``.
+
+        Returns
+        -------
+        A game with the move taken (but not advanced) and the user interface
+        of ``game``, or None if the move has not been computed. Each position
+        returned belongs to the caller, so a move should be looked up at most
+        once per ``start``.
+
+        Raises
+        ------
+        The AgricolaException raised when computing the move, if it is illegal.
+
+        """
+        result = self._results.get(self._encode(game, action, choices))
+        if result is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+
+        if isinstance(result, AgricolaException):
+            raise result
+        result.ui = getattr(game, 'ui', None)
+        return result
+
+    @staticmethod
+    def _encode(game, action, choices):
+        try:
+            action_idx = game.actions_remaining.index(action)
+            player = game.players[game.current_player_idx]
+            specs = action.choices(player) or []
+            choices = choices or []
+            if len(specs) != len(choices):
+                return None
+            return Move(action_idx, [encode_choice(s, c) for s, c in zip(specs, choices)])
+        except (AgricolaException, ValueError, TypeError):
+            return None
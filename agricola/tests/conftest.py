@@ -0,0 +1,16 @@
+""" Fixtures shared by the tests. """
+import pytest
+
+from agricola.tests.games import start_game, standard_positions
+
+
+@pytest.fixture
+def start():
+    """ ``start_game``, for tests that start from the first decision of a SmallAgricolaGame. """
+    return start_game
+
+
+@pytest.fixture
+def seeded_positions():
+    """ ``standard_positions``, for tests on the positions of a seeded random StandardAgricolaGame. """
+    return standard_positions
@@ -0,0 +1,75 @@
+""" Games shared by the tests of the search and learning modules. """
+import numpy as np
+
+from agricola.action import (
+    DayLaborer, GrainSeeds, VegetableSeeds, Forest, Farmland, SheepMarket)
+from agricola.game import AgricolaGame, StandardAgricolaGame, setup_game, advance
+from agricola.search import search_copy, legal_moves, apply_move, RandomAgent
+
+# Classes of the actions of each stage of a SmallAgricolaGame.
+SMALL_ACTIONS = [
+    [DayLaborer, GrainSeeds, Forest, Farmland],
+    [VegetableSeeds],
+    [SheepMarket]]
+
+
+class SmallAgricolaGame(AgricolaGame):
+    """ A game of a few rounds and actions, without cards.
+
+    Parameters
+    ----------
+    n_players: int
+    actions: list of lists of Action classes (optional)
+        Classes of the actions of each stage. Defaults to ``SMALL_ACTIONS``.
+    randomize: bool
+        Whether the stage actions are revealed in a random order.
+
+    """
+    def __init__(self, n_players=2, actions=None, randomize=False):
+        actions = [[a() for a in stage] for stage in actions or SMALL_ACTIONS]
+        super(SmallAgricolaGame, self).__init__(
+            actions, n_players, randomize=randomize)
+
+
+def start_game(n_players, n_moves=0, actions=None, **resources):
+    """ Search copy of a SmallAgricolaGame at the first decision of player 0.
+
+    Each player is given ``resources``, then the first legal move is played
+    ``n_moves`` times.
+
+    """
+    game = SmallAgricolaGame(n_players, actions)
+    game.ui = None
+    setup_game(game, first_player=0)
+    advance(game)
+    game = search_copy(game)
+    for player in game.players:
+        player.add_resources(**resources)
+    for i in range(n_moves):
+        game = apply_move(game, legal_moves(game)[0])
+    return game
+
+
+def standard_positions(n_players, seed=0, n_moves=None, first_player=0, family=False, moves=False):
+    """ Search copies of the positions of a StandardAgricolaGame played by a RandomAgent.
+
+    The game is set up in the numpy random state seeded with ``seed`` (with a
+    random first player if ``first_player`` is None) and played by
+    ``RandomAgent(seed)``. The positions are those before each of the first
+    ``n_moves`` moves, or before every move of the game if ``n_moves`` is
+    None. If ``moves``, each position is paired with the move played in it.
+
+    """
+    np.random.seed(seed)
+    game = StandardAgricolaGame(n_players, family=family)
+    game.ui = None
+    setup_game(game, first_player=first_player)
+    advance(game)
+    game = search_copy(game)
+    agent = RandomAgent(seed)
+    positions = []
+    while not game.game_over and (n_moves is None or len(positions) < n_moves):
+        move = agent.choose_move(game)
+        positions.append((game, move) if moves else game)
+        game = apply_move(game, move)
+    return positions
@@ -0,0 +1,58 @@
+import copy
+
+import numpy as np
+
+from agricola import AgricolaException
+from agricola.affordability import get_affordability_index
+from agricola.cards import LargeGreenhouse, Mantelpiece, Canoe, Fireplace
+from agricola.player import Player
+
+
+def _can_play(player, card):
+    p = copy.deepcopy(player)
+    try:
+        card._check(p)
+        p.change_state("Paying for card", cost=card.cost)
+    except AgricolaException:
+        return False
+    return True
+
+
+def test_affordability_index():
+    """ Test that the affordability index agrees with attempting to pay for each card. """
+    index = get_affordability_index()
+    rng = np.random.RandomState(0)
+
+    for i in range(20):
+        resources = {r: rng.randint(0, 4) for r in ['food', 'wood', 'clay', 'stone', 'reed', 'grain']}
+        player = Player(
+            "p0", sheep=rng.randint(0, 3),
+            house_type=['wood', 'clay', 'stone'][rng.randint(3)],
+            occupations=[None] * rng.randint(0, 5), **resources)
+
+        mask = index.player_mask(player)
+        for card, playable in zip(index.cards, mask):
+            assert playable == _can_play(player, card)
+
+
+def test_affordability_prerequisites():
+    """ Test that card prerequisites are taken into account by the index. """
+    index = get_affordability_index()
+    greenhouse, mantelpiece, canoe = LargeGreenhouse(), Mantelpiece(), Canoe()
+    cards = [greenhouse, mantelpiece, canoe, Fireplace()]
+
+    player = Player("p0", wood=5, stone=5, clay=5)
+    assert index.playable(player, cards) == [cards[3]]
+
+    player = Player("p0", wood=5, stone=5, clay=5, occupations=[None])
+    assert index.playable(player, cards) == [canoe, cards[3]]
+
+    player = Player("p0", wood=5, stone=5, house_type='clay', occupations=[None, None])
+    assert index.playable(player, cards) == [greenhouse, mantelpiece, canoe]
+
+    resources = np.stack([index.resource_vector(p) for p in [player, Player("p1")]])
+    features = np.stack([index.feature_vector(p) for p in [player, Player("p1")]])
+    mask = index.affordable(resources, features)
+    assert mask.shape == (2, len(index))
+    assert mask[0, index.index[greenhouse.name]]
+    assert not mask[1, index.index[greenhouse.name]]
@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+from agricola.game import play
+from agricola.search import SearchAgent, legal_moves
+from agricola.batching import InferenceQueue, BatchedAgent
+from agricola.tests.games import SmallAgricolaGame
+
+
+def _last_move_scores(batch):
+    return [range(len(moves)) for _, moves in batch]
+
+
+class _LastMoveAgent(SearchAgent):
+    def choose_move(self, game):
+        return legal_moves(game)[-1]
+
+
+def _in_threads(n, target):
+    results = [None] * n
+
+    def run(i):
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_full_batches():
+    """ Test that requests are answered in order and flushed when a batch is full. """
+    batches = []
+
+    def fn(requests):
+        batches.append(len(requests))
+        return [2 * r for r in requests]
+
+    with InferenceQueue(fn, max_batch=4, max_latency=60.0) as queue:
+        futures = [queue.submit(i) for i in range(8)]
+        assert [f.result(timeout=10) for f in futures] == [2 * i for i in range(8)]
+    assert batches == [4, 4]
+    assert queue.stats.full_batches == 2
+
+
+def test_latency_flush():
+    with InferenceQueue(lambda requests: requests, max_batch=512, max_latency=0.01) as queue:
+        assert queue.evaluate('a') == 'a'
+        assert _in_threads(3, queue.evaluate) == [0, 1, 2]
+    assert queue.stats.requests == 4
+    assert queue.stats.full_batches == 0
+
+
+def test_close_flushes():
+    queue = InferenceQueue(lambda requests: requests, max_latency=60.0)
+    future = queue.submit(1)
+    queue.close()
+    assert future.result(timeout=0) == 1
+    with pytest.raises(RuntimeError):
+        queue.submit(2)
+
+
+def test_errors():
+    def fn(requests):
+        raise ValueError("bad batch")
+
+    with InferenceQueue(fn, max_latency=0.0) as queue:
+        with pytest.raises(ValueError):
+            queue.evaluate(1)
+
+    with InferenceQueue(lambda requests: [], max_latency=0.0) as queue:
+        with pytest.raises(ValueError):
+            queue.evaluate(1)
+
+
+def test_batched_agent():
+    """ Test that concurrent games played through a queue play as the unbatched agent. """
+    expected = play(SmallAgricolaGame(2), _LastMoveAgent(), first_player=0)
+
+    n_games = 4
+    with InferenceQueue(_last_move_scores, max_batch=n_games, max_latency=0.05) as queue:
+        games = _in_threads(n_games, lambda i: play(
+            SmallAgricolaGame(2), BatchedAgent(queue), first_player=0))
+
+    for game in games:
+        assert game.score == expected.score
+    assert queue.stats.mean_batch_size > 1
@@ -0,0 +1,94 @@
+import subprocess
+import sys
+
+import numpy as np
+
+from agricola.game import setup_game, advance, play
+from agricola.search import RandomAgent, search_copy, apply_move, legal_moves
+from agricola.mcts import MCTS
+from agricola.book import (
+    OpeningBook, BookEntry, BookAgent, build_book, position_hash)
+from agricola.tests.games import SmallAgricolaGame
+
+
+class _CountingAgent(RandomAgent):
+    calls = 0
+
+    def choose_move(self, game):
+        self.calls += 1
+        return super(_CountingAgent, self).choose_move(game)
+
+
+def test_position_hash(start):
+    """ Test that the hash depends only on the position and is the same in another process. """
+    game = start(2)
+    assert position_hash(search_copy(game)) == position_hash(game)
+    hashes = set(position_hash(apply_move(game, m)) for m in legal_moves(game))
+    assert len(hashes) == len(legal_moves(game))
+    assert position_hash(game) not in hashes
+
+    code = (
+        "from agricola.tests.games import start_game; "
+        "from agricola.book import position_hash; "
+        "print(position_hash(start_game(2)))")
+    output = subprocess.check_output([sys.executable, '-c', code])
+    assert int(output) == position_hash(game)
+
+
+def test_save_load(tmpdir, start):
+    game = start(2)
+    book = build_book(game, MCTS(n_simulations=10, seed=0), max_depth=1, breadth=2)
+    assert len(book) > 1
+    path = str(tmpdir.join('book.npy'))
+    book.save(path)
+
+    for mmap in [True, False]:
+        loaded = OpeningBook.load(path, mmap=mmap)
+        assert isinstance(loaded._records, np.memmap) == mmap
+        assert len(loaded) == len(book)
+        entry, expected = loaded.lookup(game), book.lookup(game)
+        assert entry.move == expected.move
+        assert entry.move.name == expected.move.name
+        assert entry.visits == expected.visits == 10
+        assert np.isclose(entry.confidence, expected.confidence)
+
+    # Every stored move is legal in its position.
+    stack = [game]
+    while stack:
+        position = stack.pop()
+        entry = loaded.lookup(position)
+        if entry is None:
+            continue
+        assert entry.move in legal_moves(position)
+        stack.extend(apply_move(position, m) for m in legal_moves(position))
+
+
+def test_probe_thresholds(start):
+    game = start(2)
+    move = legal_moves(game)[0]
+    book = OpeningBook()
+    book.add(game, BookEntry(move, game.round_idx, 100, 0.6, 1.0))
+
+    assert book.probe(game) == move
+    assert book.probe(game, max_depth=0) is None
+    assert book.probe(game, min_confidence=0.7) is None
+    assert book.probe(apply_move(game, move)) is None
+    assert (book.stats.hits, book.stats.rejected, book.stats.misses) == (1, 1, 1)
+
+
+def test_book_agent():
+    """ Test that a book agent plays from the book in the first round only. """
+    game = SmallAgricolaGame(2)
+    game.ui = None
+    setup_game(game, first_player=0)
+    advance(game)
+    book = build_book(
+        search_copy(game), MCTS(n_simulations=5, seed=0), max_depth=1, breadth=100)
+
+    fallback = _CountingAgent(seed=0)
+    agent = BookAgent(fallback, book, max_depth=1)
+    result = play(SmallAgricolaGame(2), agent, first_player=0)
+    assert result.game_over
+    # Four decisions in the first round, four in the second.
+    assert book.stats.hits == 4
+    assert fallback.calls == 4
@@ -0,0 +1,141 @@
+import copy
+
+import numpy as np
+import pytest
+
+from agricola.cards import (
+    Occupation, CardSet, catalogue, card_id, card_name, register_cards,
+    get_occupations, get_minor_improvements, get_major_improvements)
+from agricola.search import RandomAgent, apply_move
+from agricola.view import GameView
+
+
+class _TestOccupation(Occupation):
+    # Never dealt in a game.
+    min_players = 99
+    deck = 'T'
+    text = ''
+
+    def check_and_apply(self, player):
+        pass
+
+
+class _UnknownOccupation(_TestOccupation):
+    pass
+
+
+register_cards([_TestOccupation()])
+
+
+def test_catalogue():
+    names = catalogue()
+    assert len(set(names)) == len(names)
+    cards = get_occupations(4) + get_minor_improvements() + get_major_improvements()
+    for card in cards:
+        assert card_name(card.id) == card.name
+        assert card_id(card.name) == card.id
+    majors = [m.id for m in get_major_improvements()]
+    assert majors == list(range(majors[0], majors[0] + len(majors)))
+
+    # Cards registered from elsewhere get new ids, after those of the
+    # catalogue, and unregistered ones none.
+    idx = _TestOccupation().id
+    assert idx > max(c.id for c in cards) and card_name(idx) == '_TestOccupation'
+    register_cards(['_TestOccupation'])
+    assert _TestOccupation().id == idx
+    with pytest.raises(ValueError):
+        _UnknownOccupation().id
+
+
+def test_card_equality(seeded_positions):
+    game = seeded_positions(2, n_moves=1)[0]
+    card = game.players[0].hand['occupations'][0]
+    copied = copy.deepcopy(card)
+    assert copied is not card
+    assert copied == card and hash(copied) == hash(card)
+    assert copied in game.players[0].hand['occupations']
+    assert copied not in game.players[1].hand['occupations']
+
+
+def test_card_set():
+    occupations = get_occupations(4)[:3]
+    cards = CardSet(occupations)
+    assert len(cards) == 3 and cards
+    assert all(c in cards for c in occupations)
+    assert occupations[0].name in cards and occupations[0].id in cards
+    assert get_occupations(4)[3] not in cards
+    assert sorted(cards.names) == sorted(c.name for c in occupations)
+    assert list(cards) == sorted(c.id for c in occupations)
+
+    first = CardSet(occupations[:1])
+    assert cards - first == CardSet(occupations[1:])
+    assert (cards & first) == first and (first | cards) == cards
+    assert not CardSet() and len(CardSet()) == 0
+    assert {cards: 1}[CardSet(reversed(occupations))] == 1
+    assert copy.deepcopy(cards) is cards
+
+    features = cards.to_array()
+    assert features.shape == (len(catalogue()),) and features.sum() == 3
+    assert set(np.flatnonzero(features)) == set(cards)
+    out = np.ones(len(catalogue()))
+    assert cards.to_array(out) is out and out.sum() == 3
+
+
+def test_game_sets(seeded_positions):
+    game = seeded_positions(3, n_moves=1)[0]
+    for player in game.players:
+        assert player.hand_set == CardSet(
+            player.hand['occupations'] + player.hand['minor_improvements'])
+        assert len(player.hand_set) == 14
+        assert not player.played_set
+    assert game.major_improvement_set == CardSet(get_major_improvements())
+
+    player = game.players[0]
+    fireplace = game.major_improvements[0]
+    game.remove_major_improvement(fireplace)
+    player.add_played_card('major_improvements', fireplace)
+    occupation = player.hand['occupations'][-1]
+    player.set_hand('occupations', player.hand['occupations'][:-1])
+    player.add_played_card('occupations', occupation)
+    assert player.played_set == CardSet([fireplace, occupation])
+    assert occupation not in player.hand_set and len(player.hand_set) == 13
+    assert fireplace not in game.major_improvement_set
+
+    # The cards can only be changed through the methods that keep the sets.
+    with pytest.raises(AttributeError):
+        player.hand['occupations'].pop()
+    with pytest.raises(AttributeError):
+        player.occupations.append(occupation)
+    with pytest.raises(AttributeError):
+        game.major_improvements.remove(game.major_improvements[0])
+
+    # Copies of a game have the same sets.
+    copied = copy.deepcopy(game)
+    assert copied.players[0].played_set == player.played_set
+    assert copied.players[1].hand_set == game.players[1].hand_set
+
+    view = GameView(game, 1)
+    assert view.players[1].hand_set == game.players[1].hand_set
+    assert not view.players[0].hand_set
+    assert view.major_improvement_set == game.major_improvement_set
+
+
+def test_game_sets_follow_play(seeded_positions):
+    # The sets are kept up to date as cards are played, rather than rebuilt.
+    game = seeded_positions(2, seed=1, n_moves=1)[0]
+    agent = RandomAgent(1)
+    while not game.game_over:
+        game = apply_move(game, agent.choose_move(game))
+        for player in game.players:
+            assert player.hand_set == CardSet(
+                player.hand['occupations'] + player.hand['minor_improvements'])
+            assert player.played_set == CardSet(
+                player.occupations + player.minor_improvements + player.major_improvements)
+        assert game.major_improvement_set == CardSet(game.major_improvements)
+
+
+def test_card_set_errors():
+    with pytest.raises(IndexError):
+        card_name(len(catalogue()) + 100)
+    with pytest.raises(TypeError):
+        CardSet([None])
@@ -1,12 +1,14 @@
 import pytest
 
+from agricola import AgricolaImpossible
 from agricola.game import AgricolaGame, Deck
 from agricola.ui import _TestUI, _TestUIFinished
 from agricola.action import (
     GrainSeeds, VegetableSeeds, Forest, Lessons, MeetingPlace,
     ClayPit, ReedBank, TravelingPlayers, ResourceMarket2P, Fishing)
 from agricola.cards import (
-    Conjurer, StorehouseKeeper, Harpooner, CattleFeeder)
+    Conjurer, StorehouseKeeper, Harpooner, CattleFeeder, OrganicFarmer, MiniPasture)
+from agricola.player import Player
 
 
 class _TestAgricolaGame(AgricolaGame):
@@ -59,5 +61,32 @@ def test_trigger():
     assert _test_after.called
 
 
+def test_organic_farmer():
+    def points(pastures, **animals):
+        return OrganicFarmer().victory_points(Player('0', pastures=pastures, **animals))
+
+    small, large = [(0, 2), (0, 3)], [(1, 2), (1, 3), (1, 4)]
+    assert points([]) == 0
+    assert points([small]) == 0
+    assert points([small], sheep=1) == 1
+    # The second sheep can be kept in the house.
+    assert points([small], sheep=2) == 1
+    assert points([small], sheep=3) == 0
+    assert points([large], sheep=3) == 1
+    assert points([small, large], sheep=1, boar=1) == 2
+    assert points([small, large], sheep=2) == 2
+    assert points([small, large], sheep=1, boar=1, cattle=4) == 1
+
+
+def test_mini_pasture_without_space():
+    rooms = Player('0').room_spaces
+    fields = [(i, j) for i in range(3) for j in range(5) if (i, j) not in rooms]
+    player = Player('0', fields=fields, food=2)
+    assert not player.legal_spaces('pasture')
+    with pytest.raises(AgricolaImpossible):
+        MiniPasture().check_and_apply(player)
+    assert player.food == 2
+
+
 if __name__ == "__main__":
     test_trigger()
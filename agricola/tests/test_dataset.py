@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+
+from agricola import AgricolaException
+from agricola.action import (
+    DayLaborer, VegetableSeeds, Forest, SheepMarket, Lessons, ResourceMarket2P)
+from agricola.cards import StorehouseKeeper
+from agricola.choice import DiscreteChoice
+from agricola.game import AgricolaGame, Deck
+from agricola.search import RandomAgent, candidate_moves, successors
+from agricola.trajectory import unpack_masks
+from agricola.dataset import (
+    GameRecord, record_game, write_records, read_records, replay, codecs,
+    game_examples, export_examples)
+
+
+class _PromptGame(AgricolaGame):
+    def __init__(self, n_players=1):
+        actions = [
+            [Lessons(), ResourceMarket2P(), DayLaborer(), Forest()],
+            [VegetableSeeds()],
+            [SheepMarket()]]
+
+        super(_PromptGame, self).__init__(
+            actions, n_players, randomize=False,
+            occupations=Deck([StorehouseKeeper()], 1, shuffle=False))
+
+
+class _ClayAgent(RandomAgent):
+    """ Plays StorehouseKeeper, then the resource market, and always takes clay from it. """
+    def choose_move(self, game):
+        moves = [m for m, _ in successors(game, candidate_moves(game, self.max_list_length))]
+        for name in ('Lessons', 'ResourceMarket2P'):
+            for move in moves:
+                if move.name == name:
+                    return move
+        return super(_ClayAgent, self).choose_move(game)
+
+    def get_user_choice(self, name, choice_spec):
+        if isinstance(choice_spec, DiscreteChoice):
+            return choice_spec.options[0]
+        return super(_ClayAgent, self).get_user_choice(name, choice_spec)
+
+
+CONFIG = {'game': 'agricola.tests.games:SmallAgricolaGame', 'args': [2]}
+
+
+def _records(n, seed=0):
+    return [record_game(CONFIG, RandomAgent(seed + k), seed + k) for k in range(n)]
+
+
+def test_record_and_replay(tmpdir):
+    records = _records(3)
+    path = str(tmpdir.join('games.jsonl.gz'))
+    write_records(path, records)
+    loaded = list(read_records(path))
+    assert [r.to_json() for r in loaded] == [r.to_json() for r in records]
+
+    for record in loaded:
+        assert len(record) == 8
+        positions = list(replay(record))
+        assert len(positions) == 8
+        assert [m.name for _, m in positions] == [name for name, _ in record.moves]
+        assert record.prompts == [[] for _ in record.moves]
+
+    # Replaying leaves the global random state alone.
+    state = np.random.get_state()[1].copy()
+    list(replay(loaded[0]))
+    assert (np.random.get_state()[1] == state).all()
+
+
+def test_replay_checks():
+    record = _records(1)[0]
+    wrong_scores = GameRecord(
+        record.config, record.seed, record.first_player, record.moves,
+        [s + 1 for s in record.scores])
+    with pytest.raises(AgricolaException):
+        list(replay(wrong_scores))
+
+    truncated = GameRecord(record.config, record.seed, record.first_player, record.moves[:-1])
+    with pytest.raises(AgricolaException):
+        list(replay(truncated))
+
+    unknown = GameRecord(
+        record.config, record.seed, record.first_player,
+        [('Not An Action', [])] + record.moves[1:])
+    with pytest.raises(AgricolaException):
+        list(replay(unknown))
+
+
+def test_replay_prompts():
+    config = {'game': __name__ + ':_PromptGame', 'args': [1]}
+    record = GameRecord.from_json(record_game(config, _ClayAgent(0), 0).to_json())
+    assert [list(m) for m in record.moves[:2]] == [['Lessons', [0]], ['ResourceMarket2P', []]]
+    assert record.prompts[0] == [] and record.prompts[1] == [[0]]
+
+    # The answers to the prompts are replayed, and the default is not.
+    positions = [game for game, _ in replay(record)]
+    assert positions[2].players[0].clay == 1
+    assert positions[2].players[0].grain == 0
+
+    # Records without prompts are answered by default.
+    unanswered = GameRecord(config, record.seed, record.first_player, record.moves)
+    positions = [game for game, _ in replay(unanswered)]
+    assert positions[2].players[0].clay == 0
+    assert positions[2].players[0].grain == 1
+    assert unanswered.prompts == [[] for _ in record.moves]
+
+    extra = GameRecord(
+        config, record.seed, record.first_player, record.moves, record.scores,
+        [[[0]]] + record.prompts[1:])
+    with pytest.raises(AgricolaException):
+        list(replay(extra))
+
+
+def test_examples():
+    record = _records(1)[0]
+    encoder, index = codecs(CONFIG)
+    batch = game_examples(record, encoder, index)
+    assert len(batch) == 8 and list(batch.game_lengths) == [8]
+    assert batch.obs.shape == (8, encoder.size)
+
+    masks = unpack_masks(batch.masks, index.size)
+    assert masks[np.arange(8), batch.actions].all()
+    for (game, move), action, player in zip(replay(record), batch.actions, batch.players):
+        assert index.encode(game, move) == action
+        assert game.current_player_idx == player
+
+
+@pytest.mark.parametrize('n_workers', [0, 2])
+def test_export(tmpdir, n_workers):
+    records = _records(5)
+    paths = [str(tmpdir.join('a.jsonl')), str(tmpdir.join('b.jsonl.gz'))]
+    write_records(paths[0], records[:3])
+    write_records(paths[1], records[3:])
+
+    batches = list(export_examples(
+        paths, n_workers=n_workers, games_per_task=2, max_pending=1))
+    assert [len(b.game_lengths) for b in batches] == [2, 2, 1]
+    assert sum(len(b) for b in batches) == 5 * 8
+
+    encoder, index = codecs(CONFIG)
+    expected = [game_examples(r, encoder, index) for r in records]
+    actions = np.concatenate([b.actions for b in batches])
+    assert (actions == np.concatenate([e.actions for e in expected])).all()
+    obs = np.concatenate([b.obs for b in batches])
+    assert (obs == np.concatenate([e.obs for e in expected])).all()
+
+
+def test_export_errors(tmpdir):
+    records = _records(2)
+    bad = GameRecord(
+        records[0].config, records[0].seed, records[0].first_player,
+        records[0].moves, [-1, -1])
+    path = str(tmpdir.join('games.jsonl'))
+    write_records(path, [records[0], bad, records[1]])
+
+    batches = list(export_examples([path], n_workers=0))
+    assert len(batches) == 1
+    assert batches[0].skipped == 1 and len(batches[0]) == 16
+
+    with pytest.raises(AgricolaException):
+        list(export_examples([path], n_workers=0, errors='raise'))
+    with pytest.raises(ValueError):
+        list(export_examples([path], errors='ignore'))
@@ -0,0 +1,65 @@
+from agricola.search import apply_move, RandomAgent
+from agricola.determinize import Determinizer, determinize, unseen_cards
+
+
+def _names(cards):
+    return sorted(c.name for c in cards)
+
+
+def test_unseen_cards(seeded_positions):
+    game = seeded_positions(2, n_moves=1)[0]
+    observer = game.players[0]
+    card = game.players[1].hand['occupations'][0]
+    game.players[1].add_played_card('occupations', card)
+
+    pool = _names(unseen_cards(game, 'occupations', 0))
+    assert card.name not in pool
+    assert not set(pool) & set(_names(observer.hand['occupations']))
+    assert set(_names(game.players[1].hand['occupations'][1:])) <= set(pool)
+    assert len(pool) == len(game.occupations.cards) - 8
+
+
+def test_determinize_hands(seeded_positions):
+    """ Test that only the opponents' hands are resampled, from unseen cards. """
+    game = seeded_positions(3, n_moves=6)[-1]
+    samples = determinize(game, 20, observer_idx=0, seed=0)
+    assert len(samples) == 20
+
+    changed = False
+    for sample in samples:
+        assert sample.players[0].hand == game.players[0].hand
+        for kind in ['occupations', 'minor_improvements']:
+            pool = set(_names(unseen_cards(game, kind, 0)))
+            dealt = []
+            for i in [1, 2]:
+                hand = sample.players[i].hand[kind]
+                assert len(hand) == len(game.players[i].hand[kind])
+                dealt.extend(_names(hand))
+                changed |= _names(hand) != _names(game.players[i].hand[kind])
+            assert len(set(dealt)) == len(dealt)
+            assert set(dealt) <= pool
+    assert changed
+
+    # The original game is not modified.
+    assert samples[0].players[1].hand is not game.players[1].hand
+
+
+def test_determinize_schedule(seeded_positions):
+    """ Test that only unrevealed actions are reordered, within their stages. """
+    game = seeded_positions(2, n_moves=7)[-1]
+    revealed = game.round_schedule[:game.round_idx]
+    determinizer = Determinizer(game, shuffle_schedule=True, seed=0)
+
+    orders = set()
+    for sample in determinizer.sample(10):
+        assert sample.round_schedule[:game.round_idx] == revealed
+        assert (sorted((s, id(a)) for s, a in sample.round_schedule) ==
+                sorted((s, id(a)) for s, a in game.round_schedule))
+        for stage_idx, stage in enumerate(sample.action_order[1:], 1):
+            assert set(stage) == set(game.action_order[stage_idx])
+        orders.add(tuple(a.name for _, a in sample.round_schedule))
+    assert len(orders) > 1
+
+    sample = determinizer.sample(1)[0]
+    while not sample.game_over:
+        sample = apply_move(sample, RandomAgent(0).choose_move(sample))
@@ -0,0 +1,71 @@
+from agricola.game import play
+from agricola.search import successors, apply_move
+from agricola.endgame import EndgameSolver, EndgameAgent
+from agricola.tests.games import SmallAgricolaGame
+
+
+def _minimax(game, player_idx):
+    """ Value of ``game`` found by exhaustive search without pruning. """
+    if game.game_over:
+        return EndgameSolver.utility(game.score, player_idx)
+    values = [_minimax(child, player_idx) for _, child in successors(game)]
+    return max(values) if game.current_player_idx == player_idx else min(values)
+
+
+def test_endgame_solo(start):
+    """ Test that the solver finds the best final score in a solo game. """
+    game = start(1, n_moves=2)
+    solver = EndgameSolver(max_rounds=1)
+    assert solver.in_range(game)
+
+    result = solver.solve(game)
+    assert result.value == _minimax(game, 0)
+    assert result.scores[0] == result.value
+    assert result.stats.nodes > 0
+
+    final = game
+    for move in result.principal_variation:
+        final = apply_move(final, move)
+    assert final.game_over
+    assert final.score == result.scores
+
+
+def test_endgame_two_players(start):
+    """ Test that the solver agrees with exhaustive minimax for both players. """
+    game = start(2, n_moves=5)
+    for player_idx in range(2):
+        solver = EndgameSolver(max_rounds=1)
+        result = solver.solve(game, player_idx=player_idx)
+        assert result.value == _minimax(game, player_idx)
+
+        # Every position along the principal variation keeps the value.
+        assert result.principal_variation
+        line = game
+        for move in result.principal_variation:
+            line = apply_move(line, move)
+            assert _minimax(line, player_idx) == result.value
+
+    values = EndgameSolver(max_rounds=1).move_values(game)
+    assert max(v for _, v in values) == EndgameSolver(max_rounds=1).solve(game).value
+
+
+def test_endgame_out_of_range(start):
+    """ Test that the solver refuses positions too far from the end. """
+    game = start(1)
+    solver = EndgameSolver(max_rounds=1)
+    assert not solver.in_range(game)
+    try:
+        solver.solve(game)
+    except ValueError:
+        pass
+    else:
+        assert False, "Expected ValueError."
+
+
+def test_endgame_agent(start):
+    """ Test that an endgame agent achieves the solved score when playing a game. """
+    game = SmallAgricolaGame(1)
+    expected = EndgameSolver(max_rounds=2).solve(start(1)).value
+
+    game = play(game, EndgameAgent(max_rounds=2), first_player=0)
+    assert game.score[0] == expected
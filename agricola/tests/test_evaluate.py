@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from agricola.evaluate import (
+    HeuristicEvaluator, SCORE_WEIGHTS, FEATURES, RAW_FEATURES,
+    encode_game, encode_games, derive_features, fit_weights)
+from agricola.solo import SoloOptimizer
+
+
+def test_score_weights(seeded_positions):
+    """ Test that the score features reproduce Player.score. """
+    evaluator = HeuristicEvaluator(SCORE_WEIGHTS)
+    for n_players in [1, 3]:
+        for game in seeded_positions(n_players):
+            assert list(evaluator(game)) == [p.score() for p in game.players]
+
+
+def test_batch(seeded_positions):
+    positions = seeded_positions(2)
+    raw = encode_games(positions)
+    assert raw.shape == (len(positions), 2, len(RAW_FEATURES))
+    assert derive_features(raw).shape == (len(positions), 2, len(FEATURES))
+
+    evaluator = HeuristicEvaluator()
+    values = evaluator.evaluate(positions)
+    assert values.shape == (len(positions), 2)
+    assert np.allclose(values, evaluator.evaluate(raw))
+    for game, value in zip(positions, values):
+        assert np.allclose(evaluator(game), value)
+        assert np.allclose(evaluator.evaluate(encode_game(game)), value)
+
+    with pytest.raises(ValueError):
+        encode_games(positions[:1] + seeded_positions(1)[:1])
+
+
+def test_fit_weights(seeded_positions):
+    """ Test that fitting recovers the weights that generated the targets. """
+    raw = encode_games(seeded_positions(2) + seeded_positions(2, seed=1))
+    weights = dict(SCORE_WEIGHTS, sown=0.5)
+    targets = HeuristicEvaluator(weights).evaluate(raw)
+
+    features = sorted(weights)
+    fitted = fit_weights(raw, targets, ridge=0.0, features=features)
+    prediction = HeuristicEvaluator(fitted).evaluate(raw)
+    assert np.allclose(prediction, targets)
+
+
+def test_save_load(tmpdir):
+    path = str(tmpdir.join('weights.json'))
+    evaluator = HeuristicEvaluator(dict(SCORE_WEIGHTS, food_shortfall=-2.0))
+    evaluator.save(path)
+    loaded = HeuristicEvaluator.load(path)
+    assert loaded.weights == evaluator.weights
+
+    with pytest.raises(ValueError):
+        HeuristicEvaluator({'not_a_feature': 1.0})
+
+
+def test_solo_optimizer_with_evaluator(seeded_positions):
+    game = seeded_positions(1)[0]
+    result = SoloOptimizer(beam_width=2, evaluate=HeuristicEvaluator()).optimize(game)
+    assert result.complete
+    assert result.score is not None
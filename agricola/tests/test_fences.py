@@ -0,0 +1,65 @@
+import pytest
+
+from agricola import AgricolaNotEnoughResources
+from agricola.fences import get_fence_planner, pareto_pasture_layouts
+from agricola.player import Player, Pasture
+
+
+def test_fence_planner_empty_farm():
+    """ Test the Pareto front of pasture additions for a farm without pastures. """
+    player = Player("p0", wood=6)
+    layouts = pareto_pasture_layouts(player)
+
+    assert [(layout.cost, layout.n_spaces, layout.n_pastures) for layout in layouts] == [(4, 1, 1), (6, 2, 1)]
+
+    player = Player("p0", wood=3)
+    assert pareto_pasture_layouts(player) == []
+
+
+def test_fence_planner_costs():
+    """ Test that planned layouts can be built for exactly the planned amount of wood. """
+    players = [
+        dict(wood=15),
+        dict(wood=8, fences_avail=8, pastures=[[(2, 3), (2, 4)]]),
+        dict(wood=10, fences_avail=9, pastures=[[(1, 1)]], stables=[(1, 2), (0, 4)]),
+        dict(wood=12, fields=[(0, 1), (0, 2)], stables=[(2, 4)]),
+    ]
+
+    for kwargs in players:
+        player = Player("p0", **kwargs)
+        layouts = pareto_pasture_layouts(player)
+        assert layouts
+
+        for layout in layouts:
+            assert layout.cost <= min(player.wood, player.fences_avail)
+
+            p = Player("p0", **kwargs)
+            p.build_pastures([Pasture(spaces) for spaces in layout.pastures])
+            assert player.wood - p.wood == layout.cost
+
+            with pytest.raises(AgricolaNotEnoughResources):
+                p = Player("p0", **dict(kwargs, wood=layout.cost - 1))
+                p.build_pastures([Pasture(spaces) for spaces in layout.pastures])
+
+
+def test_fence_planner_pareto():
+    """ Test that no planned layout is dominated by another affordable layout. """
+    player = Player("p0", wood=9, stables=[(1, 3)])
+    planner = get_fence_planner(player.shape)
+    idx, cost, capacity = planner.candidates(player)
+    layouts = pareto_pasture_layouts(player)
+
+    for layout in layouts:
+        dominating = (
+            (cost <= layout.cost) &
+            (planner.n_spaces[idx] >= layout.n_spaces) &
+            (planner.n_pastures[idx] >= layout.n_pastures) &
+            (capacity >= layout.capacity))
+        strictly = (
+            (cost < layout.cost) |
+            (planner.n_spaces[idx] > layout.n_spaces) |
+            (planner.n_pastures[idx] > layout.n_pastures) |
+            (capacity > layout.capacity))
+        assert not (dominating & strictly).any()
+
+    assert max(layout.capacity for layout in layouts) == capacity.max()
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from agricola import AgricolaInvalidChoice
+from agricola.search import legal_moves, Move
+from agricola.indexing import ActionIndex
+
+
+def test_stable(seeded_positions):
+    """ Test that indices depend only on the configuration, not on the deal. """
+    a = ActionIndex(seeded_positions(2, seed=0, n_moves=1)[0])
+    b = ActionIndex(seeded_positions(2, seed=1, n_moves=1)[0])
+    assert a.size == b.size
+    assert a.action_names == b.action_names
+    assert [[d.values for d in domains] for domains in a._domains] == \
+        [[d.values for d in domains] for domains in b._domains]
+
+
+def test_round_trip(seeded_positions):
+    positions = seeded_positions(2, n_moves=20)
+    index = ActionIndex(positions[0])
+    for game in positions:
+        mask = index.legal_mask(game)
+        assert mask.shape == (index.size,) and mask.dtype == bool
+
+        legal = legal_moves(game)
+        indices = []
+        for move in legal:
+            try:
+                i = index.encode(game, move)
+            except AgricolaInvalidChoice:
+                continue
+            assert index.decode(game, i) == move
+            indices.append(i)
+        assert sorted(set(indices)) == list(np.flatnonzero(mask))
+
+        out = np.ones(index.size, dtype=bool)
+        assert index.legal_mask(game, out) is out
+        assert (out == mask).all()
+
+
+def test_errors(seeded_positions):
+    game = seeded_positions(2, n_moves=1)[0]
+    index = ActionIndex(game)
+    with pytest.raises(AgricolaInvalidChoice):
+        index.decode(game, index.size)
+    with pytest.raises(AgricolaInvalidChoice):
+        index.decode(game, -1)
+
+    # Several rooms at once are only indexed with a larger max_list_length.
+    idx = [a.name for a in game.actions_remaining].index('FarmExpansion')
+    move = Move(idx, (((0, 1), (0, 2)), None), 'FarmExpansion')
+    with pytest.raises(AgricolaInvalidChoice):
+        index.encode(game, move)
+    larger = ActionIndex(game, max_list_length=2)
+    assert larger.size > index.size
+    assert larger.decode(game, larger.encode(game, move)) == move
@@ -0,0 +1,86 @@
+from agricola.action import (
+    DayLaborer, Forest, FarmExpansion, Fencing, FarmRedevelopment, SheepMarket)
+from agricola.search import apply_move, candidate_moves, successors
+from agricola.macro import (
+    macro_moves, farm_expansion_options, connected_extensions, room_layouts)
+from agricola.mcts import MCTS
+
+ACTIONS = [[DayLaborer, Forest, FarmExpansion, Fencing, FarmRedevelopment], [SheepMarket]]
+COMPOUND = (FarmExpansion, Fencing, FarmRedevelopment)
+
+
+def _compound(game, moves):
+    return [m for m in moves if isinstance(game.actions_remaining[m.action_idx], COMPOUND)]
+
+
+def _is_noop(game, move):
+    choices = move.choices
+    if isinstance(game.actions_remaining[move.action_idx], FarmRedevelopment):
+        choices = choices[1:]
+    return all(c is None or c == () for c in choices)
+
+
+def test_connected_extensions():
+    shape = (3, 5)
+    free = set((i, j) for i in range(3) for j in range(5)) - {(0, 0), (1, 0)}
+    layouts = list(connected_extensions([(0, 0), (1, 0)], free, shape, 2))
+    assert [len(s) for s in layouts] == sorted(len(s) for s in layouts)
+    assert ((2, 0),) in layouts and ((0, 1),) in layouts
+    assert ((0, 1), (0, 2)) in layouts
+    assert ((0, 2),) not in layouts
+    assert all(len(s) <= 2 for s in layouts)
+
+
+def test_macro_moves_legal(start):
+    """ Test that every macro move is legal, and that it covers the legal candidate moves. """
+    game = start(2, actions=ACTIONS, wood=12, clay=6, reed=4, stone=4)
+    while not game.game_over:
+        moves = list(macro_moves(game))
+        assert len(set(moves)) == len(moves)
+        compound = _compound(game, moves)
+        for move in compound:
+            apply_move(game, move)
+            assert ': ' in move.name
+
+        legal = _compound(game, [m for m, _ in successors(game, candidate_moves(game, 2))])
+        assert set(m for m in legal if not _is_noop(game, m)) <= set(compound)
+
+        # Alternate between taking a compound action and a simple one.
+        move = compound[0] if compound and game.round_idx % 2 else moves[0]
+        game = apply_move(game, move)
+
+
+def test_farm_expansion_options(start):
+    game = start(1, actions=ACTIONS, wood=10, reed=4)
+    player = game.players[0]
+    options = list(farm_expansion_options(player))
+    values = [o.value for o in options]
+    assert values == sorted(values, reverse=True)
+    assert len(set(o.choices for o in options)) == len(options)
+    assert (None, None) not in [o.choices for o in options]
+
+    # Two new rooms cost 10 wood and 4 reed; a third is not affordable.
+    assert max(len(r) for r in room_layouts(player)) == 2
+    assert options[0].label.startswith("rooms at ")
+
+    for option in options:
+        rooms, stables = option.choices
+        n_rooms, n_stables = len(rooms or ()), len(stables or ())
+        assert option.value == 2.0 * n_rooms + 1.0 * n_stables
+        assert 5 * n_rooms + 2 * n_stables <= player.wood
+
+
+def test_max_options(start):
+    game = start(1, actions=ACTIONS, wood=10, reed=4)
+    idx = [isinstance(a, FarmExpansion) for a in game.actions_remaining].index(True)
+    moves = [m for m in macro_moves(game, max_options=3) if m.action_idx == idx]
+    assert len(moves) == 3
+    best = [o.choices for o in farm_expansion_options(game.players[0])][:3]
+    assert [m.choices for m in moves] == best
+
+
+def test_mcts_with_macro_moves(start):
+    game = start(1, actions=ACTIONS, wood=10, reed=4)
+    root = MCTS(n_simulations=20, seed=0, move_generator=macro_moves).search(game)
+    assert set(root.moves) <= set(macro_moves(game))
+    apply_move(game, root.best_child().move)
@@ -0,0 +1,42 @@
+from agricola.game import play
+from agricola.search import legal_moves
+from agricola.endgame import EndgameSolver
+from agricola.mcts import MCTS, MCTSAgent, win_reward
+from agricola.tests.games import SmallAgricolaGame
+
+
+def test_win_reward():
+    assert list(win_reward({0: 5, 1: 3})) == [1.0, 0.0]
+    assert list(win_reward({0: 5, 1: 5, 2: 1})) == [0.5, 0.5, 0.0]
+    assert list(win_reward({0: 50}, solo_scale=100.0)) == [0.5]
+
+
+def test_mcts_tree(start):
+    """ Test that visit counts in the tree are consistent. """
+    game = start(2, n_moves=4)
+    mcts = MCTS(n_simulations=50, seed=0)
+    root = mcts.search(game)
+
+    assert mcts.stats.simulations == 50
+    assert mcts.stats.simulations_per_sec > 0
+    assert root.visits == 50
+    assert sum(c.visits for c in root.children) == 50
+    assert len(set(root.moves)) == len(root.moves)
+    assert set(root.moves) <= set(legal_moves(game))
+
+
+def test_mcts_finds_best_move(start):
+    """ Test that MCTS finds an optimal final move in a solo game. """
+    game = start(1, n_moves=3)
+    values = dict(EndgameSolver(max_rounds=1).move_values(game))
+
+    move = MCTSAgent(n_simulations=200, seed=0).choose_move(game)
+    assert values[move] == max(values.values())
+
+
+def test_mcts_agent_plays_game():
+    """ Test that an MCTS agent can play a complete game. """
+    agent = MCTSAgent(n_simulations=5, seed=0)
+    game = play(SmallAgricolaGame(2), agent, first_player=0)
+    assert game.game_over
+    assert agent.stats.simulations == 5
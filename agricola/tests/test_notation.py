@@ -0,0 +1,76 @@
+import pytest
+
+from agricola.game import StandardAgricolaGame
+from agricola.search import apply_move, search_copy, state_key
+from agricola.cards import CardSet
+from agricola.notation import serialize, parse
+from agricola.scenario import build_scenario
+from agricola.tests.games import SmallAgricolaGame
+
+
+@pytest.mark.parametrize('n_players', [1, 2, 4])
+def test_round_trip(n_players, seeded_positions):
+    for game, move in seeded_positions(n_players, seed=n_players, n_moves=60, first_player=None, moves=True):
+        text = serialize(game)
+        parsed = search_copy(parse(text, StandardAgricolaGame(n_players)))
+        assert serialize(parsed) == text
+        assert state_key(parsed) == state_key(game)
+        assert [a.name for _, a in parsed.round_schedule] == [
+            a.name for _, a in game.round_schedule]
+        for deck in ('occupations', 'minor_improvements'):
+            assert CardSet(getattr(parsed, deck).cards) == CardSet(getattr(game, deck).cards)
+
+        # The parsed position plays on like the original.
+        child, parsed_child = apply_move(game, move), apply_move(parsed, move)
+        assert state_key(parsed_child) == state_key(child)
+
+
+def test_round_trip_played_cards():
+    # Cards that plow, fence or give goods when played are not played again.
+    game = build_scenario(StandardAgricolaGame(2), 5, [
+        dict(
+            fields=[(0, 2), (0, 3)], pastures=[[(2, 4)]], fences_avail=11, wood=2,
+            occupations=['Consultant'],
+            minor_improvements=['ShiftingCultivation', 'MiniPasture']),
+        {}], seed=0)
+    text = serialize(search_copy(game))
+    parsed = search_copy(parse(text, StandardAgricolaGame(2)))
+    assert serialize(parsed) == text
+    assert state_key(parsed) == state_key(search_copy(game))
+    assert parsed.players[0].fields == 2 and parsed.players[0].pastures == 1
+
+
+def test_fixture():
+    game = search_copy(parse(
+        '1:1:1 2,3 0.0 -,-,-3,-,- '
+        'w/21/1-//0/0,0,0,0,0,0,0,0,0,0/2,3,15,4/// '
+        'c/421///8/2,1,0,0,1,0,0,1,0,0/3,2,15,3///',
+        SmallAgricolaGame()))
+    assert game.round_idx == 1 and game.current_player_idx == 1
+    assert [a.name for a in game.actions_remaining] == [
+        'DayLaborer', 'GrainSeeds', 'Forest', 'Farmland', 'VegetableSeeds']
+    assert game.actions_remaining[2].resources == dict(wood=3)
+    first, second = game.players
+    assert first.fields == 1 and first.rooms == 2
+    assert second.house_type == 'clay' and second.rooms == 3 and second.people == 3
+    assert list(second.stable_spaces) == [(0, 3)]
+    assert game.player_turns == [2, 3]
+    assert second.food == 2 and second.wood == 1 and second.sheep == 1
+
+
+def test_invalid(seeded_positions):
+    game = seeded_positions(2, n_moves=6, first_player=None)[5]
+    text = serialize(game)
+    fields = text.split()
+    with pytest.raises(ValueError):
+        parse(' '.join(fields[:-1]), StandardAgricolaGame(2))
+    with pytest.raises(ValueError):
+        parse(' '.join(fields[:3] + ['-'] + fields[4:]), StandardAgricolaGame(2))
+    with pytest.raises(ValueError):
+        parse(' '.join(fields[:-1] + ['w/3']), StandardAgricolaGame(2))
+    with pytest.raises(ValueError):
+        parse(text.replace('/', '/9z', 1), StandardAgricolaGame(2))
+
+    game.current_player_idx = None
+    with pytest.raises(ValueError):
+        serialize(game)
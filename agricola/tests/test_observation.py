@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from agricola.observation import ObservationEncoder, PLAYER_FEATURES
+
+
+def test_layout(seeded_positions):
+    positions = seeded_positions(2, n_moves=30)
+    encoder = ObservationEncoder(positions[0])
+    offsets = [offset for offset, _ in encoder.layout.values()]
+    assert offsets == sorted(offsets) and offsets[0] == 0
+    assert encoder.size == sum(int(np.prod(s)) for _, s in encoder.layout.values())
+
+    out = encoder.empty(3)
+    out[:] = -1
+    row = encoder.encode(positions[-1], out, 1)
+    assert np.shares_memory(row, out)
+    assert (out[0] == -1).all() and (out[2] == -1).all()
+
+    game = positions[-1]
+    features = encoder.view(row, 'player')
+    for k, player in enumerate(game.players[game.current_player_idx:] +
+                               game.players[:game.current_player_idx]):
+        assert features[k, PLAYER_FEATURES.index('wood')] == player.wood
+        assert features[k, PLAYER_FEATURES.index('sheep')] == player.sheep
+        assert encoder.view(row, 'farm')[k, 0].sum() == len(player._rooms)
+        assert encoder.view(row, 'hand')[k].sum() == sum(len(c) for c in player.hand.values())
+    assert encoder.view(row, 'supply').sum() == len(game.major_improvements)
+    assert encoder.view(row, 'actions')[:, 0].sum() == len(game.active_actions)
+    assert encoder.view(row, 'round').sum() == 2
+
+
+def test_batch(seeded_positions):
+    positions = seeded_positions(3, n_moves=30)
+    encoder = ObservationEncoder(positions[0])
+    out = encoder.empty(len(positions) + 2)
+    rows = encoder.encode_batch(positions, out)
+    assert rows.shape == (len(positions), encoder.size)
+    assert np.shares_memory(rows, out)
+
+    single = encoder.empty(1)
+    for game, row in zip(positions, rows):
+        assert (encoder.encode(game, single) == row).all()
+
+    with pytest.raises(ValueError):
+        encoder.encode_batch(positions, encoder.empty(len(positions) - 1))
+    with pytest.raises(ValueError):
+        encoder.encode(seeded_positions(2, n_moves=30)[0], out)
+
+
+def test_point_of_view(seeded_positions):
+    """ Test that the per-player blocks are rotated to the point of view. """
+    game = seeded_positions(3, n_moves=30)[-1]
+    encoder = ObservationEncoder(game)
+    out = encoder.empty(3)
+    for p in range(3):
+        encoder.encode(game, out, p, player_idx=p)
+    for p in range(3):
+        for name in ['farm', 'player', 'hand', 'played']:
+            assert (encoder.view(out[p], name)[(3 - p) % 3] ==
+                    encoder.view(out[0], name)[0]).all()
+    assert (encoder.view(out[0], 'supply') == encoder.view(out[1], 'supply')).all()
@@ -0,0 +1,39 @@
+from agricola.search import legal_moves
+from agricola.parallel import ParallelMCTS, ParallelMCTSAgent, scaling_benchmark
+
+
+def test_root_parallel(start):
+    """ Test that root parallel search merges the statistics of all workers. """
+    game = start(2)
+    with ParallelMCTS(2, 'root', n_simulations=8, seed=0) as search:
+        statistics = search.search(game)
+        assert search.stats.simulations == 8
+
+    assert sum(statistics.visits.values()) == 8
+    assert set(statistics.visits) <= set(legal_moves(game))
+    assert statistics.best_move() in statistics.visits
+
+
+def test_tree_parallel(start):
+    """ Test that virtual loss is fully removed once all rollouts have returned. """
+    game = start(2)
+    with ParallelMCTS(2, 'tree', n_simulations=10, virtual_loss=3, seed=0) as search:
+        statistics = search.search(game)
+        root = search.last_root
+
+    assert search.stats.simulations == 10
+    assert root.visits == 10
+    assert sum(statistics.visits.values()) == 10
+
+
+def test_parallel_agent_and_benchmark(start):
+    game = start(1)
+    agent = ParallelMCTSAgent(2, 'tree', n_simulations=4, seed=0)
+    try:
+        assert agent.choose_move(game) in legal_moves(game)
+    finally:
+        agent.close()
+
+    results = scaling_benchmark(game, worker_counts=(1, 2), time_budget=0.2, seed=0)
+    assert [n for n, _ in results] == [1, 2]
+    assert all(rate > 0 for _, rate in results)
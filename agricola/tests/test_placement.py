@@ -0,0 +1,80 @@
+import copy
+import itertools
+
+from agricola import AgricolaException
+from agricola.player import Player, Pasture
+from agricola.search import space_lists
+
+
+def _brute_force_legal(player, kind, n=1):
+    """ Sets of ``n`` spaces where placing objects of type ``kind`` succeeds on a copy of ``player``. """
+    legal = []
+    all_spaces = itertools.product(range(player.shape[0]), range(player.shape[1]))
+    for spaces in itertools.combinations(all_spaces, n):
+        p = copy.deepcopy(player)
+        p.change_state("Add resources.", change=dict(wood=20, reed=10))
+        try:
+            if kind == 'room':
+                p.build_rooms(list(spaces))
+            elif kind == 'field':
+                p.plow_fields(list(spaces))
+            elif kind == 'stable':
+                p.build_stables(list(spaces), 0)
+            else:
+                p.build_pastures([Pasture(list(spaces))])
+        except AgricolaException:
+            continue
+        legal.append(spaces[0] if n == 1 else spaces)
+    return legal
+
+
+def test_placement_masks():
+    """ Test that placement masks agree with attempting each placement. """
+    players = [
+        Player("p0"),
+        Player("p0", rooms=[]),
+        Player("p0", fields=[(0, 1), (0, 2)], stables=[(2, 4)]),
+        Player("p0", pastures=[[(2, 3), (2, 4)], [(1, 4)]], stables=[(2, 4), (2, 2)]),
+        Player("p0", rooms=[(0, 0), (0, 1), (1, 1)], fields=[(2, 0)], pastures=[[(0, 4)]]),
+    ]
+
+    for player in players:
+        for kind in ['room', 'field', 'stable', 'pasture']:
+            assert player.legal_spaces(kind) == _brute_force_legal(player, kind)
+            assert player.placement_mask(kind).sum() == len(player.legal_spaces(kind))
+
+
+def test_placement_masks_update():
+    """ Test that placement masks are updated when the farmyard changes. """
+    player = Player("p0", wood=20, reed=10)
+    assert player.legal_spaces('room') == [(0, 1), (1, 1), (2, 0)]
+    assert (2, 0) in player.legal_spaces('field')
+
+    player.build_rooms([(2, 0)])
+    assert player.legal_spaces('room') == [(0, 1), (1, 1), (2, 1)]
+    assert (2, 0) not in player.legal_spaces('field')
+
+    player.plow_fields([(0, 3)])
+    assert player.legal_spaces('field') == [(0, 2), (0, 4), (1, 3)]
+
+    player.build_pastures([Pasture([(2, 4)])])
+    assert player.legal_spaces('pasture') == [(1, 4), (2, 3)]
+    assert (2, 4) in player.legal_spaces('stable')
+
+
+def test_space_lists():
+    """ Test that the lists of rooms and stables offered to searches are all the legal ones. """
+    players = [
+        Player("p0"),
+        Player("p0", fields=[(0, 1), (0, 2)], stables=[(2, 4)]),
+        Player("p0", pastures=[[(2, 3), (2, 4)], [(1, 4)]], stables=[(2, 4), (2, 2)]),
+    ]
+
+    for player in players:
+        for kind in ['room', 'stable']:
+            lists = list(space_lists(player, kind, 2))
+            assert [s[0] for s in lists if len(s) == 1] == player.legal_spaces(kind)
+            assert [s for s in lists if len(s) == 2] == sorted(_brute_force_legal(player, kind, 2))
+
+    # A second room need only be next to the first new one.
+    assert ((0, 1), (0, 2)) in space_lists(Player("p0"), 'room', 2)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from agricola import AgricolaException
+from agricola.mcts import MCTSAgent
+from agricola.search import candidate_moves
+from agricola.rollout import RolloutGame, RolloutPolicy, fuzz
+
+
+@pytest.mark.parametrize("n_players", [1, 2, 3, 4])
+def test_fuzz(n_players):
+    """ Test that the rollout engine agrees with the full engine on random games. """
+    assert fuzz(n_games=1, n_players=n_players, seed=n_players) > 0
+
+
+def test_fuzz_simple():
+    assert fuzz(n_games=1, n_players=2, seed=0, simple=True) > 0
+
+
+def test_unsupported(seeded_positions):
+    with pytest.raises(ValueError):
+        RolloutGame.from_game(seeded_positions(2, n_moves=1, first_player=None)[0])
+
+
+def test_illegal_move(seeded_positions):
+    """ Test that an illegal move leaves the rollout game unchanged. """
+    game = seeded_positions(2, n_moves=1, first_player=None, family=True)[0]
+    fast = RolloutGame.from_game(game)
+    key = fast.key()
+    for move in candidate_moves(game):
+        if not fast.is_legal(move):
+            with pytest.raises(AgricolaException):
+                fast.apply(move)
+            assert fast.key() == key
+            break
+    else:
+        assert False, "Expected an illegal candidate move."
+
+
+def test_playout(seeded_positions):
+    game = seeded_positions(3, n_moves=1, first_player=None, family=True)[0]
+    fast = RolloutGame.from_game(game)
+    key = fast.key()
+
+    scores = RolloutPolicy(0).playout(game)
+    assert sorted(scores) == [0, 1, 2]
+    assert RolloutGame.from_game(game).key() == key
+    assert not game.game_over
+
+    copy = fast.copy()
+    assert copy.playout(np.random.RandomState(1)) == copy.score
+    assert copy.game_over
+    assert fast.key() == key
+
+
+def test_mcts_rollout_policy(seeded_positions):
+    game = seeded_positions(2, n_moves=1, first_player=None, family=True)[0]
+    agent = MCTSAgent(n_simulations=20, seed=0, rollout_policy=RolloutPolicy(0))
+    move = agent.choose_move(game)
+    assert move in set(candidate_moves(game))
+    assert agent.stats.simulations == 20
@@ -0,0 +1,125 @@
+import pytest
+
+from agricola import AgricolaException
+from agricola.cards import BigCountry
+from agricola.evaluate import RESOURCES
+from agricola.game import StandardAgricolaGame
+from agricola.search import RandomAgent, apply_move, search_copy
+from agricola.scenario import build_scenario, random_scenario, curriculum
+
+
+def _play_out(game, seed=0):
+    game = search_copy(game)
+    agent = RandomAgent(seed)
+    while not game.game_over:
+        game = apply_move(game, agent.choose_move(game))
+    return game
+
+
+def test_build_scenario():
+    game = StandardAgricolaGame(2)
+    schedule = [a.name for stage in game.actions[1:] for a in stage]
+    players = [
+        dict(
+            house_type='clay', rooms=[(0, 0), (1, 0), (2, 0)], people=3, people_avail=2,
+            fields=[(0, 2), (0, 3)], sown={(0, 2): ('grain', 2)},
+            pastures=[[(2, 3), (2, 4)]], fences_avail=9, wood=4, sheep=3,
+            major_improvements=['Fireplace(clay=2)'], occupations=['PaperMaker']),
+        dict(hand=dict(occupations=['WoodCutter'], minor_improvements=[])),
+    ]
+    game = build_scenario(
+        game, 8, players, first_player=1, schedule=schedule,
+        stocks={'Forest': dict(wood=5)}, seed=0)
+
+    assert game.round_idx == 8 and game.stage_idx == 3
+    assert game.current_player_idx == 1
+    assert [a.name for a in game.active_actions][-8:] == schedule[:8]
+    forest = [a for a in game.active_actions if a.name == 'Forest'][0]
+    assert forest.resources == dict(wood=8)
+
+    first, second = game.players
+    assert first.house_type == 'clay' and first.rooms == 3 and first.people == 3
+    assert first.grain_fields == 1 and first.sheep == 3 and first.pastures == 1
+    assert [c.name for c in first.occupations] == ['PaperMaker']
+    assert len(first.hand['occupations']) == 6
+    assert [c.name for c in second.hand['occupations']] == ['WoodCutter']
+    assert first.bread_rates != [0]
+    names = [m.name for m in game.major_improvements]
+    assert len(names) == len(StandardAgricolaGame(2).major_improvements) - 1
+    assert not any(
+        c.name in ('PaperMaker', 'WoodCutter') for c in first.hand['occupations'])
+
+    assert _play_out(game, seed=1).game_over
+
+
+def test_build_scenario_errors():
+    with pytest.raises(ValueError):
+        build_scenario(StandardAgricolaGame(2), 15)
+    with pytest.raises(ValueError):
+        build_scenario(StandardAgricolaGame(2), 1, players=[{}])
+    with pytest.raises(ValueError):
+        build_scenario(StandardAgricolaGame(2), 1, players=[dict(occupations=['NoSuchCard']), {}])
+    # Accumulation spaces must have been revealed.
+    with pytest.raises(ValueError):
+        build_scenario(StandardAgricolaGame(2), 1, stocks={'CattleMarket': dict(cattle=1)})
+    # Farmyards are validated by Player.
+    with pytest.raises(AgricolaException):
+        build_scenario(StandardAgricolaGame(2), 1, players=[dict(rooms=[(0, 0), (2, 2)]), {}])
+    with pytest.raises(AgricolaException):
+        build_scenario(StandardAgricolaGame(2), 1, players=[dict(sheep=5), {}])
+
+
+def test_played_cards_keep_spec():
+    # Cards that give goods, plow, fence or place goods on round spaces when
+    # they are played do not do it again.
+    spec = dict(fields=[(0, 2)], wood=1, clay=1)
+    cards = dict(
+        occupations=['Consultant', 'Groom'],
+        minor_improvements=['ShiftingCultivation', 'MiniPasture', 'MiningHammer'],
+        major_improvements=['Well'])
+    game = build_scenario(StandardAgricolaGame(2), 5, [dict(spec, **cards), {}])
+    plain = build_scenario(StandardAgricolaGame(2), 5, [spec, {}])
+
+    player, expected = game.players[0], plain.players[0]
+    assert [tuple(f.space) for f in player._fields] == [(0, 2)]
+    assert player.pastures == 0
+    assert [getattr(player, r) for r in RESOURCES] == [getattr(expected, r) for r in RESOURCES]
+    assert not any(player.futures.values())
+
+    # Their lasting effects are in play.
+    assert [c.name for c in player.occupations] == cards['occupations']
+    assert any(c.name == 'Groom' for c in player.listeners['start_round'])
+    assert any(c.name == 'MiningHammer' for c in player.listeners['renovation'])
+
+
+def test_played_cards_keep_state():
+    full = dict(fields=[(i, j) for i in range(3) for j in range(2, 5)] + [(2, 0), (2, 1)])
+    played = [BigCountry(rounds_remaining=8)]
+    game = build_scenario(
+        StandardAgricolaGame(2), 10, [dict(full, minor_improvements=played), {}])
+    assert game.players[0].minor_improvements[0].victory_points(game.players[0]) == 8
+    assert played[0]._rounds_remaining == 8
+
+    # Given by name, the card is taken to have been played at the start of the round.
+    game = build_scenario(
+        StandardAgricolaGame(2), 10, [dict(full, minor_improvements=['BigCountry']), {}])
+    assert game.players[0].minor_improvements[0].victory_points(game.players[0]) == game.rounds_remaining
+
+
+@pytest.mark.parametrize('round_idx', [1, 6, 14])
+def test_random_scenario(round_idx):
+    for seed in range(3):
+        game = random_scenario(StandardAgricolaGame(3), round_idx, seed=seed)
+        assert game.round_idx == round_idx
+        assert len(game.active_actions) == len(game.actions[0]) + round_idx
+        assert _play_out(game, seed).game_over
+
+        same = random_scenario(StandardAgricolaGame(3), round_idx, seed=seed)
+        assert [str(p) for p in same.players] == [str(p) for p in game.players]
+
+
+def test_curriculum():
+    rounds = [14, 14, 12, 10]
+    games = list(curriculum(lambda: StandardAgricolaGame(2), rounds, seed=0))
+    assert [g.round_idx for g in games] == rounds
+    assert [str(g.players[0]) for g in games[:2]] != [str(games[0].players[0])] * 2
@@ -0,0 +1,49 @@
+from agricola.action import (
+    DayLaborer, GrainSeeds, VegetableSeeds, Forest, Farmland, ReedBank)
+from agricola.search import apply_move
+from agricola.endgame import EndgameSolver
+from agricola.solo import setup_solo_game, SoloOptimizer
+from agricola.tests.games import SmallAgricolaGame
+
+
+def _solo_game():
+    return SmallAgricolaGame(
+        1, [[DayLaborer, GrainSeeds, Forest, Farmland], [VegetableSeeds, ReedBank]],
+        randomize=True)
+
+
+def _replay(game, moves):
+    for move in moves:
+        game = apply_move(game, move)
+    return game
+
+
+def test_setup_solo_game():
+    """ Test that the schedule given to a solo game is respected. """
+    game = setup_solo_game(
+        _solo_game(), schedule=['ReedBank', 'VegetableSeeds'])
+    assert [a.name for _, a in game.round_schedule] == ['ReedBank', 'VegetableSeeds']
+    assert game.round_idx == 1
+    assert game.current_player_idx == 0
+
+
+def test_solo_optimizer_exhaustive():
+    """ Test that a wide enough beam finds the optimal solo game. """
+    game = setup_solo_game(
+        _solo_game(), schedule=['VegetableSeeds', 'ReedBank'])
+
+    result = SoloOptimizer(beam_width=10000).optimize(game)
+    assert result.complete
+    assert result.stats.nodes > 0
+    assert result.score == EndgameSolver(max_rounds=2).solve(game).value
+    assert _replay(game, result.moves).score[0] == result.score
+
+
+def test_solo_optimizer_budget():
+    """ Test that a search that runs out of time still returns a complete game. """
+    game = setup_solo_game(_solo_game())
+    result = SoloOptimizer(beam_width=2, time_budget=0.0).optimize(game)
+    assert not result.complete
+    final = _replay(game, result.moves)
+    assert final.game_over
+    assert final.score[0] == result.score
@@ -0,0 +1,61 @@
+import pytest
+
+from agricola import AgricolaException
+from agricola.game import play
+from agricola.search import RandomAgent, legal_moves, candidate_moves
+from agricola.speculate import Speculator, interleaved_moves
+from agricola.tests.games import SmallAgricolaGame
+
+
+class _SlowAgent(RandomAgent):
+    """ RandomAgent that only decides once the speculator has finished, like a slow human. """
+    def __init__(self, speculator, seed=None):
+        super(_SlowAgent, self).__init__(seed)
+        self.speculator = speculator
+
+    def get_action(self, name, actions_remaining):
+        if self.speculator is not None:
+            self.speculator._thread.join()
+        return super(_SlowAgent, self).get_action(name, actions_remaining)
+
+
+def test_interleaved_moves(start):
+    game = start(2)
+    moves = list(interleaved_moves(game))
+    assert sorted(moves, key=hash) == sorted(candidate_moves(game), key=hash)
+    n_actions = len(set(m.action_idx for m in moves))
+    assert [m.action_idx for m in moves[:n_actions]] == list(range(n_actions))
+
+
+def test_lookup(start):
+    """ Test that computed moves are found, and illegal ones raise. """
+    game = start(2)
+    speculator = Speculator()
+    speculator.start(game)
+    speculator._thread.join()
+
+    legal = set(legal_moves(game))
+    for move in candidate_moves(game):
+        action, choices = move.resolve(game)
+        if move in legal:
+            child = speculator.lookup(game, action, choices)
+            assert child.actions_taken and child.current_player_idx != game.current_player_idx
+            assert child.ui is game.ui
+        else:
+            with pytest.raises(AgricolaException):
+                speculator.lookup(game, action, choices)
+    assert speculator.stats.misses == 0
+    assert speculator.stats.computed == len(list(candidate_moves(game)))
+
+
+def test_play_with_speculator():
+    """ Test that speculation does not change the course of a game. """
+    expected = play(SmallAgricolaGame(2), _SlowAgent(None, seed=0), first_player=0)
+
+    speculator = Speculator()
+    game = play(
+        SmallAgricolaGame(2), _SlowAgent(speculator, seed=0),
+        first_player=0, speculator=speculator)
+    assert game.score == expected.score
+    assert speculator.stats.hits > 0
+    assert speculator.stats.misses == 0
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from agricola.game import play
+from agricola.search import (
+    AnytimeAgent, RandomAgent, SearchTimeout, legal_moves)
+from agricola.endgame import EndgameSolver
+from agricola.mcts import MCTSAgent
+from agricola.tests.games import SmallAgricolaGame
+
+
+class _CountingMixin(object):
+    timeouts = 0
+
+    def action_timed_out(self, name):
+        super(_CountingMixin, self).action_timed_out(name)
+        self.timeouts += 1
+
+
+class _SlowAgent(_CountingMixin, RandomAgent):
+    """ RandomAgent that always takes longer than it is allowed to. """
+    def choose_move(self, game):
+        time.sleep(0.05)
+        return super(_SlowAgent, self).choose_move(game)
+
+
+class _TimedMCTSAgent(_CountingMixin, MCTSAgent):
+    pass
+
+
+class _StubbornAgent(_CountingMixin, RandomAgent):
+    """ RandomAgent that works on each decision until it is cancelled. """
+    active = 0
+    overlaps = 0
+    cancellations = 0
+
+    def choose_move(self, game):
+        self.active += 1
+        self.overlaps += self.active > 1
+        try:
+            while not self.cancelled():
+                time.sleep(0.001)
+            self.cancellations += 1
+            return super(_StubbornAgent, self).choose_move(game)
+        finally:
+            self.active -= 1
+
+
+class _HungAgent(_CountingMixin, RandomAgent):
+    """ RandomAgent that ignores cancellation and does not return until released. """
+    calls = 0
+
+    def __init__(self, seed=None):
+        super(_HungAgent, self).__init__(seed)
+        self.release = threading.Event()
+
+    def choose_move(self, game):
+        self.calls += 1
+        self.release.wait()
+        return super(_HungAgent, self).choose_move(game)
+
+
+class _CountingAgent(AnytimeAgent):
+    """ Yields ever larger indices into the legal moves. """
+    def improve(self, game):
+        moves = legal_moves(game)
+        for i in range(len(moves)):
+            time.sleep(0.01)
+            yield moves[i]
+
+
+def test_anytime_agent(start):
+    """ Test that an anytime agent returns its best move so far at the deadline. """
+    game = start(2)
+    agent = _CountingAgent(margin=0.0)
+    assert agent.choose_move(game) == legal_moves(game)[-1]
+
+    agent.set_deadline(time.perf_counter() + 0.015)
+    move = agent.choose_move(game)
+    assert move in legal_moves(game)[:2]
+
+
+def test_fallback_on_timeout():
+    """ Test that a player who runs out of time has the fallback move played. """
+    agent = _SlowAgent(seed=0)
+    game = play(SmallAgricolaGame(2), agent, first_player=0, time_budget=0.01, grace=1.0)
+    assert game.game_over
+    # Two rounds, with two players placing two people each.
+    assert agent.timeouts == 8
+
+
+def test_cancel_on_timeout():
+    """ Test that decisions that run out of time are cancelled and waited for. """
+    agent = _StubbornAgent(seed=0)
+    game = play(SmallAgricolaGame(2), agent, first_player=0, time_budget=0.01, grace=1.0)
+    assert game.game_over
+    assert agent.timeouts == agent.cancellations == 8
+    # The agent was never working on two decisions at once, and has stopped.
+    assert agent.overlaps == 0 and agent.active == 0
+    assert agent._pending is None and not agent.cancelled()
+
+
+def test_drop_hung_interface():
+    """ Test that an interface that does not stop when cancelled is dropped, and the fallback plays on. """
+    agent = _HungAgent(seed=0)
+    start = time.perf_counter()
+    try:
+        game = play(SmallAgricolaGame(2), agent, first_player=0, time_budget=0.05)
+    finally:
+        agent.release.set()
+    assert game.game_over
+    assert time.perf_counter() - start < 2.0
+    # Only the first decision was asked of the agent, and it was not told of
+    # the timeout while it was still deciding.
+    assert agent.calls == 1
+    assert agent.timeouts == 0
+
+
+def test_anytime_agent_meets_deadline():
+    """ Test that an MCTS agent with a large simulation budget stops at the deadline. """
+    agent = _TimedMCTSAgent(n_simulations=10**6, seed=0)
+    start = time.perf_counter()
+    game = play(SmallAgricolaGame(2), agent, first_player=0, time_budget=0.2)
+    assert game.game_over
+    assert agent.timeouts == 0
+    assert time.perf_counter() - start < 8 * 0.2 + 1.0
+
+
+def test_endgame_solver_deadline(start):
+    game = start(1)
+    with pytest.raises(SearchTimeout):
+        EndgameSolver(max_rounds=3).solve(game, deadline=time.perf_counter())
+    result = EndgameSolver(max_rounds=3).solve(game, deadline=time.perf_counter() + 60)
+    assert result.move is not None
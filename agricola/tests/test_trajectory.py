@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from agricola.game import setup_game, advance, play
+from agricola.search import RandomAgent
+from agricola.observation import ObservationEncoder
+from agricola.indexing import ActionIndex
+from agricola.trajectory import TrajectoryWriter, TrajectoryReader, RecordingAgent
+from agricola.vecenv import VectorEnv
+from agricola.tests.games import SmallAgricolaGame
+
+
+def test_shards(tmpdir):
+    """ Test that interleaved games are stored contiguously, across shards. """
+    path = str(tmpdir.join('traj'))
+    rng = np.random.RandomState(0)
+    expected = {}
+    with TrajectoryWriter(path, obs_size=5, n_actions=13, n_players=2, shard_size=10) as writer:
+        for step in range(4):
+            for game_id in range(3):
+                obs = rng.rand(5)
+                mask = rng.rand(13) < 0.5
+                expected.setdefault(game_id, []).append((obs, mask, step))
+                writer.add(game_id, obs, mask, step, game_id % 2, reward=[step, -step])
+        writer.end_game(1, scores=[3, 4])
+        writer.end_game(0, scores=[1, 2])
+        writer.add(3, np.ones(5), np.ones(13, dtype=bool), 7, 0)
+        # Games 2 and 3 are still in progress when the writer is closed.
+
+        # A game that ends without decisions is still listed.
+        writer.end_game(4)
+
+        for _ in range(11):
+            writer.add(5, np.ones(5), np.ones(13, dtype=bool), 0, 0)
+        with pytest.raises(ValueError):
+            writer.end_game(5)
+
+    reader = TrajectoryReader(path)
+    assert len(reader.shards) > 1
+    games = dict((int(g['game']), i) for i, g in enumerate(reader.games))
+    assert sorted(games) == [0, 1, 2, 3, 4]
+    for game_id, decisions in expected.items():
+        records = reader.game(games[game_id])
+        assert isinstance(records.base, np.memmap) or isinstance(records, np.memmap)
+        assert len(records) == len(decisions)
+        masks = reader.masks(records)
+        for record, mask, (obs, expected_mask, step) in zip(records, masks, decisions):
+            assert np.allclose(record['obs'], obs)
+            assert (mask == expected_mask).all()
+            assert record['action'] == step
+            assert list(record['reward']) == [step, -step]
+
+    entry = reader.games[games[1]]
+    assert entry['complete'] and list(entry['scores']) == [3, 4]
+    assert not reader.games[games[2]]['complete']
+    assert reader.n_records == 4 * 3 + 1
+
+
+def test_recording_agent(tmpdir):
+    path = str(tmpdir.join('traj'))
+    game = SmallAgricolaGame()
+    game.ui = None
+    setup_game(game, first_player=0)
+    advance(game)
+    encoder, index = ObservationEncoder(game), ActionIndex(game)
+
+    with TrajectoryWriter(path, encoder.size, index.size, 2) as writer:
+        agent = RecordingAgent(RandomAgent(seed=0), writer, encoder, index)
+        result = play(SmallAgricolaGame(), agent, first_player=0)
+        writer.end_game(0, scores=[result.score[0], result.score[1]])
+
+    reader = TrajectoryReader(path)
+    records = reader.game(0)
+    assert len(records) == 8
+    masks = reader.masks(records)
+    assert all(masks[i, a] for i, a in enumerate(records['action']))
+    assert set(records['player']) == {0, 1}
+    assert (records['reward'] == 0).all()
+
+
+def test_vector_env(tmpdir):
+    """ Test recording the steps of a vectorised environment. """
+    path = str(tmpdir.join('traj'))
+    n_envs = 2
+    with VectorEnv(SmallAgricolaGame, n_envs, n_workers=0) as env, \
+            TrajectoryWriter(path, env.encoder.size, env.index.size, 2) as writer:
+        env.reset()
+        game_ids = list(range(n_envs))
+        for step in range(8):
+            actions = [np.flatnonzero(m)[0] for m in env.mask]
+            writer.add_batch(game_ids, env.obs, env.mask, actions, env.to_move)
+            _, rewards, dones = env.step(actions)
+            for k in np.flatnonzero(dones):
+                writer.end_game(game_ids[k], scores=rewards[k])
+                game_ids[k] = max(game_ids) + 1
+
+    reader = TrajectoryReader(path)
+    assert len(reader) == n_envs
+    assert all(g['complete'] and g['stop'] - g['start'] == 8 for g in reader.games)
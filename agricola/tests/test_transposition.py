@@ -0,0 +1,59 @@
+from agricola.endgame import EndgameSolver
+from agricola.mcts import MCTS
+from agricola.transposition import TranspositionTable
+
+
+def test_lru_eviction():
+    table = TranspositionTable(capacity=2)
+    table['a'] = 1
+    table['b'] = 2
+    assert table['a'] == 1
+    table['c'] = 3
+
+    assert len(table) == 2
+    assert 'b' not in table
+    assert table.get('b') is None
+    assert table.get('c') == 3
+    assert table.stats.evictions == 1
+    assert table.stats.hits == 2
+    assert table.stats.misses == 1
+
+
+def test_depth_preferred_eviction():
+    table = TranspositionTable(capacity=3, policy='depth')
+    table.store('deep', 1, depth=10)
+    table.store('shallow', 2, depth=1)
+    table.store('medium', 3, depth=5)
+    table.store('new', 4, depth=0)
+
+    assert 'deep' in table and 'medium' in table and 'new' in table
+    assert 'shallow' not in table
+    assert table.depth('deep') == 10
+
+
+def test_endgame_bounded_table(start):
+    """ Test that a small table does not change the solution, only the work done. """
+    game = start(2, n_moves=5)
+    expected = EndgameSolver(max_rounds=1).solve(game).value
+
+    table = TranspositionTable(capacity=16, policy='depth')
+    result = EndgameSolver(max_rounds=1, table=table).solve(game)
+    assert result.value == expected
+    assert len(table) <= 16
+    assert table.stats.evictions > 0
+
+
+def test_shared_table(start):
+    """ Test that searches sharing a table see each other's statistics. """
+    game = start(2, n_moves=4)
+    table = TranspositionTable(capacity=10000)
+
+    root = MCTS(n_simulations=30, seed=0, table=table).search(game)
+    entry = table[root.key]
+    assert entry[0] == 30
+    assert entry[1].sum() == root.total.sum()
+
+    hits = table.stats.hits
+    MCTS(n_simulations=30, seed=1, table=table).search(game)
+    assert table[root.key][0] == 60
+    assert table.stats.hits > hits
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from agricola import AgricolaInvalidChoice
+from agricola.vecenv import VectorEnv
+from agricola.tests.games import SmallAgricolaGame
+
+
+def _play(n_workers, n_steps=12):
+    """ Play the first legal action in every game, recording what the environment returns. """
+    history = []
+    with VectorEnv(SmallAgricolaGame, 3, n_workers=n_workers, seed=0) as env:
+        obs = env.reset()
+        assert obs.shape == (3, env.encoder.size)
+        assert env.mask.shape == (3, env.index.size)
+        for step in range(n_steps):
+            actions = [np.flatnonzero(m)[step % m.sum()] for m in env.mask]
+            obs, rewards, dones = env.step(actions)
+            history.append(
+                (obs.copy(), rewards.copy(), dones.copy(), env.mask.copy(), env.to_move.copy()))
+    return history
+
+
+def test_workers():
+    """ Test that seeded workers are reproducible and report finished games. """
+    first, second = _play(2), _play(2)
+    for a, b in zip(first, second):
+        for x, y in zip(a, b):
+            assert (x == y).all()
+
+    for history in [first, _play(0)]:
+        # Two rounds with two players placing two people each.
+        dones = np.array([h[2] for h in history])
+        assert dones[7].all() and dones.sum() == 3
+        assert (history[7][1] != 0).any()
+        assert (history[8][1] == 0).all()
+        assert all(h[3].any(axis=1).all() for h in history)
+
+
+def test_illegal_action():
+    with VectorEnv(SmallAgricolaGame, 2, n_workers=1, seed=0) as env:
+        env.reset()
+        illegal = np.flatnonzero(~env.mask[0])[0]
+        with pytest.raises(AgricolaInvalidChoice):
+            env.step([illegal, illegal])
@@ -0,0 +1,82 @@
+import numpy as np
+
+from agricola.game import StandardAgricolaGame, play
+from agricola.search import search_copy, apply_move, legal_moves, RandomAgent
+from agricola.observation import ObservationEncoder, PLAYER_FEATURES
+from agricola.view import GameView, HiddenCards, ObserverAgent, views
+
+
+def test_redaction(seeded_positions):
+    game = seeded_positions(3, n_moves=1)[0]
+    view = GameView(game, 1)
+    assert view.observer_idx == 1
+    assert view.round_idx == game.round_idx
+    assert view.players[1].hand is game.players[1].hand
+    for i in (0, 2):
+        player, hidden = game.players[i], view.players[i]
+        assert hidden.wood == player.wood and hidden.name == player.name
+        assert hidden.game is view
+        for kind, cards in hidden.hand.items():
+            assert isinstance(cards, HiddenCards)
+            assert len(cards) == len(player.hand[kind]) > 0
+            assert list(cards) == []
+            assert player.hand[kind][0] not in cards
+
+    # The view follows its game.
+    game.players[0].set_hand('occupations', game.players[0].hand['occupations'][:-1])
+    assert len(view.players[0].hand['occupations']) == len(game.players[0].hand['occupations'])
+
+    # Setting attributes on a view leaves the game alone.
+    view.round_idx = 99
+    assert game.round_idx != 99
+
+
+def test_clone_is_determinized(seeded_positions):
+    game = seeded_positions(3, n_moves=1)[0]
+    view = GameView(game, seed=0)
+    observer = view.observer_idx
+    hands = set()
+    for _ in range(5):
+        copy = search_copy(view)
+        assert copy.players[observer].hand == game.players[observer].hand
+        for i, player in enumerate(copy.players):
+            for kind, cards in player.hand.items():
+                assert len(cards) == len(game.players[i].hand[kind])
+        hands.add(tuple(c.name for c in copy.players[(observer + 1) % 3].hand['occupations']))
+    assert len(hands) > 1
+
+    # Moves can be searched and applied from the view.
+    moves = legal_moves(view)
+    assert moves == legal_moves(game)
+    child = apply_move(view, moves[0])
+    assert child.current_player_idx != observer
+
+
+def test_encoding(seeded_positions):
+    game = seeded_positions(3, n_moves=1)[0]
+    encoder = ObservationEncoder(game)
+    out = encoder.empty(2)
+    for p, view in enumerate(views(game)):
+        encoder.encode(game, out, 0, player_idx=p)
+        encoder.encode(view, out, 1)
+        full, redacted = out
+        hand = encoder.view(redacted, 'hand')
+        assert hand[0].sum() == sum(len(c) for c in game.players[p].hand.values())
+        assert hand[1:].sum() == 0
+        assert (encoder.view(full, 'hand')[0] == hand[0]).all()
+
+        # Everything else, including the sizes of hands, is public.
+        for name in ['farm', 'player', 'played', 'supply', 'actions', 'round']:
+            assert (encoder.view(full, name) == encoder.view(redacted, name)).all()
+        features = encoder.view(redacted, 'player')
+        for k in range(3):
+            player = game.players[(p + k) % 3]
+            assert features[k, PLAYER_FEATURES.index('hand_occupations')] == len(
+                player.hand['occupations'])
+
+
+def test_observer_agent():
+    np.random.seed(1)
+    game = StandardAgricolaGame(2)
+    game = play(game, ObserverAgent(RandomAgent(0), seed=0), first_player=0)
+    assert game.game_over
@@ -0,0 +1,290 @@
+""" Storage of self-play experience in memory-mapped shards.
+
+Self-play produces far more (observation, legal mask, action, reward) tuples
+than fit in memory as Python objects. A TrajectoryWriter is given each
+decision as it is made, by the game loop (see RecordingAgent) or by the
+driver of an environment (see ``vecenv.VectorEnv``), and stores it as one
+fixed-width record:
+
+``obs``
+    the observation (see ``observation.ObservationEncoder``), as float32,
+``mask``
+    the legal mask over the action indices (see ``indexing.ActionIndex``),
+    packed eight indices per byte (see ``unpack_masks``),
+``action``, ``player``
+    the index played and the player who played it,
+``reward``
+    the reward of every player for the decision.
+
+The decisions of each game are collected until the game ends and are then
+appended together, so that the records of a game are contiguous even when
+many games are played at once. Records go into shards: ``.npy`` files of
+``shard_size`` records, created at full size and memory-mapped, with a new
+shard started when a game does not fit into the current one. A table of the
+games (``games.npy``: game id, shard, first and last record, final scores)
+and a small manifest (``index.json``) describe the shards, and are rewritten
+every time a shard fills up and when the writer is closed.
+
+A TrajectoryReader memory-maps the shards of a directory and returns the
+records of any game as a slice of a shard, without parsing or copying.
+
+"""
+import json
+import os
+
+import numpy as np
+
+from agricola import AgricolaException
+from agricola.search import SearchAgent
+
+_MANIFEST = 'index.json'
+_GAMES = 'games.npy'
+
+
+def record_dtype(obs_size, n_actions, n_players):
+    """ dtype of a record for observations of ``obs_size`` and ``n_actions`` action indices. """
+    return np.dtype([
+        ('obs', '<f4', (obs_size,)),
+        ('mask', 'u1', ((n_actions + 7) // 8,)),
+        ('action', '<i8'),
+        ('player', '<i2'),
+        ('reward', '<f4', (n_players,)),
+    ])
+
+
+def games_dtype(n_players):
+    """ dtype of the table of games. """
+    return np.dtype([
+        ('game', '<i8'), ('shard', '<i4'), ('start', '<i8'), ('stop', '<i8'),
+        ('scores', '<f4', (n_players,)), ('complete', '?'),
+    ])
+
+
+def unpack_masks(packed, n_actions):
+    """ Boolean legal masks of shape (..., n_actions) from the ``mask`` field of records. """
+    return np.unpackbits(packed, axis=-1, count=n_actions).astype(bool)
+
+
+class TrajectoryWriter(object):
+    """ Writer of decisions to memory-mapped shards in the directory ``path``.
+
+    Parameters
+    ----------
+    path: str
+        Directory for the shards, created if needed. Must not already hold
+        trajectories.
+    obs_size: int
+        Size of the observations.
+    n_actions: int
+        Number of action indices.
+    n_players: int
+    shard_size: int > 0
+        Number of records per shard. Must be at least the number of
+        decisions of a game.
+
+    """
+    def __init__(self, path, obs_size, n_actions, n_players, shard_size=2**16):
+        if shard_size <= 0:
+            raise ValueError("shard_size must be positive, got {0}.".format(shard_size))
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        if os.path.exists(os.path.join(path, _MANIFEST)):
+            raise ValueError("{0} already holds trajectories.".format(path))
+
+        self.path = path
+        self.obs_size = obs_size
+        self.n_actions = n_actions
+        self.n_players = n_players
+        self.shard_size = shard_size
+        self.dtype = record_dtype(obs_size, n_actions, n_players)
+
+        self._shards = []
+        self._shard = None
+        self._used = 0
+        self._games = []
+        # game id -> list of pending records
+        self._pending = {}
+        self._closed = False
+
+    @property
+    def n_records(self):
+        """ Number of records written to shards so far. """
+        return sum(n for _, n in self._shards)
+
+    def add(self, game_id, obs, mask, action, player, reward=None):
+        """ Record one decision of game ``game_id``.
+
+        Parameters
+        ----------
+        game_id: int
+        obs: array of shape (obs_size,)
+        mask: boolean array of shape (n_actions,)
+        action: int
+        player: int
+        reward: array of shape (n_players,) (optional)
+            Defaults to zeros.
+
+        """
+        record = np.zeros((), dtype=self.dtype)
+        record['obs'] = obs
+        record['mask'] = np.packbits(np.asarray(mask, dtype=bool))
+        record['action'] = action
+        record['player'] = player
+        if reward is not None:
+            record['reward'] = reward
+        self._pending.setdefault(game_id, []).append(record)
+
+    def add_batch(self, game_ids, obs, masks, actions, players, rewards=None):
+        """ Record one decision for each of several games, e.g. a step of a VectorEnv. """
+        for k, game_id in enumerate(game_ids):
+            self.add(
+                game_id, obs[k], masks[k], actions[k], players[k],
+                None if rewards is None else rewards[k])
+
+    def end_game(self, game_id, scores=None, complete=True):
+        """ Append the decisions of game ``game_id`` to the shards.
+
+        ``scores`` are the final scores of the players, if known.
+
+        """
+        records = self._pending.pop(game_id, [])
+        n = len(records)
+        if n > self.shard_size:
+            raise ValueError(
+                "Game {0} has {1} decisions, more than the {2} records of a shard.".format(
+                    game_id, n, self.shard_size))
+        if self._shard is None or self._used + n > self.shard_size:
+            self._new_shard()
+
+        start = self._used
+        if n:
+            self._shard[start:start + n] = np.stack(records)
+        self._used += n
+        self._shards[-1][1] = self._used
+
+        entry = np.zeros((), dtype=games_dtype(self.n_players))
+        entry['game'] = game_id
+        entry['shard'] = len(self._shards) - 1
+        entry['start'], entry['stop'] = start, start + n
+        if scores is not None:
+            entry['scores'] = scores
+        entry['complete'] = complete
+        self._games.append(entry)
+
+    def _new_shard(self):
+        if self._shard is not None:
+            self._shard.flush()
+            self._shard = None
+            self._write_index()
+        name = 'shard-{0:05d}.npy'.format(len(self._shards))
+        self._shard = np.lib.format.open_memmap(
+            os.path.join(self.path, name), mode='w+', dtype=self.dtype,
+            shape=(self.shard_size,))
+        self._shards.append([name, 0])
+        self._used = 0
+
+    def _write_index(self):
+        games = np.array(self._games, dtype=games_dtype(self.n_players))
+        np.save(os.path.join(self.path, _GAMES), games)
+        manifest = dict(
+            obs_size=self.obs_size, n_actions=self.n_actions, n_players=self.n_players,
+            shard_size=self.shard_size,
+            shards=[dict(file=name, n_records=n) for name, n in self._shards])
+        tmp = os.path.join(self.path, _MANIFEST + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, os.path.join(self.path, _MANIFEST))
+
+    def close(self):
+        """ Write the games still in progress, marked incomplete, and the index. """
+        if self._closed:
+            return
+        for game_id in list(self._pending):
+            self.end_game(game_id, complete=False)
+        if self._shard is not None:
+            self._shard.flush()
+            self._shard = None
+        self._write_index()
+        self._closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TrajectoryReader(object):
+    """ Memory-mapped view of the trajectories in the directory ``path``. """
+    def __init__(self, path):
+        with open(os.path.join(path, _MANIFEST)) as f:
+            manifest = json.load(f)
+        self.obs_size = manifest['obs_size']
+        self.n_actions = manifest['n_actions']
+        self.n_players = manifest['n_players']
+        self.shards = [
+            np.load(os.path.join(path, s['file']), mmap_mode='r')[:s['n_records']]
+            for s in manifest['shards']]
+        self.games = np.load(os.path.join(path, _GAMES))
+
+    @property
+    def n_records(self):
+        return sum(len(s) for s in self.shards)
+
+    def game(self, i):
+        """ Records of the ``i``-th game, as a view of its shard. """
+        entry = self.games[i]
+        return self.shards[entry['shard']][entry['start']:entry['stop']]
+
+    def masks(self, records):
+        """ Boolean legal masks of ``records``. """
+        return unpack_masks(records['mask'], self.n_actions)
+
+    def __len__(self):
+        return len(self.games)
+
+
+class RecordingAgent(SearchAgent):
+    """ Agent that plays as another agent and records its decisions.
+
+    Parameters
+    ----------
+    agent: SearchAgent
+    writer: TrajectoryWriter
+    encoder: ObservationEncoder
+    index: ActionIndex
+        Decisions whose move has no index are recorded with action -1.
+    game_id: int
+        Id under which decisions are recorded. Call ``writer.end_game`` with
+        it once the game is over.
+
+    """
+    def __init__(self, agent, writer, encoder, index, game_id=0):
+        super(RecordingAgent, self).__init__(agent.max_list_length)
+        self.agent = agent
+        self.writer = writer
+        self.encoder = encoder
+        self.index = index
+        self.game_id = game_id
+        self._obs = encoder.empty(1)
+
+    def set_deadline(self, deadline, token=None):
+        super(RecordingAgent, self).set_deadline(deadline, token)
+        self.agent.set_deadline(deadline, token)
+
+    def action_timed_out(self, name):
+        super(RecordingAgent, self).action_timed_out(name)
+        self.agent.action_timed_out(name)
+
+    def choose_move(self, game):
+        move = self.agent.choose_move(game)
+        if move is not None:
+            try:
+                action = self.index.encode(game, move)
+            except AgricolaException:
+                action = -1
+            self.encoder.encode(game, self._obs)
+            self.writer.add(
+                self.game_id, self._obs[0], self.index.legal_mask(game), action,
+                game.current_player_idx)
+        return move
@@ -0,0 +1,148 @@
+""" Bounded transposition table shared by the search agents.
+
+Many positions in Agricola are reached by several move orders (taking
+"Forest" then "Clay Pit" leaves the same farm as the reverse order), so
+searches keep a table from positions (usually ``search.state_key`` or its
+hash) to whatever they have learned about them: bounds and best moves for the
+endgame solver, visit counts and total rewards for MCTS, or just the fact that
+a position has been seen for the solo optimiser.
+
+The table behaves like a dict, so it can be passed anywhere a dict was used
+as a table, but holds at most ``capacity`` entries. When full, storing a new
+entry evicts either the least recently used entry ('lru') or, among the few
+least recently used entries, the one with the smallest depth ('depth'), where
+the depth of an entry is supplied by the search storing it and should grow
+with the amount of work the entry saves.
+
+A single table can be shared by any number of searches in the same process;
+entries of different kinds of search should use keys that cannot collide
+(e.g. by prefixing them with a tag).
+
+"""
+from collections import OrderedDict
+
+
+class TableStats(object):
+    """ Counters describing the use of a TranspositionTable. """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @property
+    def lookups(self):
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self):
+        return self.hits / float(self.lookups) if self.lookups else 0.0
+
+    def __str__(self):
+        return "<TableStats hits={0} misses={1} stores={2} evictions={3} hit_rate={4:.3f}>".format(
+            self.hits, self.misses, self.stores, self.evictions, self.hit_rate)
+
+    def __repr__(self):
+        return str(self)
+
+
+class TranspositionTable(object):
+    """ Dict-like table with a bounded number of entries.
+
+    Parameters
+    ----------
+    capacity: int > 0 (optional)
+        Maximum number of entries. If not supplied, the table is unbounded.
+    policy: str
+        Eviction policy when full: 'lru' evicts the least recently used entry,
+        'depth' evicts the entry with the smallest depth among the ``sample``
+        least recently used entries.
+    sample: int > 0
+        Number of entries considered for eviction by the 'depth' policy.
+
+    """
+    def __init__(self, capacity=None, policy='lru', sample=8):
+        if policy not in ('lru', 'depth'):
+            raise ValueError("Unknown eviction policy: {0}.".format(policy))
+        if capacity is not None and capacity <= 0:
+            raise ValueError("Capacity must be positive, got {0}.".format(capacity))
+
+        self.capacity = capacity
+        self.policy = policy
+        self.sample = sample
+        self.stats = TableStats()
+        # Maps key to (value, depth), least recently used first.
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """ Value stored for ``key``, or ``default``. Counts as a use of the entry. """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def store(self, key, value, depth=0):
+        """ Store ``value`` for ``key``, evicting another entry if the table is full. """
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif self.capacity is not None and len(entries) >= self.capacity:
+            self._evict()
+        entries[key] = (value, depth)
+        self.stats.stores += 1
+
+    def depth(self, key):
+        """ Depth stored with ``key``. """
+        return self._entries[key][1]
+
+    def _evict(self):
+        entries = self._entries
+        if self.policy == 'lru':
+            entries.popitem(last=False)
+        else:
+            victim, victim_depth = None, None
+            for i, (key, (_, depth)) in enumerate(entries.items()):
+                if i == self.sample:
+                    break
+                if victim is None or depth < victim_depth:
+                    victim, victim_depth = key, depth
+            del entries[victim]
+        self.stats.evictions += 1
+
+    def clear(self):
+        """ Remove all entries. Counters are kept. """
+        self._entries.clear()
+
+    def __getitem__(self, key):
+        value = self.get(key, _missing)
+        if value is _missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.store(key, value)
+
+    def __delitem__(self, key):
+        del self._entries[key]
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __str__(self):
+        return "<TranspositionTable entries={0} capacity={1} policy={2} {3}>".format(
+            len(self), self.capacity, self.policy, self.stats)
+
+    def __repr__(self):
+        return str(self)
+
+
+_missing = object()
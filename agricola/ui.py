@@ -1,15 +1,50 @@
 from future.builtins.misc import input
 import re
 
-from agricola.action import (
+from agricola.choice import (
     DiscreteChoice, CountChoice, ListChoice,
-    VariableLengthListChoice, SpaceChoice)
+    VariableLengthListChoice, SpaceChoice, YesNoChoice)
+
+
+class DecisionToken(object):
+    """ Handle on one timed decision, cancelled by ``game.play`` if it runs out of time.
+
+    Interfaces are not interrupted when a decision runs out of time: they
+    should check ``UserInterface.cancelled`` and stop working on a decision
+    whose result will be ignored.
+
+    """
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __str__(self):
+        return "<DecisionToken cancelled={0}>".format(self.cancelled)
+
+    def __repr__(self):
+        return str(self)
 
 
 class UserInterface(object):
+    # ``time.perf_counter()`` time by which the current decision must be made.
+    deadline = None
+    # DecisionToken of the current decision, if it is timed.
+    token = None
+
     def update_game(self, game):
         self.game = game
 
+    def set_deadline(self, deadline, token=None):
+        """ Called by ``game.play`` before each decision when decisions are timed (None otherwise). """
+        self.deadline = deadline
+        self.token = token
+
+    def cancelled(self):
+        """ Whether the current decision has run out of time, so that its result will be ignored. """
+        return self.token is not None and self.token.cancelled
+
     def start_game(self, game):
         self.update_game(game)
         print("Starting game")
@@ -48,6 +83,9 @@ class UserInterface(object):
     def action_failed(self, msg):
         print("Action failed: {0}.".format(msg))
 
+    def action_timed_out(self, name):
+        print("Player {0} ran out of time.".format(name))
+
     def action_successful(self):
         print("Action successful. Result: ")
         print("\n" + ("*" * 20))
@@ -129,6 +167,9 @@ class UserInterface(object):
             while True:
                 print("Player {0}, enter a grid co-ordinate (y, x): ".format(name))
                 print(choice_spec.desc)
+                if choice_spec.spaces is not None:
+                    print("Legal spaces: {0}".format(
+                        ", ".join(str(s) for s in choice_spec.spaces)))
                 response = self.get_next_response()
 
                 if not response:
@@ -151,6 +192,62 @@ class UserInterface(object):
             raise NotImplementedError()
 
 
+class SilentInterface(UserInterface):
+    """ A user interface that prints nothing and answers every request with a fixed default.
+
+    Defaults are chosen to be as passive as possible: optional effects offered
+    by cards are declined, counts are zero and lists are empty. For choices
+    between several options the last option is taken, which for the choices
+    offered by cards is the "do nothing" option where there is one.
+
+    """
+    def start_game(self, game):
+        self.update_game(game)
+
+    def begin_stage(self, stage_idx):
+        pass
+
+    def begin_round(self, round_idx, action):
+        pass
+
+    def harvest(self):
+        pass
+
+    def end_round(self):
+        pass
+
+    def end_stage(self):
+        pass
+
+    def action_failed(self, msg):
+        pass
+
+    def action_timed_out(self, name):
+        pass
+
+    def action_successful(self):
+        pass
+
+    def finish_game(self):
+        pass
+
+    def get_user_choice(self, name, choice_spec):
+        if isinstance(choice_spec, YesNoChoice):
+            return False
+        elif isinstance(choice_spec, DiscreteChoice):
+            return choice_spec.options[-1]
+        elif isinstance(choice_spec, CountChoice):
+            return 0
+        elif isinstance(choice_spec, ListChoice):
+            return [self.get_user_choice(name, sc) for sc in choice_spec.subchoices]
+        elif isinstance(choice_spec, VariableLengthListChoice):
+            return []
+        elif isinstance(choice_spec, SpaceChoice):
+            return choice_spec.spaces[0] if choice_spec.spaces else None
+        else:
+            raise NotImplementedError()
+
+
 class _TestUIFinished(BaseException):
     pass
 
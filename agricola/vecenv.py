@@ -0,0 +1,283 @@
+""" Vectorised self-play environment with games in worker processes.
+
+A VectorEnv steps many games at once for training. Every game is played by
+the policy for all of its players: a step takes one action index (see
+``indexing.ActionIndex``) per game, plays it for the player to move and
+advances the game to its next decision. After each step the environment
+exposes, for every game,
+
+``obs``
+    the observation of the position for the player to move (see
+    ``observation.ObservationEncoder``),
+``mask``
+    the legal action indices of the position,
+``to_move``
+    the player to move,
+``rewards``
+    the final score of every player if the step ended the game, and zeros
+    otherwise,
+``dones``
+    whether the step ended the game.
+
+A game that ends is replaced by a new one straight away, so ``obs`` and
+``mask`` always describe a position to play.
+
+The games are split between ``n_workers`` processes. The arrays above and
+the actions live in ``multiprocessing.shared_memory`` blocks that the
+workers write to and read from directly, so that a step only sends each
+worker a short command and waits for a short reply instead of pickling
+observations and masks. With ``n_workers=0`` the games are stepped in the
+calling process, which is convenient for debugging.
+
+"""
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from agricola import AgricolaException, AgricolaInvalidChoice
+from agricola.game import setup_game, advance
+from agricola.indexing import ActionIndex
+from agricola.observation import ObservationEncoder
+from agricola.search import apply_move, search_copy
+
+
+def _start_game(game_factory):
+    game = game_factory()
+    game.ui = None
+    setup_game(game)
+    advance(game)
+    return search_copy(game)
+
+
+def _array_specs(n_envs, n_players, obs_size, n_actions):
+    """ Name, shape and dtype of each shared array. """
+    return [
+        ('obs', (n_envs, obs_size), np.float32),
+        ('mask', (n_envs, n_actions), np.bool_),
+        ('to_move', (n_envs,), np.int16),
+        ('rewards', (n_envs, n_players), np.float32),
+        ('dones', (n_envs,), np.bool_),
+        ('actions', (n_envs,), np.int64),
+    ]
+
+
+class _EnvSlice(object):
+    """ The games ``lo`` to ``hi`` of a VectorEnv, writing to the shared arrays. """
+    def __init__(self, game_factory, lo, hi, arrays):
+        self.game_factory = game_factory
+        self.lo, self.hi = lo, hi
+        self.arrays = arrays
+        self.games = [None] * (hi - lo)
+        self.encoder = None
+        self.index = None
+
+    def _write(self, i, game):
+        k = self.lo + i
+        self.encoder.encode(game, self.arrays['obs'], k)
+        self.index.legal_mask(game, self.arrays['mask'][k])
+        self.arrays['to_move'][k] = game.current_player_idx
+
+    def reset(self):
+        for i in range(len(self.games)):
+            game = _start_game(self.game_factory)
+            if self.encoder is None:
+                self.encoder = ObservationEncoder(game)
+                self.index = ActionIndex(game)
+            self.games[i] = game
+            self._write(i, game)
+        self.arrays['rewards'][self.lo:self.hi] = 0
+        self.arrays['dones'][self.lo:self.hi] = False
+
+    def step(self):
+        """ Play the shared actions of the slice. Returns an error message, or None. """
+        rewards, dones = self.arrays['rewards'], self.arrays['dones']
+        for i, game in enumerate(self.games):
+            k = self.lo + i
+            action = int(self.arrays['actions'][k])
+            try:
+                game = apply_move(game, self.index.decode(game, action))
+            except AgricolaException as e:
+                return "Game {0}: action {1} is illegal: {2}".format(k, action, e)
+
+            rewards[k] = 0
+            dones[k] = game.game_over
+            if game.game_over:
+                rewards[k] = [game.score[p] for p in range(game.n_players)]
+                game = _start_game(self.game_factory)
+            self.games[i] = game
+            self._write(i, game)
+        return None
+
+
+def _attach(specs, names):
+    blocks, arrays = [], {}
+    for (name, shape, dtype), block_name in zip(specs, names):
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return blocks, arrays
+
+
+def _worker(conn, game_factory, lo, hi, specs, names, seed):
+    np.random.seed(seed)
+    blocks, arrays = _attach(specs, names)
+    env = _EnvSlice(game_factory, lo, hi, arrays)
+    while True:
+        command = conn.recv()
+        if command == 'step':
+            conn.send(env.step())
+        elif command == 'reset':
+            env.reset()
+            conn.send(None)
+        else:
+            break
+    conn.close()
+
+
+class VectorEnv(object):
+    """ Many self-play games stepped together in worker processes.
+
+    Parameters
+    ----------
+    game_factory: callable
+        Function with no arguments returning a new game (e.g. a game class
+        bound to its number of players). Must be picklable unless the
+        'fork' start method is used. All games must share a configuration.
+    n_envs: int > 0
+        Number of games.
+    n_workers: int >= 0 (optional)
+        Number of worker processes, each of which owns a contiguous slice of
+        the games. Defaults to the number of CPUs (at most ``n_envs``). If 0,
+        the games are stepped in this process.
+    seed: int (optional)
+        Base seed; each worker derives its own seed from it. Games stepped
+        in this process use the global numpy random state.
+    start_method: str (optional)
+        ``multiprocessing`` start method for the workers.
+
+    """
+    def __init__(self, game_factory, n_envs, n_workers=None, seed=None, start_method=None):
+        if n_workers is None:
+            n_workers = min(multiprocessing.cpu_count(), n_envs)
+        self.n_envs = n_envs
+        self.n_workers = n_workers
+        seed = np.random.randint(2**31) if seed is None else seed
+
+        game = _start_game(game_factory)
+        self.n_players = game.n_players
+        self.encoder = ObservationEncoder(game)
+        self.index = ActionIndex(game)
+
+        specs = _array_specs(n_envs, self.n_players, self.encoder.size, self.index.size)
+        self._blocks = []
+        arrays = {}
+        for name, shape, dtype in specs:
+            nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            block = shared_memory.SharedMemory(create=True, size=nbytes)
+            self._blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            arrays[name][...] = 0
+        self._arrays = arrays
+        for name in arrays:
+            setattr(self, name, arrays[name])
+
+        bounds = np.linspace(0, n_envs, max(n_workers, 1) + 1).astype(int)
+        self._local = None
+        self._workers = []
+        if n_workers == 0:
+            self._local = _EnvSlice(game_factory, 0, n_envs, arrays)
+        else:
+            context = multiprocessing.get_context(start_method)
+            names = [b.name for b in self._blocks]
+            for w in range(n_workers):
+                parent, child = context.Pipe()
+                process = context.Process(
+                    target=_worker,
+                    args=(child, game_factory, bounds[w], bounds[w + 1], specs, names, seed + w))
+                process.daemon = True
+                process.start()
+                child.close()
+                self._workers.append((process, parent))
+        self._closed = False
+
+    def _broadcast(self, command):
+        if self._local is not None:
+            if command == 'reset':
+                self._local.reset()
+                return
+            error = self._local.step()
+            if error is not None:
+                raise AgricolaInvalidChoice(error)
+            return
+
+        for _, conn in self._workers:
+            conn.send(command)
+        errors = [conn.recv() for _, conn in self._workers]
+        errors = [e for e in errors if e is not None]
+        if errors:
+            raise AgricolaInvalidChoice("; ".join(errors))
+
+    def reset(self):
+        """ Start new games. Returns the observations. """
+        self._broadcast('reset')
+        return self.obs
+
+    def step(self, actions):
+        """ Play one action index per game.
+
+        Returns
+        -------
+        (obs, rewards, dones): the shared arrays, valid until the next step.
+
+        Raises AgricolaInvalidChoice if an action is not legal, in which case
+        the games of the workers that reported it are in an unspecified
+        state and the environment should be reset.
+
+        """
+        self.actions[:] = actions
+        self._broadcast('step')
+        return self.obs, self.rewards, self.dones
+
+    def close(self):
+        """ Stop the workers and release the shared memory. """
+        if self._closed:
+            return
+        self._closed = True
+        for process, conn in self._workers:
+            try:
+                conn.send('close')
+            except (BrokenPipeError, OSError):
+                pass
+        for process, conn in self._workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self._workers = []
+        self._local = None
+
+        for name in list(self._arrays):
+            delattr(self, name)
+        self._arrays = {}
+        for block in self._blocks:
+            try:
+                block.close()
+            except BufferError:
+                # Arrays returned by step are still referenced; the memory is
+                # released once they are gone.
+                pass
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
@@ -0,0 +1,192 @@
+""" Views of a game from the point of view of one player.
+
+The occupations and minor improvements in a player's hand are private, but an
+AgricolaGame holds every player's hand. A GameView shows a game to an
+``observer`` without copying it: every attribute is read from the game
+itself, except that the players are shown through PlayerViews, which hide
+the hands of the other players. The hand of a hidden player is a dict
+mapping each kind of card to HiddenCards, which only tell how many cards
+the player holds. Hands are redacted when they are accessed, so a view costs
+next to nothing to make and always shows the current state of its game.
+
+Views are meant to be given to encoders (e.g.
+``observation.ObservationEncoder``, which encodes a view from the point of
+view of its observer) and to agents. Cloning a view, as ``search.search_copy``
+and ``search.apply_move`` do, gives a determinisation of the game for the
+observer (see ``determinize.Determinizer``): a full copy of the game in
+which the hidden hands are drawn at random from the cards the observer has
+not seen. Searches run on a view therefore never see the hidden cards, and
+an ObserverAgent makes any agent play from views.
+
+Attributes set on a view are set on the view, not on its game, and the
+methods of the game and its players act on the game itself.
+
+"""
+import numpy as np
+
+from agricola.cards import CardSet
+from agricola.determinize import Determinizer
+from agricola.search import SearchAgent
+
+
+class HiddenCards(object):
+    """ The cards of a hand that the observer cannot see.
+
+    Has the length of the hidden cards, but no cards: iterating over it gives
+    nothing and it contains nothing.
+
+    """
+    hidden = True
+
+    def __init__(self, n):
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return iter(())
+
+    def __contains__(self, card):
+        return False
+
+    def __str__(self):
+        return "<{0} hidden cards>".format(self.n)
+
+    def __repr__(self):
+        return str(self)
+
+
+class PlayerView(object):
+    """ A player of a GameView. The hand (and ``hand_set``) is hidden unless ``visible``. """
+    def __init__(self, player, game_view, visible):
+        self._player = player
+        self._game_view = game_view
+        self.visible = visible
+
+    @property
+    def hand(self):
+        hand = self._player.hand
+        if self.visible:
+            return hand
+        return {kind: HiddenCards(len(cards)) for kind, cards in hand.items()}
+
+    @property
+    def hand_set(self):
+        if self.visible:
+            return self._player.hand_set
+        return CardSet()
+
+    @property
+    def game(self):
+        return self._game_view
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name == '_player':
+            raise AttributeError(name)
+        return getattr(self._player, name)
+
+    def __str__(self):
+        return "<PlayerView {0} visible={1}>".format(self._player.name, self.visible)
+
+    def __repr__(self):
+        return str(self)
+
+
+class GameView(object):
+    """ View of ``game`` for the player ``observer_idx``.
+
+    Parameters
+    ----------
+    game: AgricolaGame
+        Game that has been set up (see ``game.setup_game``).
+    observer_idx: int (optional)
+        Player whose point of view is taken. Defaults to the player whose
+        turn it is.
+    shuffle_schedule: bool
+        Passed on to the Determinizer of ``clone``.
+    seed: int or RandomState (optional)
+        Seed of the determinisations made by ``clone``.
+
+    """
+    def __init__(self, game, observer_idx=None, shuffle_schedule=False, seed=None):
+        if observer_idx is None:
+            observer_idx = game.current_player_idx
+        self._game = game
+        self.observer_idx = observer_idx
+        self.shuffle_schedule = shuffle_schedule
+        self._seed = seed
+        self._players = None
+        self._determinizer = None
+
+    @property
+    def players(self):
+        if self._players is None:
+            self._players = [
+                PlayerView(p, self, i == self.observer_idx)
+                for i, p in enumerate(self._game.players)]
+        return self._players
+
+    def clone(self):
+        """ Determinisation of the game for the observer (see the module docstring).
+
+        The unseen cards are found at the first call, so a view should not be
+        cloned again once its game has changed.
+
+        """
+        if self._determinizer is None:
+            self._determinizer = Determinizer(
+                self._game, self.observer_idx, self.shuffle_schedule, self._seed)
+        return self._determinizer.sample(1)[0]
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name == '_game':
+            raise AttributeError(name)
+        return getattr(self._game, name)
+
+    def __str__(self):
+        return "<GameView of player {0}>".format(self.observer_idx)
+
+    def __repr__(self):
+        return str(self)
+
+
+def views(game, shuffle_schedule=False, seed=None):
+    """ GameView of ``game`` for each of its players. """
+    return [
+        GameView(game, i, shuffle_schedule, seed)
+        for i in range(game.n_players)]
+
+
+class ObserverAgent(SearchAgent):
+    """ Agent that plays as ``agent`` given only the GameView of the player to move.
+
+    Parameters
+    ----------
+    agent: SearchAgent
+    shuffle_schedule: bool
+        Passed on to the GameViews.
+    seed: int or RandomState (optional)
+        Seed of the determinisations of the views.
+
+    """
+    def __init__(self, agent, shuffle_schedule=False, seed=None):
+        super(ObserverAgent, self).__init__(agent.max_list_length)
+        self.agent = agent
+        self.shuffle_schedule = shuffle_schedule
+        if isinstance(seed, np.random.RandomState):
+            self.rng = seed
+        else:
+            self.rng = np.random.RandomState(seed)
+
+    def set_deadline(self, deadline, token=None):
+        super(ObserverAgent, self).set_deadline(deadline, token)
+        self.agent.set_deadline(deadline, token)
+
+    def action_timed_out(self, name):
+        super(ObserverAgent, self).action_timed_out(name)
+        self.agent.action_timed_out(name)
+
+    def choose_move(self, game):
+        view = GameView(game, shuffle_schedule=self.shuffle_schedule, seed=self.rng)
+        return self.agent.choose_move(view)